@@ -6,16 +6,16 @@ if __name__ == "__main__":
     exec(marshal.loads(_recovered.read_bytes()), globals())
     raise SystemExit
 
+# 最先导入：以此为启动计时的起点
+from xiaoshuo_core import startup_profile
+
 import os
 import sys
 import re
 import time
 import logging
 import threading
-import queue
 import json
-import zipfile
-import requests
 from datetime import datetime
 import secrets
 import uuid
@@ -23,10 +23,19 @@ import platform
 import hashlib
 import hmac
 from decimal import Decimal, InvalidOperation
+startup_profile.mark("import stdlib")
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from google import genai
-from google.genai import types
+from tkinter import ttk, messagebox, filedialog, simpledialog
+startup_profile.mark("import tkinter")
+
+from xiaoshuo_core import lazy_import
+from xiaoshuo_core import chapter_context, chapter_pipeline, chapter_store, checkpoint, config_service, context_store, gemini_fallback, hedging, live_outline, model_router, novel_export, outline_index, outline_tokenizer, provider_clients, rate_limiter, request_executor, response_cache, retry_policy, section_scheduler, stream_guard, streaming, ui_bus
+
+# 重模块延迟到第一次使用时再导入（登录界面不需要它们）：google.genai 约 0.7 s，requests 约 0.1 s
+types = lazy_import.lazy_module("google.genai.types")
+requests = lazy_import.lazy_module("requests")
+zipfile = lazy_import.lazy_module("zipfile")
+startup_profile.mark("import xiaoshuo_core")
 
 APP_TITLE = "小说大纲生成器"
 DEFAULT_GEMINI_MODEL = "gemini-3-pro-preview"
@@ -167,6 +176,31 @@ def _humanize_mysql_connect_error(host: str, user: str, database: str, exc: Exce
         )
     return f"MySQL连接失败：{exc}"
 
+def _app_base_dir() -> str:
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+def _config_json_candidates() -> list:
+    """参与合并的 config.json，后面的覆盖前面的：环境变量指定、打包内置、exe 同目录、当前目录、上级目录"""
+    paths = []
+    env_path = (os.environ.get("CONFIG_JSON_PATH", "") or os.environ.get("OUTLINE_APP_CONFIG", "") or "").strip()
+    if env_path:
+        paths.append(env_path)
+    meipass = getattr(sys, "_MEIPASS", "")
+    if meipass:
+        paths.append(os.path.join(meipass, "config.json"))
+    base_dir = _app_base_dir()
+    paths.append(os.path.join(base_dir, "config.json"))
+    try:
+        paths.append(os.path.join(os.getcwd(), "config.json"))
+    except Exception:
+        pass
+    paths.append(os.path.join(os.path.dirname(base_dir), "config.json"))
+    return paths
+
+CONFIG = config_service.ConfigService(_config_json_candidates)
+
 def _clear_root(root: tk.Tk):
     for w in list(root.winfo_children()):
         try:
@@ -174,10 +208,21 @@ def _clear_root(root: tk.Tk):
         except Exception:
             pass
 
+def _detach_outline_app(root: tk.Tk):
+    # 旧的主界面即将被销毁：摘掉它挂在全局配置上的监听，否则窗口对象一直存活并在每次改配置时被回调
+    app = getattr(root, "_outline_app", None)
+    if app is not None:
+        app._detach_config_listener()
+        try:
+            root._outline_app = None
+        except Exception:
+            pass
+
 def show_main_screen(root: tk.Tk, user_row: dict):
     if (not isinstance(user_row, dict)) or (not user_row.get("id")):
         show_auth_screen(root)
         return
+    _detach_outline_app(root)
     _clear_root(root)
     root.title(APP_TITLE)
     root.geometry("1000x800")
@@ -191,6 +236,7 @@ def show_main_screen(root: tk.Tk, user_row: dict):
         app._set_logged_in_user(user_row)
 
 def show_auth_screen(root: tk.Tk):
+    _detach_outline_app(root)
     _clear_root(root)
     w = AuthWindow(root)
     try:
@@ -329,40 +375,8 @@ class AuthWindow:
         return ""
 
     def _load_config_json(self) -> dict:
-        paths = []
-        env_path = (os.environ.get("CONFIG_JSON_PATH", "") or os.environ.get("OUTLINE_APP_CONFIG", "") or "").strip()
-        if env_path and os.path.exists(env_path):
-            paths.append(env_path)
-        bundled = self._get_bundled_config_path()
-        if bundled and os.path.exists(bundled):
-            paths.append(bundled)
-        external = self._get_external_config_path()
-        if external and os.path.exists(external):
-            paths.append(external)
-        try:
-            cwd_cfg = os.path.join(os.getcwd(), "config.json")
-            if os.path.exists(cwd_cfg):
-                paths.append(cwd_cfg)
-        except Exception:
-            pass
-        try:
-            base_dir = self._get_app_base_dir()
-            parent_cfg = os.path.join(os.path.dirname(base_dir), "config.json")
-            if os.path.exists(parent_cfg):
-                paths.append(parent_cfg)
-        except Exception:
-            pass
-
-        merged = {}
-        for p in list(dict.fromkeys(paths)):
-            try:
-                with open(p, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        merged.update(data)
-            except Exception:
-                continue
-        return merged
+        # 合并结果由 CONFIG 缓存，文件改动后按 mtime 自动重新读取；返回值只读
+        return CONFIG.get()
 
     def _load_type_library(self) -> list[str]:
         cfg = self._load_config_json()
@@ -402,6 +416,7 @@ class AuthWindow:
         try:
             with open(cfg_path, "w", encoding="utf-8") as f:
                 json.dump(cfg, f, ensure_ascii=False, indent=2)
+            CONFIG.invalidate()
             return True
         except Exception:
             return False
@@ -451,6 +466,7 @@ class AuthWindow:
         try:
             with open(cfg_path, "w", encoding="utf-8") as f:
                 json.dump(cfg, f, ensure_ascii=False, indent=2)
+            CONFIG.invalidate()
             return True
         except Exception:
             return False
@@ -1373,7 +1389,12 @@ class OutlineApp:
         self.log_path = None
         self.chapters_data = []
         self.full_outline_context = ""
+        self.chapter_store = None
         self.all_chapter_summaries = []
+        self.context_store = None
+        self._outline_index = None
+        self.live_outline = live_outline.LiveOutline()
+        self._live_outline_after = None
         self.last_outline_path = None
         self._cancel_event = threading.Event()
         self._pause_event = threading.Event()
@@ -1393,6 +1414,9 @@ class OutlineApp:
         self._is_working = False
         self.type_library = self._load_type_library()
         self.theme_library = self._load_theme_library()
+        self._apply_runtime_config()
+        # config.json 被修改后（按 mtime 检测）自动重新应用，无需重启
+        CONFIG.add_listener(self._on_config_changed)
         self._build_ui()
         try:
             self.root.protocol("WM_DELETE_WINDOW", self._on_close)
@@ -1403,6 +1427,12 @@ class OutlineApp:
         while self._pause_event.is_set() and (not self._cancel_event.is_set()):
             time.sleep(0.2)
 
+    def _detach_config_listener(self):
+        try:
+            CONFIG.remove_listener(self._on_config_changed)
+        except Exception:
+            pass
+
     def _on_close(self):
         try:
             if getattr(self, "_is_working", False) and (not self._cancel_event.is_set()):
@@ -1415,6 +1445,7 @@ class OutlineApp:
                     pass
         except Exception:
             pass
+        self._detach_config_listener()
         try:
             self._stop_pay_callback_server()
         except Exception:
@@ -1601,6 +1632,9 @@ class OutlineApp:
         self.generate_btn = ttk.Button(row2, text="生成大纲", command=self.on_generate)
         self.generate_btn.pack(side=tk.LEFT)
 
+        self.resume_btn = ttk.Button(row2, text="继续上次生成", command=self.on_resume_generation)
+        self.resume_btn.pack(side=tk.LEFT, padx=8)
+
         self.pause_btn = ttk.Button(row2, text="暂停", command=self.on_toggle_pause, state=tk.DISABLED)
         self.pause_btn.pack(side=tk.LEFT, padx=8)
 
@@ -1641,8 +1675,34 @@ class OutlineApp:
         scrollbar = ttk.Scrollbar(row3, orient=tk.VERTICAL, command=self.output.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.output.configure(yscrollcommand=scrollbar.set)
+        self.output.bind("<<Modified>>", self._on_output_modified)
+        self.ui_bus = ui_bus.UiBus(self.root, self.output)
         self._update_account_ui()
 
+    def _apply_runtime_config(self):
+        try:
+            request_executor.configure(self._load_request_workers())
+        except Exception:
+            pass
+        try:
+            provider_clients.set_gemini_base_url(self._load_gemini_base_url())
+        except Exception:
+            pass
+        try:
+            rate_limiter.configure(self._load_config_json())
+            hedging.configure(self._load_config_json())
+        except Exception:
+            pass
+        try:
+            response_cache.configure(self._load_config_json(), self._get_app_base_dir())
+        except Exception as e:
+            (self.logger or logging.getLogger("outline")).warning(f"响应缓存初始化失败: {e}")
+
+    def _on_config_changed(self, old: dict, new: dict):
+        self._apply_runtime_config()
+        if self.logger:
+            self.logger.info("检测到 config.json 变化，已重新加载配置")
+
     def on_test_db(self):
         started = time.perf_counter()
         conn = self._mysql_connect()
@@ -1670,40 +1730,8 @@ class OutlineApp:
             messagebox.showerror("测试失败", f"测试失败：{e}")
 
     def _load_config_json(self) -> dict:
-        paths = []
-        env_path = (os.environ.get("CONFIG_JSON_PATH", "") or os.environ.get("OUTLINE_APP_CONFIG", "") or "").strip()
-        if env_path and os.path.exists(env_path):
-            paths.append(env_path)
-        bundled = self._get_bundled_config_path()
-        if bundled and os.path.exists(bundled):
-            paths.append(bundled)
-        external = self._get_external_config_path()
-        if external and os.path.exists(external):
-            paths.append(external)
-        try:
-            cwd_cfg = os.path.join(os.getcwd(), "config.json")
-            if os.path.exists(cwd_cfg):
-                paths.append(cwd_cfg)
-        except Exception:
-            pass
-        try:
-            base_dir = self._get_app_base_dir()
-            parent_cfg = os.path.join(os.path.dirname(base_dir), "config.json")
-            if os.path.exists(parent_cfg):
-                paths.append(parent_cfg)
-        except Exception:
-            pass
-
-        merged = {}
-        for p in list(dict.fromkeys(paths)):
-            try:
-                with open(p, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        merged.update(data)
-            except Exception:
-                continue
-        return merged
+        # 合并结果由 CONFIG 缓存，文件改动后按 mtime 自动重新读取；返回值只读
+        return CONFIG.get()
 
     def _load_theme_library(self) -> dict:
         cfg = self._load_config_json()
@@ -1750,6 +1778,7 @@ class OutlineApp:
         try:
             with open(cfg_path, "w", encoding="utf-8") as f:
                 json.dump(cfg, f, ensure_ascii=False, indent=2)
+            CONFIG.invalidate()
             return True
         except Exception:
             return False
@@ -2193,6 +2222,7 @@ class OutlineApp:
         self.username = None
         self.token_balance = 0
         self._update_account_ui()
+        self._detach_config_listener()
         show_auth_screen(self.root)
 
     def on_refresh_token(self):
@@ -2437,6 +2467,66 @@ class OutlineApp:
             p = os.path.join(self._get_app_base_dir(), p)
         return p
 
+    def _load_request_workers(self) -> int:
+        cfg = self._load_config_json()
+        raw = (cfg.get("request_workers") if isinstance(cfg, dict) else None)
+        if raw is None:
+            raw = os.environ.get("REQUEST_WORKERS")
+        try:
+            v = int(raw)
+        except Exception:
+            v = request_executor.DEFAULT_MAX_WORKERS
+        return v if v > 0 else request_executor.DEFAULT_MAX_WORKERS
+
+    def _load_section_concurrency(self) -> int:
+        cfg = self._load_config_json()
+        raw = (cfg.get("section_concurrency") if isinstance(cfg, dict) else None)
+        if raw is None:
+            raw = os.environ.get("SECTION_CONCURRENCY")
+        try:
+            v = int(raw)
+        except Exception:
+            v = section_scheduler.DEFAULT_CONCURRENCY
+        return v if v > 0 else section_scheduler.DEFAULT_CONCURRENCY
+
+    def _load_novel_pipeline_window(self) -> int:
+        cfg = self._load_config_json()
+        raw = (cfg.get("novel_pipeline_window") if isinstance(cfg, dict) else None)
+        if raw is None:
+            raw = os.environ.get("NOVEL_PIPELINE_WINDOW")
+        try:
+            v = int(raw)
+        except Exception:
+            v = chapter_pipeline.DEFAULT_WINDOW
+        return max(1, min(chapter_pipeline.MAX_WINDOW, v)) if v > 0 else chapter_pipeline.DEFAULT_WINDOW
+
+    def _load_novel_context_budget(self) -> int:
+        return chapter_context.configured_budget(self._load_config_json(), os.environ.get("NOVEL_CONTEXT_BUDGET_TOKENS"))
+
+    def _load_outline_two_phase(self, volumes) -> bool:
+        try:
+            if int(volumes or 1) < 2:
+                return False
+        except Exception:
+            return False
+        cfg = self._load_config_json()
+        raw = (cfg.get("outline_two_phase") if isinstance(cfg, dict) else None)
+        if raw is None:
+            raw = os.environ.get("OUTLINE_TWO_PHASE")
+        if raw is None:
+            return True
+        if isinstance(raw, str):
+            return raw.strip().lower() not in ("0", "false", "no", "off", "")
+        return bool(raw)
+
+    def _load_gemini_base_url(self) -> str:
+        cfg = self._load_config_json()
+        url = (cfg.get("gemini_base_url") if isinstance(cfg, dict) else "") or ""
+        url = str(url).strip()
+        if not url:
+            url = (os.environ.get("GEMINI_BASE_URL", "") or "").strip()
+        return url
+
     def _load_pay_callback_bind(self) -> str:
         cfg = self._load_config_json()
         bind = (cfg.get("pay_callback_bind") if isinstance(cfg, dict) else "") or ""
@@ -2979,7 +3069,7 @@ class OutlineApp:
                 return
 
             # 创建Gemini客户端
-            client = genai.Client(api_key=api_key)
+            client = provider_clients.get_genai_client(api_key)
 
             # 构建配置
             model = (self.model_var.get() or DEFAULT_GEMINI_MODEL).strip()
@@ -3046,12 +3136,12 @@ class OutlineApp:
         except Exception as e:
             error_msg = f"生成专业提示词时出错：{str(e)}"
             self.root.after(0, messagebox.showerror, "错误", error_msg)
-            self.root.after(0, self.output.insert, tk.END, f"\n{error_msg}\n")
+            self.ui_bus.append(f"\n{error_msg}\n")
         finally:
             # 恢复按钮状态
             self.root.after(0, self.gen_prompt_btn.config, {"state": tk.NORMAL})
             self.root.after(0, self.generate_btn.config, {"state": tk.NORMAL})
-            self.root.after(0, self.status_var.set, "就绪")
+            self.ui_bus.set(self.status_var, "就绪")
 
     def _update_professional_prompt_ui(self, professional_prompt):
         """更新专业提示词UI"""
@@ -3096,6 +3186,7 @@ class OutlineApp:
         self.generate_btn.config(state=tk.DISABLED)
         self.regen_btn.config(state=tk.DISABLED)
         try:
+            self.resume_btn.config(state=tk.DISABLED)
             self.pause_btn.config(state=tk.NORMAL, text="暂停")
         except Exception:
             pass
@@ -3129,6 +3220,70 @@ class OutlineApp:
         
         threading.Thread(target=self._run_generation, args=(provider, api_key, model, novel_type, theme, chapters, volumes), daemon=True).start()
 
+    def on_resume_generation(self):
+        if not self._require_login_and_token():
+            return
+        resume = checkpoint.latest_incomplete(self._get_app_base_dir())
+        if resume is None:
+            messagebox.showinfo("继续上次生成", "没有可继续的未完成生成记录。")
+            return
+        start_at = resume.first_incomplete() + 1
+        if not messagebox.askyesno("继续上次生成", f"检测到未完成的生成：\n{resume.describe()}\n\n是否从第 {start_at} 段继续？已完成的段落不会重复生成。"):
+            return
+
+        h = resume.header
+        provider = (h.get("provider") or "Gemini").strip()
+        api_key = self._load_api_key(provider)
+        if not api_key:
+            messagebox.showerror("错误", f"未配置 {provider} 的 API Key，无法继续生成")
+            return
+        novel_type = (h.get("novel_type") or "").strip()
+        theme = (h.get("theme") or "").strip()
+        model = (h.get("model") or DEFAULT_GEMINI_MODEL).strip()
+        try:
+            chapters = max(1, min(1000, int(h.get("chapters") or 24)))
+            volumes = max(1, min(100, int(h.get("volumes") or 1)))
+        except Exception:
+            messagebox.showerror("继续上次生成", "断点记录已损坏，无法继续。")
+            return
+        volumes = min(volumes, chapters)
+
+        # 恢复与断点一致的输入，保证重建出的分段与提示词相同
+        self.type_var.set(novel_type)
+        self.theme_var.set(theme)
+        self.chapters_var.set(chapters)
+        self.volumes_var.set(volumes)
+        if h.get("channel"):
+            self.channel_var.set(h.get("channel"))
+        if provider == "Gemini":
+            self.model_var.set(model)
+        self.inspiration_context = h.get("inspiration") or ""
+        self.last_optimized_instruction = (h.get("optimized_instruction") or "").strip()
+        self.last_constraints_text = (h.get("constraints") or "").strip()
+
+        self._cancel_event.clear()
+        self._pause_event.clear()
+        self.generate_btn.config(state=tk.DISABLED)
+        self.regen_btn.config(state=tk.DISABLED)
+        try:
+            self.resume_btn.config(state=tk.DISABLED)
+            self.pause_btn.config(state=tk.NORMAL, text="暂停")
+        except Exception:
+            pass
+
+        self.output.delete("1.0", tk.END)
+        self.output.insert(tk.END, f"正在从断点继续生成大纲...（模型：{model}，从第 {start_at} 段开始）\n\n")
+        self.status_var.set("预计完成时间计算中...")
+        self.progress_var.set("进度 0/0")
+
+        if provider == "Claude":
+            target = self._run_claude_generation
+        elif provider == "Doubao":
+            target = self._run_compat_generation
+        else:
+            target = self._run_generation
+        threading.Thread(target=target, args=(provider, api_key, model, novel_type, theme, chapters, volumes), kwargs={"resume": resume}, daemon=True).start()
+
     def on_regenerate_with_feedback(self):
         if not self._require_login_and_token():
             return
@@ -3151,7 +3306,7 @@ class OutlineApp:
 
         base_outline = (self.full_outline_context or "").strip()
         if not base_outline:
-            base_outline = self.output.get("1.0", tk.END).strip()
+            base_outline = self._output_text().strip()
         if not base_outline:
             messagebox.showwarning("提示", "当前没有可修改的大纲，请先生成或粘贴大纲")
             return
@@ -3245,7 +3400,7 @@ class OutlineApp:
 
         base_outline = (self.full_outline_context or "").strip()
         if not base_outline:
-            base_outline = self.output.get("1.0", tk.END).strip()
+            base_outline = self._output_text().strip()
         if not base_outline:
             messagebox.showwarning("提示", "当前没有可修改的大纲，请先上传/生成/粘贴大纲")
             return
@@ -3318,60 +3473,27 @@ class OutlineApp:
         self._append_text("\n\n[系统] 已暂停，点击“继续”恢复生成。\n")
 
     def _parse_chapters_from_outline_text(self, text: str):
-        matches = list(
-            re.finditer(
-                r"(?:^|\n)\s*###\s*第\s*(\d+)\s*章\s*(?:[:：]\s*([^\n]*?)\s*)?\n\s*([\s\S]*?)(?=(?:\n\s*###\s*第\s*\d+\s*章)|\s*$)",
-                text,
-            )
-        )
-        if not matches:
-            matches = list(
-                re.finditer(
-                    r"(第\s*(\d+)\s*章\s*(.*?))\s*[:：\n]\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)",
-                    text,
-                )
-            )
-        if not matches:
-            matches = list(
-                re.finditer(
-                    r"(第\s*(\d+)\s*章\s*([^\n:：]*?))\s*(?:[:：\n]|-{2,}|—{2,})\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)",
-                    text,
-                )
-            )
-        chapters = {}
-        for m in matches:
-            groups = m.groups()
-            if len(groups) == 3:
-                try:
-                    c_num = int(m.group(1))
-                except Exception:
-                    continue
-                title_clean = (m.group(2) or "").strip()
-                summary = (m.group(3) or "").strip()
-            else:
-                try:
-                    c_num = int(m.group(2))
-                except Exception:
-                    continue
-                title_only = (m.group(3) or "").strip()
-                full_title_part = (m.group(1) or "").strip()
-                title_clean = re.sub(r"^第\s*\d+\s*章\s*", "", full_title_part).strip()
-                if title_only:
-                    title_clean = title_only
-                summary = (m.group(4) or "").strip()
-            if not title_clean and summary:
-                m2 = re.match(r"^([^\n:：]{1,40})\s*[:：]\s*(.+)$", summary)
-                if m2:
-                    title_clean = (m2.group(1) or "").strip()
-                    summary = (m2.group(2) or "").strip()
-            if not summary:
-                summary = "无内容"
-            chapters[c_num] = {
-                "chapter": c_num,
-                "title": title_clean,
-                "summary": summary,
-            }
-        return chapters
+        return outline_tokenizer.chapters_by_number(text or "", empty_summary="无内容")
+
+    def _outline_index_for(self, text: str):
+        """章节偏移索引：内容未变时复用内存中的索引，其次读取大纲文件旁的 .index.json，最后才重新切分"""
+        text = text or ""
+        index = self._outline_index
+        if index is not None and index.matches(text):
+            return index
+        index = None
+        path = self.last_outline_path
+        if path and os.path.exists(path):
+            index = outline_index.load(path, text)
+        if index is None:
+            index = outline_index.OutlineIndex.build(text)
+        self._outline_index = index
+        return index
+
+    def _save_outline_index(self, path: str, content: str):
+        index = outline_index.save_for_file(path, content, self._outline_index)
+        if index is not None:
+            self._outline_index = index
 
     def _detect_outline_missing(self, text: str):
         missing = []
@@ -3451,7 +3573,7 @@ class OutlineApp:
             messagebox.showerror("错误", "豆包模型请填写 Ark 的 Endpoint ID（形如 ep-...），可在火山引擎 Ark 控制台获取")
             return
 
-        text = self.output.get("1.0", tk.END).strip()
+        text = self._output_text().strip()
         if not text:
             messagebox.showwarning("提示", "当前没有大纲内容，请先生成或粘贴大纲")
             return
@@ -3484,7 +3606,7 @@ class OutlineApp:
         self._cancel_event.clear()
         self.stop_btn.config(state=tk.NORMAL)
 
-        self.root.after(0, self._append_text, "\n\n[系统] 开始检查大纲完整性，并补全缺失内容...\n")
+        self.ui_bus.append("\n\n[系统] 开始检查大纲完整性，并补全缺失内容...\n")
         threading.Thread(
             target=self._run_check_and_fill_outline,
             args=(provider, api_key, model, novel_type, theme, desired_chapters, volumes, text),
@@ -3510,7 +3632,7 @@ class OutlineApp:
 
         text = (self.full_outline_context or "").strip()
         if not text:
-            text = self.output.get("1.0", tk.END).strip()
+            text = self._output_text().strip()
         if not text:
             messagebox.showwarning("提示", "当前没有大纲内容，请先上传/生成/粘贴大纲")
             return
@@ -3546,7 +3668,7 @@ class OutlineApp:
             daemon=True,
         ).start()
 
-    def _generate_json_via_provider(self, provider, api_key, model_name, novel_type, theme, contents_text, user_prompt, schema):
+    def _generate_json_via_provider(self, provider, api_key, model_name, novel_type, theme, contents_text, user_prompt, schema, use_cache=True):
         system_text = build_system_instruction() + "\n" + build_constraints(novel_type, theme, self.channel_var.get(), inspiration=(self.inspiration_context or "")) + "\n你正在对已有大纲做完整性校验与补全。必须承接已有内容，不得推翻重写；只补全缺失项。严格按要求输出。"
 
         if provider in ("Doubao", "Claude"):
@@ -3561,9 +3683,9 @@ class OutlineApp:
                 )
                 try:
                     if provider == "Claude":
-                        text_out = self._call_claude(api_key, model_name, system_text, prompt, temperature=0.4, max_tokens=4096)
+                        text_out = self._call_claude(api_key, model_name, system_text, prompt, temperature=0.4, max_tokens=4096, use_cache=use_cache)
                     else:
-                        text_out = self._call_compat_chat(api_key, model_name, system_text, prompt, temperature=0.4, base_url=base_url)
+                        text_out = self._call_compat_chat(api_key, model_name, system_text, prompt, temperature=0.4, base_url=base_url, use_cache=use_cache)
                 except Exception:
                     text_out = ""
                 json_data = self._parse_json(text_out)
@@ -3573,9 +3695,9 @@ class OutlineApp:
                     fix_prompt = f"上一次输出的 JSON 格式有误，请修正为合法的 JSON，且严格匹配 schema：\n{json.dumps(schema, ensure_ascii=False)}\n\n原输出：\n{text_out}"
                     try:
                         if provider == "Claude":
-                            fixed = self._call_claude(api_key, model_name, system_text, fix_prompt, temperature=0.1, max_tokens=4096)
+                            fixed = self._call_claude(api_key, model_name, system_text, fix_prompt, temperature=0.1, max_tokens=4096, use_cache=False)
                         else:
-                            fixed = self._call_compat_chat(api_key, model_name, system_text, fix_prompt, temperature=0.1, base_url=base_url)
+                            fixed = self._call_compat_chat(api_key, model_name, system_text, fix_prompt, temperature=0.1, base_url=base_url, use_cache=False)
                     except Exception:
                         fixed = ""
                     json_data = self._parse_json(fixed)
@@ -3583,7 +3705,7 @@ class OutlineApp:
                         return json_data
             return None
 
-        client = genai.Client(api_key=api_key)
+        client = provider_clients.get_genai_client(api_key)
         tools = []
         base_models = [model_name]
         if "gemini" in model_name.lower() and model_name != "gemini-2.5-pro":
@@ -3619,7 +3741,7 @@ class OutlineApp:
                     response_mime_type="application/json",
                     response_schema=schema,
                 )
-                text_out = self._generate_with_fallback(client, base_models, contents, config_local, max_request_retries=4, max_empty_retries=10)
+                text_out = self._generate_with_fallback(client, base_models, contents, config_local, max_request_retries=4, max_empty_retries=10, use_cache=use_cache)
                 json_data = self._parse_json(text_out)
                 if json_data is not None:
                     return json_data
@@ -3731,12 +3853,12 @@ class OutlineApp:
             if formatted:
                 add_block = f"\n\n### 补全：{sec}\n{formatted}\n"
                 text += add_block
-                self.root.after(0, self._append_text, add_block)
+                self.ui_bus.append(add_block)
 
         existing = self._parse_chapters_from_outline_text(text)
         missing_nums = [n for n in range(1, desired + 1) if n not in existing]
         if missing_nums:
-            self.root.after(0, self._append_text, f"\n\n[系统] 检测到缺失章节 {len(missing_nums)} 章，开始补全...\n")
+            self.ui_bus.append(f"\n\n[系统] 检测到缺失章节 {len(missing_nums)} 章，开始补全...\n")
 
         ranges = []
         for n in missing_nums:
@@ -3804,7 +3926,7 @@ class OutlineApp:
             if formatted:
                 add_block = f"\n\n### 补全：章节大纲 第{a}-{b}章\n{formatted}\n"
                 text += add_block
-                self.root.after(0, self._append_text, add_block)
+                self.ui_bus.append(add_block)
 
         stack = [(r[0], r[1]) for r in ranges]
         while stack and (not self._cancel_event.is_set()):
@@ -3832,7 +3954,7 @@ class OutlineApp:
             if formatted:
                 add_block = f"\n\n### 补全：章节大纲 第1-{desired}章（兜底）\n{formatted}\n"
                 text += add_block
-                self.root.after(0, self._append_text, add_block)
+                self.ui_bus.append(add_block)
 
         existing = self._parse_chapters_from_outline_text(text)
         if isinstance(existing, dict) and existing:
@@ -3859,7 +3981,7 @@ class OutlineApp:
 
             missing_sections = self._detect_outline_missing(text)
             if missing_sections:
-                self.root.after(0, self._append_text, f"[系统] 发现缺失关键模块：{', '.join(missing_sections)}\n")
+                self.ui_bus.append(f"[系统] 发现缺失关键模块：{', '.join(missing_sections)}\n")
 
             for sec in missing_sections:
                 if sec == "作品名与类型":
@@ -3951,7 +4073,7 @@ class OutlineApp:
             missing_nums = [n for n in range(1, desired + 1) if n not in existing]
 
             if missing_nums:
-                self.root.after(0, self._append_text, f"[系统] 发现缺失章节：{len(missing_nums)} 章，开始补全...\n")
+                self.ui_bus.append(f"[系统] 发现缺失章节：{len(missing_nums)} 章，开始补全...\n")
                 if self.logger:
                     self.logger.info(f"缺失章节数: {len(missing_nums)}")
 
@@ -4083,23 +4205,23 @@ class OutlineApp:
 
             if rebuilt_lines:
                 chapter_block = "\n".join(rebuilt_lines)
-                matches = list(re.finditer(r"(第\\s*(\\d+)\\s*章\\s*(.*?))\\s*[:：\\n]\\s*([\\s\\S]*?)(?=(?:\\n\\s*第\\s*\\d+\\s*章)|$)", text))
-                if matches:
-                    start_idx = matches[0].start()
-                    end_idx = matches[-1].end()
+                span = self._outline_index_for(text).span()
+                if span:
+                    start_idx, end_idx = span
                     text = text[:start_idx].rstrip() + "\n" + chapter_block + "\n" + text[end_idx:].lstrip()
                 else:
                     text += "\n\n### 章节大纲（补全版）\n" + chapter_block + "\n"
 
             self.full_outline_context = text
-            self.root.after(0, lambda: self.output.delete("1.0", tk.END))
-            self.root.after(0, lambda: self.output.insert(tk.END, text))
+            self.ui_bus.clear()
+            self.ui_bus.append(text)
 
             wrote_back = False
             if self.last_outline_path and os.path.exists(self.last_outline_path):
                 try:
                     with open(self.last_outline_path, "w", encoding="utf-8") as f:
                         f.write(text)
+                    self._save_outline_index(self.last_outline_path, text)
                     wrote_back = True
                     if self.logger:
                         self.logger.info(f"已回写大纲文件: {self.last_outline_path}")
@@ -4128,8 +4250,13 @@ class OutlineApp:
             self._reset_ui_state()
 
     def _append_text(self, text: str):
-        self.output.insert(tk.END, text)
-        self.output.see(tk.END)
+        # 经 UI 总线合并后每帧插入一次；工作线程也直接调用 self.ui_bus.append
+        self.ui_bus.append(text)
+
+    def _output_text(self) -> str:
+        """输出框全文；先把总线里尚未显示的追加写进去"""
+        self.ui_bus.flush()
+        return self.output.get("1.0", tk.END)
 
     def _new_generation_variation(self, novel_type: str, theme: str) -> str:
         nonce = uuid.uuid4().hex[:10]
@@ -4199,7 +4326,7 @@ class OutlineApp:
         try:
             self._wait_if_paused()
             if self._cancel_event.is_set():
-                self.root.after(0, self._append_text, "\n\n[系统] 已停止重生成。\n")
+                self.ui_bus.append("\n\n[系统] 已停止重生成。\n")
                 return
 
             self.generation_variation = ""
@@ -4236,7 +4363,7 @@ class OutlineApp:
                     if oi and isinstance(oi, str):
                         optimized_instruction = oi.strip()
                 else:
-                    client = genai.Client(api_key=api_key)
+                    client = provider_clients.get_genai_client(api_key)
                     models = [DEFAULT_GEMINI_MODEL]
                     if model_name and model_name != DEFAULT_GEMINI_MODEL:
                         models.append(model_name)
@@ -4296,14 +4423,12 @@ class OutlineApp:
                 self.logger.info(f"chapters={chapters} volumes={volumes}")
                 self.logger.info(f"feedback:\n{feedback}")
 
-            self.root.after(
-                0,
-                self._append_text,
+            self.ui_bus.append(
                 "\n\n### 专业提示词（本次用于重生成大纲）\n"
                 + optimized_instruction.strip()
                 + "\n\n",
             )
-            self.root.after(0, self._append_text, "\n\n### 修改意见\n" + feedback.strip() + "\n\n")
+            self.ui_bus.append("\n\n### 修改意见\n" + feedback.strip() + "\n\n")
 
             text_out = ""
             if provider in ("Doubao", "Claude"):
@@ -4314,7 +4439,7 @@ class OutlineApp:
                     base_url = self._load_doubao_base_url() if provider == "Doubao" else ""
                     text_out = self._call_compat_chat(api_key, model_name, system_prompt, user_prompt, temperature=0.6, base_url=base_url)
             else:
-                client = genai.Client(api_key=api_key)
+                client = provider_clients.get_genai_client(api_key)
                 models = [DEFAULT_GEMINI_MODEL]
                 if model_name and model_name != DEFAULT_GEMINI_MODEL:
                     models.append(model_name)
@@ -4337,15 +4462,15 @@ class OutlineApp:
             text_out = self._sanitize_text(text_out or "")
             self._wait_if_paused()
             if self._cancel_event.is_set():
-                self.root.after(0, self._append_text, "\n\n[系统] 已停止重生成。\n")
+                self.ui_bus.append("\n\n[系统] 已停止重生成。\n")
                 return
 
             if not text_out.strip():
                 self.root.after(0, messagebox.showwarning, "重生成失败", "模型返回了空内容")
                 return
 
-            self.root.after(0, lambda: self.output.delete("1.0", tk.END))
-            self.root.after(0, self._append_text, text_out.strip() + "\n")
+            self.ui_bus.clear()
+            self.ui_bus.append(text_out.strip() + "\n")
 
             accumulated = text_out.strip()
             accumulated = self._post_fill_missing_after_generation(
@@ -4353,8 +4478,8 @@ class OutlineApp:
             )
 
             self.full_outline_context = accumulated.strip()
-            self.root.after(0, lambda: self.output.delete("1.0", tk.END))
-            self.root.after(0, self._append_text, self.full_outline_context + "\n")
+            self.ui_bus.clear()
+            self.ui_bus.append(self.full_outline_context + "\n")
 
             self.root.after(0, messagebox.showinfo, "完成", "大纲修改完成")
             if self.logger:
@@ -4369,13 +4494,15 @@ class OutlineApp:
         finally:
             self._reset_ui_state()
 
-    def _run_generation(self, provider, api_key, model_name, novel_type, theme, chapters, volumes):
+    def _run_generation(self, provider, api_key, model_name, novel_type, theme, chapters, volumes, resume=None):
         # Gemini Logic
+        journal = None
         try:
-            self.generation_variation = self._new_generation_variation(novel_type, theme)
+            self.generation_variation = self._resume_or_new_variation(resume, novel_type, theme)
+            hedging.start_run()
             self._setup_logger(novel_type, theme, chapters)
             self.start_time = time.time()
-            client = genai.Client(api_key=api_key)
+            client = provider_clients.get_genai_client(api_key)
             tools = []
             constraints_text = build_constraints(novel_type, theme, self.channel_var.get(), inspiration=(self.inspiration_context or "")) + "\n" + (self.generation_variation or "")
             config = types.GenerateContentConfig(
@@ -4399,7 +4526,10 @@ class OutlineApp:
             
             # --- 第一步：获取或生成优化后的提示词 ---
             # 优先使用用户已生成的专业提示词
-            if hasattr(self, "professional_prompt_text"):
+            if resume is not None:
+                # 断点续跑：沿用上次优化后的指令，保证后续段落与已完成部分一致
+                pre_generated_prompt = (resume.header.get("optimized_instruction") or "").strip()
+            elif hasattr(self, "professional_prompt_text"):
                 try:
                     pre_generated_prompt = (self.professional_prompt_text.get("1.0", tk.END) or "").strip()
                 except Exception:
@@ -4410,12 +4540,12 @@ class OutlineApp:
             if pre_generated_prompt:
                 # 使用已生成的专业提示词
                 optimized_instruction = pre_generated_prompt
-                self.root.after(0, self._append_text, "使用已生成的专业提示词...\n")
+                self.ui_bus.append("使用已生成的专业提示词...\n")
                 if self.logger:
                     self.logger.info("使用已生成的专业提示词")
             else:
                 # 如果没有预先生成，则自动生成
-                self.root.after(0, self._append_text, "正在根据类型与主题，智能优化大纲生成指令...\n")
+                self.ui_bus.append("正在根据类型与主题，智能优化大纲生成指令...\n")
                 if self.logger:
                     self.logger.info("开始生成优化提示词")
 
@@ -4427,16 +4557,14 @@ class OutlineApp:
             if self.logger:
                 self.logger.info(f"使用的提示词:\n{optimized_instruction}")
 
-            self.root.after(
-                0,
-                self._append_text,
+            self.ui_bus.append(
                 "\n\n### 专业提示词（本次用于生成大纲）\n"
                 + optimized_instruction.strip()
                 + "\n\n"
                 + (self.generation_variation or ""),
             )
             
-            self.root.after(0, self._append_text, "指令优化完成，开始生成正文...\n")
+            self.ui_bus.append("指令优化完成，开始生成正文...\n")
             
             # 使用优化后的指令更新配置
             config = types.GenerateContentConfig(
@@ -4452,46 +4580,49 @@ class OutlineApp:
             sections = self._build_sections(novel_type, theme, chapters, volumes, provider=provider)
             self.total_sections = len(sections)
             self.completed_sections = 0
-            self.root.after(0, self._update_progress)
+            self.ui_bus.call(self._update_progress)
             
-            accumulated = ""
-            for i, sec in enumerate(sections, start=1):
+            vol_starts = section_scheduler.volume_starts([sec[0] for sec in sections]) if self._load_outline_two_phase(volumes) else None
+            completed = self._restore_from_checkpoint(resume, sections)
+            self._init_context_store(sections, completed, resume)
+            journal = self._open_checkpoint(resume, provider, model_name, novel_type, theme, chapters, volumes, sections)
+            section_data = {}
+
+            def _section_job(idx, accumulated):
+                sec = sections[idx]
                 if self._cancel_event.is_set():
-                    self.root.after(0, self._append_text, "\n\n[系统] 已停止生成。\n")
-                    break
+                    return ""
                 sec_title = sec[0]
                 sec_prompt = sec[1]
                 sec_schema = sec[2] if len(sec) > 2 else None
                 
-                self.root.after(0, self._append_text, f"\n\n### {i}. {sec_title}\n")
                 if self.logger:
                     self.logger.info(f"开始生成: {sec_title}")
                 
                 # 动态构建 prompt parts
                 prompt_parts = [types.Part.from_text(text=sec_prompt)]
                 
-                # 核心逻辑：将已生成的所有大纲内容作为上下文注入到 prompt 中
-                # 这确保了大纲的前后逻辑一致性（如人物关系、设定细节等）
+                # 核心逻辑：将已生成的大纲内容作为上下文注入到 prompt 中，保证前后逻辑一致（人物关系、设定细节等）
+                # accumulated 由 context_fn 从上下文存储按预算挑选（设定集全文 + 本卷规划 + 近期章节 + 伏笔），这里不再截断
                 if accumulated:
-                    # 限制上下文长度，防止超出模型窗口（Gemini-Pro 上下文很长，这里相对安全，但仍做适当截断以防万一）
-                    # 保留最近的 20000 字符通常足够覆盖大纲的关键信息
-                    context_text = accumulated[-25000:] 
                     context_injection = (
                         f"\n\n【当前已生成的大纲内容（上下文参考）】\n"
-                        f"{context_text}\n"
+                        f"{accumulated}\n"
                         f"----------------\n"
                         f"重要指令：请基于以上已生成的内容继续创作，确保《{sec_title}》部分与前文的人物设定、世界观规则及剧情走向保持高度一致，严禁出现逻辑冲突。\n"
                     )
                     prompt_parts.insert(0, types.Part.from_text(text=context_injection)) # 将上下文放在 prompt 最前面
 
+                # 【固定设定】与“不得改名/不得另起主角”的硬约束不在上下文存储里，仍单独放在最前面
                 bible_text = self._get_story_bible_text(accumulated)
                 if bible_text:
                     prompt_parts.insert(0, types.Part.from_text(text=bible_text + "\n"))
 
                 # 如果是章节大纲（非第一批），额外注入剧情梗概作为更聚焦的上下文
-                if sec_title.startswith("章节大纲") and self.all_chapter_summaries:
+                chapter_summaries = self._section_chapter_summaries(sec_title, vol_starts)
+                if sec_title.startswith("章节大纲") and chapter_summaries:
                     # 获取最近的剧情回顾
-                    context_summary = "\n".join(self.all_chapter_summaries)[-5000:]
+                    context_summary = "\n".join(chapter_summaries)[-5000:]
                     context_injection_summary = (
                         f"\n\n【前序剧情梗概速览】\n"
                         f"{context_summary}\n"
@@ -4548,7 +4679,7 @@ class OutlineApp:
                             )
                             ctx_existing = self._parse_chapters_from_outline_text(accumulated)
                             range_context = self._build_chapter_range_context(accumulated, ctx_existing, a, b)
-                            regen_data = self._generate_json_via_provider(provider, api_key, DEFAULT_GEMINI_MODEL, novel_type, theme, range_context, regen_prompt, sec_schema)
+                            regen_data = self._generate_json_via_provider(provider, api_key, DEFAULT_GEMINI_MODEL, novel_type, theme, range_context, regen_prompt, sec_schema, use_cache=False)
                             json_data = regen_data
                             if not json_data:
                                 by_ch = dict(ctx_existing) if isinstance(ctx_existing, dict) else {}
@@ -4573,9 +4704,8 @@ class OutlineApp:
                                     f"只补全这些缺失章号：{miss_str}。\n"
                                     f"要求：只输出 JSON 数组；每项包含 chapter(整数)、title、summary；summary 必须包含：**内容**：... **【悬疑点】**：... **【爽点】**：...（爽点允许为“暂无”）\n"
                                 )
-                                context_text = accumulated[-25000:] if accumulated else ""
-                                ctx = (context_text + "\n" + "\n".join(self.all_chapter_summaries[-80:])).strip()
-                                fill_data = self._generate_json_via_provider(provider, api_key, DEFAULT_GEMINI_MODEL, novel_type, theme, ctx, fill_prompt, sec_schema)
+                                ctx = (accumulated or "").strip()
+                                fill_data = self._generate_json_via_provider(provider, api_key, DEFAULT_GEMINI_MODEL, novel_type, theme, ctx, fill_prompt, sec_schema, use_cache=False)
                                 fill_items = self._ensure_list(fill_data) if fill_data is not None else []
                                 base_items = self._ensure_list(json_data)
                                 by_ch = {}
@@ -4616,6 +4746,7 @@ class OutlineApp:
                         except Exception:
                             text_out_final = str(json_data)
                     
+                    section_data[idx] = json_data
                     # 收集章节梗概用于上下文
                     if sec_title.startswith("章节大纲") and json_data:
                         items = self._ensure_list(json_data)
@@ -4635,18 +4766,23 @@ class OutlineApp:
                             text_out = fix
                     text_out_final = self._sanitize_text(text_out or "")
 
-                if text_out_final:
-                    try:
-                        self._update_story_bible_from_section(sec_title, text_out_final)
-                    except Exception:
-                        pass
-                    self.root.after(0, self._append_text, text_out_final)
-                    accumulated += "\n\n### " + str(i) + ". " + sec_title + "\n" + text_out_final
-                    self.completed_sections += 1
-                    self.root.after(0, self._update_progress)
-                    self.root.after(0, self._update_eta, 0)
-                    if self.logger:
-                        self.logger.info(f"完成: {sec_title}")
+                return text_out_final
+
+            accumulated = section_scheduler.run_sections(
+                [sec[0] for sec in sections],
+                _section_job,
+                on_commit=self._commit_outline_section(sections),
+                on_done=self._outline_section_done(sections, journal, section_data, update_bible=True),
+                concurrency=self._load_section_concurrency(),
+                cancel_event=self._cancel_event,
+                two_phase=bool(vol_starts),
+                completed=completed,
+                on_revise=self._outline_section_revised(sections, journal),
+                context_fn=self._outline_context_fn(sections, 25000, vol_starts),
+                stitch_fn=self._volume_stitcher(sections, provider, api_key, DEFAULT_GEMINI_MODEL, novel_type, theme) if vol_starts else None,
+            )
+            if self._cancel_event.is_set():
+                self.ui_bus.append("\n\n[系统] 已停止生成。\n")
             
             if not self._cancel_event.is_set():
                 accumulated = self._post_fill_missing_after_generation(
@@ -4660,8 +4796,12 @@ class OutlineApp:
                     accumulated,
                 )
                 self.root.after(0, self._auto_save, novel_type, theme)
+                if journal is not None:
+                    journal.complete()
                 if self.logger:
                     self.logger.info("全部生成完成")
+                    self.logger.info(f"连接复用统计: {provider_clients.format_stats()}；{request_executor.format_stats()}；{rate_limiter.format_stats()}；{response_cache.format_stats()}")
+                    self.logger.info(f"模型记分板: {model_router.format_stats()}；{hedging.format_stats()}；{stream_guard.format_stats()}")
                 
         except Exception as e:
             err_msg = str(e)
@@ -4670,6 +4810,8 @@ class OutlineApp:
             if self.logger:
                 self.logger.error(f"生成失败: {err_msg}")
         finally:
+            if journal is not None:
+                journal.close()
             self._reset_ui_state()
 
     def _slug(self, text: str) -> str:
@@ -4850,160 +4992,35 @@ class OutlineApp:
         return header + "\n" + "\n".join(lines[:14]) + "\n" + hard
 
     def _parse_retry_delay(self, msg: str) -> int:
-        m = re.search(r"retryDelay['\"]?:\s*'?([0-9]+)s", msg)
-        if m:
-            try:
-                return int(m.group(1))
-            except Exception:
-                pass
-        m2 = re.search(r"Please retry in ([0-9]+(?:\.[0-9]+)?)", msg)
-        if m2:
-            try:
-                return int(float(m2.group(1)))
-            except Exception:
-                pass
-        return 30
+        return retry_policy.parse_retry_delay(msg)
 
     def _is_rate_limit(self, msg: str) -> bool:
-        s = msg.lower()
-        return ("resource_exhausted" in s) or ("code: 429" in s) or ("quota" in s)
+        return retry_policy.is_rate_limit(msg)
 
     def _is_free_tier_block(self, msg: str) -> bool:
-        s = msg.lower()
-        return ("generate_content_free_tier" in s or "free tier" in s or "free_tier" in s) and ("limit: 0" in s or "limit 0" in s)
-
-    def _gemini_generate_with_timeout(self, client, model: str, contents, config, timeout_secs: int = 180):
-        q = queue.Queue(maxsize=1)
-
-        def worker():
-            try:
-                resp = client.models.generate_content(model=model, contents=contents, config=config)
-                q.put(("ok", resp))
-            except Exception as e:
-                q.put(("err", e))
-
-        t = threading.Thread(target=worker, daemon=True)
-        t.start()
-        try:
-            kind, payload = q.get(timeout=max(1, int(timeout_secs)))
-        except queue.Empty:
-            raise TimeoutError(f"Gemini request timeout after {timeout_secs}s")
-        if kind == "err":
-            raise payload
-        return payload
+        return retry_policy.is_free_tier_block(msg)
 
     def _extract_gemini_text(self, resp) -> str:
-        if resp is None:
-            return ""
-        text = getattr(resp, "text", None)
-        if isinstance(text, str) and text.strip():
-            return text
-        parts = getattr(resp, "parts", None)
-        if parts:
-            try:
-                joined = "".join([p.text for p in parts if hasattr(p, "text") and p.text])
-                if joined.strip():
-                    return joined
-            except Exception:
-                pass
-        candidates = getattr(resp, "candidates", None)
-        if candidates:
-            for c in candidates:
-                content = getattr(c, "content", None)
-                if content is None:
-                    continue
-                ctext = getattr(content, "text", None)
-                if isinstance(ctext, str) and ctext.strip():
-                    return ctext
-                cparts = getattr(content, "parts", None)
-                if not cparts:
-                    continue
-                try:
-                    joined = "".join([p.text for p in cparts if hasattr(p, "text") and p.text])
-                    if joined.strip():
-                        return joined
-                except Exception:
-                    continue
-        return ""
-
-    def _generate_with_fallback(self, client, models, contents, config, max_request_retries=2, max_empty_retries=8) -> str:
-        total_empty_retries = 0
-        for idx, m in enumerate(models):
-            if self._cancel_event.is_set():
-                return ""
-            request_retries = 0
-            consecutive_empty = 0
-            if idx > 0:
-                self.root.after(0, self._append_text, f"\n[系统] 切换模型：{m}\n")
-                if self.logger:
-                    self.logger.info(f"切换模型: {m}")
-            
-            while True:
-                if self._cancel_event.is_set():
-                    return ""
-                try:
-                    resp = self._gemini_generate_with_timeout(client, model=m, contents=contents, config=config, timeout_secs=180)
-                    text = self._extract_gemini_text(resp)
-                    
-                    if not text:
-                        raise ValueError("Empty response received")
-                    
-                    return text or ""
-                    
-                except Exception as e:
-                    msg = str(e)
-                    
-                    # 处理免费层配额耗尽
-                    if self._is_free_tier_block(msg):
-                        if self.logger:
-                            self.logger.warning(f"免费层限制，跳过模型 {m}")
-                        break
-
-                    if "Empty response received" in msg:
-                        total_empty_retries += 1
-                        consecutive_empty += 1
-                        if self.logger:
-                            self.logger.warning(f"空响应: {msg}。正在重试 ({total_empty_retries}/{max_empty_retries}) | 模型 {m}")
-                        if total_empty_retries >= max_empty_retries:
-                            if self.logger:
-                                self.logger.error(f"空响应达到上限，放弃本次请求 | 模型 {m}")
-                            return ""
-                        if consecutive_empty >= 2 and idx < (len(models) - 1):
-                            if self.logger:
-                                self.logger.warning(f"空响应连续出现，提前切换到下一个模型 | 当前模型 {m}")
-                            break
-                        wait_time = min(20, 2 * (2 ** min(consecutive_empty - 1, 4)))
-                        self.root.after(0, self._append_text, f"\n[系统] 模型返回空内容，{wait_time}s后重试...\n")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        consecutive_empty = 0
-                    
-                    # 处理速率限制 (429)
-                    if self._is_rate_limit(msg) and request_retries < self.max_retries:
-                        delay = self._parse_retry_delay(msg)
-                        self.root.after(0, self._append_text, f"\n[系统] 达到配额限制，{delay}s后重试...\n")
-                        self.root.after(0, self._update_eta, delay)
-                        if self.logger:
-                            self.logger.warning(f"限流，等待 {delay}s 后重试，模型 {m}")
-                        time.sleep(delay)
-                        request_retries += 1
-                        continue
-                        
-                    # 处理其他网络错误或未知错误（增加通用重试）
-                    if request_retries < max_request_retries:
-                        wait_time = min(30, 4 * (2 ** request_retries))
-                        self.root.after(0, self._append_text, f"\n[系统] 请求遇到问题（{msg[:50]}...），{wait_time}s后重试...\n")
-                        if self.logger:
-                            self.logger.warning(f"请求异常: {msg}。正在重试 ({request_retries + 1}/{max_request_retries})")
-                        time.sleep(wait_time)
-                        request_retries += 1
-                        continue
-                    else:
-                        if self.logger:
-                            self.logger.error(f"模型 {m} 调用最终失败: {msg}")
-                        break
-        return ""
+        return retry_policy.extract_gemini_text(resp)
+
+    def _generate_with_fallback(self, client, models, contents, config, max_request_retries=2, max_empty_retries=8, use_cache=True) -> str:
+        # 重试/切换模型/对冲/缓存规则只有 gemini_fallback 一份实现，Web 端的异步引擎也走它
+        # use_cache=False：纠错/补全类重试（同一提示词再问一次），不能命中上一次不合格的缓存结果
+        return gemini_fallback.generate(
+            client,
+            models,
+            contents,
+            config,
+            cancel_event=self._cancel_event,
+            notify=self.ui_bus.append,
+            on_rate_limit=lambda delay: self.ui_bus.call(self._update_eta, delay),
+            logger=self.logger,
+            max_request_retries=max_request_retries,
+            max_empty_retries=max_empty_retries,
+            max_rate_limit_retries=self.max_retries,
+            use_cache=use_cache,
+            cache_nonce=self.generation_variation or "",
+        )
 
     def _build_sections(self, novel_type: str, theme: str, chapters: int, volumes: int, provider: str = ""):
         insp = (getattr(self, "inspiration_context", "") or "").strip()
@@ -5603,7 +5620,7 @@ class OutlineApp:
             f"请修正为有效 JSON。"
         )
         contents = [types.Content(role="user", parts=[types.Part.from_text(text=prompt)])]
-        fixed = self._generate_with_fallback(client, models, contents, config_local)
+        fixed = self._generate_with_fallback(client, models, contents, config_local, use_cache=False)
         return fixed
 
     def _extract_json(self, text: str):
@@ -5652,8 +5669,7 @@ class OutlineApp:
             lt = line.strip()
             if not lt:
                 continue
-            bad = ["收到", "感谢", "作为资深", "我将", "我会", "策划案", "以下是", "将为您", "为了确保", "基于您", "这里为您提供"]
-            if any(lt.startswith(b) for b in bad):
+            if lt.startswith(stream_guard.META_LINE_PREFIXES):
                 continue
             lines.append(lt)
         return "\n".join(lines)
@@ -5714,6 +5730,221 @@ class OutlineApp:
         fixed = self._generate_with_fallback(client, models, contents, config)
         return fixed
 
+    def _resume_or_new_variation(self, resume, novel_type: str, theme: str) -> str:
+        if resume is not None:
+            return resume.header.get("variation") or ""
+        return self._new_generation_variation(novel_type, theme)
+
+    def _open_checkpoint(self, resume, provider, model_name, novel_type, theme, chapters, volumes, sections):
+        """新建断点日志；续跑时在原日志上继续追加"""
+        try:
+            if resume is not None:
+                return checkpoint.CheckpointJournal.reopen(resume.path)
+            header = {
+                "provider": provider,
+                "model": model_name,
+                "novel_type": novel_type,
+                "theme": theme,
+                "chapters": chapters,
+                "volumes": volumes,
+                "channel": self.channel_var.get(),
+                "inspiration": self.inspiration_context or "",
+                "variation": self.generation_variation or "",
+                "optimized_instruction": self.last_optimized_instruction or "",
+                "constraints": self.last_constraints_text or "",
+                "titles": [sec[0] for sec in sections],
+                "story_bible": dict(getattr(self, "story_bible", {}) or {}),
+            }
+            return checkpoint.CheckpointJournal.create(self._get_app_base_dir(), header, name_hint=self._slug(novel_type))
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"断点日志创建失败: {e}")
+            return None
+
+    def _section_chapter_items(self, title, text, data=None):
+        if not title.startswith("章节大纲") or not text:
+            return []
+        if data:
+            return [it for it in self._ensure_list(data) if isinstance(it, dict) and "chapter" in it]
+        parsed = self._parse_chapters_from_outline_text(text)
+        return [parsed[k] for k in sorted(parsed.keys())] if isinstance(parsed, dict) else []
+
+    def _checkpoint_section(self, journal, idx, title, text, data=None, chapters=None):
+        if journal is None or not text:
+            return
+        if chapters is None:
+            chapters = self._section_chapter_items(title, text, data)
+        try:
+            journal.record_section(idx, title, text, data=data, story_bible=dict(getattr(self, "story_bible", {}) or {}), chapters=chapters)
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"断点写入失败: {e}")
+
+    def _restore_from_checkpoint(self, resume, sections) -> dict:
+        """恢复设定集、章节条目与进度，返回已完成段落 {下标: 文本}（分段标题与断点不一致的段落丢弃）"""
+        if resume is None:
+            return {}
+        titles = resume.titles
+        completed = {}
+        for i, text in resume.section_texts().items():
+            if i < len(sections) and i < len(titles) and titles[i] == sections[i][0]:
+                completed[i] = text
+        self.story_bible = resume.story_bible()
+        self.chapters_data = resume.chapter_items()
+        self.all_chapter_summaries = [
+            f"第{it.get('chapter')}章：{(it.get('summary') or '').strip()}"
+            for it in self.chapters_data
+            if isinstance(it, dict) and it.get("chapter") is not None
+        ]
+        self.completed_sections = len(completed)
+        self.ui_bus.call(self._update_progress)
+        if self.logger:
+            self.logger.info(f"从断点继续: {resume.path}，已完成 {len(completed)}/{len(sections)} 段")
+        return completed
+
+    def _outline_section_done(self, sections, journal=None, section_data=None, update_bible=False):
+        def _done(idx, text):
+            if not text:
+                return
+            title = sections[idx][0]
+            if update_bible:
+                try:
+                    self._update_story_bible_from_section(title, text)
+                except Exception:
+                    pass
+            self.completed_sections += 1
+            self.ui_bus.call(self._update_progress)
+            self.ui_bus.call(self._update_eta, 0)
+            if self.logger:
+                self.logger.info(f"完成: {title}")
+            chapters = self._section_chapter_items(title, text, (section_data or {}).get(idx))
+            if self.context_store is not None:
+                self.context_store.put_section(idx, title, text, chapters)
+            self._checkpoint_section(journal, idx, title, text, (section_data or {}).get(idx), chapters=chapters)
+        return _done
+
+    def _outline_section_revised(self, sections, journal=None):
+        """卷间衔接改写后同步上下文存储与断点"""
+        def _revised(idx, text):
+            title = sections[idx][0]
+            chapters = self._section_chapter_items(title, text)
+            if self.context_store is not None:
+                self.context_store.put_section(idx, title, text, chapters)
+            self._checkpoint_section(journal, idx, title, text, chapters=chapters)
+        return _revised
+
+    def _init_context_store(self, sections, completed=None, resume=None):
+        """每次生成新建上下文存储；续跑时先装入已完成的段落与章节条目"""
+        self.context_store = context_store.ContextStore(numbered=True)
+        for i, text in sorted((completed or {}).items()):
+            chapters = resume.sections.get(i, {}).get("chapters") if resume is not None else None
+            self.context_store.put_section(i, sections[i][0], text, chapters or None)
+        return self.context_store
+
+    def _outline_context_fn(self, sections, budget_chars, vol_starts=None):
+        """调度器提交各段时调用：按预算从上下文存储挑选设定集、本卷规划、近期章节与伏笔"""
+        def _context(idx):
+            store = self.context_store
+            if store is None:
+                return ""
+            title = sections[idx][0]
+            volume_start = None
+            if vol_starts:
+                info = section_scheduler.parse_batch_title(title)
+                if info:
+                    volume_start = vol_starts.get(info[2])
+            return store.build(title, budget_chars=budget_chars, volume_start=volume_start)
+        return _context
+
+    def _section_chapter_summaries(self, sec_title: str, vol_starts=None):
+        """两阶段模式下只取本卷内、本批次之前的章节梗概，避免混入其他卷并行生成的内容"""
+        store = self.context_store
+        if store is not None:
+            rng = self._parse_chapter_range_from_title(sec_title)
+            if not rng:
+                return []
+            info = section_scheduler.parse_batch_title(sec_title) if vol_starts else None
+            lo = vol_starts.get(info[2], 1) if info else 1
+            return store.chapter_lines(rng[0], lo=lo, max_chars=8000, limit=80)
+        if not vol_starts:
+            return self.all_chapter_summaries
+        info = section_scheduler.parse_batch_title(sec_title)
+        if not info:
+            return self.all_chapter_summaries
+        a, _b, v = info
+        lo = vol_starts.get(v, 1)
+        picked = []
+        for line in list(self.all_chapter_summaries):
+            m = re.match(r"第(\d+)章", line)
+            if m and lo <= int(m.group(1)) < a:
+                picked.append((int(m.group(1)), line))
+        picked.sort(key=lambda x: x[0])
+        return [line for _, line in picked]
+
+    def _volume_stitcher(self, sections, provider, api_key, model_name, novel_type, theme, stitch_chapters: int = 2):
+        """两阶段模式的卷间衔接：按上一卷结尾改写下一卷开头几章，保持章号与核心事件不变"""
+        schema = {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "required": ["chapter", "title", "summary"],
+                "properties": {
+                    "chapter": {"type": "INTEGER"},
+                    "title": {"type": "STRING"},
+                    "summary": {"type": "STRING"},
+                },
+            },
+        }
+
+        def _stitch(prev_idx, next_idx, prev_text, next_text):
+            if self._cancel_event.is_set():
+                return ""
+            prev = self._parse_chapters_from_outline_text(prev_text)
+            nxt = self._parse_chapters_from_outline_text(next_text)
+            if not prev or not nxt:
+                return ""
+            tail = sorted(prev.keys())[-3:]
+            heads = sorted(nxt.keys())[:stitch_chapters]
+            ctx = (
+                "【上一卷结尾】\n"
+                + "\n".join(f"第{k}章 {prev[k].get('title', '')}：{prev[k].get('summary', '')}" for k in tail)
+                + "\n\n【下一卷开头（待衔接）】\n"
+                + "\n".join(f"第{k}章 {nxt[k].get('title', '')}：{nxt[k].get('summary', '')}" for k in sorted(nxt.keys())[:stitch_chapters + 2])
+            )
+            heads_str = ", ".join(str(k) for k in heads)
+            prompt = (
+                f"任务：卷间衔接。两卷章节大纲分别生成，交界处可能衔接生硬或事件重复。\n"
+                f"只改写下一卷开头的这些章号：{heads_str}，使其自然承接上一卷结尾的局势、人物状态与悬念。\n"
+                f"要求：保留原有核心事件与章号，不得推翻本卷规划；只输出 JSON 数组；每项包含 chapter(整数)、title、summary；"
+                f"summary 必须包含：**内容**：... **【悬疑点】**：... **【爽点】**：...（爽点允许为“暂无”）\n"
+            )
+            data = self._generate_json_via_provider(provider, api_key, model_name, novel_type, theme, ctx, prompt, schema)
+            merged = dict(nxt)
+            changed = 0
+            for it in (self._ensure_list(data) if data is not None else []):
+                if not isinstance(it, dict):
+                    continue
+                try:
+                    cn = int(it.get("chapter"))
+                except Exception:
+                    continue
+                summary = (it.get("summary") or "").strip()
+                if cn in heads and summary:
+                    merged[cn] = {"chapter": cn, "title": (it.get("title") or "").strip() or merged[cn].get("title", ""), "summary": summary}
+                    changed += 1
+            if not changed:
+                return ""
+            if self.logger:
+                self.logger.info(f"卷间衔接: {sections[prev_idx][0]} -> {sections[next_idx][0]}，改写 {changed} 章")
+            return self._format_from_data(sections[next_idx][0], [merged[k] for k in sorted(merged.keys())])
+
+        return _stitch
+
+    def _commit_outline_section(self, sections):
+        def _commit(idx, text):
+            self.ui_bus.append(f"\n\n### {idx + 1}. {sections[idx][0]}\n" + text)
+        return _commit
+
     def _update_progress(self):
         self.progress_var.set(f"进度 {self.completed_sections}/{self.total_sections}")
 
@@ -5873,7 +6104,7 @@ class OutlineApp:
         return (os.environ.get("DOUBAO_MODEL", "") or "").strip()
 
     def _auto_save(self, novel_type: str, theme: str):
-        content = self.output.get("1.0", tk.END).strip()
+        content = self._output_text().strip()
         if not content:
             return
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -5885,12 +6116,13 @@ class OutlineApp:
             with open(path, "w", encoding="utf-8") as f:
                 f.write(content)
             self.last_outline_path = path
+            self._save_outline_index(path, content)
             messagebox.showinfo("自动保存", f"文件已保存至：\n{path}")
         except Exception as e:
             messagebox.showerror("自动保存失败", str(e))
 
     def on_save(self):
-        content = self.output.get("1.0", tk.END).strip()
+        content = self._output_text().strip()
         if not content:
             messagebox.showwarning("无内容", "当前没有可保存的内容")
             return
@@ -5909,12 +6141,13 @@ class OutlineApp:
             with open(path, "w", encoding="utf-8") as f:
                 f.write(content)
             self.last_outline_path = path
+            self._save_outline_index(path, content)
             messagebox.showinfo("已保存", f"保存路径：{path}")
         except Exception as e:
             messagebox.showerror("保存失败", str(e))
 
     def on_export_zip(self):
-        output_text = self.output.get("1.0", tk.END).strip()
+        output_text = self._output_text().strip()
         content = output_text
         if ("正在生成 第" in output_text) or (">>> 正在生成" in output_text) or ("所有章节正文生成完毕" in output_text):
             content = (self.full_outline_context or "").strip() or output_text
@@ -5928,7 +6161,7 @@ class OutlineApp:
             title="导出ZIP包",
             defaultextension=".zip",
             initialfile=initial,
-            filetypes=[("ZIP Archive", "*.zip"), ("All Files", "*.*")],
+            filetypes=[("ZIP Archive", "*.zip"), ("EPUB 电子书", "*.epub"), ("All Files", "*.*")],
         )
         if not path:
             return
@@ -5940,58 +6173,66 @@ class OutlineApp:
             except:
                 pass
 
-            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                # 1. 写入完整大纲
-                zf.writestr("完整大纲.txt", content)
-                
-                # 2. 写入章节细分
-                if self.chapters_data:
-                    # 创建章节目录结构
-                    for item in self.chapters_data:
-                        if not isinstance(item, dict):
-                            continue
-                        
-                        chap_num = item.get('chapter')
-                        chap_title = item.get('title', '')
-                        summary = item.get('summary', '')
-                        if isinstance(chap_title, list):
-                            chap_title = "\n".join(str(x) for x in chap_title)
-                        chap_title = str(chap_title or "")
-                        if isinstance(summary, list):
-                            summary = "\n".join(str(x) for x in summary)
-                        summary = str(summary or "").strip()
-                        
-                        if chap_num is not None:
-                            try:
-                                chap_num = int(chap_num)
-                                # 格式化文件名: 001_章节标题.txt
-                                # 去除标题中可能存在的重复“第X章”前缀
-                                if chap_title:
-                                    chap_title = re.sub(r'^第\d+章\s*', '', chap_title).strip()
-                                    
-                                # 如果没有标题，使用摘要前15字
-                                name_part = chap_title if chap_title else summary[:15]
-                                clean_name = self._slug(name_part)
-                                filename = f"章节/{chap_num:03d}_{clean_name}.txt"
-                                
-                                file_content_lines = [f"第{chap_num}章 {chap_title}"]
-                                file_content_lines.append(f"\n梗概：\n{summary}")
-                                
-                                # 检查是否有生成的正文
-                                if hasattr(self, 'generated_chapters_content') and chap_num in self.generated_chapters_content:
-                                    file_content_lines.append("\n\n" + "="*20 + " 正文 " + "="*20 + "\n")
-                                    file_content_lines.append(self.generated_chapters_content[chap_num])
-                                else:
-                                    file_content_lines.append("\n(此处可后续扩展正文)")
-                                
-                                zf.writestr(filename, "\n".join(file_content_lines))
-                            except Exception:
-                                pass
-                                
-            messagebox.showinfo("已导出", f"ZIP包已保存：\n{path}")
+            # 逐条目流式写入：正文从存储逐块读取，整个压缩包不在内存里拼
+            generated = self._generated_chapters()
+            chapters = self._export_chapter_items()
+            if path.lower().endswith(".epub"):
+                book = [novel_export.EpubChapter(num, f"第{num}章 {title}".strip(),
+                                                 lambda num=num, summary=summary: (self._export_body_chunks(generated, num)
+                                                                                   if num in generated else [summary]))
+                        for num, title, summary in chapters]
+                size = novel_export.write_file(path, novel_export.iter_epub(self.type_var.get() or "小说", book))
+            else:
+                # 1. 完整大纲；2. 章节细分（文件名: 章节/001_章节标题.txt）
+                entries = [(chapter_store.EXPORT_OUTLINE_NAME, lambda: [content])]
+                for num, title, summary in chapters:
+                    # 如果没有标题，使用摘要前15字
+                    filename = f"章节/{num:03d}_{self._slug(title if title else summary[:15])}.txt"
+                    entries.append((filename, lambda num=num, title=title, summary=summary:
+                                    self._export_chapter_chunks(generated, num, title, summary)))
+                size = novel_export.write_file(path, novel_export.iter_zip(entries))
+                self.last_export_zip_path = path
+            if self.logger:
+                self.logger.info(f"已导出 {os.path.basename(path)}：{len(chapters)} 章，{size / 1024:.1f} KB")
+            messagebox.showinfo("已导出", f"{'EPUB' if path.lower().endswith('.epub') else 'ZIP包'}已保存：\n{path}")
         except Exception as e:
             messagebox.showerror("导出失败", str(e))
 
+    def _export_chapter_items(self):
+        """导出用的章节元数据：[(章号, 标题, 梗概)]，去掉标题里重复的“第X章”前缀"""
+        items = []
+        for item in self.chapters_data or []:
+            if not isinstance(item, dict) or item.get('chapter') is None:
+                continue
+            try:
+                chap_num = int(item.get('chapter'))
+            except (TypeError, ValueError):
+                continue
+            chap_title = item.get('title', '')
+            summary = item.get('summary', '')
+            if isinstance(chap_title, list):
+                chap_title = "\n".join(str(x) for x in chap_title)
+            chap_title = re.sub(r'^第\d+章\s*', '', str(chap_title or "")).strip()
+            if isinstance(summary, list):
+                summary = "\n".join(str(x) for x in summary)
+            items.append((chap_num, chap_title, str(summary or "").strip()))
+        return items
+
+    def _export_body_chunks(self, generated, num):
+        iter_text = getattr(generated, "iter_text", None)
+        if iter_text is not None:
+            return iter_text(num)
+        return novel_export.text_chunks(generated.get(num) or "")
+
+    def _export_chapter_chunks(self, generated, num, title, summary):
+        yield f"第{num}章 {title}\n\n梗概：\n{summary}"
+        # 检查是否有生成的正文
+        if num in generated:
+            yield "\n\n\n" + chapter_store.EXPORT_BODY_SEPARATOR + "\n\n"
+            yield from self._export_body_chunks(generated, num)
+        else:
+            yield "\n\n" + chapter_store.EXPORT_EMPTY_BODY
+
     def on_generate_novel(self):
         if not self._require_login_and_token():
             return
@@ -6007,6 +6248,10 @@ class OutlineApp:
         if not api_key:
             messagebox.showerror("错误", "未配置 API Key，请在 config.json 或环境变量 GEMINI_API_KEY 中设置")
             return
+
+        resume = self._ask_resume_novel()
+        if resume is False:
+            return
             
         self.generate_btn.config(state=tk.DISABLED)
         self.save_btn.config(state=tk.DISABLED)
@@ -6019,9 +6264,90 @@ class OutlineApp:
         self.stop_btn.config(state=tk.NORMAL)
         
         self.status_var.set(f"准备使用 {provider} 生成正文...")
-        self.generated_chapters_content = {} 
+        self.generated_chapters_content = {}
+        self.chapter_store = None
         
-        threading.Thread(target=self._run_novel_generation, args=(provider, api_key, model), daemon=True).start()
+        threading.Thread(target=self._run_novel_generation, args=(provider, api_key, model), kwargs={"resume": resume}, daemon=True).start()
+
+    def _find_existing_chapters(self, nums):
+        """
+        查找当前大纲已生成的正文：内存（本次运行的存储或字典）→ 磁盘上的正文存储 → 本次会话导出过的 ZIP 包
+
+        Returns:
+            {"source", "store", "chapters", "done"} 或 None；store 为可续写的 ChapterStore，
+            chapters 为 {章号: (标题, 正文)}（来自内存字典或 ZIP 时）
+        """
+        outline = self.full_outline_context or ""
+        sha = chapter_store.outline_hash(outline)
+        wanted = set(nums)
+        current = getattr(self, "generated_chapters_content", None)
+        if isinstance(current, chapter_store.ChapterStore):
+            if current.header.get("outline_sha") == sha and current.done_chapters():
+                return {"source": "本次生成", "store": current, "chapters": None, "done": [n for n in current.done_chapters() if n in wanted]}
+        elif current:
+            items = {int(n): ("", t) for n, t in current.items() if t and int(n) in wanted}
+            if items:
+                return {"source": "内存", "store": None, "chapters": items, "done": sorted(items.keys())}
+        store = chapter_store.latest_for_outline(self._get_app_base_dir(), sha)
+        if store is not None and store.done_chapters():
+            return {"source": f"正文存储 {store.path}", "store": store, "chapters": None, "done": [n for n in store.done_chapters() if n in wanted]}
+        zip_path = getattr(self, "last_export_zip_path", "") or ""
+        if zip_path and os.path.exists(zip_path):
+            try:
+                zip_outline, items = chapter_store.read_export_zip(zip_path)
+            except Exception:
+                zip_outline, items = "", {}
+            if items and chapter_store.outline_hash(zip_outline) == sha:
+                items = {n: v for n, v in items.items() if n in wanted}
+                if items:
+                    return {"source": f"ZIP 包 {zip_path}", "store": None, "chapters": items, "done": sorted(items.keys())}
+        return None
+
+    def _ask_resume_novel(self):
+        """已有部分正文时询问是否只补缺失的章节；返回续写信息、None（全部重新生成）或 False（取消）"""
+        nums = []
+        for c in self.chapters_data:
+            if isinstance(c, dict) and c.get('chapter') is not None:
+                try:
+                    nums.append(int(c.get('chapter')))
+                except Exception:
+                    continue
+        found = self._find_existing_chapters(nums)
+        if not found or not found["done"]:
+            return None
+        done = found["done"]
+        missing = len(nums) - len(done)
+        ans = messagebox.askyesnocancel(
+            "继续生成正文",
+            f"检测到已生成 {len(done)}/{len(nums)} 章正文（来源：{found['source']}）。\n\n"
+            f"是：只生成缺失或不完整的 {missing} 章，已完成的章节不再消耗次数和 token\n"
+            f"否：全部重新生成\n取消：不生成",
+        )
+        if ans is None:
+            return False
+        if not ans:
+            return None
+        raw = simpledialog.askstring("继续生成正文", "需要重新生成的已完成章节（如 3,10-12；留空表示不重写）：", parent=self.root)
+        found["regenerate"] = [n for n in chapter_store.parse_chapter_list(raw or "") if n in set(done)]
+        return found
+
+    def _resume_chapter_store(self, resume, provider, model_name, total_chapters):
+        """续写：沿用已有的正文存储，或新建存储并导入内存/ZIP 中的已有章节"""
+        store = resume.get("store")
+        if store is not None:
+            if store is not getattr(self, "chapter_store", None):
+                store = chapter_store.ChapterStore.reopen(store.path)
+            if store is not None:
+                store.completed = False
+                self.chapter_store = store
+                self.generated_chapters_content = store
+        else:
+            store = self._open_chapter_store(provider, model_name, total_chapters)
+            for n, (title, text) in sorted((resume.get("chapters") or {}).items()):
+                self._save_generated_chapter(n, text, title=title)
+        if store is not None and resume.get("regenerate"):
+            store.mark_regenerate(resume["regenerate"])
+        return store
 
     def on_generate_novel_and_export(self):
         if not self._require_login_and_token():
@@ -6029,7 +6355,241 @@ class OutlineApp:
         self._auto_export_zip_after_novel = True
         self.on_generate_novel()
 
-    def _run_novel_generation(self, provider, api_key, model_name):
+    def _chapter_spool_dir(self) -> str:
+        store = getattr(self, "chapter_store", None)
+        if store is not None:
+            return store.parts_dir
+        return os.path.join(self._get_app_base_dir(), "chapter_spool")
+
+    def _open_chapter_store(self, provider, model_name, total_chapters):
+        """本次正文生成的磁盘存储（novel_store/ 下）；建不起来时退回内存字典，不影响生成"""
+        outline = self.full_outline_context or ""
+        title = self._extract_outline_title(outline) or (self.type_var.get() or "").strip() or "未命名"
+        header = {
+            "title": title,
+            "novel_type": self.type_var.get(),
+            "theme": self.theme_var.get(),
+            "provider": provider,
+            "model": model_name,
+            "outline_sha": chapter_store.outline_hash(outline),
+            "total_chapters": total_chapters,
+        }
+        try:
+            store = chapter_store.ChapterStore.create(self._get_app_base_dir(), header, name_hint=self._slug(title))
+            store.save_outline(outline)
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"正文存储创建失败，仅保存在内存中: {e}")
+            self.chapter_store = None
+            self.generated_chapters_content = {}
+            return None
+        self.chapter_store = store
+        self.generated_chapters_content = store
+        if self.logger:
+            self.logger.info(f"正文存储: {store.path}")
+        return store
+
+    def _save_generated_chapter(self, chap_num, text, title="", partial=False):
+        store = getattr(self, "chapter_store", None)
+        if store is not None:
+            try:
+                store.put(chap_num, text, title=title, partial=partial)
+                return
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"第{chap_num}章写入正文存储失败，改存内存: {e}")
+                # 磁盘写不进去时把已落盘的章节搬回内存，之后都存内存
+                self.generated_chapters_content = {n: store.text(n) for n in store.keys()}
+                self.chapter_store = None
+        self.generated_chapters_content[chap_num] = text
+
+    def _generated_chapters(self):
+        """导出用的正文来源：本次生成的存储，没有时找磁盘上同一份大纲最近的存储"""
+        content = getattr(self, "generated_chapters_content", None)
+        if content:
+            return content
+        outline = (self.full_outline_context or "").strip()
+        if not outline:
+            return {}
+        store = chapter_store.latest_for_outline(self._get_app_base_dir(), chapter_store.outline_hash(self.full_outline_context or ""))
+        return store if store is not None else {}
+
+    def _iter_chapter_stream(self, provider, api_key, model, client, system_inst, user_msg, config=None, temperature=0.8):
+        if provider == "Claude":
+            url = (self._load_claude_base_url() or DEFAULT_CLAUDE_BASE_URL).strip()
+            return streaming.iter_claude(api_key, model or DEFAULT_CLAUDE_MODEL, system_inst, user_msg, temperature=temperature,
+                                         url=url, max_tokens=8192, cancel_event=self._cancel_event)
+        if provider == "Doubao":
+            return streaming.iter_compat(api_key, model, system_inst, user_msg, temperature=temperature,
+                                         base_url=self._load_doubao_base_url(), max_tokens=4000, cancel_event=self._cancel_event)
+        contents = [types.Content(role="user", parts=[types.Part.from_text(text=user_msg)])]
+        cfg = request_executor.with_request_timeout(config, 300)
+        return streaming.iter_gemini(client, model, contents, cfg, cancel_event=self._cancel_event)
+
+    def _stream_chapter(self, provider, api_key, models, client, system_inst, prompt, chap_num, config=None, temperature=0.8,
+                        max_resumes=2, novel_type=None, max_guard_retries=2, echo=True):
+        """
+        流式生成单章：文本边到边写入输出框与章节临时文件（echo=False 时只写临时文件，窗口并行时由调用方按顺序输出）。
+        中途断流时带上已收到的内容续写；一个字都没拿到时抛出异常，由调用方回退到普通请求。
+        在线质检发现复读/违禁词/元叙述时立即中止本次输出、撤回已显示的部分并重写；
+        重写次数用尽后最后一次不再在线中止，写完后整章补做一次质检。
+
+        Returns:
+            (正文, 是否完整)；续写次数用尽、被停止或最后一次未通过质检时返回已收到的内容与 False，由调用方按不完整章节保存
+        """
+        limiter_provider = {"Claude": "claude", "Doubao": "doubao"}.get(provider, "gemini")
+        key_id = provider_clients.key_fingerprint_of(client) if client is not None else api_key
+        spool = streaming.ChapterSpool(self._chapter_spool_dir(), chap_num)
+        sink = streaming.ThrottledSink(self.ui_bus.append if echo else (lambda _text: None))
+        forbidden = self._get_forbidden_terms(novel_type if novel_type is not None else self.type_var.get())
+        max_tokens = 8192 if provider == "Claude" else (4000 if provider == "Doubao" else 8000)
+        user_msg = prompt
+        echo_mark = "stream_attempt"
+        failures = 0
+        guard_trips = 0
+        completed = False
+        try:
+            while True:
+                routed = model_router.order(limiter_provider, list(models)) if limiter_provider == "gemini" else list(models)
+                model = routed[min(failures, len(routed) - 1)]
+                if not rate_limiter.acquire(limiter_provider, model, key_id, tokens=response_cache.request_tokens(system_inst, user_msg), cancel_event=self._cancel_event):
+                    break
+                started = time.time()
+                mark = spool.mark()
+                guard = stream_guard.StreamGuard(forbidden) if guard_trips < max_guard_retries else None
+                if echo and guard is not None:
+                    # 输出框里记下本次输出的起点，质检中止时连同已显示的内容一起撤回
+                    sink.flush()
+                    self.ui_bus.mark(echo_mark)
+                stream = self._iter_chapter_stream(provider, api_key, model, client, system_inst, user_msg, config=config, temperature=temperature)
+                try:
+                    for piece in stream:
+                        spool.write(piece)
+                        sink.write(piece)
+                        tripped = guard.feed(piece) if guard is not None else None
+                        if tripped is not None:
+                            raise tripped
+                    sink.flush()
+                    model_router.record_success(limiter_provider, model, time.time() - started)
+                    rate_limiter.consume(limiter_provider, model, key_id, response_cache.estimate_tokens(spool.text()))
+                    completed = True
+                    if guard is None:
+                        # 最后一次没有在线质检：整章补检，不合格时按不完整章节保存，续写时重写
+                        tripped = stream_guard.StreamGuard(forbidden).feed(spool.text())
+                        if tripped is not None:
+                            completed = False
+                            if self.logger:
+                                self.logger.warning(f"第{chap_num}章重写 {guard_trips} 次后仍未通过质检（{tripped.reason}），按不完整章节保存")
+                            if echo:
+                                self.ui_bus.append(f"\n[系统] 本章仍未通过质检（{tripped.reason}）。\n")
+                    break
+                except streaming.StreamCancelled:
+                    sink.flush()
+                    break
+                except stream_guard.StreamGuardTripped as e:
+                    # 立即断开流（关闭生成器会释放底层连接），丢弃本次输出后重写
+                    try:
+                        stream.close()
+                    except Exception:
+                        pass
+                    sink.flush()
+                    if echo:
+                        self.ui_bus.truncate(echo_mark)
+                    guard_trips += 1
+                    stream_guard.record_trip(e.kind, guard.chars, max_tokens)
+                    rate_limiter.consume(limiter_provider, model, key_id, guard.chars)
+                    spool.rollback(mark)
+                    if self.logger:
+                        self.logger.warning(f"第{chap_num}章流式质检中止（{e.reason}），已收 {guard.chars} 字，重写 ({guard_trips}/{max_guard_retries})")
+                    if echo:
+                        self.ui_bus.append(f"\n[系统] 检测到异常输出（{e.reason}），已中止并重写本段...\n")
+                    if self._cancel_event.is_set():
+                        break
+                    continue
+                except Exception as e:
+                    sink.flush()
+                    msg = str(e)
+                    failures += 1
+                    if self._is_rate_limit(msg):
+                        rate_limiter.penalize(limiter_provider, model, key_id, self._parse_retry_delay(msg))
+                    else:
+                        model_router.record_failure(limiter_provider, model, "error")
+                    if self.logger:
+                        self.logger.warning(f"第{chap_num}章流式生成中断（已收到 {len(spool.text())} 字）: {msg}")
+                    if self._cancel_event.is_set() or failures > max_resumes:
+                        if spool.text().strip():
+                            break
+                        raise
+                    if spool.text().strip():
+                        user_msg = (
+                            prompt
+                            + "\n\n【本章已写出的内容（生成中断，请从结尾处无缝续写，不要重复已写内容）】\n"
+                            + spool.text()[-3000:]
+                        )
+                    wait_time = retry_policy.request_backoff(failures - 1)
+                    if echo:
+                        self.ui_bus.append(f"\n[系统] 流式输出中断，{wait_time}s后续写...\n")
+                    if self._cancel_event.wait(wait_time):
+                        break
+            text = spool.text()
+            if completed and not text.strip():
+                raise ValueError(retry_policy.EMPTY_RESPONSE_MESSAGE)
+            if completed:
+                spool.commit()
+            elif self.logger and text.strip():
+                self.logger.warning(f"第{chap_num}章未完整生成（{len(text)} 字），按不完整章节保存")
+            return text, completed
+        finally:
+            if not spool.text():
+                spool.discard()
+            else:
+                spool.close()
+
+    def _generate_chapter_once(self, provider, api_key, model_name, models, client, system_inst, prompt, config=None, temperature=0.8) -> str:
+        """非流式生成（流式失败时的回退）"""
+        if provider == "Claude":
+            return self._call_claude(api_key, model_name, system_inst, prompt, temperature=temperature, max_tokens=8192)
+        if provider == "Doubao":
+            base_url = self._load_doubao_base_url()
+            return self._call_compat_chat(api_key, model_name, system_inst, prompt, temperature=temperature, base_url=base_url)
+        contents = [types.Content(role="user", parts=[types.Part.from_text(text=prompt)])]
+        return self._generate_with_fallback(client, models, contents, config)
+
+    def _stitch_chapter_opening(self, provider, api_key, model_name, models, client, system_inst, prev_text, opening, chap, novel_type=None) -> str:
+        """
+        窗口并行时，本章是按梗概交接起笔的：上一章真实结尾出来后只改写本章开头几百字，使其与上一章无缝衔接。
+        失败或结果异常时返回空串，保留原开头。
+        """
+        chap_num = int(chap.get('chapter'))
+        prompt = (
+            f"你是一位专业小说编辑。下面是小说上一章的结尾，以及第{chap_num}章的开头。\n"
+            f"第{chap_num}章是在上一章完成之前按梗概写的，开头可能与上一章结尾在时间、地点、人物状态上有出入或重复。\n"
+            f"请只改写第{chap_num}章的开头，使其紧接上一章结尾自然过渡：\n"
+            f"1. 保留原开头的情节要点与结尾处的内容，便于与后文衔接；篇幅与原开头相近。\n"
+            f"2. 不要复述上一章已写过的情节，不要添加“第X章”标题。\n"
+            f"3. 只输出改写后的开头正文，不要任何解释。\n\n"
+            f"【上一章结尾】\n{prev_text[-1200:]}\n\n"
+            f"【第{chap_num}章开头（待改写）】\n{opening}"
+        )
+        config = None
+        if provider == "Gemini":
+            config = types.GenerateContentConfig(temperature=0.5, max_output_tokens=2000, top_p=0.95)
+        try:
+            out = self._generate_chapter_once(provider, api_key, model_name, models, client, system_inst, prompt, config=config, temperature=0.5)
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"第{chap_num}章开头衔接改写失败，保留原文: {e}")
+            return ""
+        out = self._sanitize_text(out or "").strip()
+        # 明显过短/过长的改写多半是模型跑题，保留原开头
+        if not out or len(out) < len(opening) * 0.5 or len(out) > len(opening) * 2 + 200:
+            return ""
+        guard = stream_guard.StreamGuard(self._get_forbidden_terms(novel_type if novel_type is not None else self.type_var.get()))
+        if guard.feed(out) is not None:
+            return ""
+        return out
+
+    def _run_novel_generation(self, provider, api_key, model_name, resume=None):
         auto_export_zip = bool(getattr(self, "_auto_export_zip_after_novel", False))
         try:
             if self.logger:
@@ -6038,7 +6598,7 @@ class OutlineApp:
             # Gemini Client Init (Only if needed)
             client = None
             if provider == "Gemini":
-                client = genai.Client(api_key=api_key)
+                client = provider_clients.get_genai_client(api_key)
                 models = [model_name, "gemini-2.5-pro"] if "gemini" in model_name.lower() else [model_name]
             
             # 过滤出有效的章节数据
@@ -6048,49 +6608,83 @@ class OutlineApp:
                     valid_chapters.append(c)
             
             total_chapters = len(valid_chapters)
-            self.root.after(0, lambda: self.progress_var.set(f"正文进度 0/{total_chapters}"))
+            self.ui_bus.set(self.progress_var, f"正文进度 0/{total_chapters}")
+            if resume:
+                store = self._resume_chapter_store(resume, provider, model_name, total_chapters)
+            else:
+                store = self._open_chapter_store(provider, model_name, total_chapters)
+            if store is not None:
+                self.ui_bus.append(f"\n[系统] 正文逐章保存至：{store.path}\n")
+            # 续写时跳过已完整写完的章节（被标记重写的除外），上一章结尾从磁盘读取
+            done = set(store.done_chapters()) if (resume and store is not None) else set()
+            if done:
+                todo = len([c for c in valid_chapters if int(c.get('chapter')) not in done])
+                self.ui_bus.append(f"[系统] 已有 {total_chapters - todo} 章正文，本次只生成其余 {todo} 章。\n")
+                self.ui_bus.set(self.progress_var, f"正文进度 0/{total_chapters}（已有 {total_chapters - todo} 章）")
             
             # 构建基础上下文
             novel_type = self.type_var.get()
             theme = self.theme_var.get()
             inspiration = (getattr(self, "inspiration_context", "") or "").strip()
-            # 用户要求发送完整大纲，Gemini模型支持长上下文，取消截断
-            context_base = (
+            context_head = (
                 f"小说类型：{novel_type}\n"
                 + f"主题：{theme}\n"
                 + (f"写作灵感：{inspiration}\n" if inspiration else "")
-                + f"完整大纲参考：\n{self.full_outline_context}"
+            )
+            # 每章只带设定集、本卷规划、相邻章节梗概与相关伏笔（novel_context_budget_tokens 为 0 时仍发送完整大纲）
+            outline_context = chapter_context.ChapterContextBuilder(
+                self.full_outline_context or "", valid_chapters, budget_tokens=self._load_novel_context_budget(),
             )
             
-            last_chapter_text = "" # 用于存储上一章正文，保持连贯性
+            # 窗口为 1 时与原来的逐章串行完全一致；大于 1 时多章同时在途，按顺序提交并改写衔接处
+            window = self._load_novel_pipeline_window()
+            echo = window == 1
+            gen_models = models if provider == "Gemini" else [model_name]
+            system_inst = ""
+            config = None
+            if provider in ("Doubao", "Claude"):
+                system_inst = build_system_instruction() + "\n" + build_constraints(novel_type, theme, self.channel_var.get(), inspiration=(self.inspiration_context or ""))
+            else:
+                config = types.GenerateContentConfig(
+                    temperature=0.8, 
+                    max_output_tokens=8000,
+                    top_p=0.95,
+                )
+            if window > 1:
+                self.ui_bus.append(f"\n[系统] 并行生成正文：同时 {window} 章，按章节顺序输出。\n")
+                if self.logger:
+                    self.logger.info(f"正文窗口并行: {window}")
 
-            for i, chap in enumerate(valid_chapters, 1):
+            streamed_chapters = set()
+            # 流式续写次数用尽只拿到部分内容、或重写后仍未通过质检的章节：按不完整保存，续写时重新生成
+            incomplete_chapters = set()
+
+            def _chapter_title(chap):
+                title = chap.get('title', '')
+                if title:
+                    title = re.sub(r'^第\d+章\s*', '', title).strip()
+                return title
+
+            def _generate(chap, handoff):
                 if self._cancel_event.is_set():
-                    self.root.after(0, self._append_text, "\n\n[系统] 已停止生成正文。\n")
-                    break
+                    return ""
                 chap_num = int(chap.get('chapter'))
-                chap_title = chap.get('title', '')
+                chap_title = _chapter_title(chap)
                 chap_summary = chap.get('summary', '')
-                
-                if chap_title:
-                    chap_title = re.sub(r'^第\d+章\s*', '', chap_title).strip()
-                
-                self.root.after(0, self._append_text, f"\n\n>>> 正在生成 第{chap_num}章 {chap_title} ...\n")
-                self.root.after(0, lambda: self.status_var.set(f"正在生成 第{chap_num}章"))
+
+                if echo:
+                    self.ui_bus.append(f"\n\n>>> 正在生成 第{chap_num}章 {chap_title} ...\n")
+                self.ui_bus.set(self.status_var, f"正在生成 第{chap_num}章")
                 if self.logger:
-                    self.logger.info(f"生成章节: 第{chap_num}章 {chap_title}")
-
-                # 构建上一章的回顾，增强连贯性
-                prev_context_prompt = ""
-                if last_chapter_text:
-                    # 截取上一章最后2000字作为上下文
-                    prev_text_segment = last_chapter_text[-2000:]
-                    prev_context_prompt = (
-                        f"【上一章（第{chap_num-1}章）结尾内容回顾】\n"
-                        f"{prev_text_segment}\n"
-                        f"--------------------------------\n"
-                        f"指令：请务必紧接上一章的结尾剧情继续创作，保持场景、时间、人物状态的连贯性。\n\n"
-                    )
+                    self.logger.info(f"生成章节: 第{chap_num}章 {chap_title}" + ("" if handoff.kind == chapter_pipeline.HANDOFF_ACTUAL else "（梗概交接）"))
+
+                # 上一章结尾（已完成时）或场景状态交接（上一章仍在生成时），保持连贯性
+                prev_context_prompt = handoff.prompt()
+                ctx = outline_context.build(chap_num)
+                if ctx.tokens >= ctx.full_tokens:
+                    context_base = context_head + f"完整大纲参考：\n{ctx.text}"
+                else:
+                    context_base = context_head + f"大纲参考（设定集、本卷规划、相邻章节梗概与相关伏笔）：\n{ctx.text}"
 
                 prompt = (
                     f"你是一位专业畅销小说作家。\n"
@@ -6105,45 +6699,80 @@ class OutlineApp:
                     f"3. 严格贴合本章梗概，承接上文（如果有），铺垫下文。\n"
                     f"4. 输出纯正文内容，不要包含“第X章”标题，直接开始正文描写。"
                 )
-                
-                if provider in ("Doubao", "Claude"):
-                    system_inst = build_system_instruction() + "\n" + build_constraints(novel_type, theme, self.channel_var.get(), inspiration=(self.inspiration_context or ""))
-                    if provider == "Claude":
-                        content_out = self._call_claude(api_key, model_name, system_inst, prompt, temperature=0.8, max_tokens=8192)
-                    else:
-                        base_url = self._load_doubao_base_url()
-                        content_out = self._call_compat_chat(api_key, model_name, system_inst, prompt, temperature=0.8, base_url=base_url)
-                else:
-                    # Gemini 生成
-                    config = types.GenerateContentConfig(
-                        temperature=0.8, 
-                        max_output_tokens=8000,
-                        top_p=0.95,
+
+                # 流式生成：首字几秒内出现，边生成边写入临时文件
+                streamed = True
+                try:
+                    content_out, completed = self._stream_chapter(
+                        provider, api_key, gen_models, client,
+                        system_inst, prompt, chap_num, config=config, temperature=0.8, novel_type=novel_type, echo=echo,
                     )
-                    contents = [types.Content(role="user", parts=[types.Part.from_text(text=prompt)])]
-                    content_out = self._generate_with_fallback(client, models, contents, config)
-                
-                if self._cancel_event.is_set():
-                    self.root.after(0, self._append_text, "\n\n[系统] 已停止生成正文。\n")
-                    break
+                    if not completed and not self._cancel_event.is_set():
+                        incomplete_chapters.add(chap_num)
+                except Exception as e:
+                    streamed = False
+                    content_out = ""
+                    if self.logger:
+                        self.logger.warning(f"第{chap_num}章流式生成失败，改用普通请求: {e}")
 
-                content_out = self._sanitize_text(content_out)
-                
-                self.generated_chapters_content[chap_num] = content_out
-                last_chapter_text = content_out # 更新上一章内容
-                
-                # 实时显示部分内容或提示完成
-                preview = content_out[:200] + "..." if len(content_out) > 200 else content_out
-                self.root.after(0, self._append_text, f"{preview}\n[第{chap_num}章 完成]\n")
-                self.root.after(0, lambda: self.progress_var.set(f"正文进度 {i}/{total_chapters}"))
-                
-                # 简单的防频控休眠
-                time.sleep(2)
+                if (not streamed) and (not self._cancel_event.is_set()):
+                    content_out = self._generate_chapter_once(provider, api_key, model_name, gen_models, client, system_inst, prompt, config)
+                if streamed and echo:
+                    streamed_chapters.add(chap_num)
+                return self._sanitize_text(content_out or "")
+
+            def _stitch(prev_text, opening, chap):
+                return self._stitch_chapter_opening(provider, api_key, model_name, gen_models, client, system_inst, prev_text, opening, chap, novel_type)
+
+            def _commit(idx, chap, content_out, handoff):
+                chap_num = int(chap.get('chapter'))
+                streamed = chap_num in streamed_chapters
+                if not content_out:
+                    return
+                # 每章完成即落盘；停止或续写失败时已收到的部分内容同样保留（标记为不完整，续写时重新生成），不因失败而丢弃
+                incomplete = chap_num in incomplete_chapters
+                self._save_generated_chapter(chap_num, content_out, title=_chapter_title(chap), partial=incomplete or self._cancel_event.is_set())
+                if self._cancel_event.is_set():
+                    return
+                if incomplete:
+                    if not echo:
+                        self.ui_bus.append(f"\n\n>>> 第{chap_num}章 {_chapter_title(chap)}\n{content_out}\n")
+                    self.ui_bus.append(f"\n[第{chap_num}章 未完成：输出中断或未通过质检，已保存收到的内容，再次生成正文时将重写本章]\n")
+                elif streamed:
+                    self.ui_bus.append(f"\n[第{chap_num}章 完成]\n")
+                elif echo:
+                    # 实时显示部分内容或提示完成
+                    preview = content_out[:200] + "..." if len(content_out) > 200 else content_out
+                    self.ui_bus.append(f"{preview}\n[第{chap_num}章 完成]\n")
+                else:
+                    self.ui_bus.append(f"\n\n>>> 第{chap_num}章 {_chapter_title(chap)}\n{content_out}\n[第{chap_num}章 完成]\n")
+                self.ui_bus.set(self.progress_var, f"正文进度 {idx + 1}/{total_chapters}")
+
+            # 频控由共享令牌桶负责（config.json 的 rate_limits），不再固定休眠
+            pipeline = chapter_pipeline.ChapterPipeline(
+                valid_chapters, _generate, stitch_fn=_stitch, on_commit=_commit,
+                window=window, cancel_event=self._cancel_event,
+                skip_fn=(lambda chap: int(chap.get('chapter')) in done) if done else None,
+                load_fn=(lambda chap: store.text(int(chap.get('chapter')))) if done else None,
+            )
+            pipeline_stats = pipeline.run()
+            if self._cancel_event.is_set():
+                self.ui_bus.append("\n\n[系统] 已停止生成正文。\n")
+            if self.logger:
+                self.logger.info(f"正文生成统计: {pipeline_stats.format()}；{outline_context.format_stats()}")
 
             if not self._cancel_event.is_set():
-                self.root.after(0, self._append_text, "\n\n====== 所有章节正文生成完毕 ======\n")
+                if incomplete_chapters:
+                    # 有不完整章节时存储不标记完成，下次生成正文会询问是否续写并重写这些章节
+                    self.ui_bus.append(f"\n[系统] 第{', '.join(str(n) for n in sorted(incomplete_chapters))}章未完整生成，再次点击生成正文可只重写这些章节。\n")
+                elif self.chapter_store is not None:
+                    self.chapter_store.complete()
+                self.ui_bus.append("\n\n====== 所有章节正文生成完毕 ======\n")
+                self.ui_bus.append(f"[系统] {outline_context.format_stats()}\n")
                 if self.logger:
                     self.logger.info("所有章节正文生成完毕")
+                    self.logger.info(f"连接复用统计: {provider_clients.format_stats()}；{request_executor.format_stats()}；{rate_limiter.format_stats()}；{response_cache.format_stats()}")
+                    self.logger.info(f"模型记分板: {model_router.format_stats()}；{hedging.format_stats()}；{stream_guard.format_stats()}")
                 if auto_export_zip:
                     def do_export_zip():
                         try:
@@ -6163,12 +6792,16 @@ class OutlineApp:
             if self.logger:
                 self.logger.error(f"生成正文失败: {err_msg}")
         finally:
+            if self.chapter_store is not None:
+                self.chapter_store.close()
             self._auto_export_zip_after_novel = False
             self._reset_ui_state()
 
-    def _run_compat_generation(self, provider, api_key, model_name, novel_type, theme, chapters, volumes):
+    def _run_compat_generation(self, provider, api_key, model_name, novel_type, theme, chapters, volumes, resume=None):
+        journal = None
         try:
-            self.generation_variation = self._new_generation_variation(novel_type, theme)
+            self.generation_variation = self._resume_or_new_variation(resume, novel_type, theme)
+            hedging.start_run()
             self._setup_logger(novel_type, theme, chapters)
             self.start_time = time.time()
             
@@ -6177,7 +6810,7 @@ class OutlineApp:
             base_url = self._load_doubao_base_url()
             
             # --- 1. 优化提示词 ---
-            self.root.after(0, self._append_text, f"正在使用 {provider} ({model_name}) 优化指令...\n")
+            self.ui_bus.append(f"正在使用 {provider} ({model_name}) 优化指令...\n")
             if self.logger: self.logger.info("开始备用模型提示词优化")
             
             optimize_prompt = (
@@ -6195,7 +6828,10 @@ class OutlineApp:
                 "8. 不要包含任何解释性文字，直接输出优化后的 Instruction 内容。"
             )
             
-            optimized_instruction = self._call_compat_chat(api_key, model_name, system_prompt, optimize_prompt, temperature=0.7, base_url=base_url)
+            if resume is not None:
+                optimized_instruction = (resume.header.get("optimized_instruction") or "").strip()
+            else:
+                optimized_instruction = self._call_compat_chat(api_key, model_name, system_prompt, optimize_prompt, temperature=0.7, base_url=base_url)
             self.last_optimized_instruction = (optimized_instruction or "").strip() if isinstance(optimized_instruction, str) else str(optimized_instruction)
             self.last_constraints_text = (constraints_text or "").strip()
             if not optimized_instruction:
@@ -6204,51 +6840,51 @@ class OutlineApp:
                 system_prompt = optimized_instruction.strip() + "\n" + constraints_text
             
             if self.logger: self.logger.info(f"优化后指令: {system_prompt[:100]}...")
-            self.root.after(
-                0,
-                self._append_text,
+            self.ui_bus.append(
                 "\n\n### 专业提示词（本次用于生成大纲）\n"
                 + (optimized_instruction.strip() if isinstance(optimized_instruction, str) else str(optimized_instruction))
                 + "\n\n"
                 + (self.generation_variation or ""),
             )
-            self.root.after(0, self._append_text, "指令优化完成，开始生成正文...\n")
+            self.ui_bus.append("指令优化完成，开始生成正文...\n")
             
             # --- 2. 生成各章节 ---
             sections = self._build_sections_text(novel_type, theme, chapters, volumes, provider=provider)
             self.total_sections = len(sections)
             self.completed_sections = 0
-            self.root.after(0, self._update_progress)
-            
-            accumulated = ""
+            self.ui_bus.call(self._update_progress)
             
-            for i, sec in enumerate(sections, start=1):
+            vol_starts = section_scheduler.volume_starts([sec[0] for sec in sections]) if self._load_outline_two_phase(volumes) else None
+            completed = self._restore_from_checkpoint(resume, sections)
+            self._init_context_store(sections, completed, resume)
+            journal = self._open_checkpoint(resume, provider, model_name, novel_type, theme, chapters, volumes, sections)
+            section_data = {}
+
+            def _section_job(idx, accumulated):
+                sec = sections[idx]
                 if self._cancel_event.is_set():
-                    self.root.after(0, self._append_text, "\n\n[系统] 已停止生成。\n")
-                    break
+                    return ""
                 self._wait_if_paused()
                 if self._cancel_event.is_set():
-                    self.root.after(0, self._append_text, "\n\n[系统] 已停止生成。\n")
-                    break
+                    return ""
                 sec_title = sec[0]
                 sec_prompt = sec[1]
                 sec_schema = sec[2] if len(sec) > 2 else None
                 
-                self.root.after(0, self._append_text, f"\n\n### {i}. {sec_title}\n")
                 if self.logger: self.logger.info(f"开始生成: {sec_title}")
                 
                 # 上下文注入
                 current_prompt = sec_prompt
                 if accumulated:
-                    context_text = accumulated[-20000:]
                     current_prompt = (
-                        f"【前文内容参考】\n{context_text}\n"
+                        f"【前文内容参考】\n{accumulated}\n"
                         f"----------------\n"
                         f"基于前文继续创作：\n{current_prompt}"
                     )
                     
-                if sec_title.startswith("章节大纲") and self.all_chapter_summaries:
-                    context_summary = "\n".join(self.all_chapter_summaries)[-4000:]
+                chapter_summaries = self._section_chapter_summaries(sec_title, vol_starts)
+                if sec_title.startswith("章节大纲") and chapter_summaries:
+                    context_summary = "\n".join(chapter_summaries)[-4000:]
                     current_prompt += (
                         f"\n\n【前序章节梗概】\n{context_summary}\n"
                         f"----------------\n"
@@ -6298,7 +6934,7 @@ class OutlineApp:
                     if not json_data:
                         if self.logger: self.logger.warning("JSON 解析失败，尝试纠错")
                         fix_prompt = f"上一次输出的 JSON 格式有误，请修正为合法的 JSON：\n{text_out}"
-                        text_out_fixed = self._call_compat_chat(api_key, model_name, system_prompt, fix_prompt, temperature=0.1, base_url=base_url)
+                        text_out_fixed = self._call_compat_chat(api_key, model_name, system_prompt, fix_prompt, temperature=0.1, base_url=base_url, use_cache=False)
                         json_data = self._parse_json(text_out_fixed)
                     
                     if sec_title.startswith("章节大纲") and not json_data:
@@ -6318,7 +6954,7 @@ class OutlineApp:
                             ctx_existing = self._parse_chapters_from_outline_text(accumulated)
                             range_context = self._build_chapter_range_context(accumulated, ctx_existing, a, b)
                             regen_prompt = f"【上下文参考】\n{range_context}\n----------------\n{regen_prompt}"
-                            regen_text = self._call_compat_chat(api_key, model_name, system_prompt, regen_prompt, temperature=0.5, base_url=base_url)
+                            regen_text = self._call_compat_chat(api_key, model_name, system_prompt, regen_prompt, temperature=0.5, base_url=base_url, use_cache=False)
                             json_data = self._parse_json(regen_text)
                             if not json_data:
                                 by_ch = dict(ctx_existing) if isinstance(ctx_existing, dict) else {}
@@ -6346,9 +6982,8 @@ class OutlineApp:
                                         f"要求：只输出 JSON 数组；每项包含 chapter(整数)、title、summary；summary 必须包含：**内容**：... **【悬疑点】**：... **【爽点】**：...（爽点允许为“暂无”）\n"
                                     )
                                     if accumulated:
-                                        ctx = accumulated[-20000:]
-                                        fill_prompt = f"【前文内容参考】\n{ctx}\n----------------\n{fill_prompt}"
-                                    fill_text = self._call_compat_chat(api_key, model_name, system_prompt, fill_prompt, temperature=0.4, base_url=base_url)
+                                        fill_prompt = f"【前文内容参考】\n{accumulated}\n----------------\n{fill_prompt}"
+                                    fill_text = self._call_compat_chat(api_key, model_name, system_prompt, fill_prompt, temperature=0.4, base_url=base_url, use_cache=False)
                                     fill_data = self._parse_json(fill_text)
                                     base_items = self._ensure_list(json_data)
                                     fill_items = self._ensure_list(fill_data) if fill_data is not None else []
@@ -6388,15 +7023,26 @@ class OutlineApp:
                                     if s: self.all_chapter_summaries.append(f"第{item.get('chapter')}章：{s}")
                     
                     text_out_final = formatted or text_out
+                    section_data[idx] = json_data
                 else:
                     text_out_final = text_out
-
-                if text_out_final:
-                    self.root.after(0, self._append_text, text_out_final)
-                    accumulated += "\n\n### " + str(i) + ". " + sec_title + "\n" + text_out_final
-                    self.completed_sections += 1
-                    self.root.after(0, self._update_progress)
-                    self.root.after(0, self._update_eta, 0)
+                return text_out_final
+
+            accumulated = section_scheduler.run_sections(
+                [sec[0] for sec in sections],
+                _section_job,
+                on_commit=self._commit_outline_section(sections),
+                on_done=self._outline_section_done(sections, journal, section_data),
+                concurrency=self._load_section_concurrency(),
+                cancel_event=self._cancel_event,
+                two_phase=bool(vol_starts),
+                completed=completed,
+                on_revise=self._outline_section_revised(sections, journal),
+                context_fn=self._outline_context_fn(sections, 20000, vol_starts),
+                stitch_fn=self._volume_stitcher(sections, provider, api_key, model_name, novel_type, theme) if vol_starts else None,
+            )
+            if self._cancel_event.is_set():
+                self.ui_bus.append("\n\n[系统] 已停止生成。\n")
             
             if not self._cancel_event.is_set():
                 accumulated = self._post_fill_missing_after_generation(
@@ -6412,8 +7058,12 @@ class OutlineApp:
 
             if not self._cancel_event.is_set():
                 self.root.after(0, self._auto_save, novel_type, theme)
+                if journal is not None:
+                    journal.complete()
                 if self.logger:
                     self.logger.info("备用模型生成完成")
+                    self.logger.info(f"连接复用统计: {provider_clients.format_stats()}；{request_executor.format_stats()}；{rate_limiter.format_stats()}；{response_cache.format_stats()}")
+                    self.logger.info(f"模型记分板: {model_router.format_stats()}；{hedging.format_stats()}；{stream_guard.format_stats()}")
 
         except Exception as e:
             err_msg = str(e)
@@ -6421,18 +7071,22 @@ class OutlineApp:
             self.root.after(0, messagebox.showerror, "生成失败", err_msg)
             if self.logger: self.logger.error(f"生成失败: {err_msg}")
         finally:
+            if journal is not None:
+                journal.close()
             self._reset_ui_state()
 
-    def _run_claude_generation(self, provider, api_key, model_name, novel_type, theme, chapters, volumes):
+    def _run_claude_generation(self, provider, api_key, model_name, novel_type, theme, chapters, volumes, resume=None):
+        journal = None
         try:
-            self.generation_variation = self._new_generation_variation(novel_type, theme)
+            self.generation_variation = self._resume_or_new_variation(resume, novel_type, theme)
+            hedging.start_run()
             self._setup_logger(novel_type, theme, chapters)
             self.start_time = time.time()
 
             constraints_text = build_constraints(novel_type, theme, self.channel_var.get(), inspiration=(self.inspiration_context or "")) + "\n" + (self.generation_variation or "")
             system_prompt = build_system_instruction() + "\n" + constraints_text
 
-            self.root.after(0, self._append_text, f"正在使用 {provider} ({model_name}) 优化指令...\n")
+            self.ui_bus.append(f"正在使用 {provider} ({model_name}) 优化指令...\n")
             optimize_prompt = (
                 "你是资深网文主编，请根据以下基础信息，扩充并优化出一份专业的小说大纲生成提示词（System Instruction）。\n"
                 f"小说类型：{novel_type}\n"
@@ -6449,54 +7103,59 @@ class OutlineApp:
             )
 
             optimized_instruction = ""
-            try:
-                optimized_instruction = self._call_claude(api_key, model_name, system_prompt, optimize_prompt, temperature=0.7, max_tokens=2048)
-            except Exception:
-                optimized_instruction = ""
+            if resume is not None:
+                optimized_instruction = (resume.header.get("optimized_instruction") or "").strip()
+            else:
+                try:
+                    optimized_instruction = self._call_claude(api_key, model_name, system_prompt, optimize_prompt, temperature=0.7, max_tokens=2048)
+                except Exception:
+                    optimized_instruction = ""
             self.last_optimized_instruction = (optimized_instruction or "").strip()
             self.last_constraints_text = (constraints_text or "").strip()
             if not optimized_instruction:
                 optimized_instruction = build_system_instruction()
             system_prompt = optimized_instruction.strip() + "\n" + constraints_text
 
-            self.root.after(
-                0,
-                self._append_text,
+            self.ui_bus.append(
                 "\n\n### 专业提示词（本次用于生成大纲）\n"
                 + optimized_instruction.strip()
                 + "\n\n"
                 + (self.generation_variation or ""),
             )
-            self.root.after(0, self._append_text, "指令优化完成，开始生成正文...\n")
+            self.ui_bus.append("指令优化完成，开始生成正文...\n")
 
             sections = self._build_sections_text(novel_type, theme, chapters, volumes, provider=provider)
             self.total_sections = len(sections)
             self.completed_sections = 0
-            self.root.after(0, self._update_progress)
+            self.ui_bus.call(self._update_progress)
 
-            accumulated = ""
-            for i, sec in enumerate(sections, start=1):
+            vol_starts = section_scheduler.volume_starts([sec[0] for sec in sections]) if self._load_outline_two_phase(volumes) else None
+            completed = self._restore_from_checkpoint(resume, sections)
+            self._init_context_store(sections, completed, resume)
+            journal = self._open_checkpoint(resume, provider, model_name, novel_type, theme, chapters, volumes, sections)
+            section_data = {}
+
+            def _section_job(idx, accumulated):
+                sec = sections[idx]
                 if self._cancel_event.is_set():
-                    self.root.after(0, self._append_text, "\n\n[系统] 已停止生成。\n")
-                    break
+                    return ""
                 sec_title = sec[0]
                 sec_prompt = sec[1]
 
-                self.root.after(0, self._append_text, f"\n\n### {i}. {sec_title}\n")
                 if self.logger:
                     self.logger.info(f"开始生成: {sec_title}")
 
                 current_prompt = sec_prompt
                 if accumulated:
-                    context_text = accumulated[-20000:]
                     current_prompt = (
-                        f"【前文内容参考】\n{context_text}\n"
+                        f"【前文内容参考】\n{accumulated}\n"
                         f"----------------\n"
                         f"基于前文继续创作：\n{current_prompt}"
                     )
 
-                if sec_title.startswith("章节大纲") and self.all_chapter_summaries:
-                    context_summary = "\n".join(self.all_chapter_summaries)[-4000:]
+                chapter_summaries = self._section_chapter_summaries(sec_title, vol_starts)
+                if sec_title.startswith("章节大纲") and chapter_summaries:
+                    context_summary = "\n".join(chapter_summaries)[-4000:]
                     current_prompt += (
                         f"\n\n【前序章节梗概】\n{context_summary}\n"
                         f"----------------\n"
@@ -6505,24 +7164,37 @@ class OutlineApp:
 
                 self._wait_if_paused()
                 if self._cancel_event.is_set():
-                    break
+                    return ""
                 text_out = self._call_claude(api_key, model_name, system_prompt, current_prompt, temperature=0.7, max_tokens=4096)
-                text_out_final = self._sanitize_text(text_out or "")
-
-                if text_out_final:
-                    self.root.after(0, self._append_text, text_out_final)
-                    accumulated += "\n\n### " + str(i) + ". " + sec_title + "\n" + text_out_final
-                    self.completed_sections += 1
-                    self.root.after(0, self._update_progress)
-                    self.root.after(0, self._update_eta, 0)
+                return self._sanitize_text(text_out or "")
+
+            accumulated = section_scheduler.run_sections(
+                [sec[0] for sec in sections],
+                _section_job,
+                on_commit=self._commit_outline_section(sections),
+                on_done=self._outline_section_done(sections, journal, section_data),
+                concurrency=self._load_section_concurrency(),
+                cancel_event=self._cancel_event,
+                two_phase=bool(vol_starts),
+                completed=completed,
+                on_revise=self._outline_section_revised(sections, journal),
+                context_fn=self._outline_context_fn(sections, 20000, vol_starts),
+                stitch_fn=self._volume_stitcher(sections, provider, api_key, model_name, novel_type, theme) if vol_starts else None,
+            )
+            if self._cancel_event.is_set():
+                self.ui_bus.append("\n\n[系统] 已停止生成。\n")
 
             if not self._cancel_event.is_set():
                 accumulated = self._post_fill_missing_after_generation(
                     provider, api_key, model_name, novel_type, theme, chapters, volumes, accumulated
                 )
                 self.root.after(0, self._auto_save, novel_type, theme)
+                if journal is not None:
+                    journal.complete()
                 if self.logger:
                     self.logger.info("Claude 生成完成")
+                    self.logger.info(f"连接复用统计: {provider_clients.format_stats()}；{request_executor.format_stats()}；{rate_limiter.format_stats()}；{response_cache.format_stats()}")
+                    self.logger.info(f"模型记分板: {model_router.format_stats()}；{hedging.format_stats()}；{stream_guard.format_stats()}")
 
         except Exception as e:
             err_msg = str(e)
@@ -6531,9 +7203,11 @@ class OutlineApp:
             if self.logger:
                 self.logger.error(f"生成失败: {err_msg}")
         finally:
+            if journal is not None:
+                journal.close()
             self._reset_ui_state()
 
-    def _call_compat_chat(self, api_key, model, system, user_msg, temperature=0.7, base_url=None):
+    def _call_compat_chat(self, api_key, model, system, user_msg, temperature=0.7, base_url=None, use_cache=True):
         base_url = (base_url or "").strip().rstrip("/")
         if not base_url:
             raise ValueError("未配置兼容接口 Base URL")
@@ -6558,20 +7232,35 @@ class OutlineApp:
             "max_tokens": 4000,
             "stream": False
         }
+        cache_key = None
+        if use_cache and response_cache.get_cache() is not None:
+            cache_key = response_cache.make_key("compat:" + base_url_l, model, system, user_msg, {"temperature": temperature, "max_tokens": 4000}, nonce=self.generation_variation or "")
+            cached = response_cache.lookup(cache_key)
+            if cached:
+                return cached
         
         retries = 5 if is_ark else 3
+        prompt_tokens = response_cache.request_tokens(system, user_msg)
         for i in range(retries):
             if self._cancel_event.is_set():
                 return ""
+            if not rate_limiter.acquire("doubao", model, api_key, tokens=prompt_tokens, cancel_event=self._cancel_event):
+                return ""
             try:
-                resp = requests.post(url, headers=headers, json=data, timeout=timeout_secs)
+                resp = provider_clients.post(url, headers=headers, json=data, timeout=timeout_secs)
+                if resp.status_code == 429:
+                    rate_limiter.penalize("doubao", model, api_key, retry_policy.parse_retry_after(resp.headers, default=2 * (i + 1)))
                 if resp.status_code >= 400:
                     body = (resp.text or "").strip()
                     if resp.status_code == 404 and ("volces.com" in url.lower() or "volc" in url.lower() or "ark" in url.lower()):
                         raise requests.HTTPError(f"{resp.status_code} Client Error: {body or 'Not Found'}; 豆包 Ark 通常需要使用 Endpoint ID（ep-...）作为 model", response=resp)
                     raise requests.HTTPError(f"{resp.status_code} Client Error: {body or resp.reason}", response=resp)
                 res_json = resp.json()
-                return res_json['choices'][0]['message']['content']
+                content = res_json['choices'][0]['message']['content']
+                rate_limiter.consume("doubao", model, api_key, response_cache.estimate_tokens(content))
+                if cache_key:
+                    response_cache.store(cache_key, content, "compat", model, tokens=response_cache.request_tokens(system, user_msg) + response_cache.estimate_tokens(content))
+                return content
             except requests.exceptions.ReadTimeout as e:
                 if i < retries - 1:
                     try:
@@ -6592,7 +7281,7 @@ class OutlineApp:
                 raise e
         return ""
 
-    def _call_claude(self, api_key, model, system, user_msg, temperature=0.7, base_url=None, max_tokens: int = 4096):
+    def _call_claude(self, api_key, model, system, user_msg, temperature=0.7, base_url=None, max_tokens: int = 4096, use_cache=True):
         url = (base_url or self._load_claude_base_url() or DEFAULT_CLAUDE_BASE_URL).strip()
         timeout_secs = 180
         headers = {
@@ -6607,12 +7296,23 @@ class OutlineApp:
             "system": system or "",
             "messages": [{"role": "user", "content": user_msg or ""}],
         }
-
+        cache_key = None
+        if use_cache and response_cache.get_cache() is not None:
+            cache_key = response_cache.make_key("claude:" + url.lower(), data["model"], system, user_msg, {"temperature": data["temperature"], "max_tokens": data["max_tokens"]}, nonce=self.generation_variation or "")
+            cached = response_cache.lookup(cache_key)
+            if cached:
+                return cached
+
+        prompt_tokens = response_cache.request_tokens(system, user_msg)
         for i in range(3):
             if self._cancel_event.is_set():
                 return ""
+            if not rate_limiter.acquire("claude", data["model"], api_key, tokens=prompt_tokens, cancel_event=self._cancel_event):
+                return ""
             try:
-                resp = requests.post(url, headers=headers, json=data, timeout=timeout_secs)
+                resp = provider_clients.post(url, headers=headers, json=data, timeout=timeout_secs)
+                if resp.status_code == 429:
+                    rate_limiter.penalize("claude", data["model"], api_key, retry_policy.parse_retry_after(resp.headers, default=2 * (i + 1)))
                 if resp.status_code >= 400:
                     body = (resp.text or "").strip()
                     raise requests.HTTPError(f"{resp.status_code} Client Error: {body or resp.reason}", response=resp)
@@ -6625,6 +7325,9 @@ class OutlineApp:
                             text_parts.append(p["text"])
                     out = "".join(text_parts).strip()
                     if out:
+                        rate_limiter.consume("claude", data["model"], api_key, response_cache.estimate_tokens(out))
+                        if cache_key:
+                            response_cache.store(cache_key, out, "claude", data["model"], tokens=response_cache.request_tokens(system, user_msg) + response_cache.estimate_tokens(out))
                         return out
                 if isinstance(res_json.get("text"), str) and res_json.get("text").strip():
                     return res_json.get("text").strip()
@@ -6641,14 +7344,72 @@ class OutlineApp:
                 raise
 
     def on_parse_outline(self):
-        text = self.output.get("1.0", tk.END).strip()
+        text = self._output_text().strip()
         if not text:
             messagebox.showwarning("提示", "文本框为空，请先粘贴大纲内容")
             return
-        self._sync_chapters_from_text(text, show_message=True)
+        self._cancel_live_outline_refresh()
+        self.parse_btn.config(state=tk.DISABLED)
+        threading.Thread(target=self._run_parse_outline, args=(text,), daemon=True).start()
+
+    def _run_parse_outline(self, text: str):
+        # 切分在后台线程完成（只重新切分改动过的章节），结果回到主线程写入 chapters_data
+        try:
+            result = self.live_outline.update(text)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"解析大纲失败: {e}")
+            self.root.after(0, lambda: self.parse_btn.config(state=tk.NORMAL))
+            self.root.after(0, messagebox.showerror, "解析失败", str(e))
+            return
+        if self.logger:
+            self.logger.info(result.describe())
+        self.root.after(0, self._finish_parse_outline, result)
+
+    def _finish_parse_outline(self, result):
+        self.parse_btn.config(state=tk.NORMAL)
+        self._apply_parsed_chapters(result, show_message=True)
+
+    def _on_output_modified(self, event=None):
+        try:
+            if not self.output.edit_modified():
+                return
+            # 复位标志，下一次改动才会再触发 <<Modified>>
+            self.output.edit_modified(False)
+        except tk.TclError:
+            return
+        self._cancel_live_outline_refresh()
+        self._live_outline_after = self.root.after(live_outline.DEBOUNCE_MS, self._refresh_live_outline)
+
+    def _cancel_live_outline_refresh(self):
+        if self._live_outline_after is not None:
+            try:
+                self.root.after_cancel(self._live_outline_after)
+            except Exception:
+                pass
+            self._live_outline_after = None
+
+    def _refresh_live_outline(self):
+        """输出框停止改动后在后台更新章节索引，点“解析”/润色完成时只需处理剩余的少量改动"""
+        self._live_outline_after = None
+        try:
+            text = self.output.get("1.0", tk.END)
+        except tk.TclError:
+            return
+        threading.Thread(target=self._run_refresh_live_outline, args=(text,), daemon=True).start()
+
+    def _run_refresh_live_outline(self, text: str):
+        try:
+            self.live_outline.update(text)
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"更新章节索引失败: {e}")
 
     def _sync_chapters_from_text(self, text: str, show_message: bool = False):
-        t = (text or "").replace("\r\n", "\n").replace("\r", "\n").strip()
+        self._apply_parsed_chapters(self.live_outline.update(text), show_message=show_message)
+
+    def _apply_parsed_chapters(self, result, show_message: bool = False):
+        t = result.text
         if not t:
             self.chapters_data = []
             self.all_chapter_summaries = []
@@ -6656,26 +7417,7 @@ class OutlineApp:
             return
 
         self.full_outline_context = t
-        chapters = self._parse_chapters_from_outline_text(t)
-        if isinstance(chapters, dict) and chapters:
-            items = [chapters[k] for k in sorted(chapters.keys())]
-        else:
-            items = []
-            matches = list(re.finditer(r"(第\s*(\d+)\s*章\s*(.*?))\s*[:：\n]\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)", t))
-            for m in matches:
-                try:
-                    c_num = int(m.group(2))
-                except Exception:
-                    continue
-                title_only = (m.group(3) or "").strip()
-                full_title_part = (m.group(1) or "").strip()
-                title_clean = re.sub(r"^第\s*\d+\s*章\s*", "", full_title_part).strip()
-                if title_only:
-                    title_clean = title_only
-                summary = (m.group(4) or "").strip() or "无内容"
-                items.append({"chapter": c_num, "title": title_clean, "summary": summary})
-
-        items = [it for it in items if isinstance(it, dict) and it.get("chapter") is not None]
+        items = [it for it in result.items if isinstance(it, dict) and it.get("chapter") is not None]
         items.sort(key=lambda x: int(x.get("chapter")))
         self.chapters_data = items
         self.all_chapter_summaries = [
@@ -6789,9 +7531,9 @@ class OutlineApp:
                     fix_prompt = f"上一次输出的 JSON 格式有误，请修正为合法的 JSON，且严格匹配 schema：\n{json.dumps(schema, ensure_ascii=False)}\n\n原输出：\n{text_out}"
                     try:
                         if provider == "Claude":
-                            fixed = self._call_claude(api_key, model_name, system_text, fix_prompt, temperature=0.1, max_tokens=4096)
+                            fixed = self._call_claude(api_key, model_name, system_text, fix_prompt, temperature=0.1, max_tokens=4096, use_cache=False)
                         else:
-                            fixed = self._call_compat_chat(api_key, model_name, system_text, fix_prompt, temperature=0.1, base_url=base_url)
+                            fixed = self._call_compat_chat(api_key, model_name, system_text, fix_prompt, temperature=0.1, base_url=base_url, use_cache=False)
                     except Exception:
                         fixed = ""
                     json_data = self._parse_json(fixed)
@@ -6799,7 +7541,7 @@ class OutlineApp:
                         return json_data
             return None
 
-        client = genai.Client(api_key=api_key)
+        client = provider_clients.get_genai_client(api_key)
         base_models = [model_name]
         if "gemini" in model_name.lower() and model_name != "gemini-2.5-pro":
             base_models.append("gemini-2.5-pro")
@@ -6877,9 +7619,9 @@ class OutlineApp:
                     fix_prompt = f"上一次输出的 JSON 格式有误，请修正为合法的 JSON，且严格匹配 schema：\n{json.dumps(schema, ensure_ascii=False)}\n\n原输出：\n{text_out}"
                     try:
                         if provider == "Claude":
-                            fixed = self._call_claude(api_key, model_name, system_text, fix_prompt, temperature=0.1, max_tokens=4096)
+                            fixed = self._call_claude(api_key, model_name, system_text, fix_prompt, temperature=0.1, max_tokens=4096, use_cache=False)
                         else:
-                            fixed = self._call_compat_chat(api_key, model_name, system_text, fix_prompt, temperature=0.1, base_url=base_url)
+                            fixed = self._call_compat_chat(api_key, model_name, system_text, fix_prompt, temperature=0.1, base_url=base_url, use_cache=False)
                     except Exception:
                         fixed = ""
                     json_data = self._parse_json(fixed)
@@ -6887,7 +7629,7 @@ class OutlineApp:
                         return json_data
             return None
 
-        client = genai.Client(api_key=api_key)
+        client = provider_clients.get_genai_client(api_key)
         base_models = [model_name]
         if "gemini" in model_name.lower() and model_name != "gemini-2.5-pro":
             base_models.append("gemini-2.5-pro")
@@ -6933,44 +7675,45 @@ class OutlineApp:
         return None
 
     def _apply_updated_chapters_to_outline_text(self, outline_text: str, chapters: dict):
+        """只替换改动的章节（按索引偏移原位拼接），保留原有章节格式、卷标题与其他段落"""
         base = (outline_text or "").replace("\r\n", "\n").replace("\r", "\n")
         if not isinstance(chapters, dict) or not chapters:
             return base.strip()
 
-        ordered_nums = sorted([int(k) for k in chapters.keys() if str(k).isdigit()])
-        if not ordered_nums:
-            return base.strip()
-
-        ordered_items = [chapters[n] for n in ordered_nums if n in chapters]
-        new_block = self._format_from_data(f"章节大纲 第1-{ordered_nums[-1]}章", ordered_items)
-        if not new_block:
-            return base.strip()
-
-        matches = list(re.finditer(r"(?:^|\n)\s*###\s*第\s*(\d+)\s*章[\s\S]*?(?=(?:\n\s*###\s*第\s*\d+\s*章)|\Z)", base))
-        if matches:
-            start = matches[0].start()
-            end = matches[-1].end()
-            return (base[:start].rstrip() + "\n\n" + new_block.strip() + "\n" + base[end:].lstrip()).strip()
-
-        matches2 = list(re.finditer(r"(?:^|\n)\s*第\s*\d+\s*章[\s\S]*?(?=(?:\n\s*第\s*\d+\s*章)|\Z)", base))
-        if matches2:
-            start = matches2[0].start()
-            end = matches2[-1].end()
-            return (base[:start].rstrip() + "\n\n" + new_block.strip() + "\n" + base[end:].lstrip()).strip()
-
-        return (base.strip() + "\n\n" + new_block.strip()).strip()
+        index = self._outline_index_for(base)
+        blocks = {}
+        for k, item in chapters.items():
+            try:
+                n = int(k)
+            except Exception:
+                continue
+            if not isinstance(item, dict):
+                continue
+            entry = index.entry(n)
+            if entry is not None and entry.style != outline_tokenizer.STYLE_MARKDOWN:
+                t = re.sub(r"^第\s*\d+\s*章\s*", "", (item.get("title") or "").strip()).strip()
+                s = (item.get("summary") or "").strip() or "无内容"
+                blocks[n] = f"第{n}章 {t}：{s}"
+            else:
+                blocks[n] = self._format_from_data(f"章节大纲 第{n}-{n}章", [dict(item, chapter=n)])
+        new_text, self._outline_index = index.replace_chapters(base, blocks)
+        return new_text.strip()
 
     def _run_apply_feedback_to_chapters(self, provider, api_key, model_name, novel_type, theme, base_outline: str, feedback: str):
         try:
-            existing = self._parse_chapters_from_outline_text(base_outline) or {}
-            if not isinstance(existing, dict) or not existing:
+            # 只按索引取用到的章节（待改章节及其前后各 12 章），不整份解析
+            index = self._outline_index_for(base_outline)
+            existing = {}
+            if not len(index):
                 existing = {int(it.get("chapter")): it for it in (self.chapters_data or []) if isinstance(it, dict) and it.get("chapter") is not None}
+            changed = {}
 
-            max_ch = 0
-            try:
-                max_ch = max(int(k) for k in existing.keys())
-            except Exception:
-                max_ch = 0
+            max_ch = index.max_chapter()
+            if not max_ch:
+                try:
+                    max_ch = max(int(k) for k in existing.keys())
+                except Exception:
+                    max_ch = 0
 
             targets = self._parse_target_chapters_from_feedback(feedback, max_ch)
             if not targets:
@@ -7019,7 +7762,7 @@ class OutlineApp:
             done = 0
             self.total_sections = total
             self.completed_sections = 0
-            self.root.after(0, lambda: self.progress_var.set(f"进度 {done}/{total}"))
+            self.ui_bus.set(self.progress_var, f"进度 {done}/{total}")
 
             schema = {
                 "type": "ARRAY",
@@ -7043,6 +7786,8 @@ class OutlineApp:
                     break
                 a = min(cur)
                 b = max(cur)
+                need = [k for k in range(max(1, a - 12), b + 13) if k not in existing]
+                existing.update(index.records(base_outline, need, empty_summary="无内容"))
                 ctx = self._build_chapter_range_context(base_outline, existing, a, b)
                 items = []
                 for cn in cur:
@@ -7086,15 +7831,17 @@ class OutlineApp:
                         if not summary:
                             continue
                         existing[cn] = {"chapter": cn, "title": title, "summary": summary}
+                        changed[cn] = existing[cn]
 
                 done = min(total, done + len(cur))
-                self.root.after(0, lambda d=done, t=total: self.progress_var.set(f"进度 {d}/{t}"))
-                self.root.after(0, self._append_text, f"[系统] 已修改章节：{a}-{b}\n")
+                self.ui_bus.set(self.progress_var, f"进度 {done}/{total}")
+                self.ui_bus.append(f"[系统] 已修改章节：{a}-{b}\n")
 
-            new_text = self._apply_updated_chapters_to_outline_text(base_outline, existing)
+            new_text = self._apply_updated_chapters_to_outline_text(base_outline, changed)
             self.full_outline_context = new_text.strip()
-            ordered_nums = sorted([int(k) for k in existing.keys() if str(k).isdigit()])
-            ordered_items = [existing[n] for n in ordered_nums if n in existing]
+            by_ch = {int(it.get("chapter")): it for it in (self.chapters_data or []) if isinstance(it, dict) and it.get("chapter") is not None}
+            by_ch.update(changed)
+            ordered_items = [by_ch[n] for n in sorted(by_ch.keys())]
             self.chapters_data = ordered_items
             self.all_chapter_summaries = [
                 f"第{it.get('chapter')}章：{(it.get('summary') or '').strip()[:50]}..."
@@ -7102,8 +7849,8 @@ class OutlineApp:
                 if isinstance(it, dict)
             ]
 
-            self.root.after(0, lambda: self.output.delete("1.0", tk.END))
-            self.root.after(0, self._append_text, self.full_outline_context + "\n")
+            self.ui_bus.clear()
+            self.ui_bus.append(self.full_outline_context + "\n")
             self.root.after(0, messagebox.showinfo, "完成", "已按修改意见修改对应章节，可直接保存/导出。")
 
         except Exception as e:
@@ -7207,7 +7954,7 @@ class OutlineApp:
                 out.append("\n### 自动生成的修改意见（已填入输入框）\n" + feedback.strip())
             final = "\n\n".join([x for x in out if x]).strip()
             if final:
-                self.root.after(0, self._append_text, final + "\n")
+                self.ui_bus.append(final + "\n")
             self.root.after(0, messagebox.showinfo, "完成", "大纲检查完成，修改意见已自动填充")
 
         except Exception as e:
@@ -7222,7 +7969,7 @@ class OutlineApp:
     def on_polish(self):
         if not self._require_login_and_token():
             return
-        content = self.output.get("1.0", tk.END).strip()
+        content = self._output_text().strip()
         if not content:
             messagebox.showwarning("无内容", "当前没有可润色的内容")
             return
@@ -7254,7 +8001,7 @@ class OutlineApp:
             if self.logger:
                 self.logger.info("开始大纲润色 (Gemini)")
                 
-            client = genai.Client(api_key=api_key)
+            client = provider_clients.get_genai_client(api_key)
             model = "gemini-3-pro-preview" # 指定使用 Gemini 3 Pro Preview
             
             prompt = (
@@ -7283,8 +8030,8 @@ class OutlineApp:
             
             if polished_text:
                 # 更新 UI
-                self.root.after(0, lambda: self.output.delete("1.0", tk.END))
-                self.root.after(0, self._append_text, polished_text)
+                self.ui_bus.clear()
+                self.ui_bus.append(polished_text)
                 
                 # 自动重新解析以更新内部数据结构
                 self.root.after(100, self.on_parse_outline) 
@@ -7307,12 +8054,28 @@ class OutlineApp:
         self._pause_event.clear()
         self.root.after(0, lambda: self.generate_btn.config(state=tk.NORMAL))
         self.root.after(0, lambda: self.regen_btn.config(state=tk.NORMAL))
+        if hasattr(self, "resume_btn"):
+            self.root.after(0, lambda: self.resume_btn.config(state=tk.NORMAL))
         if hasattr(self, "pause_btn"):
             self.root.after(0, lambda: self.pause_btn.config(state=tk.DISABLED, text="暂停"))
-        self.root.after(0, lambda: self.status_var.set("就绪"))
+        self.ui_bus.set(self.status_var, "就绪")
         self.root.after(0, self._update_account_ui)
 
+def _startup_log_dir() -> str:
+    return os.path.join(_app_base_dir(), "logs")
+
+def _finish_startup_profile(root: tk.Tk):
+    startup_profile.mark("login window painted")
+    if not startup_profile.enabled():
+        return
+    path = startup_profile.write_report(_startup_log_dir())
+    if startup_profile.bench_mode():
+        # 供 benchmarks/bench_startup.py 解析；随后立即退出
+        print(f"STARTUP_REPORT {path or ''}", flush=True)
+        root.after(0, root.destroy)
+
 def main():
+    startup_profile.mark("main()")
     if sys.platform.startswith("win"):
         try:
             import ctypes
@@ -7341,14 +8104,17 @@ def main():
         loading.pack(expand=True)
     except Exception:
         pass
+    startup_profile.mark("root window created")
 
     def _boot():
         try:
+            startup_profile.mark("event loop started")
             show_auth_screen(root)
             try:
                 root.update_idletasks()
             except Exception:
                 pass
+            _finish_startup_profile(root)
 
             def _ensure():
                 try:
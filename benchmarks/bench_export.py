@@ -0,0 +1,99 @@
+"""
+导出峰值内存基准：原来的内存拼包（每章 writestr + io.BytesIO）与流式导出（ZIP / EPUB）对比
+
+按给定总字数生成若干章（每章字数固定，用随机汉字避免压缩后体积过小）写入临时章节存储，
+分别导出并用 tracemalloc 记录峰值；内存拼包的峰值随正文总长度线性增长；流式导出只随章节数略增（每章一条中央目录信息），与正文长度无关。
+
+用法（在仓库根目录）：
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --sizes 0.5,2,8 --chapter-chars 6000
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xiaoshuo_core import chapter_store, novel_export  # noqa: E402
+
+
+def make_store(base: str, total_chars: int, chapter_chars: int, seed: int = 7) -> chapter_store.ChapterStore:
+    rng = random.Random(seed)
+    store = chapter_store.ChapterStore.create(base, {"title": "bench"}, "bench")
+    for n in range(1, max(1, total_chars // chapter_chars) + 1):
+        lines = ["".join(chr(rng.randint(0x4E00, 0x4FFF)) for _ in range(80)) for _ in range(chapter_chars // 80)]
+        store.put(n, "\n".join(lines), title=f"标题{n}")
+    return store
+
+
+def measure(fn) -> tuple:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def run(total_chars: int, chapter_chars: int, workdir: str) -> dict:
+    store = make_store(os.path.join(workdir, "s"), total_chars, chapter_chars)
+    nums = store.keys()
+
+    def in_memory():
+        mem = io.BytesIO()
+        with zipfile.ZipFile(mem, "w", zipfile.ZIP_DEFLATED) as zf:
+            for n in nums:
+                zf.writestr(f"章节/{n:03d}.txt", store[n])
+        data = mem.getvalue()
+        with open(os.path.join(workdir, "mem.zip"), "wb") as f:
+            f.write(data)
+        return len(data)
+
+    def stream_zip():
+        entries = [(f"章节/{n:03d}.txt", lambda n=n: store.iter_text(n)) for n in nums]
+        return novel_export.write_file(os.path.join(workdir, "stream.zip"), novel_export.iter_zip(entries))
+
+    def stream_epub():
+        book = [novel_export.EpubChapter(n, f"第{n}章", lambda n=n: store.iter_text(n)) for n in nums]
+        return novel_export.write_file(os.path.join(workdir, "stream.epub"), novel_export.iter_epub("bench", book))
+
+    result = {"chars": total_chars, "chapters": len(nums)}
+    for name, fn in (("in_memory", in_memory), ("stream_zip", stream_zip), ("stream_epub", stream_epub)):
+        size, peak, elapsed = measure(fn)
+        result[name] = {"bytes": size, "peak_kb": round(peak / 1024, 1), "secs": round(elapsed, 3)}
+    store.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出峰值内存基准")
+    parser.add_argument("--sizes", default="0.5,2,8", help="正文总字数（百万字），逗号分隔")
+    parser.add_argument("--chapter-chars", type=int, default=6000, help="每章字数")
+    args = parser.parse_args(argv)
+
+    results = []
+    for s in [float(x) for x in args.sizes.split(",") if x.strip()]:
+        workdir = tempfile.mkdtemp(prefix="bench_export_")
+        try:
+            r = run(int(s * 1_000_000), args.chapter_chars, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results.append(r)
+        print(f"{s} 百万字：内存拼包峰值 {r['in_memory']['peak_kb']} KB，"
+              f"流式 ZIP {r['stream_zip']['peak_kb']} KB，流式 EPUB {r['stream_epub']['peak_kb']} KB")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
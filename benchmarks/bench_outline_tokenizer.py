@@ -0,0 +1,96 @@
+"""
+大纲章节解析基准：旧的多段正则解析 vs xiaoshuo_core.outline_tokenizer
+
+用法（在仓库根目录）：
+    python benchmarks/bench_outline_tokenizer.py
+    python benchmarks/bench_outline_tokenizer.py --file 江州暗涌_20251230_193613_大纲.txt --repeat 20 --scale 1,4,16
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from xiaoshuo_core import outline_tokenizer  # noqa: E402
+
+DEFAULT_FILE = os.path.join(ROOT, "江州暗涌_20251230_193613_大纲.txt")
+
+# 替换前桌面端 _parse_chapters_from_outline_text 使用的三段正则（依次回退）
+_LEGACY_PATTERNS = [
+    r"(?:^|\n)\s*###\s*第\s*(\d+)\s*章\s*(?:[:：]\s*([^\n]*?)\s*)?\n\s*([\s\S]*?)(?=(?:\n\s*###\s*第\s*\d+\s*章)|\s*$)",
+    r"(第\s*(\d+)\s*章\s*(.*?))\s*[:：\n]\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)",
+    r"(第\s*(\d+)\s*章\s*([^\n:：]*?))\s*(?:[:：\n]|-{2,}|—{2,})\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)",
+]
+
+
+def legacy_parse(text: str) -> dict:
+    matches = []
+    for pat in _LEGACY_PATTERNS:
+        matches = list(re.finditer(pat, text))
+        if matches:
+            break
+    chapters = {}
+    for m in matches:
+        g = m.groups()
+        if len(g) == 3:
+            chapters[int(g[0])] = ((g[1] or "").strip(), (g[2] or "").strip())
+        else:
+            chapters[int(g[1])] = ((g[2] or "").strip(), (g[3] or "").strip())
+    return chapters
+
+
+def scaled_text(text: str, factor: int) -> str:
+    """把原文重复 factor 次并顺延章号，模拟更长的大纲"""
+    if factor <= 1:
+        return text
+    top = max(outline_tokenizer.chapters_by_number(text).keys() or [0])
+    parts = []
+    for k in range(factor):
+        offset = top * k
+        parts.append(re.sub(r"第(\s*)(\d+)(\s*)章", lambda m: f"第{m.group(1)}{int(m.group(2)) + offset}{m.group(3)}章", text))
+    return "\n".join(parts)
+
+
+def bench(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="大纲章节解析基准")
+    parser.add_argument("--file", default=DEFAULT_FILE)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--scale", default="1,4,16", help="原文放大倍数，逗号分隔")
+    args = parser.parse_args(argv)
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        base = f.read()
+    print(f"文件: {os.path.basename(args.file)}  {len(base.encode('utf-8')) / 1024:.0f} KB, {len(base)} 字符")
+
+    print(f"{'倍数':>4} {'KB':>8} {'章节':>6} {'旧正则(ms)':>12} {'tokenizer(ms)':>14} {'加速':>7}")
+    for factor in [int(x) for x in args.scale.split(",") if x.strip()]:
+        text = scaled_text(base, factor)
+        legacy_ms = bench(legacy_parse, text, args.repeat) * 1000
+        new_ms = bench(outline_tokenizer.chapters_by_number, text, args.repeat) * 1000
+        count = len(outline_tokenizer.chapters_by_number(text))
+        kb = len(text.encode("utf-8")) / 1024
+        print(f"{factor:>4} {kb:>8.0f} {count:>6} {legacy_ms:>12.1f} {new_ms:>14.1f} {legacy_ms / max(new_ms, 1e-9):>6.1f}x")
+
+    # 两者结果对比（标题不一致的章节数）
+    old = legacy_parse(base)
+    new = outline_tokenizer.chapters_by_number(base)
+    diff = sum(1 for k in old if k in new and old[k][0] != new[k]["title"])
+    print(f"章节数 旧/新: {len(old)}/{len(new)}，标题不一致: {diff}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+桌面端冷启动基准：从启动进程到登录界面画出的耗时
+
+每轮启动一个新进程（源码：python 导入 app 后调用 main()；打包版：直接运行 exe），带 --startup-bench 参数，
+app 在登录界面画出后写启动报告（logs/startup_*.json）、打印报告路径并退出。
+这里记录外部墙钟时间（含解释器启动 / PyInstaller 解包）以及报告里各阶段的时间点。
+
+用法（在仓库根目录，需要图形环境）：
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --exe dist/outline_app/outline_app.exe --repeat 5 --label v1.3.0
+    python benchmarks/bench_startup.py --import-only      # 无图形环境时只测 import app 的耗时
+
+--label 会把本次结果追加到 benchmarks/startup_history.jsonl，便于跨版本对比；
+需要逐模块的导入耗时时可再运行 python -X importtime -c "import app"。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_history.jsonl")
+
+# app.py 作为 __main__ 运行时走的是另一条入口，这里以导入方式调用 main()
+_SOURCE_LAUNCHER = (
+    "import sys; sys.path.insert(0, {root!r}); sys.argv = ['app.py', '--startup-bench']; "
+    "import app; app.main()"
+)
+_IMPORT_ONLY = (
+    "import sys, time; sys.path.insert(0, {root!r}); t0 = time.perf_counter(); import app; "
+    "print('IMPORT_MS %.1f' % ((time.perf_counter() - t0) * 1000)); "
+    "print('HEAVY ' + ','.join(m for m in ('google.genai', 'requests', 'pymysql') if m in sys.modules))"
+)
+
+
+def run_once(exe: str, import_only: bool, timeout: float) -> dict:
+    if exe:
+        cmd = [exe, "--startup-bench"]
+    elif import_only:
+        cmd = [sys.executable, "-c", _IMPORT_ONLY.format(root=ROOT)]
+    else:
+        cmd = [sys.executable, "-c", _SOURCE_LAUNCHER.format(root=ROOT)]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, encoding="utf-8", errors="replace",
+                          timeout=timeout)
+    wall_ms = (time.perf_counter() - t0) * 1000
+    out = {"wall_ms": wall_ms, "returncode": proc.returncode}
+    for line in (proc.stdout or "").splitlines():
+        if line.startswith("STARTUP_REPORT "):
+            path = line[len("STARTUP_REPORT "):].strip()
+            if path and os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    out["report"] = json.load(f)
+        elif line.startswith("IMPORT_MS "):
+            out["import_ms"] = float(line.split()[1])
+        elif line.startswith("HEAVY"):
+            out["heavy"] = line[len("HEAVY"):].strip()
+    if proc.returncode != 0 and not out.get("report") and "import_ms" not in out:
+        out["error"] = (proc.stderr or "").strip().splitlines()[-1:] or ["exit %d" % proc.returncode]
+    return out
+
+
+def phase_ms(report: dict, name: str):
+    for p in (report or {}).get("phases") or []:
+        if p.get("name") == name:
+            return p.get("at_ms")
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="桌面端冷启动基准")
+    parser.add_argument("--exe", default="", help="打包后的可执行文件；缺省时以源码方式启动")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--import-only", action="store_true", help="只测 import app（不需要图形环境）")
+    parser.add_argument("--label", default="", help="版本标签；给出时把结果追加到 startup_history.jsonl")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for i in range(max(1, args.repeat)):
+        r = run_once(args.exe, args.import_only, args.timeout)
+        if r.get("error"):
+            print(f"第 {i + 1} 轮失败：{r['error'][0]}")
+            continue
+        runs.append(r)
+        if args.import_only:
+            print(f"第 {i + 1} 轮：进程 {r['wall_ms']:.0f} ms，import app {r.get('import_ms', 0):.0f} ms，"
+                  f"已加载重模块：{r.get('heavy') or '无'}")
+        else:
+            login = phase_ms(r.get("report"), "login window painted")
+            print(f"第 {i + 1} 轮：进程 {r['wall_ms']:.0f} ms，进程内到登录界面 {login if login is not None else '-'} ms")
+    if not runs:
+        return 1
+
+    walls = [r["wall_ms"] for r in runs]
+    summary = {
+        "label": args.label,
+        "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "mode": "exe" if args.exe else ("import" if args.import_only else "source"),
+        "runs": len(runs),
+        "wall_ms_median": round(statistics.median(walls), 1),
+        "wall_ms_min": round(min(walls), 1),
+    }
+    if args.import_only:
+        summary["import_ms_median"] = round(statistics.median(r.get("import_ms", 0) for r in runs), 1)
+    else:
+        logins = [phase_ms(r.get("report"), "login window painted") for r in runs]
+        logins = [v for v in logins if v is not None]
+        if logins:
+            summary["login_ms_median"] = round(statistics.median(logins), 1)
+        last = runs[-1].get("report") or {}
+        summary["phases"] = {p["name"]: p["at_ms"] for p in last.get("phases") or []}
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    if args.label:
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        print(f"已追加到 {HISTORY_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
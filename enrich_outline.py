@@ -6,6 +6,8 @@ import sys
 from google import genai
 from google.genai import types
 
+from xiaoshuo_core import outline_tokenizer
+
 # Configuration
 FILE_PATH = r"c:\Users\Administrator\Downloads\xiaoshuo\官场逆袭_20251229_105229_大纲.txt"
 MODEL_NAME = "gemini-3-pro-preview"
@@ -46,17 +48,8 @@ def write_file(path, content):
         f.write(content)
 
 def get_chapters_matches(text):
-    # Regex to capture:
-    # Group 1: Full Title Line (e.g. 第1章 标题)
-    # Group 2: Chapter Number
-    # Group 3: Title Only
-    # Group 4: Content
-    # Lookahead: Stop at next "第X章" OR "第X卷" OR End of String
-    
-    pattern = re.compile(
-        r"(第\s*(\d+)\s*章\s*(.*?))\s*[:：\n]\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|(?:\n\s*第\s*[一二三四五六七八九十0-9]+\s*卷)|$)"
-    )
-    return list(pattern.finditer(text))
+    # 章节与卷标题的切分统一交给 outline_tokenizer（单次扫描，正文止于下一个章节或卷标题）
+    return outline_tokenizer.tokenize(text).chapters
 
 def enrich_batch(client, front_matter_context, batch_items):
     # batch_items is list of dict: {num, title, content}
@@ -156,7 +149,7 @@ def main():
     print(f"Found {len(matches)} chapters.")
     
     # Extract Front Matter (everything before first chapter)
-    first_match_start = matches[0].start()
+    first_match_start = matches[0].start
     front_matter = text[:first_match_start]
     
     client = genai.Client(api_key=api_key)
@@ -172,18 +165,21 @@ def main():
     chapter_indices = [] # store indices in segments list that are chapters
     
     for m in matches:
-        start, end = m.span()
+        start, end = m.start, m.end
         # Text before this chapter
         if start > last_pos:
             segments.append({"type": "static", "content": text[last_pos:start]})
             
         # The chapter itself (placeholder for now)
+        rec = m.chapter_record()
+        original = m.raw
         segments.append({
             "type": "chapter", 
-            "original_content": m.group(0),
-            "num": int(m.group(2)),
-            "title": m.group(3).strip(),
-            "summary": m.group(4).strip()
+            "original_content": original,
+            "trailing": original[len(original.rstrip()):],
+            "num": rec["chapter"],
+            "title": rec["title"],
+            "summary": rec["summary"]
         })
         chapter_indices.append(len(segments) - 1)
         
@@ -228,7 +224,7 @@ def main():
                     # Ensure Title doesn't have "第X章" prefix
                     new_title = re.sub(r"^第\d+章\s*", "", new_title).strip()
                     
-                    new_content = f"第{c_num}章 {new_title}：{new_summary}"
+                    new_content = f"第{c_num}章 {new_title}：{new_summary}" + seg["trailing"]
                     segments[idx]["new_content"] = new_content
                 else:
                     print(f"Warning: Chapter {c_num} missing in response, keeping original.")
@@ -1,6 +1,8 @@
 import re
 import os
 
+from xiaoshuo_core import outline_tokenizer
+
 FILE_PATH = r"c:\Users\Administrator\Downloads\xiaoshuo\《扫黑：权路锋刃》.txt"
 
 def read_file(path):
@@ -12,67 +14,32 @@ def write_file(path, content):
         f.write(content)
 
 def parse_chapters(text):
-    # Split by lines
-    lines = text.splitlines()
-    
-    front_matter = []
-    chapters = []
-    
-    current_chap = None
-    
-    # Regex for chapter header: 第123章 Title: Content...
-    # Or just 第123章 Title
-    chap_re = re.compile(r"^第\s*(\d+)\s*章\s*(.*)")
-    
-    # Regex for Volume header: 第X卷... (We want to preserve these but maybe regenerate them)
-    # Actually, we can just treat Volume headers as part of the previous chapter's content 
-    # OR better: separate them.
-    # But swapping volumes means we need to move the volume headers too?
-    # The user request specifically mentioned logic issues.
-    # Let's extract chapters purely. Volume headers usually appear before a block of chapters.
-    
-    # Strategy:
-    # 1. Capture front matter (everything before Ch 1).
-    # 2. Capture each chapter.
-    # 3. If a line looks like a Volume Header, store it as a special "marker" in the chapter list?
-    #    No, Volume headers are distinct.
-    
-    # Let's use a list of segments.
-    # Segment = {type: "front"|"chapter"|"volume_header", content: str, num: int (if chapter)}
-    
+    # Segment = {type: "front"|"chapter"|"volume", content: [lines], num/title_line (chapter only)}
+    # Chapter / volume headers come from the shared single-pass tokenizer; everything up to the
+    # next chapter or volume header stays in the segment so the text round-trips unchanged.
+    heads = [t for t in outline_tokenizer.tokenize(text).tokens if t.kind != outline_tokenizer.KIND_HEADING]
+
     segments = []
-    current_segment = {"type": "front", "content": []}
-    
-    for line in lines:
-        match = chap_re.match(line)
-        if match:
-            # Save current segment
-            segments.append(current_segment)
-            
-            # Start new chapter segment
-            c_num = int(match.group(1))
-            title_part = match.group(2)
-            current_segment = {
+    first = heads[0].start if heads else len(text)
+    segments.append({"type": "front", "content": text[:first].splitlines()})
+
+    for i, tok in enumerate(heads):
+        seg_end = heads[i + 1].start if i + 1 < len(heads) else len(text)
+        header_line = text[tok.start:tok.header_end].rstrip("\r\n")
+        body_lines = text[tok.header_end:seg_end].splitlines()
+        if tok.kind == outline_tokenizer.KIND_CHAPTER:
+            segments.append({
                 "type": "chapter",
-                "num": c_num,
-                "title_line": line, # We might reconstruct this
-                "content": []
-            }
+                "num": tok.number,
+                "title_line": header_line,
+                "content": body_lines
+            })
         else:
-            # Check for volume header
-            if re.match(r"^第[一二三四五六七八九十]+卷", line):
-                # Save current
-                segments.append(current_segment)
-                # Start volume segment
-                current_segment = {
-                    "type": "volume",
-                    "content": [line]
-                }
-            else:
-                current_segment["content"].append(line)
-                
-    segments.append(current_segment)
-    
+            segments.append({
+                "type": "volume",
+                "content": [header_line] + body_lines
+            })
+
     # Clean up empty segments
     segments = [s for s in segments if s["content"] or s.get("title_line")]
     
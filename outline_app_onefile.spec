@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('config.json', '.'), ('使用说明.txt', '.')],
-    hiddenimports=[],
+    # app.py 与 xiaoshuo_core 通过 lazy_import 延迟导入，静态分析看不到，需显式列出
+    hiddenimports=['google.genai', 'google.genai.types', 'requests', 'requests.adapters', 'zipfile', 'pymysql'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,3 @@
+"""
+FastAPI 版网页端（在项目根目录运行：python -m web.main）
+"""
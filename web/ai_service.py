@@ -1,21 +1,26 @@
 import os
 import json
 import re
-import time
 import logging
 import requests
-from google import genai
 from google.genai import types
 
+from xiaoshuo_core import async_providers, chapter_context, provider_clients, rate_limiter
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ai_service")
 
+# 项目根目录的 config.json（与桌面端共用），不依赖启动时的工作目录
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.json")
+
 class AIService:
-    def __init__(self, config_path="../config.json"):
+    def __init__(self, config_path=DEFAULT_CONFIG_PATH):
         self.config = self._load_config(config_path)
         self.gemini_key = self.config.get("api_key")
         self.gemini_model = self.config.get("model", "gemini-3-pro-preview")
+        rate_limiter.configure(self.config)
+        provider_clients.set_gemini_base_url(self.config.get("gemini_base_url") or os.environ.get("GEMINI_BASE_URL", ""))
 
     def _load_config(self, path):
         try:
@@ -52,11 +57,10 @@ class AIService:
             "世界观与角色设定需贴近现实逻辑，避免科幻或玄幻成分。"
         )
 
-    def _call_gemini(self, system, user_msg, temperature=0.7):
+    async def _acall_gemini(self, system, user_msg, temperature=0.7):
         if not self.gemini_key:
             raise ValueError("Gemini API Key not configured")
-            
-        client = genai.Client(api_key=self.gemini_key)
+
         config = types.GenerateContentConfig(
             system_instruction=system,
             temperature=temperature,
@@ -64,21 +68,18 @@ class AIService:
             top_p=0.95,
         )
         contents = [types.Content(role="user", parts=[types.Part.from_text(text=user_msg)])]
-        
-        # 简单重试逻辑
+
+        # 与桌面端一致的重试/切换模型语义，由异步引擎负责
         models = [self.gemini_model, "gemini-2.5-pro"]
-        last_err = None
-        for m in models:
-            try:
-                resp = client.models.generate_content(model=m, contents=contents, config=config)
-                return resp.text
-            except Exception as e:
-                last_err = e
-                time.sleep(2)
-        raise last_err
+        text = await async_providers.get_engine().gemini_generate(self.gemini_key, models, contents, config)
+        if not text:
+            raise RuntimeError("Gemini 调用失败：所有模型均未返回内容")
+        return text
 
-    def generate_outline(self, provider, novel_type, theme, chapters):
-        """生成大纲的简化版接口，直接返回文本"""
+    def _call_gemini(self, system, user_msg, temperature=0.7):
+        return async_providers.run_sync(self._acall_gemini(system, user_msg, temperature=temperature))
+
+    def _outline_prompt(self, novel_type, theme, chapters):
         base_prompt = (
             f"请生成一份完整的《{novel_type}》小说大纲。\n"
             f"主题：{theme}\n"
@@ -88,11 +89,12 @@ class AIService:
         )
         
         system = self.build_system_instruction() + "\n" + self.build_constraints(novel_type, theme)
-        return self._call_gemini(system, base_prompt)
+        return base_prompt, system
 
-    def generate_chapter(self, provider, novel_type, theme, outline_context, chapter_num, chapter_title, chapter_summary, prev_content=""):
-        """生成单章正文"""
-        
+    def _chapter_prompt(self, novel_type, theme, outline_context, chapter_num, chapter_title, chapter_summary, prev_content=""):
+        # 按章挑选设定集、本卷规划、相邻章节梗概与相关伏笔，代替原来的 outline_context[:20000] 截断
+        budget = chapter_context.configured_budget(self.config, os.environ.get("NOVEL_CONTEXT_BUDGET_TOKENS"))
+        ctx = chapter_context.for_outline(outline_context or "", budget_tokens=budget).build(chapter_num)
         prev_context_prompt = ""
         if prev_content:
             prev_segment = prev_content[-2000:]
@@ -109,7 +111,7 @@ class AIService:
             f"章节标题：{chapter_title}\n"
             f"本章梗概：{chapter_summary}\n\n"
             f"{prev_context_prompt}"
-            f"【小说完整大纲与设定】\n{outline_context[:20000]}\n\n" # 截断以防过长
+            f"【小说完整大纲与设定】\n{ctx.text}\n\n"
             f"要求：\n"
             f"1. 字数要求：2000字以上。\n"
             f"2. 剧情紧凑，场景描写生动，人物对话符合性格。\n"
@@ -118,5 +120,25 @@ class AIService:
         )
 
         system = "你是一位专业网文作家。"
+        return prompt, system
+
+    def generate_outline(self, provider, novel_type, theme, chapters):
+        """生成大纲的简化版接口，直接返回文本"""
+        prompt, system = self._outline_prompt(novel_type, theme, chapters)
+        return self._call_gemini(system, prompt)
+
+    async def agenerate_outline(self, provider, novel_type, theme, chapters):
+        """generate_outline 的异步版本，可在同一事件循环中并发等待"""
+        prompt, system = self._outline_prompt(novel_type, theme, chapters)
+        return await self._acall_gemini(system, prompt)
+
+    def generate_chapter(self, provider, novel_type, theme, outline_context, chapter_num, chapter_title, chapter_summary, prev_content=""):
+        """生成单章正文"""
+        prompt, system = self._chapter_prompt(novel_type, theme, outline_context, chapter_num, chapter_title, chapter_summary, prev_content)
         return self._call_gemini(system, prompt, temperature=0.8)
 
+    async def agenerate_chapter(self, provider, novel_type, theme, outline_context, chapter_num, chapter_title, chapter_summary, prev_content=""):
+        """generate_chapter 的异步版本"""
+        prompt, system = self._chapter_prompt(novel_type, theme, outline_context, chapter_num, chapter_title, chapter_summary, prev_content)
+        return await self._acall_gemini(system, prompt, temperature=0.8)
+
@@ -1,5 +1,4 @@
 import os
-import re
 from datetime import datetime
 from typing import Optional, List
 from fastapi import FastAPI, Request, Depends, HTTPException, Form, BackgroundTasks
@@ -11,11 +10,14 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from pydantic import BaseModel
 
-from ai_service import AIService
+from web.ai_service import AIService
+from xiaoshuo_core import outline_tokenizer
 
 # --- Configuration ---
-DATABASE_URL = "sqlite:///./novel_web.db"
-templates = Jinja2Templates(directory="templates")
+# 作为 web 包运行（在项目根目录执行 python -m web.main 或 uvicorn web.main:app），路径都以本目录为准
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'novel_web.db')}"
+templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 ai_service = AIService()
 
 # --- Database Setup ---
@@ -59,7 +61,7 @@ Base.metadata.create_all(bind=engine)
 
 # --- FastAPI App ---
 app = FastAPI(title="AI Novel Web")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static")
 
 # --- Dependencies ---
 def get_db():
@@ -72,20 +74,13 @@ def get_db():
 # --- Helper Functions ---
 def parse_chapters_from_outline(outline_text: str):
     """从大纲文本中解析章节列表"""
-    matches = list(re.finditer(r"(第\s*(\d+)\s*章\s*(.*?))\s*[:：\n]\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)", outline_text))
-    chapters = []
-    for m in matches:
-        try:
-            c_num = int(m.group(2))
-            title = m.group(3).strip()
-            summary = m.group(4).strip()[:500] # 限制长度
-            chapters.append({"num": c_num, "title": title, "summary": summary})
-        except:
-            continue
-    return chapters
-
-def generate_chapter_task(chapter_id: int, provider: str):
-    """后台任务：异步生成章节内容"""
+    return [
+        {"num": it["chapter"], "title": it["title"], "summary": it["summary"][:500]}  # 限制长度
+        for it in outline_tokenizer.parse_chapters(outline_text)
+    ]
+
+async def generate_chapter_task(chapter_id: int, provider: str):
+    """后台任务：异步生成章节内容（在事件循环内等待模型，不占用线程池）"""
     db = SessionLocal()
     try:
         chapter = db.query(Chapter).filter(Chapter.id == chapter_id).first()
@@ -102,7 +97,7 @@ def generate_chapter_task(chapter_id: int, provider: str):
         prev_content = prev_chap.content if prev_chap else ""
         
         try:
-            content = ai_service.generate_chapter(
+            content = await ai_service.agenerate_chapter(
                 provider, 
                 novel.novel_type, 
                 novel.theme, 
@@ -13,9 +13,10 @@ import queue
 import secrets
 import hashlib
 from typing import Optional, Dict, List, Tuple, Any, Callable
-from google import genai
 from google.genai import types
 
+from xiaoshuo_core import async_providers, chapter_context, config_service, context_store, outline_tokenizer, provider_clients, rate_limiter, response_cache
+
 # ==========================================================================
 # 常量定义
 # ==========================================================================
@@ -217,10 +218,10 @@ def build_system_instruction():
         "4) 世界观与设定（时代、地域、权力结构、资源）\n"
         "5) 爽点清单（10条以上，明确冲突与反转）\n"
         "6) 三幕结构梗概（每幕5-8个关键节点）\n"
-        "7) 章节大纲（至少24章；每章输出一个章节块：### 第N章：标题；并严格包含三行：**内容**：... **【悬疑点】**：... **【爽点】**：...；爽点允许为"暂无"）\n"
+        "7) 章节大纲（至少24章；每章输出一个章节块：### 第N章：标题；并严格包含三行：**内容**：... **【悬疑点】**：... **【爽点】**：...；爽点允许为“暂无”）\n"
         "8) 可扩展支线与后续走向\n"
         "风格：节奏快、冲突密集、反转频繁、爽点直给。\n"
-        "重要提示：章节标题中请勿包含"第X章"前缀，仅输出纯标题，例如"风起云涌"而不是"第1章 风起云涌"。"
+        "重要提示：章节标题中请勿包含“第X章”前缀，仅输出纯标题，例如“风起云涌”而不是“第1章 风起云涌”。"
     )
 
 def build_constraints(novel_type: str, theme: str, channel: str = None) -> str:
@@ -281,6 +282,12 @@ class AdvancedNovelGenerator:
         self.logger = logging.getLogger("advanced_novel_gen")
         self.cancel_event = threading.Event()
         self.pause_event = threading.Event()
+        rate_limiter.configure(self.config)
+        provider_clients.set_gemini_base_url(self.config.get("gemini_base_url") or os.environ.get("GEMINI_BASE_URL", ""))
+        try:
+            response_cache.configure(self.config, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        except Exception as e:
+            self.logger.warning(f"响应缓存初始化失败: {e}")
 
     # ==================== 文本处理工具方法 ====================
 
@@ -369,7 +376,6 @@ class AdvancedNovelGenerator:
         if not api_key:
             raise ValueError("Gemini API key not configured")
 
-        client = genai.Client(api_key=api_key)
         model = model_name or DEFAULT_GEMINI_MODEL
 
         # 构建配置
@@ -407,21 +413,17 @@ class AdvancedNovelGenerator:
         if "gemini-2.0-flash" not in models_to_try:
             models_to_try.append("gemini-2.0-flash")
 
-        for m in models_to_try:
-            try:
-                resp = client.models.generate_content(
-                    model=m,
-                    contents=contents,
-                    config=config
-                )
-                text = self._extract_gemini_text(resp)
-                if text:
-                    return text
-            except Exception as e:
-                self.logger.warning(f"Gemini model {m} failed: {e}")
-                continue
-
-        return ""
+        # 交给共享的异步引擎执行：与桌面端同一套限流等待/空响应退避/切换模型/缓存规则；
+        # stop() 置位 cancel_event 后，在途请求、空响应重试与退避等待都会立即结束
+        try:
+            return async_providers.run_sync(
+                async_providers.get_engine().gemini_generate(
+                    api_key, models_to_try, contents, config, cancel_event=self.cancel_event, use_cache=True
+                ),
+                cancel_event=self.cancel_event,
+            )
+        except async_providers.ProviderCancelled:
+            return ""
 
     def _extract_gemini_text(self, resp) -> str:
         """从Gemini响应中提取文本"""
@@ -517,7 +519,8 @@ class AdvancedNovelGenerator:
             sections = self._build_sections(novel_type, theme, chapters, provider)
             total_sections = len(sections)
 
-            accumulated_text = ""
+            # 分片段存储已生成内容，每段只取按预算挑选的上下文，避免全文拼接后再截尾
+            store = context_store.ContextStore(budget_chars=15000, numbered=False)
             all_chapters_data = []
 
             for i, (section_title, section_prompt, section_schema) in enumerate(sections):
@@ -539,22 +542,23 @@ class AdvancedNovelGenerator:
                     section_prompt=section_prompt,
                     section_schema=section_schema,
                     system_instruction=system_inst,
-                    accumulated_context=accumulated_text,
+                    accumulated_context=store.build(section_title),
                     provider=provider,
                     model_name=model_name
                 )
 
-                accumulated_text += f"\n\n### {section_title}\n{section_text}"
-
                 # 如果是章节大纲，解析章节数据
+                section_chapters = []
                 if "章节大纲" in section_title and section_schema:
                     chapters_list = self._parse_json(section_text)
                     if chapters_list:
-                        all_chapters_data.extend(self._ensure_list(chapters_list))
+                        section_chapters = self._ensure_list(chapters_list)
+                        all_chapters_data.extend(section_chapters)
+                store.put_section(i, section_title, section_text, section_chapters)
 
             if not self.cancel_event.is_set():
                 result["success"] = True
-                result["outline_text"] = accumulated_text
+                result["outline_text"] = store.render()
                 result["chapters_data"] = all_chapters_data
 
                 if progress_callback:
@@ -585,8 +589,8 @@ class AdvancedNovelGenerator:
             "2. 细化对人设、世界观、冲突节奏的具体要求。\n"
             "3. 强调输出风格（如节奏快、反转多、情绪拉扯强）。\n"
             "4. 输出一段完整的、指令性强的 System Instruction，用于指导AI生成大纲。\n"
-            "5. 【重点】针对长篇结构，请设计"螺旋式上升"的剧情结构，避免重复套路。\n"
-            "6. 章节标题生成时，请只输出标题文字，不要包含"第X章"字样。\n"
+            "5. 【重点】针对长篇结构，请设计“螺旋式上升”的剧情结构，避免重复套路。\n"
+            "6. 章节标题生成时，请只输出标题文字，不要包含“第X章”字样。\n"
             "7. 不要包含任何解释性文字，直接输出优化后的 Instruction 内容。"
         )
 
@@ -616,7 +620,7 @@ class AdvancedNovelGenerator:
         # 第1部分：作品基础信息
         sections.append((
             "作品基础信息",
-            f"请为类型"{novel_type}"、主题"{theme}"的小说，输出：作品名、类型标签、一句话简介。",
+            f"请为类型“{novel_type}”、主题“{theme}”的小说，输出：作品名、类型标签、一句话简介。",
             None
         ))
 
@@ -630,7 +634,7 @@ class AdvancedNovelGenerator:
         # 第3部分：世界观设定
         sections.append((
             "世界观与设定",
-            f"请构建符合"{novel_type}"的世界观：时代背景、地域、权力结构、资源分配、核心规则。",
+            f"请构建符合“{novel_type}”的世界观：时代背景、地域、权力结构、资源分配、核心规则。",
             None
         ))
 
@@ -673,8 +677,8 @@ class AdvancedNovelGenerator:
             batch_prompt = (
                 f"请生成第{start_ch}章到第{end_ch}章的章节大纲。\n"
                 f"要求：\n"
-                f"1. 每章包含：chapter（章节号）、title（纯标题，不含"第X章"）、summary（梗概）\n"
-                f"2. summary格式必须为：**内容**：... **【悬疑点】**：... **【爽点】**：...（爽点可为"暂无"）\n"
+                f"1. 每章包含：chapter（章节号）、title（纯标题，不含“第X章”）、summary（梗概）\n"
+                f"2. summary格式必须为：**内容**：... **【悬疑点】**：... **【爽点】**：...（爽点可为“暂无”）\n"
                 f"3. 章节需承接前文，推进主线，设置悬念。\n"
                 f"4. 输出JSON数组格式。"
             )
@@ -761,6 +765,12 @@ class AdvancedNovelGenerator:
         chap_title = chapter_info.get('title')
         chap_summary = chapter_info.get('summary')
 
+        # 按章挑选设定集、本卷规划、相邻章节梗概与相关伏笔（原先是 full_outline[:5000] 截断）
+        budget = chapter_context.configured_budget(self.config, os.environ.get("NOVEL_CONTEXT_BUDGET_TOKENS"))
+        outline_context = chapter_context.for_outline(full_outline, budget_tokens=budget)
+        ctx = outline_context.build(chap_num)
+        self.logger.info(f"第{chap_num}章大纲上下文约 {ctx.tokens} tokens（完整大纲 {ctx.full_tokens}）；{outline_context.format_stats()}")
+
         prev_context_prompt = ""
         if prev_content:
             prev_text_segment = prev_content[-2000:]
@@ -780,12 +790,12 @@ class AdvancedNovelGenerator:
             f"【小说完整大纲与设定】\n"
             f"小说类型：{novel_type}\n"
             f"主题：{theme}\n"
-            f"完整大纲参考：\n{full_outline[:5000]}\n\n"
+            f"大纲参考：\n{ctx.text}\n\n"
             f"要求：\n"
             f"1. 字数要求：2000字以上。\n"
             f"2. 剧情紧凑，场景描写生动，人物对话符合性格。\n"
             f"3. 严格贴合本章梗概，承接上文（如果有），铺垫下文。\n"
-            f"4. 输出纯正文内容，不要包含"第X章"标题，直接开始正文描写。"
+            f"4. 输出纯正文内容，不要包含“第X章”标题，直接开始正文描写。"
         )
 
         if provider == "Gemini":
@@ -858,51 +868,7 @@ class AdvancedNovelGenerator:
         Returns:
             章节列表 [{chapter, title, summary}, ...]
         """
-        # 尝试多种格式匹配
-        matches = list(
-            re.finditer(
-                r"(?:^|\n)\s*###\s*第\s*(\d+)\s*章\s*(?:[:：]\s*([^\n]*?)\s*)?\n\s*([\s\S]*?)(?=(?:\n\s*###\s*第\s*\d+\s*章)|\s*$)",
-                outline_text,
-            )
-        )
-
-        if not matches:
-            matches = list(
-                re.finditer(
-                    r"(第\s*(\d+)\s*章\s*(.*?))\s*[:：\n]\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)",
-                    outline_text,
-                )
-            )
-
-        chapters = {}
-        for m in matches:
-            groups = m.groups()
-            if len(groups) == 3:
-                try:
-                    c_num = int(m.group(1))
-                except:
-                    continue
-                title_clean = (m.group(2) or "").strip()
-                summary = (m.group(3) or "").strip()
-            else:
-                try:
-                    c_num = int(m.group(2))
-                except:
-                    continue
-                title_only = (m.group(3) or "").strip()
-                title_clean = title_only
-                summary = (m.group(4) or "").strip()
-
-            if not summary:
-                summary = "无内容"
-
-            chapters[c_num] = {
-                "chapter": c_num,
-                "title": title_clean,
-                "summary": summary,
-            }
-
-        return [chapters[k] for k in sorted(chapters.keys())]
+        return outline_tokenizer.parse_chapters(outline_text or "", empty_summary="无内容")
 
     # ==================== 控制方法 ====================
 
@@ -944,11 +910,4 @@ def load_config_from_file(config_path: str = None) -> Dict:
     if not config_path:
         config_path = os.path.join(os.path.dirname(__file__), "..", "config.json")
 
-    if os.path.exists(config_path):
-        try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            pass
-
-    return {}
+    return config_service.load(config_path)
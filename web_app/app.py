@@ -1,6 +1,4 @@
 import os
-import re
-import json
 import threading
 from datetime import datetime
 from urllib.parse import quote_plus
@@ -12,18 +10,14 @@ from sqlalchemy.exc import IntegrityError
 from .extensions import db, login_manager
 from .models import User, Novel, Chapter
 from .services import NovelGenerator
+from xiaoshuo_core import config_service, outline_tokenizer
 
 def _project_root():
     return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 def _load_root_config():
-    cfg_path = os.path.join(_project_root(), "config.json")
-    try:
-        with open(cfg_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
+    # 进程内缓存，按 mtime 失效；返回值只读
+    return config_service.load(os.path.join(_project_root(), "config.json"))
 
 def _build_mysql_uri(cfg):
     host = (cfg.get("host") or os.environ.get("MYSQL_HOST") or "").strip()
@@ -194,13 +188,9 @@ def create_app():
         
         # Try to load from ../config.json if not in env
         if not api_key:
-            try:
-                with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json'), 'r') as f:
-                    cfg = json.load(f)
-                    api_key = cfg.get('gemini_api_key') or cfg.get('api_key')
-                    provider = "Gemini"
-            except:
-                pass
+            cfg = _load_root_config()
+            api_key = cfg.get('gemini_api_key') or cfg.get('api_key')
+            provider = "Gemini"
         
         if not api_key:
              return jsonify({"error": "系统未配置API Key"}), 500
@@ -278,26 +268,7 @@ def create_app():
         return render_template('recharge.html')
 
     def _parse_outline_text(text):
-        items = []
-        pattern_cn = re.finditer(r"(第\s*(\d+)\s*章\s*(.*?))\s*[:：\n]\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)", text)
-        for m in pattern_cn:
-            full_title_part = m.group(1).strip()
-            chap_num = int(m.group(2))
-            title_only = (m.group(3) or "").strip()
-            content_part = (m.group(4) or "").strip()
-            title_clean = re.sub(r"^第\d+章\s*", "", full_title_part).strip()
-            if title_only:
-                title_clean = title_only
-            items.append({"chapter": chap_num, "title": title_clean, "summary": content_part})
-        if not items:
-            pattern_ch = re.finditer(r"(?:Ch(?:apter)?\.?\s*)(\d+)\s*([^\n:：]*?)\s*[:：]\s*([\s\S]*?)(?=(?:\n\s*(?:Ch(?:apter)?\.?\s*\d+|第\s*\d+\s*章))|$)", text, re.IGNORECASE)
-            for m in pattern_ch:
-                chap_num = int(m.group(1))
-                title_only = (m.group(2) or "").strip()
-                content_part = (m.group(3) or "").strip()
-                items.append({"chapter": chap_num, "title": title_only, "summary": content_part})
-        items.sort(key=lambda x: x["chapter"])
-        return items
+        return outline_tokenizer.parse_chapters(text)
 
     def _parse_and_save_chapters(novel, text):
         items = _parse_outline_text(text)
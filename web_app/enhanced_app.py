@@ -5,16 +5,14 @@
 
 import os
 import re
-import json
 import threading
-import zipfile
-import io
 import time
 from datetime import datetime
-from urllib.parse import quote_plus
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session
+from urllib.parse import quote, quote_plus
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, login_required, logout_user, current_user
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 
 from .extensions import db, login_manager
@@ -27,6 +25,7 @@ from .advanced_services import (
     load_config_from_file,
     THEME_SUGGESTIONS
 )
+from xiaoshuo_core import config_service, novel_export, outline_tokenizer
 
 # ==========================================================================
 # 全局变量
@@ -46,13 +45,8 @@ def _project_root():
 
 def _load_root_config():
     """加载根目录的配置文件"""
-    cfg_path = os.path.join(_project_root(), "config.json")
-    try:
-        with open(cfg_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
+    # 进程内缓存，按 mtime 失效；返回值只读
+    return config_service.load(os.path.join(_project_root(), "config.json"))
 
 def _build_mysql_uri(cfg):
     """构建 MySQL 连接URI"""
@@ -70,43 +64,7 @@ def _build_mysql_uri(cfg):
 
 def _parse_outline_text(text):
     """从文本中解析章节信息"""
-    items = []
-    pattern_cn = re.finditer(
-        r"(第\s*(\d+)\s*章\s*(.*?))\s*[:：\n]\s*([\s\S]*?)(?=(?:\n\s*第\s*\d+\s*章)|$)",
-        text
-    )
-    for m in pattern_cn:
-        full_title_part = m.group(1).strip()
-        chap_num = int(m.group(2))
-        title_only = (m.group(3) or "").strip()
-        content_part = (m.group(4) or "").strip()
-        title_clean = re.sub(r"^第\d+章\s*", "", full_title_part).strip()
-        if title_only:
-            title_clean = title_only
-        items.append({
-            "chapter": chap_num,
-            "title": title_clean,
-            "summary": content_part
-        })
-
-    if not items:
-        pattern_ch = re.finditer(
-            r"(?:Ch(?:apter)?\.?\s*)(\d+)\s*([^\n:：]*?)\s*[:：]\s*([\s\S]*?)(?=(?:\n\s*(?:Ch(?:apter)?\.?\s*\d+|第\s*\d+\s*章))|$)",
-            text,
-            re.IGNORECASE
-        )
-        for m in pattern_ch:
-            chap_num = int(m.group(1))
-            title_only = (m.group(2) or "").strip()
-            content_part = (m.group(3) or "").strip()
-            items.append({
-                "chapter": chap_num,
-                "title": title_only,
-                "summary": content_part
-            })
-
-    items.sort(key=lambda x: x["chapter"])
-    return items
+    return outline_tokenizer.parse_chapters(text)
 
 def _parse_and_save_chapters(novel, text):
     """解析大纲文本并保存章节"""
@@ -653,52 +611,55 @@ def create_app():
     @app.route('/export_novel/<int:novel_id>')
     @login_required
     def export_novel(novel_id):
-        """导出小说为 ZIP 文件"""
+        """导出小说为 ZIP 文件（?format=epub 导出 EPUB）；边压缩边分块发送，正文逐章查询"""
         novel = Novel.query.get_or_404(novel_id)
         if novel.user_id != current_user.id:
             return "Unauthorized", 403
 
-        chapters = Chapter.query.filter_by(novel_id=novel.id).order_by(
-            Chapter.chapter_num
-        ).all()
+        # 只取章节元数据，正文在写到该章时才单独查询，整部小说不同时驻留内存
+        rows = db.session.query(
+            Chapter.id, Chapter.chapter_num, Chapter.title, func.length(Chapter.content)
+        ).filter_by(novel_id=novel.id).order_by(Chapter.chapter_num).all()
+        with_content = [(cid, num, title) for cid, num, title, size in rows if size]
 
-        # 创建内存中的 ZIP 文件
-        mem_zip = io.BytesIO()
+        def chapter_chunks(cid):
+            content = db.session.query(Chapter.content).filter_by(id=cid).scalar() or ""
+            return novel_export.text_chunks(content)
 
-        with zipfile.ZipFile(mem_zip, 'w', zipfile.ZIP_DEFLATED) as zf:
+        safe_title = re.sub(r'[\\/:*?"<>|]+', '_', novel.title or 'novel')
+        if request.args.get('format', '').lower() == 'epub':
+            book = [novel_export.EpubChapter(num, f"第{num}章 {title or ''}".strip(), lambda cid=cid: chapter_chunks(cid))
+                    for cid, num, title in with_content]
+            body = novel_export.iter_epub(novel.title or '小说', book)
+            filename, mimetype = f"{safe_title}.epub", novel_export.EPUB_MIMETYPE
+        else:
+            outline = novel.outline
+            entries = []
             # 添加大纲文件
-            if novel.outline:
-                zf.writestr('大纲.txt', novel.outline)
-
+            if outline:
+                entries.append(('大纲.txt', lambda: novel_export.text_chunks(outline)))
             # 添加每个章节
-            for ch in chapters:
-                if ch.content:
-                    filename = f"第{ch.chapter_num:03d}章 {ch.title}.txt"
-                    zf.writestr(filename, ch.content)
-
+            for cid, num, title in with_content:
+                entries.append((f"第{num:03d}章 {title}.txt", lambda cid=cid: chapter_chunks(cid)))
             # 添加小说信息
             info = f"""小说信息
 ==================
 标题：{novel.title}
 类型：{novel.type}
 主题：{novel.theme}
-章节数：{len(chapters)}
+章节数：{len(rows)}
 创建时间：{novel.created_at}
 """
-            zf.writestr('小说信息.txt', info)
-
-        mem_zip.seek(0)
-
-        # 生成文件名
-        safe_title = re.sub(r'[\\/:*?"<>|]+', '_', novel.title or 'novel')
-        filename = f"{safe_title}.zip"
-
-        return send_file(
-            mem_zip,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=filename
-        )
+            entries.append(('小说信息.txt', lambda: [info]))
+            body = novel_export.iter_zip(entries)
+            filename, mimetype = f"{safe_title}.zip", novel_export.ZIP_MIMETYPE
+
+        # 长度未知，走分块传输；非 ASCII 文件名用 RFC 5987 的 filename*
+        stem, ext = os.path.splitext(filename)
+        ascii_name = (stem.encode('ascii', 'ignore').decode().strip() or 'novel') + ext
+        disposition = f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{quote(filename)}'
+        return Response(stream_with_context(body), mimetype=mimetype,
+                        headers={'Content-Disposition': disposition, 'X-Accel-Buffering': 'no'})
 
     # ======================================================================
     # 充值管理
@@ -3,9 +3,10 @@ import re
 import json
 import time
 import logging
-from google import genai
 from google.genai import types
 
+from xiaoshuo_core import chapter_context, provider_clients
+
 # 默认配置
 DEFAULT_GEMINI_MODEL = "gemini-3-pro-preview"
 
@@ -57,7 +58,7 @@ class NovelGenerator:
         return "\n".join(lines)
 
     def _call_gemini(self, prompt, system_instruction=None):
-        client = genai.Client(api_key=self.api_key)
+        client = provider_clients.get_genai_client(self.api_key)
         models_to_try = [self.model_name]
         if "gemini" in self.model_name.lower() and self.model_name != "gemini-2.5-pro":
              models_to_try.append("gemini-2.5-pro")
@@ -99,10 +100,11 @@ class NovelGenerator:
         chap_title = chapter_info.get('title')
         chap_summary = chapter_info.get('summary')
 
+        ctx = chapter_context.for_outline(full_outline, budget_tokens=chapter_context.configured_budget(None, os.environ.get("NOVEL_CONTEXT_BUDGET_TOKENS"))).build(chap_num)
         context_base = (
             f"小说类型：{novel_type}\n"
             f"主题：{theme}\n"
-            f"完整大纲参考：\n{full_outline}" 
+            f"大纲参考：\n{ctx.text}" 
         )
 
         prev_context_prompt = ""
@@ -140,10 +142,11 @@ class NovelGenerator:
         chap_num = chapter_info.get('num')
         chap_title = chapter_info.get('title')
         chap_summary = chapter_info.get('summary')
+        ctx = chapter_context.for_outline(full_outline, budget_tokens=chapter_context.configured_budget(None, os.environ.get("NOVEL_CONTEXT_BUDGET_TOKENS"))).build(chap_num)
         context_base = (
             f"小说类型：{novel_type}\n"
             f"主题：{theme}\n"
-            f"完整大纲参考：\n{full_outline}"
+            f"大纲参考：\n{ctx.text}"
         )
         prev_context_prompt = ""
         if prev_content:
@@ -167,7 +170,7 @@ class NovelGenerator:
             f"3. 严格贴合本章梗概，承接上文（如果有），铺垫下文。\n"
             f"4. 输出纯正文内容，不要包含“第X章”标题，直接开始正文描写。"
         )
-        client = genai.Client(api_key=self.api_key)
+        client = provider_clients.get_genai_client(self.api_key)
         config = types.GenerateContentConfig(
             temperature=0.8,
             max_output_tokens=8000,
@@ -0,0 +1,4 @@
+"""
+小说生成器公共核心模块
+桌面端（app.py）、Flask 端（web_app）与 FastAPI 端（web）共用的基础设施
+"""
@@ -0,0 +1,225 @@
+"""
+基于 asyncio 的 Provider 调用引擎（Web 端使用）
+Flask/FastAPI 后端在共享事件循环上 await Gemini 调用，多个请求并发在途。
+
+重试/切换模型/对冲/缓存规则只有 gemini_fallback 一份实现，桌面端直接调用它；
+这里把它放进工作线程执行并接上取消：协程被取消或 cancel_event 置位时，工作线程里的循环在下一个检查点返回。
+
+- 协程内可直接 await（FastAPI）
+- 普通线程（Flask 后台线程）通过 run_sync / submit 投递到共享事件循环
+"""
+
+import asyncio
+import functools
+import threading
+import time
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from . import gemini_fallback
+from . import provider_clients
+
+DEFAULT_GEMINI_TIMEOUT_SECS = gemini_fallback.DEFAULT_TIMEOUT_SECS
+_POLL_INTERVAL_SECS = 0.5
+
+
+class ProviderCancelled(Exception):
+    """调用方通过 cancel_event 取消了请求"""
+
+
+class _LinkedCancel:
+    """调用方的 cancel_event 或协程被取消，任一发生即视为取消（供工作线程里的同步循环检查）"""
+
+    def __init__(self, parent: Optional[threading.Event] = None):
+        self._parent = parent
+        self._own = threading.Event()
+
+    def set(self):
+        self._own.set()
+
+    def is_set(self) -> bool:
+        return self._own.is_set() or (self._parent is not None and self._parent.is_set())
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + float(timeout)
+        while not self.is_set():
+            remaining = _POLL_INTERVAL_SECS if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._own.wait(min(_POLL_INTERVAL_SECS, remaining))
+        return True
+
+
+class AsyncProviderEngine:
+    """
+    异步 Provider 引擎
+
+    Args:
+        max_request_retries: 普通异常的重试次数（同 _generate_with_fallback）
+        max_empty_retries: 空响应累计重试上限
+        max_rate_limit_retries: 429 限流的重试次数（同 OutlineApp.max_retries）
+        notify: 可选回调，接收“切换模型/xx秒后重试”等提示文本
+    """
+
+    def __init__(
+        self,
+        max_request_retries: int = gemini_fallback.DEFAULT_MAX_REQUEST_RETRIES,
+        max_empty_retries: int = gemini_fallback.DEFAULT_MAX_EMPTY_RETRIES,
+        max_rate_limit_retries: int = gemini_fallback.DEFAULT_MAX_RATE_LIMIT_RETRIES,
+        notify: Optional[Callable[[str], None]] = None,
+        logger=None,
+    ):
+        self.max_request_retries = int(max_request_retries)
+        self.max_empty_retries = int(max_empty_retries)
+        self.max_rate_limit_retries = int(max_rate_limit_retries)
+        self.notify = notify
+        self.logger = logger
+
+    # ==================== Gemini ====================
+
+    async def gemini_generate(
+        self,
+        api_key: str,
+        models: List[str],
+        contents,
+        config,
+        timeout_secs: int = DEFAULT_GEMINI_TIMEOUT_SECS,
+        cancel_event: Optional[threading.Event] = None,
+        max_request_retries: Optional[int] = None,
+        max_empty_retries: Optional[int] = None,
+        use_cache: bool = False,
+    ) -> str:
+        cancel = _LinkedCancel(cancel_event)
+        call = functools.partial(
+            gemini_fallback.generate,
+            provider_clients.get_genai_client(api_key),
+            list(models),
+            contents,
+            config,
+            cancel_event=cancel,
+            notify=self.notify,
+            logger=self.logger,
+            max_request_retries=self.max_request_retries if max_request_retries is None else int(max_request_retries),
+            max_empty_retries=self.max_empty_retries if max_empty_retries is None else int(max_empty_retries),
+            max_rate_limit_retries=self.max_rate_limit_retries,
+            timeout_secs=timeout_secs,
+            use_cache=use_cache,
+        )
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, call)
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+    # ==================== 并发工具 ====================
+
+    async def gather(self, coros: Iterable[Awaitable[Any]], limit: Optional[int] = None, return_exceptions: bool = False) -> List[Any]:
+        """并发执行多个调用，limit 限制同时在途的请求数"""
+        coros = list(coros)
+        if not limit or limit <= 0:
+            return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+        sem = asyncio.Semaphore(int(limit))
+
+        async def run_one(c):
+            async with sem:
+                return await c
+
+        return await asyncio.gather(*(run_one(c) for c in coros), return_exceptions=return_exceptions)
+
+
+class EngineLoop:
+    """
+    后台事件循环线程
+    让普通线程把协程投递到同一个事件循环，多个请求共享一个 loop 并发在途。
+    """
+
+    def __init__(self, name: str = "provider-loop"):
+        self._name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None and self._thread is not None and self._thread.is_alive():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def runner():
+                asyncio.set_event_loop(loop)
+                ready.set()
+                loop.run_forever()
+
+            t = threading.Thread(target=runner, name=self._name, daemon=True)
+            t.start()
+            ready.wait()
+            self._loop = loop
+            self._thread = t
+            return loop
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """投递协程，返回 concurrent.futures.Future；future.cancel() 会取消对应任务"""
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run_sync(self, coro, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+        """阻塞等待协程结果；超时或 cancel_event 置位时取消在途任务"""
+        fut = self.submit(coro)
+        waited = 0.0
+        try:
+            while True:
+                step = 0.5 if timeout is None else max(0.0, min(0.5, timeout - waited))
+                try:
+                    return fut.result(timeout=step)
+                except concurrent.futures.TimeoutError:
+                    waited += step
+                    if cancel_event is not None and cancel_event.is_set():
+                        fut.cancel()
+                        raise ProviderCancelled()
+                    if timeout is not None and waited >= timeout:
+                        fut.cancel()
+                        raise TimeoutError(f"provider call timeout after {timeout}s")
+        except BaseException:
+            if not fut.done():
+                fut.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+            self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+_ENGINE: Optional[AsyncProviderEngine] = None
+_LOOP: Optional[EngineLoop] = None
+_SINGLETON_LOCK = threading.Lock()
+
+
+def get_engine() -> AsyncProviderEngine:
+    global _ENGINE
+    if _ENGINE is None:
+        with _SINGLETON_LOCK:
+            if _ENGINE is None:
+                _ENGINE = AsyncProviderEngine()
+    return _ENGINE
+
+
+def get_loop() -> EngineLoop:
+    global _LOOP
+    if _LOOP is None:
+        with _SINGLETON_LOCK:
+            if _LOOP is None:
+                _LOOP = EngineLoop()
+    return _LOOP
+
+
+def submit(coro) -> concurrent.futures.Future:
+    return get_loop().submit(coro)
+
+
+def run_sync(coro, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+    return get_loop().run_sync(coro, timeout=timeout, cancel_event=cancel_event)
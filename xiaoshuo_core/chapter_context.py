@@ -0,0 +1,344 @@
+"""
+正文生成的分章上下文
+原先 _run_novel_generation 每章都把完整大纲（full_outline_context）放进提示词，300 章的大纲约 35 万字，
+每次调用都重复发送几十万字相同的内容；web_app 的 AdvancedNovelGenerator.generate_chapter 则直接截取
+full_outline[:5000]，后面的分卷规划与章节梗概全部丢失。
+
+这里按章节挑选上下文，总量不超过 token 预算：
+1. 设定集（作品名与类型 / 核心人设 / 世界观与设定）
+2. 本章所属卷的分卷规划
+3. 前后各 K 章的梗概（由近及远）
+4. 更早章节中、本章很可能回收的伏笔（悬疑点与本章梗概的关键词重合度，按 IDF 加权）
+5. 预算有余时再加入其他段落（三幕结构梗概、爽点清单等）
+
+在 config.json 中配置（0 表示仍发送完整大纲）：
+    "novel_context_budget_tokens": 8000
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import outline_tokenizer
+from .context_store import BIBLE_TITLES, HOOK_LOOKBACK_CHAPTERS, KIND_BATCH, KIND_BIBLE, KIND_PLAN, ChapterEntry, classify
+from .response_cache import estimate_tokens
+
+DEFAULT_BUDGET_TOKENS = 8000
+DEFAULT_NEIGHBOURS = 3
+DEFAULT_MAX_PAYOFFS = 5
+# 伏笔回收判定：共同关键词的 IDF 权重和下限；出现在超过该比例章节里的二元组视为常用词（人名、地名等）
+MIN_PAYOFF_SCORE = 6.0
+COMMON_BIGRAM_RATIO = 0.15
+# 预算不足时设定集按比例截断，给分卷规划和梗概留出空间
+BIBLE_SHARE = 0.45
+PLAN_SHARE = 0.25
+
+_SECTION_RE = re.compile(r"^###[ \t]+(\d+)\.[ \t]*(.+?)\s*$", re.MULTILINE)
+_PLAN_SPAN_RE = re.compile(r"(\d+)\s*[-—~]\s*(\d+)\s*章")
+_CJK_RE = re.compile(r"[一-鿿]+")
+_FIRST_CHAPTER_RE = re.compile(r"^\W*第\s*\d+\s*章", re.MULTILINE)
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """按 "### N. 标题" 切分大纲；第一个编号段落之前的内容（生成用的提示词）不参与"""
+    t = text or ""
+    marks = list(_SECTION_RE.finditer(t))
+    out = []
+    for i, m in enumerate(marks):
+        end = marks[i + 1].start() if i + 1 < len(marks) else len(t)
+        out.append((m.group(2).strip(), t[m.end():end].strip("\n")))
+    return out
+
+
+def bigrams(text: str) -> Set[str]:
+    out = set()
+    for run in _CJK_RE.findall(text or ""):
+        for i in range(len(run) - 1):
+            out.add(run[i:i + 2])
+    return out
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    """按 token 预算截取开头（估算按字符比例折算，再向前退到换行处）"""
+    if max_tokens <= 0:
+        return ""
+    total = estimate_tokens(text)
+    if total <= max_tokens:
+        return text
+    keep = max(0, int(len(text) * max_tokens / float(total)))
+    cut = text.rfind("\n", 0, keep)
+    return text[:cut if cut > keep // 2 else keep]
+
+
+class _Section:
+    __slots__ = ("order", "title", "block", "kind", "volume", "span", "tokens")
+
+    def __init__(self, order: int, title: str, text: str):
+        self.order = order
+        self.title = title
+        self.kind, self.volume, self.span = classify(title)
+        if self.kind == KIND_PLAN:
+            m = _PLAN_SPAN_RE.search(title)
+            self.span = (int(m.group(1)), int(m.group(2))) if m else None
+        self.block = f"### {title}\n{text}"
+        self.tokens = estimate_tokens(self.block)
+
+
+class ChapterContext:
+    def __init__(self, chapter: int, text: str, tokens: int, full_tokens: int, parts: Dict[str, int]):
+        self.chapter = chapter
+        self.text = text
+        self.tokens = tokens
+        self.full_tokens = full_tokens
+        self.parts = parts
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.full_tokens - self.tokens)
+
+
+class ChapterContextBuilder:
+    """
+    一部小说的分章上下文构建器（构造时解析一次大纲，之后每章的构建与全书篇幅基本无关）
+
+    Args:
+        outline: 完整大纲文本
+        chapters: [{chapter, title, summary}]；缺省时从大纲中解析
+        budget_tokens: 每章上下文的 token 预算，<= 0 表示返回完整大纲
+        neighbours: 前后各取多少章梗概
+        max_payoffs: 最多附带多少条待回收的前文伏笔
+    """
+
+    def __init__(self, outline: str, chapters: Optional[Iterable[dict]] = None, budget_tokens: int = DEFAULT_BUDGET_TOKENS,
+                 neighbours: int = DEFAULT_NEIGHBOURS, max_payoffs: int = DEFAULT_MAX_PAYOFFS):
+        self.outline = outline or ""
+        self.budget_tokens = int(budget_tokens or 0)
+        self.neighbours = max(0, int(neighbours))
+        self.max_payoffs = max(0, int(max_payoffs))
+        self.full_tokens = estimate_tokens(self.outline)
+        self._lock = threading.Lock()
+        self.built = 0
+        self.sent_tokens = 0
+        self.baseline_tokens = 0
+
+        sections = [_Section(i, title, body) for i, (title, body) in enumerate(split_sections(self.outline))]
+        if not sections:
+            # 没有 "### N. 标题" 结构的大纲：第一章之前的部分（通常是设定）整体作为设定集
+            m = _FIRST_CHAPTER_RE.search(self.outline)
+            head = self.outline[:m.start()] if m else self.outline
+            if head.strip():
+                sections = [_Section(0, BIBLE_TITLES[0], head.strip())]
+        self._bible = [s for s in sections if s.kind == KIND_BIBLE]
+        self._plans = [s for s in sections if s.kind == KIND_PLAN]
+        self._others = [s for s in sections if s.kind not in (KIND_BIBLE, KIND_PLAN, KIND_BATCH)]
+        batch_volume = {}
+        for s in sections:
+            if s.kind == KIND_BATCH and s.span is not None and s.volume is not None:
+                batch_volume[s.span] = s.volume
+
+        items = list(chapters) if chapters is not None else []
+        if not items:
+            items = outline_tokenizer.parse_chapters(self.outline)
+        self._entries: Dict[int, ChapterEntry] = {}
+        for it in items:
+            if not isinstance(it, dict):
+                continue
+            try:
+                n = int(it.get("chapter"))
+            except Exception:
+                continue
+            vol = None
+            for (a, b), v in batch_volume.items():
+                if a <= n <= b:
+                    vol = v
+                    break
+            self._entries[n] = ChapterEntry(n, it.get("title") or "", it.get("summary") or "", vol)
+
+        # 伏笔关键词：先统计二元组在各章梗概中的文档频率，常用词不参与匹配
+        self._summary_grams: Dict[int, Set[str]] = {n: bigrams(e.summary) for n, e in self._entries.items()}
+        df: Dict[str, int] = {}
+        for grams in self._summary_grams.values():
+            for g in grams:
+                df[g] = df.get(g, 0) + 1
+        total = max(1, len(self._entries))
+        limit = max(2, int(total * COMMON_BIGRAM_RATIO))
+        self._idf = {g: math.log(total / float(c)) for g, c in df.items() if c <= limit}
+        self._hook_grams: Dict[int, Set[str]] = {}
+        for n, e in self._entries.items():
+            if e.hook:
+                self._hook_grams[n] = {g for g in bigrams(e.hook) if g in self._idf}
+
+    # ==================== 挑选 ====================
+
+    def _plan_for(self, chapter: int) -> Optional[_Section]:
+        entry = self._entries.get(chapter)
+        for s in self._plans:
+            if entry is not None and entry.volume is not None and s.volume == entry.volume:
+                return s
+        for s in self._plans:
+            if s.span is not None and s.span[0] <= chapter <= s.span[1]:
+                return s
+        return None
+
+    def neighbour_lines(self, chapter: int, max_tokens: int) -> List[Tuple[int, str]]:
+        """前后各 K 章的梗概，由近及远交替挑选，返回按章号排序的 (章号, 行)"""
+        picked = []
+        used = 0
+        for d in range(1, self.neighbours + 1):
+            for n in (chapter - d, chapter + d):
+                entry = self._entries.get(n)
+                if entry is None:
+                    continue
+                if used + entry.tokens > max_tokens:
+                    return sorted(picked)
+                picked.append((n, entry.line))
+                used += entry.tokens
+        return sorted(picked)
+
+    def payoff_lines(self, chapter: int, max_tokens: int) -> List[str]:
+        """K 章之外、更早章节里与本章梗概关键词重合的伏笔，按得分从高到低"""
+        entry = self._entries.get(chapter)
+        if entry is None or self.max_payoffs <= 0:
+            return []
+        grams = self._summary_grams.get(chapter) or set()
+        if not grams:
+            return []
+        scored = []
+        lo = max(1, chapter - HOOK_LOOKBACK_CHAPTERS)
+        for n in range(chapter - self.neighbours - 1, lo - 1, -1):
+            hook = self._hook_grams.get(n)
+            if not hook:
+                continue
+            score = sum(self._idf[g] for g in hook & grams)
+            if score >= MIN_PAYOFF_SCORE:
+                scored.append((score, n))
+        scored.sort(key=lambda x: (-x[0], -x[1]))
+        out = []
+        used = 0
+        for _score, n in scored[:self.max_payoffs]:
+            line = self._entries[n].hook
+            cost = estimate_tokens(line)
+            if used + cost > max_tokens:
+                break
+            out.append((n, line))
+            used += cost
+        return [line for _n, line in sorted(out)]
+
+    def build(self, chapter: int) -> ChapterContext:
+        try:
+            chapter = int(chapter)
+        except Exception:
+            chapter = 0
+        if self.budget_tokens <= 0 or self.full_tokens <= self.budget_tokens:
+            ctx = ChapterContext(chapter, self.outline, self.full_tokens, self.full_tokens, {"full": self.full_tokens})
+            self._record(ctx)
+            return ctx
+
+        budget = self.budget_tokens
+        parts: Dict[str, int] = {}
+        chosen: List[Tuple[int, str]] = []
+
+        def take(name: str, order: int, text: str, max_tokens: int) -> int:
+            piece = _clip(text, max_tokens)
+            if not piece.strip():
+                return 0
+            cost = estimate_tokens(piece)
+            chosen.append((order, piece))
+            parts[name] = parts.get(name, 0) + cost
+            return cost
+
+        remaining = budget
+        bible_cap = int(budget * BIBLE_SHARE)
+        for s in self._bible:
+            remaining -= take("bible", s.order, s.block, min(remaining, bible_cap - parts.get("bible", 0)))
+
+        plan = self._plan_for(chapter)
+        if plan is not None:
+            remaining -= take("plan", plan.order, plan.block, min(remaining, int(budget * PLAN_SHARE)))
+
+        lines = self.neighbour_lines(chapter, max(0, remaining - 50))
+        if lines:
+            block = "### 前后章节梗概\n" + "\n".join(line for _n, line in lines)
+            remaining -= take("neighbours", 10 ** 6, block, remaining)
+
+        hooks = self.payoff_lines(chapter, max(0, remaining - 50))
+        if hooks:
+            block = "### 本章可能回收的前文伏笔\n" + "\n".join(hooks)
+            remaining -= take("payoffs", 10 ** 6 + 1, block, remaining)
+
+        for s in self._others:
+            if remaining <= 200:
+                break
+            remaining -= take("other", s.order, s.block, remaining)
+
+        chosen.sort(key=lambda x: x[0])
+        text = "\n\n".join(piece for _order, piece in chosen)
+        ctx = ChapterContext(chapter, text, estimate_tokens(text), self.full_tokens, parts)
+        self._record(ctx)
+        return ctx
+
+    def _record(self, ctx: ChapterContext):
+        with self._lock:
+            self.built += 1
+            self.sent_tokens += ctx.tokens
+            self.baseline_tokens += ctx.full_tokens
+
+    # ==================== 统计 ====================
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = max(0, self.baseline_tokens - self.sent_tokens)
+            return {
+                "chapters": self.built,
+                "outline_tokens": self.full_tokens,
+                "sent_tokens": self.sent_tokens,
+                "baseline_tokens": self.baseline_tokens,
+                "saved_tokens": saved,
+                "saved_ratio": round(saved / float(self.baseline_tokens), 4) if self.baseline_tokens else 0.0,
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"大纲上下文 {s['chapters']} 章：发送约 {s['sent_tokens']} tokens（完整大纲需 {s['baseline_tokens']}），"
+                f"节省 {s['saved_tokens']} tokens（{s['saved_ratio']:.0%}）")
+
+
+# ==================== 按大纲内容共享 ====================
+
+_BUILDERS: "OrderedDict[Tuple[str, int, int, int], ChapterContextBuilder]" = OrderedDict()
+_BUILDERS_LOCK = threading.Lock()
+_MAX_BUILDERS = 8
+
+
+def for_outline(outline: str, budget_tokens: int = DEFAULT_BUDGET_TOKENS, neighbours: int = DEFAULT_NEIGHBOURS,
+                max_payoffs: int = DEFAULT_MAX_PAYOFFS) -> ChapterContextBuilder:
+    """同一份大纲（按内容哈希）在进程内共享一个构建器，web_app 逐章请求时不必重复解析"""
+    key = (hashlib.sha256((outline or "").encode("utf-8")).hexdigest(), int(budget_tokens or 0), int(neighbours), int(max_payoffs))
+    with _BUILDERS_LOCK:
+        builder = _BUILDERS.get(key)
+        if builder is not None:
+            _BUILDERS.move_to_end(key)
+            return builder
+    builder = ChapterContextBuilder(outline, budget_tokens=budget_tokens, neighbours=neighbours, max_payoffs=max_payoffs)
+    with _BUILDERS_LOCK:
+        builder = _BUILDERS.setdefault(key, builder)
+        _BUILDERS.move_to_end(key)
+        while len(_BUILDERS) > _MAX_BUILDERS:
+            _BUILDERS.popitem(last=False)
+    return builder
+
+
+def configured_budget(cfg: Optional[dict], env_value: Optional[str] = None) -> int:
+    """读取 config.json 的 novel_context_budget_tokens（缺省时取环境变量，再缺省用默认值）"""
+    raw = cfg.get("novel_context_budget_tokens") if isinstance(cfg, dict) else None
+    if raw is None:
+        raw = env_value
+    if raw is None:
+        return DEFAULT_BUDGET_TOKENS
+    try:
+        return int(raw)
+    except Exception:
+        return DEFAULT_BUDGET_TOKENS
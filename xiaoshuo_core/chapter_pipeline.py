@@ -0,0 +1,271 @@
+"""
+正文分章的窗口化并行生成
+原先 _run_novel_generation 严格按顺序逐章生成，因为每章提示词都要带上一章正文的结尾（last_chapter_text[-2000:]），
+300 章就是 300 次首尾相接的调用。
+
+这里允许最多 window 章同时在途：
+- 上一章已完成时（window=1 时总是如此），照旧把上一章结尾 2000 字作为衔接上下文，与串行模式完全一致
+- 上一章仍在生成时，改用“场景状态交接”：最近一个已完成章节的结尾场景（几百字）+ 其后各章（含上一章）的大纲梗概
+- 结果按章节顺序提交；用梗概交接起笔的章节在提交前调用 stitch_fn，依据上一章真实结尾改写本章开头，
+  改写只涉及开头几百字，其余章节仍在后台继续生成
+- 续写时已存在的章节（skip_fn 为真）不再生成，直接视为已提交；需要它作为上一章时才通过 load_fn 从磁盘读取
+
+在 config.json 中配置：
+    "novel_pipeline_window": 3
+"""
+
+import concurrent.futures
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_WINDOW = 1
+MAX_WINDOW = 8
+# 上一章已完成时携带的结尾长度（与原串行模式一致）
+PREV_TAIL_CHARS = 2000
+# 场景状态交接：已完成章节结尾的长度、每章梗概的长度上限
+SCENE_STATE_CHARS = 600
+HANDOFF_SUMMARY_CHARS = 300
+# 衔接改写：本章开头参与改写的长度（按段落边界截取）
+STITCH_HEAD_CHARS = 800
+
+HANDOFF_ACTUAL = "actual"
+HANDOFF_PLANNED = "planned"
+HANDOFF_EXISTING = "existing"
+
+
+def scene_state(text: str, max_chars: int = SCENE_STATE_CHARS) -> str:
+    """章节结尾的场景：从末尾按段落向前取，总长不超过 max_chars"""
+    t = (text or "").strip()
+    if len(t) <= max_chars:
+        return t
+    paras = [p for p in t.split("\n") if p.strip()]
+    picked: List[str] = []
+    used = 0
+    for p in reversed(paras):
+        if picked and used + len(p) + 1 > max_chars:
+            break
+        picked.append(p)
+        used += len(p) + 1
+    out = "\n".join(reversed(picked))
+    return out[-max_chars:]
+
+
+def split_opening(text: str, head_chars: int = STITCH_HEAD_CHARS) -> Tuple[str, str]:
+    """把正文分成 (开头, 其余)：开头在 head_chars 附近的段落边界处截断"""
+    t = text or ""
+    if len(t) <= head_chars:
+        return t, ""
+    cut = t.rfind("\n", head_chars // 2, head_chars)
+    if cut < 0:
+        cut = t.find("\n", head_chars)
+    if cut < 0:
+        return t, ""
+    return t[:cut], t[cut:]
+
+
+class Handoff:
+    """某章起笔时可用的衔接信息"""
+
+    def __init__(self, kind: str, chapter: int, prev_chapter: Optional[int] = None, prev_tail: str = "",
+                 state_chapter: Optional[int] = None, state: str = "", bridge: Optional[List[Tuple[int, str]]] = None):
+        self.kind = kind
+        self.chapter = chapter
+        self.prev_chapter = prev_chapter
+        self.prev_tail = prev_tail
+        self.state_chapter = state_chapter
+        self.state = state
+        self.bridge = bridge or []
+
+    @property
+    def needs_stitch(self) -> bool:
+        return self.kind == HANDOFF_PLANNED and self.prev_chapter is not None
+
+    def prompt(self) -> str:
+        if self.kind == HANDOFF_ACTUAL:
+            if not self.prev_tail:
+                return ""
+            return (
+                f"【上一章（第{self.prev_chapter}章）结尾内容回顾】\n"
+                f"{self.prev_tail}\n"
+                f"--------------------------------\n"
+                f"指令：请务必紧接上一章的结尾剧情继续创作，保持场景、时间、人物状态的连贯性。\n\n"
+            )
+        lines = ["【前情交接（上一章正在同步创作，以下为已完成部分的场景状态与之后各章梗概）】"]
+        if self.state:
+            lines.append(f"第{self.state_chapter}章结尾场景：\n{self.state}")
+        for n, summary in self.bridge:
+            lines.append(f"第{n}章梗概：{summary}")
+        lines.append("--------------------------------")
+        lines.append(f"指令：请以第{self.prev_chapter}章梗概的结局为起点开始本章，保持人物状态、时间与地点的连贯性；"
+                     "开头不要复述上一章的情节。\n\n")
+        return "\n".join(lines)
+
+
+class PipelineStats:
+    def __init__(self, window: int):
+        self.window = window
+        self.chapters = 0
+        self.planned = 0
+        self.skipped = 0
+        self.stitched = 0
+        self.stitch_failures = 0
+        self.elapsed = 0.0
+        self.stitch_secs = 0.0
+
+    def to_dict(self) -> dict:
+        per_min = self.chapters / self.elapsed * 60 if self.elapsed > 0 else 0.0
+        return {
+            "window": self.window,
+            "chapters": self.chapters,
+            "skipped": self.skipped,
+            "planned_handoffs": self.planned,
+            "stitched": self.stitched,
+            "stitch_failures": self.stitch_failures,
+            "elapsed_secs": round(self.elapsed, 2),
+            "stitch_secs": round(self.stitch_secs, 2),
+            "chapters_per_min": round(per_min, 2),
+        }
+
+    def format(self) -> str:
+        d = self.to_dict()
+        return (f"窗口 {d['window']}：{d['chapters']} 章（跳过已有 {d['skipped']} 章），用时 {d['elapsed_secs']}s（{d['chapters_per_min']} 章/分钟），"
+                f"梗概交接 {d['planned_handoffs']} 章，衔接改写 {d['stitched']} 章（失败 {d['stitch_failures']}）")
+
+
+class ChapterPipeline:
+    """
+    按窗口并行生成正文、按顺序提交
+
+    Args:
+        chapters: [{chapter, title, summary}]，按生成顺序排列
+        generate_fn: generate_fn(chapter, handoff) -> 正文；在工作线程中调用
+        stitch_fn: stitch_fn(prev_text, opening, chapter) -> 改写后的开头；返回空值表示保留原开头。
+            在调度线程中调用（此时窗口内其余章节仍在生成）
+        on_commit: on_commit(index, chapter, text, handoff)，按顺序调用
+        window: 同时在途的章节数，1 即原串行模式
+        cancel_event: 置位后不再发起新章节，已在途的章节返回后照常提交
+        skip_fn: skip_fn(chapter) 为真表示该章已存在，不生成也不调用 on_commit
+        load_fn: load_fn(chapter) -> 已存在章节的正文（只在作为上一章衔接时读取）
+    """
+
+    def __init__(self, chapters: Sequence[dict], generate_fn: Callable[[dict, Handoff], str],
+                 stitch_fn: Optional[Callable[[str, str, dict], Optional[str]]] = None,
+                 on_commit: Optional[Callable[[int, dict, str, Handoff], None]] = None,
+                 window: int = DEFAULT_WINDOW, cancel_event: Optional[threading.Event] = None,
+                 skip_fn: Optional[Callable[[dict], bool]] = None, load_fn: Optional[Callable[[dict], str]] = None):
+        self.chapters = list(chapters)
+        self.generate_fn = generate_fn
+        self.stitch_fn = stitch_fn
+        self.on_commit = on_commit
+        self.window = max(1, min(MAX_WINDOW, int(window or 1)))
+        self.cancel_event = cancel_event or threading.Event()
+        self.skip_fn = skip_fn
+        self.load_fn = load_fn
+        self.stats = PipelineStats(self.window)
+
+    def _handoff(self, j: int, committed: int, prev_text: Callable[[], str]) -> Handoff:
+        """committed 为已提交的章数（下标 < committed 的章节已有最终正文）；prev_text() 返回其中最后一章的正文"""
+        number = int(self.chapters[j].get("chapter"))
+        if self.skip_fn is not None and self.skip_fn(self.chapters[j]):
+            return Handoff(HANDOFF_EXISTING, number)
+        if j == 0:
+            return Handoff(HANDOFF_ACTUAL, number)
+        prev_number = int(self.chapters[j - 1].get("chapter"))
+        if committed >= j:
+            return Handoff(HANDOFF_ACTUAL, number, prev_number, (prev_text() or "")[-PREV_TAIL_CHARS:])
+        if self.skip_fn is not None and self.load_fn is not None and self.skip_fn(self.chapters[j - 1]):
+            # 上一章已存在（续写），虽然更早的章节还在生成，结尾是确定的
+            return Handoff(HANDOFF_ACTUAL, number, prev_number, (self.load_fn(self.chapters[j - 1]) or "")[-PREV_TAIL_CHARS:])
+        state_chapter = int(self.chapters[committed - 1].get("chapter")) if committed > 0 else None
+        bridge = []
+        for k in range(committed, j):
+            ch = self.chapters[k]
+            bridge.append((int(ch.get("chapter")), str(ch.get("summary") or "").strip()[:HANDOFF_SUMMARY_CHARS]))
+        return Handoff(HANDOFF_PLANNED, number, prev_number, state_chapter=state_chapter,
+                       state=scene_state(prev_text()) if committed > 0 else "", bridge=bridge)
+
+    def _stitch(self, prev_text: str, text: str, chapter: dict) -> str:
+        if self.stitch_fn is None or not prev_text.strip() or not text.strip() or self.cancel_event.is_set():
+            return text
+        opening, rest = split_opening(text)
+        t0 = time.perf_counter()
+        try:
+            new_opening = self.stitch_fn(prev_text, opening, chapter)
+        except Exception:
+            new_opening = None
+            self.stats.stitch_failures += 1
+        self.stats.stitch_secs += time.perf_counter() - t0
+        if not new_opening or not str(new_opening).strip():
+            return text
+        self.stats.stitched += 1
+        return str(new_opening).rstrip() + rest
+
+    def _skip(self, idx: int, last: dict):
+        chap = self.chapters[idx]
+        last["loader"] = (lambda: self.load_fn(chap)) if self.load_fn is not None else None
+        last["text"] = ""
+        self.stats.skipped += 1
+
+    def run(self) -> PipelineStats:
+        n = len(self.chapters)
+        started = time.perf_counter()
+        pending: Dict[int, Tuple[Optional[concurrent.futures.Future], Handoff]] = {}
+        next_submit = 0
+        committed = 0
+        last = {"text": "", "loader": None}
+
+        def prev_text() -> str:
+            loader = last["loader"]
+            if loader is not None:
+                last["loader"] = None
+                try:
+                    last["text"] = loader() or ""
+                except Exception:
+                    last["text"] = ""
+            return last["text"]
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.window, thread_name_prefix="chapter")
+        try:
+            while committed < n:
+                while next_submit < n and next_submit - committed < self.window and not self.cancel_event.is_set():
+                    handoff = self._handoff(next_submit, committed, prev_text)
+                    if handoff.kind == HANDOFF_EXISTING:
+                        if next_submit == committed:
+                            # 前面都已提交：直接跳过，不占窗口
+                            self._skip(committed, last)
+                            committed += 1
+                        else:
+                            pending[next_submit] = (None, handoff)
+                        next_submit += 1
+                        continue
+                    if handoff.kind == HANDOFF_PLANNED:
+                        self.stats.planned += 1
+                    fut = pool.submit(self.generate_fn, self.chapters[next_submit], handoff)
+                    pending[next_submit] = (fut, handoff)
+                    next_submit += 1
+                if committed >= n:
+                    break
+                if committed not in pending:
+                    break
+                fut, handoff = pending.pop(committed)
+                if fut is None:
+                    self._skip(committed, last)
+                    committed += 1
+                    continue
+                text = fut.result() or ""
+                if handoff.needs_stitch:
+                    text = self._stitch(prev_text(), text, self.chapters[committed])
+                if self.on_commit is not None:
+                    self.on_commit(committed, self.chapters[committed], text, handoff)
+                self.stats.chapters += 1
+                last["text"] = text
+                last["loader"] = None
+                committed += 1
+        finally:
+            for fut, _h in pending.values():
+                if fut is not None:
+                    fut.cancel()
+            pool.shutdown(wait=True)
+            self.stats.elapsed = time.perf_counter() - started
+        return self.stats
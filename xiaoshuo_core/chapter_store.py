@@ -0,0 +1,457 @@
+"""
+正文章节的磁盘存储
+原先生成的正文只放在内存字典 generated_chapters_content 里，写到第 180 章时崩溃就全部丢失，
+整部小说也一直占着内存，直到 on_export_zip 才写出。
+
+每次生成正文在 novel_store/ 下建一个目录：
+    novel_store/<书名>_<时间戳>/
+        outline.md          本次使用的大纲（恢复时不依赖界面上的内容）
+        manifest.jsonl      开头一行记录本次运行参数（书名、类型、主题、大纲哈希、章数等），
+                            之后每写完一章追加一行（章号、标题、文件名、字数、哈希、是否不完整），每行写入后 fsync
+        chapters/0001.txt   单章正文，先写临时文件再 os.replace，不会出现写了一半的章节
+        parts/              流式生成中的章节临时文件（ChapterSpool），完成后删除
+同一章再次写入时覆盖文件并追加新的一行，读取时以最后一行为准。
+需要重写的章节追加一行 regenerate 记录（标记为不完整，正文保留到重写完成为止）。
+
+续写时（ChapterStore.reopen）已完成的章节不再生成，上一章结尾直接从磁盘读取；
+也可以从导出的 ZIP 包（read_export_zip）导入已有正文。
+
+内存里只保留每章的 ChapterHandle（章号、标题、字数、路径），正文在需要时才从磁盘读取；
+ChapterStore 同时提供 dict 风格的接口（in / [] / keys），原来按字典访问正文的代码无需改动。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+STORE_DIR_NAME = "novel_store"
+MANIFEST_NAME = "manifest.jsonl"
+OUTLINE_NAME = "outline.md"
+CHAPTERS_DIR_NAME = "chapters"
+PARTS_DIR_NAME = "parts"
+STORE_VERSION = 1
+# 导出 ZIP 包（on_export_zip）中的章节文件与正文分隔行
+EXPORT_OUTLINE_NAME = "完整大纲.txt"
+EXPORT_BODY_SEPARATOR = "=" * 20 + " 正文 " + "=" * 20
+EXPORT_EMPTY_BODY = "(此处可后续扩展正文)"
+_EXPORT_CHAPTER_RE = re.compile(r"^章节/(\d+)_[^/]*\.txt$")
+_EXPORT_TITLE_RE = re.compile(r"^第\d+章\s*(.*)$")
+
+
+def store_root(base_dir: str) -> str:
+    return os.path.join(base_dir, STORE_DIR_NAME)
+
+
+def outline_hash(outline: str) -> str:
+    return hashlib.sha256((outline or "").strip().encode("utf-8")).hexdigest()[:16]
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def atomic_write_text(path: str, text: str):
+    """写临时文件、fsync 后 os.replace，读者要么看到旧内容，要么看到完整的新内容"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(text or "")
+        f.flush()
+        try:
+            os.fsync(f.fileno())
+        except Exception:
+            pass
+    os.replace(tmp, path)
+
+
+class ChapterHandle:
+    """已落盘章节的轻量句柄：正文不常驻内存，read() 时才读文件"""
+
+    __slots__ = ("num", "title", "path", "chars", "sha", "partial", "at")
+
+    def __init__(self, num: int, title: str, path: str, chars: int, sha: str = "", partial: bool = False, at: str = ""):
+        self.num = int(num)
+        self.title = title or ""
+        self.path = path
+        self.chars = int(chars or 0)
+        self.sha = sha or ""
+        self.partial = bool(partial)
+        self.at = at or ""
+
+    def read(self) -> str:
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            return f.read()
+
+    def iter_chunks(self, size: int = 64 * 1024) -> Iterator[str]:
+        """按 size 字逐块读正文（流式导出用，整章不进内存）"""
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            while True:
+                piece = f.read(size)
+                if not piece:
+                    break
+                yield piece
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def to_record(self) -> dict:
+        return {
+            "type": "chapter",
+            "chapter": self.num,
+            "title": self.title,
+            "file": os.path.basename(self.path),
+            "chars": self.chars,
+            "sha1": self.sha,
+            "partial": self.partial,
+            "at": self.at,
+        }
+
+
+class ChapterStore:
+    """
+    一次正文生成的章节存储（线程安全；写入通常来自生成线程，读取来自 UI / 导出）
+
+    dict 风格接口：store[n] 读正文，store[n] = text 写入，n in store，keys() 按章号升序
+    """
+
+    def __init__(self, path: str, header: dict, handles: Optional[Dict[int, ChapterHandle]] = None, completed: bool = False):
+        self.path = path
+        self.header = header
+        self.completed = completed
+        self._handles: Dict[int, ChapterHandle] = dict(handles or {})
+        self._lock = threading.Lock()
+        self._fh = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST_NAME)
+
+    @property
+    def chapters_dir(self) -> str:
+        return os.path.join(self.path, CHAPTERS_DIR_NAME)
+
+    @property
+    def parts_dir(self) -> str:
+        return os.path.join(self.path, PARTS_DIR_NAME)
+
+    @classmethod
+    def create(cls, base_dir: str, header: dict, name_hint: str = "") -> "ChapterStore":
+        root = store_root(base_dir)
+        ts = time.strftime("%Y%m%d_%H%M%S")
+        safe = "".join(ch for ch in (name_hint or "novel") if ch not in '\\/:*?"<>|').strip() or "novel"
+        path = os.path.join(root, f"{safe[:40]}_{ts}")
+        n = 1
+        while os.path.exists(path):
+            n += 1
+            path = os.path.join(root, f"{safe[:40]}_{ts}_{n}")
+        os.makedirs(os.path.join(path, CHAPTERS_DIR_NAME), exist_ok=True)
+        rec = dict(header)
+        rec["type"] = "run"
+        rec["version"] = STORE_VERSION
+        rec.setdefault("created_at", time.strftime("%Y-%m-%d %H:%M:%S"))
+        store = cls(path, rec)
+        store._append(rec)
+        return store
+
+    @classmethod
+    def reopen(cls, path: str) -> Optional["ChapterStore"]:
+        """继续写入已有的存储；上次崩溃可能留下半行，先补换行，避免与新记录粘在一起"""
+        manifest = os.path.join(path, MANIFEST_NAME)
+        try:
+            with open(manifest, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        with open(manifest, "a", encoding="utf-8") as fa:
+                            fa.write("\n")
+        except Exception:
+            pass
+        store = load(path)
+        if store is not None:
+            store.completed = False
+        return store
+
+    # ==================== 写入 ====================
+
+    def _append(self, rec: dict):
+        line = json.dumps(rec, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.manifest_path, "a", encoding="utf-8")
+            self._fh.write(line + "\n")
+            self._fh.flush()
+            try:
+                os.fsync(self._fh.fileno())
+            except Exception:
+                pass
+
+    def chapter_path(self, num: int) -> str:
+        return os.path.join(self.chapters_dir, f"{int(num):04d}.txt")
+
+    def put(self, num: int, text: str, title: str = "", partial: bool = False) -> ChapterHandle:
+        """写入一章：正文原子落盘后再追加清单记录"""
+        num = int(num)
+        text = text or ""
+        os.makedirs(self.chapters_dir, exist_ok=True)
+        path = self.chapter_path(num)
+        atomic_write_text(path, text)
+        old = self._handles.get(num)
+        handle = ChapterHandle(num, title or (old.title if old is not None else ""), path, len(text), _text_hash(text),
+                               partial, time.strftime("%Y-%m-%d %H:%M:%S"))
+        self._append(handle.to_record())
+        with self._lock:
+            self._handles[num] = handle
+        return handle
+
+    def mark_regenerate(self, nums: Iterable[int]):
+        """标记需要重写的章节：续写时会重新生成（正文保留到重写完成）"""
+        marked = []
+        with self._lock:
+            for n in nums:
+                h = self._handles.get(int(n))
+                if h is not None:
+                    h.partial = True
+                    marked.append(h.num)
+        if marked:
+            self._append({"type": "regenerate", "chapters": marked, "at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        return marked
+
+    def missing(self, nums: Iterable[int]) -> List[int]:
+        """nums 中尚未完整写完（缺失、不完整或被标记重写）的章节"""
+        done = set(self.done_chapters())
+        return [int(n) for n in nums if int(n) not in done]
+
+    def save_outline(self, outline: str):
+        atomic_write_text(os.path.join(self.path, OUTLINE_NAME), outline or "")
+
+    def outline(self) -> str:
+        try:
+            with open(os.path.join(self.path, OUTLINE_NAME), "r", encoding="utf-8", newline="") as f:
+                return f.read()
+        except Exception:
+            return ""
+
+    def complete(self):
+        self.completed = True
+        self._append({"type": "complete", "chapters": len(self), "at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                try:
+                    self._fh.close()
+                except Exception:
+                    pass
+                self._fh = None
+
+    # ==================== 读取 ====================
+
+    def handle(self, num: int) -> Optional[ChapterHandle]:
+        with self._lock:
+            return self._handles.get(int(num))
+
+    def handles(self) -> List[ChapterHandle]:
+        with self._lock:
+            return [self._handles[k] for k in sorted(self._handles.keys())]
+
+    def text(self, num: int, default: str = "") -> str:
+        h = self.handle(num)
+        if h is None:
+            return default
+        try:
+            return h.read()
+        except Exception:
+            return default
+
+    def iter_text(self, num: int, size: int = 64 * 1024) -> Iterator[str]:
+        h = self.handle(num)
+        if h is None:
+            return iter(())
+        return h.iter_chunks(size)
+
+    def done_chapters(self) -> List[int]:
+        """完整写完的章节号（停止时保存的不完整章节不算）"""
+        with self._lock:
+            return sorted(k for k, h in self._handles.items() if not h.partial)
+
+    def total_chars(self) -> int:
+        with self._lock:
+            return sum(h.chars for h in self._handles.values())
+
+    def describe(self) -> str:
+        h = self.header
+        done = len(self.done_chapters())
+        return (
+            f"书名：{h.get('title', '')}\n类型：{h.get('novel_type', '')}\n主题：{h.get('theme', '')}\n"
+            f"已完成 {done}/{h.get('total_chapters', '?')} 章，共 {self.total_chars()} 字（{h.get('created_at', '')}）"
+        )
+
+    def __contains__(self, num) -> bool:
+        try:
+            key = int(num)
+        except Exception:
+            return False
+        with self._lock:
+            return key in self._handles
+
+    def __getitem__(self, num) -> str:
+        h = self.handle(num)
+        if h is None:
+            raise KeyError(num)
+        return h.read()
+
+    def __setitem__(self, num, text: str):
+        self.put(num, text)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._handles)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.keys())
+
+    def __bool__(self) -> bool:
+        return True
+
+    def keys(self) -> List[int]:
+        with self._lock:
+            return sorted(self._handles.keys())
+
+    def get(self, num, default=None):
+        h = self.handle(num)
+        if h is None:
+            return default
+        try:
+            return h.read()
+        except Exception:
+            return default
+
+
+def load(path: str) -> Optional[ChapterStore]:
+    """从目录恢复；清单最后一行可能只写了一半，忽略；正文文件缺失或字数不符的章节丢弃"""
+    header = None
+    handles: Dict[int, ChapterHandle] = {}
+    completed = False
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    continue
+                kind = rec.get("type")
+                if kind == "run" and header is None:
+                    header = rec
+                elif kind == "chapter":
+                    try:
+                        num = int(rec.get("chapter"))
+                    except Exception:
+                        continue
+                    fp = os.path.join(path, CHAPTERS_DIR_NAME, os.path.basename(str(rec.get("file") or f"{num:04d}.txt")))
+                    handles[num] = ChapterHandle(num, rec.get("title") or "", fp, rec.get("chars") or 0,
+                                                 rec.get("sha1") or "", bool(rec.get("partial")), rec.get("at") or "")
+                    # 完成后又续写 / 重写过的存储，以最后一次 complete 为准
+                    completed = False
+                elif kind == "regenerate":
+                    completed = False
+                    for n in rec.get("chapters") or []:
+                        try:
+                            h = handles.get(int(n))
+                        except Exception:
+                            continue
+                        if h is not None:
+                            h.partial = True
+                elif kind == "complete":
+                    completed = True
+    except Exception:
+        return None
+    if header is None:
+        return None
+    for num in list(handles.keys()):
+        h = handles[num]
+        try:
+            if os.path.getsize(h.path) < h.chars:
+                handles.pop(num)
+        except OSError:
+            handles.pop(num)
+    return ChapterStore(path, header, handles, completed)
+
+
+def list_stores(base_dir: str) -> List[str]:
+    root = store_root(base_dir)
+    try:
+        names = [n for n in os.listdir(root) if os.path.isfile(os.path.join(root, n, MANIFEST_NAME))]
+    except Exception:
+        return []
+    paths = [os.path.join(root, n) for n in names]
+    paths.sort(key=lambda p: os.path.getmtime(os.path.join(p, MANIFEST_NAME)), reverse=True)
+    return paths
+
+
+def latest_for_outline(base_dir: str, outline_sha: str, incomplete_only: bool = False) -> Optional[ChapterStore]:
+    """同一份大纲最近一次的正文存储（incomplete_only 时只找未完成、且已写了至少一章的）"""
+    for path in list_stores(base_dir):
+        store = load(path)
+        if store is None or store.header.get("outline_sha") != outline_sha:
+            continue
+        if incomplete_only and (store.completed or not len(store)):
+            continue
+        return store
+    return None
+
+
+def read_export_zip(path: str) -> Tuple[str, Dict[int, Tuple[str, str]]]:
+    """
+    读取 on_export_zip 导出的 ZIP 包
+
+    Returns:
+        (完整大纲, {章号: (标题, 正文)})；只收录带正文的章节
+    """
+    import zipfile
+
+    outline = ""
+    chapters: Dict[int, Tuple[str, str]] = {}
+    with zipfile.ZipFile(path, "r") as zf:
+        for name in zf.namelist():
+            if name == EXPORT_OUTLINE_NAME:
+                outline = zf.read(name).decode("utf-8", errors="replace")
+                continue
+            m = _EXPORT_CHAPTER_RE.match(name)
+            if not m:
+                continue
+            text = zf.read(name).decode("utf-8", errors="replace")
+            head, sep, body = text.partition(EXPORT_BODY_SEPARATOR)
+            if not sep:
+                continue
+            body = body.lstrip("\n")
+            if not body.strip() or body.strip() == EXPORT_EMPTY_BODY:
+                continue
+            first = head.split("\n", 1)[0].strip()
+            mt = _EXPORT_TITLE_RE.match(first)
+            chapters[int(m.group(1))] = ((mt.group(1).strip() if mt else ""), body)
+    return outline, chapters
+
+
+def parse_chapter_list(text: str) -> List[int]:
+    """"3, 10-12，20" -> [3, 10, 11, 12, 20]"""
+    out = set()
+    for part in re.split(r"[,，、\s]+", text or ""):
+        if not part:
+            continue
+        m = re.match(r"^(\d+)\s*[-—~]\s*(\d+)$", part)
+        if m:
+            a, b = int(m.group(1)), int(m.group(2))
+            if a > b:
+                a, b = b, a
+            out.update(range(a, b + 1))
+        elif part.isdigit():
+            out.add(int(part))
+    return sorted(out)
@@ -0,0 +1,212 @@
+"""
+大纲生成断点日志
+每次生成一个 JSONL 文件（checkpoints/ 目录下），开头一行记录本次运行参数（类型、主题、章数、卷数、
+变化块、优化后的指令等），之后每完成一段追加一行（段落下标、格式化文本、解析出的 JSON、设定集、章节条目）。
+每行写入后立即 fsync，崩溃/断网/停止后都能从第一个未完成的段落继续，已完成的段落不再重复请求。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+CHECKPOINT_DIR_NAME = "checkpoints"
+JOURNAL_SUFFIX = ".jsonl"
+JOURNAL_VERSION = 1
+# 只保留最近的若干份断点，避免目录无限增长
+MAX_JOURNALS = 20
+
+
+def checkpoint_dir(base_dir: str) -> str:
+    return os.path.join(base_dir, CHECKPOINT_DIR_NAME)
+
+
+class RunCheckpoint:
+    """从断点日志恢复出的一次运行"""
+
+    def __init__(self, path: str, header: dict, sections: Dict[int, dict], completed: bool):
+        self.path = path
+        self.header = header
+        self.sections = sections
+        self.completed = completed
+
+    @property
+    def titles(self) -> List[str]:
+        return list(self.header.get("titles") or [])
+
+    def section_texts(self) -> Dict[int, str]:
+        return {i: (rec.get("text") or "") for i, rec in self.sections.items() if rec.get("text")}
+
+    def story_bible(self) -> dict:
+        """最近一次记录的设定集"""
+        for i in sorted(self.sections.keys(), reverse=True):
+            sb = self.sections[i].get("story_bible")
+            if isinstance(sb, dict) and sb:
+                return dict(sb)
+        return dict(self.header.get("story_bible") or {})
+
+    def chapter_items(self) -> List[dict]:
+        by_ch = {}
+        for i in sorted(self.sections.keys()):
+            for it in self.sections[i].get("chapters") or []:
+                try:
+                    by_ch[int(it.get("chapter"))] = it
+                except Exception:
+                    continue
+        return [by_ch[k] for k in sorted(by_ch.keys())]
+
+    def first_incomplete(self) -> int:
+        n = len(self.titles)
+        for i in range(n):
+            if i not in self.sections:
+                return i
+        return n
+
+    def describe(self) -> str:
+        h = self.header
+        done = len(self.section_texts())
+        return (
+            f"类型：{h.get('novel_type', '')}\n主题：{h.get('theme', '')}\n"
+            f"模型：{h.get('provider', '')} / {h.get('model', '')}\n"
+            f"章数：{h.get('chapters', '')}，卷数：{h.get('volumes', '')}\n"
+            f"已完成 {done}/{len(self.titles)} 段（{h.get('created_at', '')}）"
+        )
+
+
+class CheckpointJournal:
+    """追加写入的断点日志；单线程写（调度线程），读取时容忍最后一行被截断"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fh = None
+
+    @classmethod
+    def create(cls, base_dir: str, header: dict, name_hint: str = "") -> "CheckpointJournal":
+        d = checkpoint_dir(base_dir)
+        os.makedirs(d, exist_ok=True)
+        ts = time.strftime("%Y%m%d_%H%M%S")
+        safe = "".join(ch for ch in (name_hint or "outline") if ch not in '\\/:*?"<>|').strip() or "outline"
+        path = os.path.join(d, f"{safe[:40]}_{ts}{JOURNAL_SUFFIX}")
+        journal = cls(path)
+        rec = dict(header)
+        rec["type"] = "run"
+        rec["version"] = JOURNAL_VERSION
+        rec.setdefault("created_at", time.strftime("%Y-%m-%d %H:%M:%S"))
+        journal._append(rec)
+        prune(base_dir)
+        return journal
+
+    @classmethod
+    def reopen(cls, path: str) -> "CheckpointJournal":
+        # 上次崩溃可能留下半行，先补换行，避免与新记录粘在一起
+        try:
+            with open(path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        with open(path, "a", encoding="utf-8") as fa:
+                            fa.write("\n")
+        except Exception:
+            pass
+        return cls(path)
+
+    def _append(self, rec: dict):
+        line = json.dumps(rec, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(line + "\n")
+            self._fh.flush()
+            try:
+                os.fsync(self._fh.fileno())
+            except Exception:
+                pass
+
+    def record_section(self, idx: int, title: str, text: str, data: Any = None, story_bible: Optional[dict] = None,
+                       chapters: Optional[List[dict]] = None):
+        self._append({
+            "type": "section",
+            "idx": int(idx),
+            "title": title,
+            "text": text or "",
+            "data": data,
+            "story_bible": story_bible or {},
+            "chapters": chapters or [],
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def complete(self):
+        self._append({"type": "complete", "at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                try:
+                    self._fh.close()
+                except Exception:
+                    pass
+                self._fh = None
+
+
+def load(path: str) -> Optional[RunCheckpoint]:
+    header = None
+    sections: Dict[int, dict] = {}
+    completed = False
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                kind = rec.get("type")
+                if kind == "run" and header is None:
+                    header = rec
+                elif kind == "section":
+                    try:
+                        sections[int(rec.get("idx"))] = rec
+                    except Exception:
+                        continue
+                elif kind == "complete":
+                    completed = True
+    except Exception:
+        return None
+    if header is None:
+        return None
+    return RunCheckpoint(path, header, sections, completed)
+
+
+def list_journals(base_dir: str) -> List[str]:
+    d = checkpoint_dir(base_dir)
+    try:
+        names = [n for n in os.listdir(d) if n.endswith(JOURNAL_SUFFIX)]
+    except Exception:
+        return []
+    paths = [os.path.join(d, n) for n in names]
+    paths.sort(key=lambda p: os.path.getmtime(p), reverse=True)
+    return paths
+
+
+def latest_incomplete(base_dir: str) -> Optional[RunCheckpoint]:
+    """最近一次未完成、且至少完成了一段的运行"""
+    for path in list_journals(base_dir):
+        cp = load(path)
+        if cp is not None and not cp.completed and cp.sections:
+            return cp
+    return None
+
+
+def prune(base_dir: str, keep: int = MAX_JOURNALS):
+    for path in list_journals(base_dir)[max(1, int(keep)):]:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
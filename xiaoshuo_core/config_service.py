@@ -0,0 +1,152 @@
+"""
+config.json 缓存与热更新
+桌面端原先每次 _load_config_json() 都要探测并解析最多五个 config.json（环境变量指定、打包内置、exe 同目录、
+当前目录、上级目录），而 _load_api_key、_load_mysql_config 等在生成循环里被反复调用；
+web_app 也是每个请求读一遍 config.json。
+
+ConfigService 缓存合并后的结果：
+- get() 在检查间隔内直接返回缓存（只比较一次单调时钟）
+- 超过间隔后对候选文件做 stat()，(路径, mtime_ns, 大小) 全部不变就继续用缓存，变了才重新解析合并
+- 内容变化时通知监听者（如重新配置限流、对冲、响应缓存）
+
+get() 返回的是共享的字典，调用方只读不改；需要修改并写回时请自行读文件，写完调用 invalidate()。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_CHECK_INTERVAL_SECS = 1.0
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+class ConfigService:
+    """
+    按候选路径合并的配置（线程安全）
+
+    Args:
+        candidates: 返回候选路径列表的函数，越靠后优先级越高（后面的覆盖前面的同名键）；
+            每次重新校验时调用，环境变量或工作目录变化也能生效
+        check_interval_secs: 两次 stat() 校验之间的最短间隔
+    """
+
+    def __init__(self, candidates: Callable[[], List[str]], check_interval_secs: float = DEFAULT_CHECK_INTERVAL_SECS):
+        self._candidates = candidates
+        self.check_interval_secs = max(0.0, float(check_interval_secs))
+        self._lock = threading.Lock()
+        self._data: dict = {}
+        self._signature: Optional[Signature] = None
+        self._next_check = 0.0
+        self._listeners: List[Callable[[dict, dict], None]] = []
+        self.checks = 0
+        self.loads = 0
+
+    def get(self) -> dict:
+        if time.monotonic() < self._next_check:
+            return self._data
+        return self._revalidate()
+
+    def invalidate(self):
+        """下一次 get() 立即重新读取（写回 config.json 后调用，避免 mtime 精度不够时漏掉改动）"""
+        with self._lock:
+            self._signature = None
+            self._next_check = 0.0
+
+    def add_listener(self, fn: Callable[[dict, dict], None]):
+        """fn(old, new)：配置内容变化时调用（在触发重新校验的线程里执行）"""
+        with self._lock:
+            if fn not in self._listeners:
+                self._listeners.append(fn)
+        return fn
+
+    def remove_listener(self, fn):
+        with self._lock:
+            if fn in self._listeners:
+                self._listeners.remove(fn)
+
+    def paths(self) -> List[str]:
+        """当前参与合并的文件（按合并顺序）"""
+        return [p for p, _m, _s in self._stat_all()]
+
+    # ==================== 内部 ====================
+
+    def _stat_all(self) -> Signature:
+        out = []
+        seen = set()
+        try:
+            candidates = self._candidates() or []
+        except Exception:
+            candidates = []
+        for p in candidates:
+            if not p or p in seen:
+                continue
+            seen.add(p)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            out.append((p, st.st_mtime_ns, st.st_size))
+        return tuple(out)
+
+    def _revalidate(self) -> dict:
+        changed = None
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_check:
+                return self._data
+            self.checks += 1
+            sig = self._stat_all()
+            if sig != self._signature:
+                merged = {}
+                for p, _m, _s in sig:
+                    try:
+                        with open(p, "r", encoding="utf-8") as f:
+                            data = json.load(f)
+                        if isinstance(data, dict):
+                            merged.update(data)
+                    except Exception:
+                        continue
+                self.loads += 1
+                old = self._data
+                self._data = merged
+                self._signature = sig
+                if self.loads > 1 and merged != old:
+                    changed = (old, merged, list(self._listeners))
+            self._next_check = time.monotonic() + self.check_interval_secs
+            data = self._data
+        if changed is not None:
+            old, new, listeners = changed
+            for fn in listeners:
+                try:
+                    fn(old, new)
+                except Exception:
+                    pass
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"checks": self.checks, "loads": self.loads, "files": len(self._signature or ())}
+
+
+# ==================== 按单个文件共享 ====================
+
+_FILE_SERVICES: Dict[str, ConfigService] = {}
+_FILE_LOCK = threading.Lock()
+
+
+def for_file(path: str) -> ConfigService:
+    """同一路径在进程内共享一个 ConfigService（web_app 按请求读取根目录 config.json 时使用）"""
+    key = os.path.abspath(path)
+    with _FILE_LOCK:
+        svc = _FILE_SERVICES.get(key)
+        if svc is None:
+            svc = ConfigService(lambda: [key])
+            _FILE_SERVICES[key] = svc
+        return svc
+
+
+def load(path: str) -> dict:
+    return for_file(path).get()
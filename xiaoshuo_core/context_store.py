@@ -0,0 +1,277 @@
+"""
+大纲生成上下文存储
+替代 accumulated += ... 与 accumulated[-25000:] / "\n".join(all_chapter_summaries)[-5000:] 的做法：
+设定集、分卷规划、其他段落与逐章梗概分别存为独立片段，并缓存各自的字符数/token 估算。
+每段生成前按预算挑选上下文（设定集 + 本卷规划 + 最近 K 章 + 更早章节的伏笔），
+耗时只与预算和 K 相关，与全书已生成的章节数无关。
+
+app.py 与 web_app 的 AdvancedNovelGenerator 共用。
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .response_cache import estimate_tokens
+
+DEFAULT_BUDGET_CHARS = 25000
+DEFAULT_RECENT_CHAPTERS = 30
+DEFAULT_MAX_HOOKS = 12
+# 向前查找伏笔时最多回看的章数（保证单次构建的耗时有上限）
+HOOK_LOOKBACK_CHAPTERS = 300
+PREV_PLAN_TAIL_CHARS = 1500
+
+BIBLE_TITLES = ("作品名与类型", "作品基础信息", "核心人设", "世界观与设定")
+
+KIND_BIBLE = "bible"
+KIND_PLAN = "plan"
+KIND_BATCH = "batch"
+KIND_SECTION = "section"
+
+_VOLUME_RE = re.compile(r"^\s*第\s*(\d+)\s*卷[:：]\s*分卷规划")
+_BATCH_RE = re.compile(r"章节大纲\s*[（(]?\s*第\s*(\d+)\s*[-—~]\s*(\d+)\s*章")
+_BATCH_VOL_RE = re.compile(r"属于第\s*(\d+)\s*卷")
+_HOOK_RE = re.compile(r"\*\*【悬疑点】\*\*\s*[:：]\s*([^\n]+)")
+
+
+def classify(title: str) -> Tuple[str, Optional[int], Optional[Tuple[int, int]]]:
+    """返回 (片段类型, 卷号, 章节范围)"""
+    t = (title or "").strip()
+    if t in BIBLE_TITLES:
+        return KIND_BIBLE, None, None
+    m = _VOLUME_RE.match(t)
+    if m:
+        return KIND_PLAN, int(m.group(1)), None
+    m = _BATCH_RE.search(t)
+    if m and t.startswith("章节大纲"):
+        mv = _BATCH_VOL_RE.search(t)
+        return KIND_BATCH, (int(mv.group(1)) if mv else None), (int(m.group(1)), int(m.group(2)))
+    return KIND_SECTION, None, None
+
+
+class Segment:
+    __slots__ = ("idx", "title", "text", "kind", "volume", "span", "block", "chars", "tokens")
+
+    def __init__(self, idx: int, title: str, text: str, numbered: bool = True):
+        self.idx = idx
+        self.title = title
+        self.text = text or ""
+        self.kind, self.volume, self.span = classify(title)
+        head = f"### {idx + 1}. {title}" if numbered else f"### {title}"
+        self.block = "\n\n" + head + "\n" + self.text
+        self.chars = len(self.block)
+        self.tokens = estimate_tokens(self.block)
+
+
+class ChapterEntry:
+    __slots__ = ("num", "title", "summary", "volume", "line", "hook", "chars", "tokens")
+
+    def __init__(self, num: int, title: str, summary: str, volume: Optional[int] = None):
+        self.num = int(num)
+        self.title = (title or "").strip()
+        self.summary = (summary or "").strip()
+        self.volume = volume
+        self.line = f"第{self.num}章：{self.summary}"
+        m = _HOOK_RE.search(self.summary)
+        self.hook = f"第{self.num}章伏笔：{m.group(1).strip()}" if m else ""
+        self.chars = len(self.line)
+        self.tokens = estimate_tokens(self.line)
+
+
+def _tail(text: str, limit: int) -> str:
+    if limit <= 0:
+        return ""
+    return text if len(text) <= limit else text[-limit:]
+
+
+class ContextStore:
+    """
+    分片段的上下文存储（线程安全）
+
+    - put_section(idx, title, text, chapters)：段落完成时写入（同一 idx 再写入即覆盖，如卷间衔接改写）
+    - build(title, budget_chars)：为即将生成的段落挑选上下文
+    - chapter_lines(before, lo, max_chars)：某章之前的最近章节梗概
+    - render()：按原顺序拼接的全文（等同原来的 accumulated）
+    """
+
+    def __init__(self, budget_chars: int = DEFAULT_BUDGET_CHARS, recent_chapters: int = DEFAULT_RECENT_CHAPTERS,
+                 max_hooks: int = DEFAULT_MAX_HOOKS, numbered: bool = True):
+        self.budget_chars = max(1000, int(budget_chars))
+        self.recent_chapters = max(1, int(recent_chapters))
+        self.max_hooks = max(0, int(max_hooks))
+        self.numbered = bool(numbered)
+        self._lock = threading.RLock()
+        self._segments: Dict[int, Segment] = {}
+        self._plans: Dict[int, Segment] = {}
+        self._chapters: Dict[int, ChapterEntry] = {}
+        self._rendered: Optional[str] = None
+
+    # ==================== 写入 ====================
+
+    def put_section(self, idx: int, title: str, text: str, chapters: Optional[Iterable[dict]] = None):
+        if not text:
+            return
+        seg = Segment(int(idx), title, text, numbered=self.numbered)
+        with self._lock:
+            old = self._segments.get(seg.idx)
+            if old is not None and old.kind == KIND_PLAN:
+                self._plans.pop(old.volume, None)
+            self._segments[seg.idx] = seg
+            if seg.kind == KIND_PLAN and seg.volume is not None:
+                self._plans[seg.volume] = seg
+            self._rendered = None
+        if chapters:
+            self.put_chapters(chapters, volume=seg.volume)
+
+    def put_chapters(self, items: Iterable[dict], volume: Optional[int] = None):
+        with self._lock:
+            for it in items or []:
+                if not isinstance(it, dict):
+                    continue
+                try:
+                    n = int(it.get("chapter"))
+                except Exception:
+                    continue
+                self._chapters[n] = ChapterEntry(n, it.get("title") or "", it.get("summary") or "", volume)
+
+    # ==================== 读取 ====================
+
+    def chapter_lines(self, before: int, lo: int = 1, max_chars: int = 5000, limit: Optional[int] = None) -> List[str]:
+        """before 之前（不含）、lo 及之后的最近章节梗概，按章号升序；总长不超过 max_chars"""
+        limit = self.recent_chapters if limit is None else max(1, int(limit))
+        picked = []
+        used = 0
+        with self._lock:
+            n = int(before) - 1
+            while n >= max(1, int(lo)) and len(picked) < limit:
+                entry = self._chapters.get(n)
+                n -= 1
+                if entry is None:
+                    continue
+                if used + entry.chars + 1 > max_chars:
+                    break
+                picked.append(entry.line)
+                used += entry.chars + 1
+        picked.reverse()
+        return picked
+
+    def hook_lines(self, before: int, max_chars: int = 2000) -> List[str]:
+        """最近 K 章之外、更早章节里的悬疑点（伏笔），由近及远最多 max_hooks 条"""
+        out = []
+        used = 0
+        with self._lock:
+            n = int(before) - self.recent_chapters - 1
+            stop = max(1, n - HOOK_LOOKBACK_CHAPTERS)
+            while n >= stop and len(out) < self.max_hooks:
+                entry = self._chapters.get(n)
+                n -= 1
+                if entry is None or not entry.hook:
+                    continue
+                if used + len(entry.hook) + 1 > max_chars:
+                    break
+                out.append(entry.hook)
+                used += len(entry.hook) + 1
+        out.reverse()
+        return out
+
+    def build(self, title: str, budget_chars: Optional[int] = None, volume_start: Optional[int] = None) -> str:
+        """
+        为即将生成的段落构建上下文
+
+        Args:
+            title: 段落标题（决定挑选策略）
+            budget_chars: 字符预算，默认使用构造时的 budget_chars
+            volume_start: 只取本卷内的近期章节时传入本卷首章章号
+
+        Returns:
+            拼接好的上下文文本（格式与原 accumulated 片段一致）
+        """
+        budget = self.budget_chars if budget_chars is None else max(1000, int(budget_chars))
+        kind, volume, span = classify(title)
+        chosen: List[Tuple[int, str]] = []
+        remaining = budget
+
+        def take(order: int, text: str, tail_only: bool = True):
+            nonlocal remaining
+            if not text or remaining <= 0:
+                return
+            piece = _tail(text, remaining) if tail_only else text[:remaining]
+            chosen.append((order, piece))
+            remaining -= len(piece)
+
+        with self._lock:
+            bible = sorted((s for s in self._segments.values() if s.kind == KIND_BIBLE), key=lambda s: s.idx)
+            others = sorted((s for s in self._segments.values() if s.kind == KIND_SECTION), key=lambda s: s.idx)
+            for seg in bible:
+                take(seg.idx, seg.block, tail_only=False)
+
+            if kind == KIND_BATCH and span is not None:
+                a = span[0]
+                own = self._plans.get(volume) if volume is not None else None
+                if own is None:
+                    own = self._plan_for_chapter(a)
+                if own is not None:
+                    take(own.idx, own.block)
+                lo = int(volume_start) if volume_start else 1
+                lines = self.chapter_lines(a, lo=lo, max_chars=max(0, remaining - 200))
+                if lines:
+                    take(10 ** 8 + a, "\n\n【近期章节梗概】\n" + "\n".join(lines))
+                hooks = self.hook_lines(a, max_chars=min(2000, max(0, remaining - 200)))
+                if hooks:
+                    take(10 ** 8 + a - 1, "\n\n【前文伏笔（待回收）】\n" + "\n".join(hooks))
+                prev = self._plans.get(own.volume - 1) if own is not None and own.volume else None
+                if prev is not None:
+                    take(prev.idx, _tail(prev.block, PREV_PLAN_TAIL_CHARS))
+                for seg in others:
+                    take(seg.idx, seg.block)
+            elif kind == KIND_PLAN:
+                prev = self._plans.get(volume - 1) if volume else None
+                if prev is not None:
+                    take(prev.idx, prev.block)
+                for seg in others:
+                    take(seg.idx, seg.block)
+                last = max(self._chapters.keys()) if self._chapters else 0
+                if last:
+                    lines = self.chapter_lines(last + 1, max_chars=min(4000, max(0, remaining - 200)), limit=10)
+                    if lines:
+                        take(10 ** 8, "\n\n【近期章节梗概】\n" + "\n".join(lines))
+            else:
+                for seg in others:
+                    take(seg.idx, seg.block)
+                last = max(self._chapters.keys()) if self._chapters else 0
+                if last:
+                    lines = self.chapter_lines(last + 1, max_chars=min(4000, max(0, remaining - 200)), limit=10)
+                    if lines:
+                        take(10 ** 8, "\n\n【近期章节梗概】\n" + "\n".join(lines))
+                for v in sorted(self._plans.keys()):
+                    seg = self._plans[v]
+                    take(seg.idx, seg.block)
+
+        chosen.sort(key=lambda x: x[0])
+        return "".join(text for _, text in chosen)
+
+    def _plan_for_chapter(self, chapter: int) -> Optional[Segment]:
+        """标题里没有卷号时（如 web_app 的批次），取最后一个已完成的分卷规划"""
+        if not self._plans:
+            return None
+        return self._plans[max(self._plans.keys())]
+
+    def render(self) -> str:
+        with self._lock:
+            if self._rendered is None:
+                self._rendered = "".join(self._segments[i].block for i in sorted(self._segments.keys()))
+            return self._rendered
+
+    def chapter_count(self) -> int:
+        with self._lock:
+            return len(self._chapters)
+
+    def sizes(self) -> dict:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "chapters": len(self._chapters),
+                "chars": sum(s.chars for s in self._segments.values()),
+                "tokens": sum(s.tokens for s in self._segments.values()),
+                "chapter_tokens": sum(c.tokens for c in self._chapters.values()),
+            }
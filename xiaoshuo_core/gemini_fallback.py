@@ -0,0 +1,256 @@
+"""
+Gemini 调用的重试与模型切换循环（唯一实现）
+桌面端 _generate_with_fallback 直接调用；异步引擎 async_providers 把它放进工作线程执行，
+Flask/FastAPI 后端与桌面端走同一套限流等待、空响应退避、熔断路由、对冲与响应缓存规则。
+
+界面相关的动作通过回调注入：
+- notify(text)：“切换模型/xx秒后重试”等提示文本
+- on_rate_limit(delay)：遇到 429 时的等待秒数（桌面端用于刷新预计剩余时间）
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from . import hedging
+from . import model_router
+from . import provider_clients
+from . import rate_limiter
+from . import request_executor
+from . import response_cache
+from . import retry_policy
+
+DEFAULT_TIMEOUT_SECS = 180
+DEFAULT_MAX_REQUEST_RETRIES = 2
+DEFAULT_MAX_EMPTY_RETRIES = 8
+DEFAULT_MAX_RATE_LIMIT_RETRIES = 3
+
+
+def _wait(cancel_event: Optional[threading.Event], secs: float) -> bool:
+    """等待 secs 秒；期间被取消返回 True"""
+    if cancel_event is None:
+        time.sleep(secs)
+        return False
+    return cancel_event.wait(secs)
+
+
+def _generate_hedged(client, model: str, hedge_model: Optional[str], contents, config, timeout_secs: int,
+                     key_id: str, prompt_tokens: int, cancel_event, logger) -> Tuple[str, object, float]:
+    """返回 (实际胜出的模型, 响应, 该模型本次请求的耗时秒数)"""
+    # 超过该模型历史 p90 仍未返回时，向下一个模型发对冲请求，先返回有效内容者胜出
+    delay = hedging.hedge_delay("gemini", model) if hedge_model else None
+    started = time.time()
+    if delay is None:
+        resp = request_executor.gemini_generate(
+            request_executor.get_executor(),
+            client,
+            model=model,
+            contents=contents,
+            config=config,
+            timeout_secs=timeout_secs,
+            cancel_event=cancel_event,
+        )
+        return model, resp, time.time() - started
+    hedge_started = []
+
+    def _begin_hedge() -> bool:
+        # 对冲请求同样要过熔断与 RPM/TPM；限流需要排队时不对冲（排队就失去了对冲的意义）
+        if not model_router.try_begin("gemini", hedge_model):
+            return False
+        if not rate_limiter.try_acquire("gemini", hedge_model, key_id, prompt_tokens):
+            model_router.release("gemini", hedge_model)
+            return False
+        hedge_started.append(time.time())
+        return True
+
+    cfg = request_executor.with_request_timeout(config, timeout_secs)
+    winner = None
+    try:
+        winner, resp = hedging.run(
+            lambda: client.models.generate_content(model=model, contents=contents, config=cfg),
+            lambda: client.models.generate_content(model=hedge_model, contents=contents, config=cfg),
+            delay,
+            lambda r: bool(retry_policy.extract_gemini_text(r)),
+            timeout_secs,
+            cancel_event=cancel_event,
+            hedge_gate=_begin_hedge,
+        )
+    finally:
+        if hedge_started and winner != "hedge":
+            # 对冲方没有胜出（结果被放弃或整体失败），不对它下健康结论
+            model_router.release("gemini", hedge_model)
+    if winner == "hedge":
+        if logger:
+            logger.info(f"对冲请求胜出: {hedge_model}（{model} 超过 {delay:.0f}s 未返回）")
+        return hedge_model, resp, time.time() - hedge_started[0]
+    return model, resp, time.time() - started
+
+
+def generate(
+    client,
+    models: List[str],
+    contents,
+    config,
+    cancel_event: Optional[threading.Event] = None,
+    notify: Optional[Callable[[str], None]] = None,
+    on_rate_limit: Optional[Callable[[int], None]] = None,
+    logger=None,
+    max_request_retries: int = DEFAULT_MAX_REQUEST_RETRIES,
+    max_empty_retries: int = DEFAULT_MAX_EMPTY_RETRIES,
+    max_rate_limit_retries: int = DEFAULT_MAX_RATE_LIMIT_RETRIES,
+    timeout_secs: int = DEFAULT_TIMEOUT_SECS,
+    use_cache: bool = True,
+    cache_nonce: str = "",
+) -> str:
+    """
+    按模型列表依次调用 Gemini，直到拿到非空文本
+
+    Args:
+        client: genai.Client
+        models: 候选模型（按记分板重新排序，熔断中的跳过；全部熔断时按原顺序强制尝试）
+        contents / config: generate_content 的参数
+        cancel_event: 置位后尽快返回空字符串（含限流排队与退避等待）
+        notify / on_rate_limit: 界面提示回调，见模块说明
+        logger: 可选日志对象
+        max_request_retries: 普通异常的重试次数
+        max_empty_retries: 空响应累计重试上限
+        max_rate_limit_retries: 429 限流的重试次数
+        timeout_secs: 单次请求超时
+        use_cache: 是否读写响应缓存；纠错/补全类重试（同一提示词再问一次）需关闭，避免命中上一次不合格的结果
+        cache_nonce: 参与缓存键的附加内容（如本次生成的随机变体）
+
+    Returns:
+        生成的文本；全部失败或被取消时返回空字符串
+    """
+    def _notify(text: str):
+        if notify:
+            notify(text)
+
+    cache_key = None
+    if use_cache and response_cache.get_cache() is not None:
+        cache_key = response_cache.make_key("gemini", list(models), None, contents, config, nonce=cache_nonce or "")
+        cached = response_cache.lookup(cache_key)
+        if cached:
+            if logger:
+                logger.info(f"命中响应缓存，跳过请求 | 模型 {models[0] if models else ''}")
+            return cached
+    key_id = provider_clients.key_fingerprint_of(client)
+    prompt_tokens = response_cache.request_tokens(contents, config)
+    # 按记分板（成功率/空响应率/延迟/熔断）动态排序；全部熔断时强制按原顺序尝试
+    force_attempt = model_router.all_open("gemini", list(models))
+    routed = model_router.order("gemini", list(models))
+    if logger and routed != list(models):
+        logger.info(f"模型路由调整顺序: {' -> '.join(routed)}")
+    models = routed
+    total_empty_retries = 0
+    for idx, m in enumerate(models):
+        if cancel_event is not None and cancel_event.is_set():
+            return ""
+        request_retries = 0
+        consecutive_empty = 0
+        if idx > 0:
+            _notify(f"\n[系统] 切换模型：{m}\n")
+            if logger:
+                logger.info(f"切换模型: {m}")
+
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return ""
+            # 先看熔断再取令牌：熔断跳过的模型不占 RPM/TPM 额度
+            if not model_router.try_begin("gemini", m) and not force_attempt:
+                if logger:
+                    logger.warning(f"模型 {m} 熔断中，跳过")
+                break
+            # 共享令牌桶：所有线程按 RPM/TPM 取令牌，任一线程遇到 429 时一起退避
+            if not rate_limiter.acquire("gemini", m, key_id, tokens=prompt_tokens, cancel_event=cancel_event):
+                model_router.release("gemini", m)
+                return ""
+            started = time.time()
+            hedge_model = models[idx + 1] if idx + 1 < len(models) else None
+            try:
+                used, resp, used_secs = _generate_hedged(client, m, hedge_model, contents, config, timeout_secs,
+                                                         key_id, prompt_tokens, cancel_event, logger)
+                text = retry_policy.extract_gemini_text(resp)
+                if not text:
+                    raise ValueError(retry_policy.EMPTY_RESPONSE_MESSAGE)
+
+                # 对冲胜出时只计对冲请求自身的耗时；被放弃的主请求记一条“至少这么慢”的样本，p90 才不会被低估
+                model_router.record_success("gemini", used, used_secs)
+                if used != m:
+                    model_router.record_slow("gemini", m, time.time() - started)
+                rate_limiter.consume("gemini", used, key_id, response_cache.estimate_tokens(text))
+                if cache_key:
+                    response_cache.store(cache_key, text, "gemini", used, tokens=prompt_tokens + response_cache.estimate_tokens(text))
+                return text
+
+            except request_executor.RequestCancelled:
+                model_router.release("gemini", m)
+                rate_limiter.release("gemini", m, key_id, prompt_tokens)
+                return ""
+            except Exception as e:
+                msg = str(e)
+                if retry_policy.is_free_tier_block(msg):
+                    model_router.record_failure("gemini", m, "free_tier")
+                elif retry_policy.is_empty_response(msg):
+                    model_router.record_failure("gemini", m, "empty")
+                elif retry_policy.is_rate_limit(msg):
+                    model_router.release("gemini", m)
+                elif isinstance(e, TimeoutError):
+                    model_router.record_failure("gemini", m, "timeout", time.time() - started)
+                else:
+                    model_router.record_failure("gemini", m, "error")
+
+                # 处理免费层配额耗尽
+                if retry_policy.is_free_tier_block(msg):
+                    if logger:
+                        logger.warning(f"免费层限制，跳过模型 {m}")
+                    break
+
+                if retry_policy.is_empty_response(msg):
+                    total_empty_retries += 1
+                    consecutive_empty += 1
+                    if logger:
+                        logger.warning(f"空响应: {msg}。正在重试 ({total_empty_retries}/{max_empty_retries}) | 模型 {m}")
+                    if total_empty_retries >= max_empty_retries:
+                        if logger:
+                            logger.error(f"空响应达到上限，放弃本次请求 | 模型 {m}")
+                        return ""
+                    if consecutive_empty >= 2 and idx < (len(models) - 1):
+                        if logger:
+                            logger.warning(f"空响应连续出现，提前切换到下一个模型 | 当前模型 {m}")
+                        break
+                    wait_time = retry_policy.empty_backoff(consecutive_empty)
+                    _notify(f"\n[系统] 模型返回空内容，{wait_time}s后重试...\n")
+                    if _wait(cancel_event, wait_time):
+                        return ""
+                    continue
+                consecutive_empty = 0
+
+                # 处理速率限制 (429)
+                if retry_policy.is_rate_limit(msg):
+                    rate_limiter.penalize("gemini", m, key_id, retry_policy.parse_retry_delay(msg))
+                if retry_policy.is_rate_limit(msg) and request_retries < max_rate_limit_retries:
+                    delay = retry_policy.parse_retry_delay(msg)
+                    _notify(f"\n[系统] 达到配额限制，{delay}s后重试...\n")
+                    if on_rate_limit:
+                        on_rate_limit(delay)
+                    if logger:
+                        logger.warning(f"限流，等待 {delay}s 后重试，模型 {m}")
+                    # 等待由共享令牌桶在下一次取令牌时完成
+                    request_retries += 1
+                    continue
+
+                # 处理其他网络错误或未知错误（增加通用重试）
+                if request_retries < max_request_retries:
+                    wait_time = retry_policy.request_backoff(request_retries)
+                    _notify(f"\n[系统] 请求遇到问题（{msg[:50]}...），{wait_time}s后重试...\n")
+                    if logger:
+                        logger.warning(f"请求异常: {msg}。正在重试 ({request_retries + 1}/{max_request_retries})")
+                    if _wait(cancel_event, wait_time):
+                        return ""
+                    request_retries += 1
+                    continue
+                if logger:
+                    logger.error(f"模型 {m} 调用最终失败: {msg}")
+                break
+    return ""
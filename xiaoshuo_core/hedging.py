@@ -0,0 +1,245 @@
+"""
+对冲请求（降低长尾延迟）
+请求在该模型历史 p90 延迟内仍未返回时，向下一个最优模型再发一份；
+先拿到有效结果的一方胜出，另一方被放弃。每次生成有额外请求预算上限，并统计对冲节省的墙钟时间。
+
+在 config.json 中开启：
+    "hedging": {"enabled": true, "budget": 20, "min_delay_secs": 15, "min_samples": 5}
+"""
+
+import concurrent.futures
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from . import model_router
+from . import request_executor
+
+DEFAULT_BUDGET = 20
+DEFAULT_MIN_DELAY_SECS = 15
+DEFAULT_MIN_SAMPLES = 5
+HEDGE_PERCENTILE = 0.9
+_POLL_INTERVAL_SECS = 0.5
+
+
+class HedgeController:
+    """
+    对冲控制器
+
+    - hedge_delay(provider, model)：返回触发对冲的等待秒数，样本不足或未启用时返回 None
+    - run(primary_fn, hedge_fn, delay_secs, ...)：执行（可能对冲的）请求，返回 (胜出方, 结果)
+    """
+
+    def __init__(self, enabled: bool = False, budget: int = DEFAULT_BUDGET, min_delay_secs: float = DEFAULT_MIN_DELAY_SECS,
+                 min_samples: int = DEFAULT_MIN_SAMPLES):
+        self._lock = threading.Lock()
+        self.enabled = bool(enabled)
+        self.budget = max(0, int(budget))
+        self.min_delay_secs = max(1.0, float(min_delay_secs))
+        self.min_samples = max(1, int(min_samples))
+        self._spent = 0
+        self._fired = 0
+        self._hedge_wins = 0
+        self._primary_wins = 0
+        self._saved_secs = 0.0
+
+    def configure(self, node: Optional[dict]):
+        node = node if isinstance(node, dict) else {}
+        with self._lock:
+            self.enabled = bool(node.get("enabled"))
+            try:
+                self.budget = max(0, int(node.get("budget", DEFAULT_BUDGET)))
+            except Exception:
+                self.budget = DEFAULT_BUDGET
+            try:
+                self.min_delay_secs = max(1.0, float(node.get("min_delay_secs", DEFAULT_MIN_DELAY_SECS)))
+            except Exception:
+                self.min_delay_secs = DEFAULT_MIN_DELAY_SECS
+            try:
+                self.min_samples = max(1, int(node.get("min_samples", DEFAULT_MIN_SAMPLES)))
+            except Exception:
+                self.min_samples = DEFAULT_MIN_SAMPLES
+
+    def start_run(self):
+        """新一轮生成开始：重置预算与统计"""
+        with self._lock:
+            self._spent = 0
+            self._fired = 0
+            self._hedge_wins = 0
+            self._primary_wins = 0
+            self._saved_secs = 0.0
+
+    def _try_spend(self) -> bool:
+        with self._lock:
+            if self._spent >= self.budget:
+                return False
+            self._spent += 1
+            self._fired += 1
+            return True
+
+    def _unspend(self):
+        with self._lock:
+            self._spent = max(0, self._spent - 1)
+            self._fired = max(0, self._fired - 1)
+
+    def _add_saved(self, secs: float):
+        with self._lock:
+            self._saved_secs += max(0.0, secs)
+
+    def hedge_delay(self, provider: str, model: str) -> Optional[float]:
+        if not self.enabled or self.budget <= 0:
+            return None
+        p90, samples = model_router.latency_percentile(provider, model, HEDGE_PERCENTILE)
+        if samples < self.min_samples:
+            return None
+        return max(self.min_delay_secs, p90)
+
+    def run(
+        self,
+        primary_fn: Callable[[], Any],
+        hedge_fn: Optional[Callable[[], Any]],
+        delay_secs: Optional[float],
+        is_valid: Callable[[Any], bool],
+        timeout_secs: float,
+        cancel_event: Optional[threading.Event] = None,
+        executor: Optional[request_executor.RequestExecutor] = None,
+        hedge_gate: Optional[Callable[[], bool]] = None,
+    ) -> Tuple[str, Any]:
+        """
+        执行请求，必要时对冲
+
+        Args:
+            primary_fn: 主请求
+            hedge_fn: 对冲请求（None 表示不对冲）
+            delay_secs: 主请求等待多久后发出对冲
+            is_valid: 判断结果是否有效（如非空文本）
+            timeout_secs: 整体截止时间
+            cancel_event: 取消事件
+            hedge_gate: 发出对冲前调用（如熔断检查、取限流令牌）；返回 False 则本次不再对冲，也不占预算
+
+        Returns:
+            ("primary" | "hedge", 结果)；两方都无有效结果时按主请求的结果返回/抛出其异常
+        """
+        ex = executor or request_executor.get_executor()
+        start = time.monotonic()
+        deadline = start + max(1.0, float(timeout_secs))
+        handles = {"primary": ex.submit(primary_fn)}
+        outcomes = {}
+        hedged = False
+        while True:
+            for name, h in handles.items():
+                if name in outcomes or not h.future.done():
+                    continue
+                try:
+                    outcomes[name] = ("ok", h.future.result())
+                except BaseException as e:
+                    outcomes[name] = ("err", e)
+                kind, payload = outcomes[name]
+                if kind == "ok" and is_valid(payload):
+                    self._finish(name, handles, hedged)
+                    return name, payload
+
+            if len(outcomes) == len(handles):
+                kind, payload = outcomes["primary"]
+                if kind == "err":
+                    raise payload
+                return "primary", payload
+
+            now = time.monotonic()
+            if cancel_event is not None and cancel_event.is_set():
+                for h in handles.values():
+                    h.abandon()
+                ex.note_cancelled()
+                raise request_executor.RequestCancelled("request cancelled")
+            if now >= deadline:
+                for h in handles.values():
+                    h.abandon()
+                ex.note_timeout()
+                raise TimeoutError(f"Gemini request timeout after {timeout_secs}s")
+            if (not hedged) and hedge_fn is not None and delay_secs is not None and "primary" not in outcomes \
+                    and now - start >= delay_secs and self._try_spend():
+                if hedge_gate is None or hedge_gate():
+                    handles["hedge"] = ex.submit(hedge_fn)
+                else:
+                    self._unspend()
+                    hedge_fn = None
+                hedged = hedge_fn is not None
+
+            pending = [h.future for n, h in handles.items() if n not in outcomes]
+            wait = min(_POLL_INTERVAL_SECS, max(0.0, deadline - now))
+            if (not hedged) and hedge_fn is not None and delay_secs is not None:
+                wait = min(wait, max(0.0, start + delay_secs - now))
+            concurrent.futures.wait(pending, timeout=max(0.01, wait), return_when=concurrent.futures.FIRST_COMPLETED)
+
+    def _finish(self, winner: str, handles: dict, hedged: bool):
+        if not hedged:
+            return
+        won_at = time.monotonic()
+        with self._lock:
+            if winner == "hedge":
+                self._hedge_wins += 1
+            else:
+                self._primary_wins += 1
+        for name, h in handles.items():
+            if name == winner:
+                continue
+            if winner == "hedge":
+                # 被放弃的主请求最终结束（或被 SDK 超时断开）的时刻，即不对冲时要等到的时刻
+                h.future.add_done_callback(lambda _f: self._add_saved(time.monotonic() - won_at))
+            h.abandon()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "budget": self.budget,
+                "fired": self._fired,
+                "budget_left": max(0, self.budget - self._spent),
+                "hedge_wins": self._hedge_wins,
+                "primary_wins": self._primary_wins,
+                "saved_secs": round(self._saved_secs, 1),
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        if not s["enabled"]:
+            return "对冲请求未启用"
+        return (
+            f"对冲请求 {s['fired']}/{s['budget']} 次，对冲胜出 {s['hedge_wins']} 次，"
+            f"主请求胜出 {s['primary_wins']} 次，节省约 {s['saved_secs']}s"
+        )
+
+
+_CONTROLLER: Optional[HedgeController] = None
+_CONTROLLER_LOCK = threading.Lock()
+
+
+def get_controller() -> HedgeController:
+    global _CONTROLLER
+    if _CONTROLLER is None:
+        with _CONTROLLER_LOCK:
+            if _CONTROLLER is None:
+                _CONTROLLER = HedgeController()
+    return _CONTROLLER
+
+
+def configure(cfg: Optional[dict]):
+    """读取 config.json 的 hedging 节点"""
+    get_controller().configure(cfg.get("hedging") if isinstance(cfg, dict) else None)
+
+
+def start_run():
+    get_controller().start_run()
+
+
+def hedge_delay(provider: str, model: str) -> Optional[float]:
+    return get_controller().hedge_delay(provider, model)
+
+
+def run(primary_fn, hedge_fn, delay_secs, is_valid, timeout_secs, cancel_event=None, executor=None, hedge_gate=None) -> Tuple[str, Any]:
+    return get_controller().run(primary_fn, hedge_fn, delay_secs, is_valid, timeout_secs, cancel_event=cancel_event, executor=executor,
+                                hedge_gate=hedge_gate)
+
+
+def format_stats() -> str:
+    return get_controller().format_stats()
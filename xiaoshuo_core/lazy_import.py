@@ -0,0 +1,60 @@
+"""
+延迟导入
+google.genai（约 0.7 s）、requests（约 0.1 s）等在模块顶部导入时，桌面端在显示登录界面之前就要付出这部分时间，
+PyInstaller 打包后每次启动都如此。这里用一个代理对象占位，第一次访问属性时才真正导入，
+调用处的写法（types.GenerateContentConfig、requests.HTTPError 等）保持不变。
+
+实际导入耗时会记入 startup_profile，便于在启动报告里看到由谁、在何时触发了重模块的加载。
+"""
+
+import importlib
+import threading
+import time
+
+
+class LazyModule:
+    """模块代理：首次访问属性时 import_module(name)，之后直接转发"""
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        mod = self.__dict__["_module"]
+        if mod is not None:
+            return mod
+        name = self.__dict__["_name"]
+        with self.__dict__["_lock"]:
+            mod = self.__dict__["_module"]
+            if mod is None:
+                t0 = time.perf_counter()
+                mod = importlib.import_module(name)
+                elapsed = time.perf_counter() - t0
+                self.__dict__["_module"] = mod
+                from . import startup_profile
+                startup_profile.record_import(name, elapsed)
+        return mod
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def is_loaded(module) -> bool:
+    if isinstance(module, LazyModule):
+        return module.__dict__["_module"] is not None
+    return True
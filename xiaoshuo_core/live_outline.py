@@ -0,0 +1,197 @@
+"""
+桌面端输出框的实时章节索引
+原先每次点“解析”或润色完成后，都把输出框全文重新切分一遍、从头重建 chapters_data / all_chapter_summaries，
+几百 KB 的大纲会让界面卡顿。
+
+这里保存上一次解析时的文本与各章节/卷标题的偏移、已解析出的章节记录。输出框的 <<Modified>> 事件只负责
+标记“有改动”（Tk 不提供改动位置），真正的脏区在后台线程里通过与上次文本比较公共前缀/后缀得到，
+再只对覆盖脏区的那几个章节重新切分，其余章节按偏移平移并复用已有记录。
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from . import outline_tokenizer
+
+# 输出框停止改动多久后在后台刷新索引（流式生成时持续插入，会一直顺延）
+DEBOUNCE_MS = 600
+# 脏区超过全文这个比例时直接整体重建（如润色后整体替换）
+REBUILD_RATIO = 0.5
+
+
+def normalize(text: str) -> str:
+    """与 _sync_chapters_from_text 原有的处理一致：统一换行并去掉首尾空白"""
+    return (text or "").replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def _common_prefix(a: str, b: str) -> int:
+    # 二分 + 切片比较：比较在 C 层按内存进行，比逐字符循环快得多
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, min(len(a), len(b), limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class _Entry:
+    """章节或卷标题；start/end 为在当前文本中的字符偏移"""
+
+    __slots__ = ("kind", "number", "start", "end", "volume", "record")
+
+    def __init__(self, kind, number, start, end, record=None):
+        self.kind = kind
+        self.number = number
+        self.start = start
+        self.end = end
+        self.volume = None
+        self.record = record
+
+
+def _entries_from(text: str, base: int = 0) -> List[_Entry]:
+    out = []
+    for tok in outline_tokenizer.tokenize(text).tokens:
+        if tok.kind == outline_tokenizer.KIND_HEADING:
+            continue
+        rec = tok.chapter_record() if tok.kind == outline_tokenizer.KIND_CHAPTER else None
+        out.append(_Entry(tok.kind, tok.number, tok.start + base, tok.end + base, rec))
+    return out
+
+
+class ParseResult:
+    """一次 update 的结果"""
+
+    def __init__(self, text: str, items: List[dict], changed: Set[int], full: bool, reparsed_chars: int,
+                 elapsed: float):
+        self.text = text
+        self.items = items
+        self.changed = changed
+        self.full = full
+        self.reparsed_chars = reparsed_chars
+        self.elapsed = elapsed
+
+    def describe(self) -> str:
+        mode = "全量" if self.full else "增量"
+        return (f"{mode}解析 {len(self.items)} 章，变动 {len(self.changed)} 章，"
+                f"重新切分 {self.reparsed_chars}/{len(self.text)} 字符，耗时 {self.elapsed * 1000:.1f} ms")
+
+
+class LiveOutline:
+    """
+    输出框文本的章节索引（线程安全）
+
+    - update(text)：把索引更新到 text，只重新切分改动所在的章节；返回 ParseResult
+    - items(empty_summary)：按章号排序的 [{chapter, title, summary}]，同一章号以后出现的为准
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._text: Optional[str] = None
+        self._entries: List[_Entry] = []
+        self._starts: List[int] = []
+
+    @property
+    def text(self) -> Optional[str]:
+        return self._text
+
+    def update(self, text: str, empty_summary: str = "无内容") -> ParseResult:
+        t0 = time.perf_counter()
+        new = normalize(text)
+        with self._lock:
+            old = self._text
+            if old is None or not old or not new:
+                changed = self._rebuild(new)
+                full, reparsed = True, len(new)
+            elif old == new:
+                changed, full, reparsed = set(), False, 0
+            else:
+                p = _common_prefix(old, new)
+                s = _common_suffix(old, new, min(len(old), len(new)) - p)
+                if (len(old) - s - p) > len(old) * REBUILD_RATIO:
+                    changed = self._rebuild(new)
+                    full, reparsed = True, len(new)
+                else:
+                    changed, reparsed = self._splice(old, new, p, len(old) - s)
+                    full = False
+            items = self._items(empty_summary)
+        return ParseResult(new, items, changed, full, reparsed, time.perf_counter() - t0)
+
+    # ==================== 内部 ====================
+
+    def _rebuild(self, new: str) -> Set[int]:
+        before = {e.number for e in self._entries if e.kind == outline_tokenizer.KIND_CHAPTER}
+        self._entries = _entries_from(new)
+        self._finish(new)
+        return before | {e.number for e in self._entries if e.kind == outline_tokenizer.KIND_CHAPTER}
+
+    def _splice(self, old: str, new: str, a: int, b_old: int):
+        """
+        旧文本 [a, b_old) 被替换；重新切分的范围：
+
+        - 起点：起点早于 a 的倒数第二个标题（最后一个标题的标题行本身可能被改掉，
+          那时它的正文要并入前一个标题，所以再往前退一个；前一个标题行一定完好）
+        - 终点：第一个起点晚于 b_old 的标题（它的标题行和前面的换行都没被改动，章节必然止于此）
+        """
+        entries = self._entries
+        starts = self._starts
+        k = bisect.bisect_left(starts, a)
+        first = k - 2 if k >= 2 else 0
+        lo = starts[first] if k >= 2 else 0
+        j = bisect.bisect_right(starts, b_old)
+        hi_old = starts[j] if j < len(starts) else len(old)
+        delta = len(new) - len(old)
+
+        fresh = _entries_from(new[lo:hi_old + delta], base=lo)
+        tail = entries[j:]
+        for e in tail:
+            e.start += delta
+            e.end += delta
+        self._entries = entries[:first] + fresh + tail
+        self._finish(new)
+
+        changed = {e.number for e in entries[first:j] if e.kind == outline_tokenizer.KIND_CHAPTER}
+        changed |= {e.number for e in fresh if e.kind == outline_tokenizer.KIND_CHAPTER}
+        return changed, hi_old + delta - lo
+
+    def _finish(self, new: str):
+        current = None
+        for e in self._entries:
+            if e.kind == outline_tokenizer.KIND_VOLUME:
+                current = e.number
+            else:
+                e.volume = current
+        self._starts = [e.start for e in self._entries]
+        self._text = new
+
+    def _items(self, empty_summary: str) -> List[dict]:
+        by_ch: Dict[int, dict] = {}
+        for e in self._entries:
+            if e.record is not None:
+                by_ch[e.number] = e.record
+        out = []
+        for n in sorted(by_ch.keys()):
+            # 返回副本：调用方会原地修改 chapters_data 里的条目
+            rec = dict(by_ch[n])
+            if not rec["summary"] and empty_summary:
+                rec["summary"] = empty_summary
+            out.append(rec)
+        return out
+
+    def items(self, empty_summary: str = "无内容") -> List[dict]:
+        with self._lock:
+            return self._items(empty_summary)
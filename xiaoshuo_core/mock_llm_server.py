@@ -0,0 +1,581 @@
+"""
+本地模拟 LLM 服务（离线压测 / 回归用）
+同时实现三种线上协议，任意流水线都能在不联网、速度可控的情况下端到端跑通：
+- Gemini：POST /v1beta/models/{model}:generateContent 与 :streamGenerateContent?alt=sse
+- OpenAI 兼容（豆包）：POST .../chat/completions（支持 stream: true）
+- Anthropic：POST .../messages（支持 stream: true）
+
+可注入的故障与延迟：
+- 延迟分布：fixed:1.5 / uniform:0.5,3 / lognormal:2,0.5（均值秒, sigma）
+- 429（Gemini 带 retryDelay，HTTP 接口带 Retry-After）、空响应、非法 JSON
+
+录制 / 回放：
+- --record DIR：把请求转发到真实上游并把响应存为夹具
+- --replay DIR：按请求内容命中夹具直接返回（未命中时生成合成内容，或加 --strict 返回 404）
+  夹具键不含桌面端每次生成的随机变体段（变体 ID/时间/随机人名），同一流程录制后可以重复回放
+
+用法：
+    python -m xiaoshuo_core.mock_llm_server --port 8808 --latency lognormal:2,0.5 --rate-429 0.05
+然后在 config.json 中把 gemini_base_url / doubao_base_url / claude_base_url 指向 http://127.0.0.1:8808
+（claude_base_url 需写完整路径 http://127.0.0.1:8808/v1/messages）。
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_UPSTREAMS = {
+    "gemini": "https://generativelanguage.googleapis.com",
+    "openai": "https://ark.cn-beijing.volces.com",
+    "anthropic": "https://api.anthropic.com",
+}
+
+# 不参与夹具键计算、也不写入夹具的请求头（密钥等）
+_SECRET_HEADERS = {"authorization", "x-api-key", "x-goog-api-key"}
+
+_FILLER = (
+    "夜色压在江面上，码头的灯一盏接一盏亮起。他把外套领子竖起来，沿着堆场往里走，"
+    "脚步声被集装箱之间的风吞掉。手机震了一下，是一条没有署名的短信，只写着一个时间。"
+    "他停下来，回头看了一眼来路，雨水顺着帽檐滴下，落在那份还没来得及交出去的材料上。"
+    "办公室里的灯还亮着，桌上摊着三年前的案卷，页码中间少了两页。"
+)
+
+
+# ==================== 延迟分布 ====================
+
+class LatencyModel:
+    """解析 fixed:x / uniform:a,b / lognormal:mean,sigma"""
+
+    def __init__(self, spec: str = "fixed:0", rng: Optional[random.Random] = None):
+        self.spec = (spec or "fixed:0").strip()
+        self.rng = rng or random.Random()
+        kind, _, args = self.spec.partition(":")
+        vals = [float(x) for x in args.split(",") if x.strip()] if args else []
+        self.kind = kind.strip().lower()
+        self.args = vals
+
+    def sample(self) -> float:
+        if self.kind == "uniform" and len(self.args) >= 2:
+            return max(0.0, self.rng.uniform(self.args[0], self.args[1]))
+        if self.kind == "lognormal" and self.args:
+            mean = max(1e-3, self.args[0])
+            sigma = self.args[1] if len(self.args) > 1 else 0.5
+            mu = math.log(mean) - sigma * sigma / 2
+            return max(0.0, self.rng.lognormvariate(mu, sigma))
+        return max(0.0, self.args[0] if self.args else 0.0)
+
+
+# ==================== 合成内容 ====================
+
+def _chapter_numbers(prompt: str):
+    m = re.search(r"缺失章号[：:]\s*([0-9,，\s]+)", prompt)
+    if m:
+        nums = [int(x) for x in re.findall(r"\d+", m.group(1))]
+        if nums:
+            return nums
+    m = re.search(r"第\s*(\d+)\s*章\s*[-—~至到]+\s*第?\s*(\d+)\s*章", prompt) or re.search(r"第\s*(\d+)\s*[-—~]\s*(\d+)\s*章", prompt)
+    if m:
+        a, b = int(m.group(1)), int(m.group(2))
+        if 0 < a <= b and b - a < 500:
+            return list(range(a, b + 1))
+    return []
+
+
+def _filler(rng: random.Random, chars: int) -> str:
+    out = []
+    n = 0
+    while n < chars:
+        start = rng.randrange(0, len(_FILLER) - 20)
+        seg = _FILLER[start:start + rng.randint(20, 60)]
+        out.append(seg)
+        n += len(seg)
+    return "".join(out)[:chars]
+
+
+def _from_schema(schema, rng: random.Random, prompt: str, chapters=None, depth: int = 0):
+    if not isinstance(schema, dict) or depth > 6:
+        return _filler(rng, 30)
+    t = str(schema.get("type") or "STRING").upper()
+    if t == "OBJECT":
+        out = {}
+        for k, sub in (schema.get("properties") or {}).items():
+            out[k] = _from_schema(sub, rng, prompt, chapters, depth + 1)
+        return out
+    if t == "ARRAY":
+        items = schema.get("items") or {}
+        props = (items.get("properties") or {}) if isinstance(items, dict) else {}
+        if "chapter" in props and chapters:
+            res = []
+            for n in chapters:
+                obj = _from_schema(items, rng, prompt, None, depth + 1)
+                obj["chapter"] = n
+                if "summary" in obj:
+                    obj["summary"] = f"**内容**：{_filler(rng, 60)}\n**【悬疑点】**：{_filler(rng, 20)}\n**【爽点】**：{_filler(rng, 20)}"
+                res.append(obj)
+            return res
+        return [_from_schema(items, rng, prompt, chapters, depth + 1) for _ in range(3)]
+    if t == "INTEGER":
+        return rng.randint(1, 100)
+    if t == "NUMBER":
+        return round(rng.uniform(0, 100), 2)
+    if t == "BOOLEAN":
+        return bool(rng.randint(0, 1))
+    return _filler(rng, 24)
+
+
+def synthesize(prompt: str, schema=None, json_mode: bool = False, chars: int = 1200, seed_text: str = "") -> str:
+    """按请求内容确定性地生成合成回复：同一请求永远得到同一结果"""
+    seed = int(hashlib.sha256((seed_text or prompt).encode("utf-8")).hexdigest()[:12], 16)
+    rng = random.Random(seed)
+    chapters = _chapter_numbers(prompt)
+    if schema:
+        return json.dumps(_from_schema(schema, rng, prompt, chapters), ensure_ascii=False)
+    if json_mode:
+        if chapters:
+            return json.dumps([{"chapter": n, "title": _filler(rng, 8), "summary": _filler(rng, 60)} for n in chapters], ensure_ascii=False)
+        return json.dumps({"content": _filler(rng, 200)}, ensure_ascii=False)
+    if chapters:
+        return "\n".join(f"第{n}章 {_filler(rng, 8)}：{_filler(rng, 80)}" for n in chapters)
+    return _filler(rng, chars)
+
+
+# ==================== 协议格式 ====================
+
+def _gemini_request_text(body: dict) -> Tuple[str, object, bool]:
+    texts = []
+    for c in body.get("contents") or []:
+        for p in (c.get("parts") or []) if isinstance(c, dict) else []:
+            if isinstance(p, dict) and isinstance(p.get("text"), str):
+                texts.append(p["text"])
+    cfg = body.get("generationConfig") or body.get("generation_config") or {}
+    schema = cfg.get("responseSchema") or cfg.get("response_schema")
+    json_mode = "json" in str(cfg.get("responseMimeType") or cfg.get("response_mime_type") or "")
+    return "\n".join(texts), schema, json_mode
+
+
+def _gemini_payload(text: str) -> dict:
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": ([{"text": text}] if text else [])},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": len(text), "totalTokenCount": len(text)},
+    }
+
+
+def _split_chunks(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+# ==================== 服务 ====================
+
+class MockSettings:
+    def __init__(self, latency: str = "fixed:0", chunk_delay: float = 0.0, chunk_chars: int = 40, rate_429: float = 0.0,
+                 retry_delay: int = 2, rate_empty: float = 0.0, rate_malformed: float = 0.0, chars: int = 1200,
+                 seed: Optional[int] = None, record_dir: str = "", replay_dir: str = "", strict: bool = False,
+                 upstreams: Optional[dict] = None):
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.chunk_delay = float(chunk_delay)
+        self.chunk_chars = max(1, int(chunk_chars))
+        self.rate_429 = float(rate_429)
+        self.retry_delay = int(retry_delay)
+        self.rate_empty = float(rate_empty)
+        self.rate_malformed = float(rate_malformed)
+        self.chars = int(chars)
+        self.record_dir = record_dir
+        self.replay_dir = replay_dir
+        self.strict = bool(strict)
+        self.upstreams = dict(DEFAULT_UPSTREAMS)
+        self.upstreams.update(upstreams or {})
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "429": 0, "empty": 0, "malformed": 0, "replayed": 0, "recorded": 0}
+
+    def roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < rate
+
+    def count(self, key: str):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+
+# 桌面端每次生成都会在系统指令与提示词里嵌入一段随机变体（变体 ID、时间戳、随机人名/地点），
+# 原样参与哈希时录制的夹具永远无法回放；计算夹具键前先整段去掉
+_VARIATION_BLOCK = re.compile(r"【本次随机变体（用于避免人物/情节雷同）】.*?必须生成新的冲突走向与线索链。\n?", re.S)
+
+
+def _normalize_text(text: str) -> str:
+    return _VARIATION_BLOCK.sub("", text)
+
+
+def _normalize_json(obj):
+    if isinstance(obj, str):
+        return _normalize_text(obj)
+    if isinstance(obj, list):
+        return [_normalize_json(v) for v in obj]
+    if isinstance(obj, dict):
+        return {k: _normalize_json(v) for k, v in obj.items()}
+    return obj
+
+
+def normalize_body(body: bytes) -> bytes:
+    """夹具键用的请求体：去掉随机变体段；JSON 请求体按键排序重新序列化（不受转义方式与键顺序影响）"""
+    if not body:
+        return b""
+    try:
+        obj = json.loads(body.decode("utf-8"))
+    except Exception:
+        return _normalize_text(body.decode("utf-8", errors="replace")).encode("utf-8")
+    return json.dumps(_normalize_json(obj), ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def fixture_key(method: str, path: str, body: bytes) -> str:
+    # 路径里的 ?key=... 不参与计算
+    parts = urlsplit(path)
+    query = "&".join(q for q in (parts.query or "").split("&") if q and not q.startswith("key="))
+    h = hashlib.sha256()
+    h.update(method.upper().encode("utf-8"))
+    h.update(parts.path.encode("utf-8"))
+    h.update(query.encode("utf-8"))
+    h.update(normalize_body(body))
+    return h.hexdigest()[:32]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockLLM/1.0"
+    settings: MockSettings = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    # ---------- 输出工具 ----------
+
+    def _send_json(self, status: int, obj, headers: Optional[dict] = None):
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self._send_raw(status, data, "application/json", headers)
+
+    def _send_raw(self, status: int, data: bytes, ctype: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_sse(self, events, headers: Optional[dict] = None):
+        """events: [(event_name or "", data_str)]，按 chunk_delay 逐个发送"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.close_connection = True
+        for name, data in events:
+            chunk = (f"event: {name}\n" if name else "") + f"data: {data}\n\n"
+            self.wfile.write(chunk.encode("utf-8"))
+            self.wfile.flush()
+            if self.settings.chunk_delay > 0:
+                time.sleep(self.settings.chunk_delay)
+
+    # ---------- 路由 ----------
+
+    def do_POST(self):
+        s = self.settings
+        s.count("requests")
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        path = self.path
+        route = self._route(path)
+        if route is None:
+            self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+            return
+
+        key = fixture_key("POST", path, raw)
+        if s.replay_dir:
+            if self._replay(key):
+                return
+            if s.strict:
+                self._send_json(404, {"error": {"message": f"fixture not found: {key}"}})
+                return
+        if s.record_dir:
+            self._record(route, key, path, raw)
+            return
+
+        try:
+            body = json.loads(raw.decode("utf-8") or "{}")
+        except Exception:
+            self._send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+
+        delay = s.latency.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+        if s.roll(s.rate_429):
+            s.count("429")
+            self._send_429(route)
+            return
+        if s.roll(s.rate_malformed):
+            s.count("malformed")
+            self._send_raw(200, b'{"candidates": [{"content": {"parts": [{"text": "broken', "application/json")
+            return
+        empty = s.roll(s.rate_empty)
+        if empty:
+            s.count("empty")
+
+        if route[0] == "gemini":
+            self._handle_gemini(route[1], route[2], body, empty)
+        elif route[0] == "openai":
+            self._handle_openai(body, empty)
+        else:
+            self._handle_anthropic(body, empty)
+
+    def _route(self, path: str):
+        p = urlsplit(path).path
+        m = re.search(r"/models/([^/:]+):(generateContent|streamGenerateContent)$", p)
+        if m:
+            return ("gemini", m.group(1), m.group(2) == "streamGenerateContent")
+        if p.endswith("/chat/completions"):
+            return ("openai", "", False)
+        if p.endswith("/messages"):
+            return ("anthropic", "", False)
+        return None
+
+    def _send_429(self, route):
+        s = self.settings
+        if route[0] == "gemini":
+            self._send_json(429, {"error": {
+                "code": 429,
+                "message": f"You exceeded your current quota. Please retry in {s.retry_delay}s.",
+                "status": "RESOURCE_EXHAUSTED",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{s.retry_delay}s"}],
+            }})
+        elif route[0] == "openai":
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                            headers={"Retry-After": str(s.retry_delay)})
+        else:
+            self._send_json(429, {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited"}},
+                            headers={"Retry-After": str(s.retry_delay)})
+
+    # ---------- 三种协议 ----------
+
+    def _handle_gemini(self, model: str, stream: bool, body: dict, empty: bool):
+        prompt, schema, json_mode = _gemini_request_text(body)
+        text = "" if empty else synthesize(prompt, schema, json_mode, self.settings.chars, seed_text=model + prompt)
+        if not stream:
+            self._send_json(200, _gemini_payload(text))
+            return
+        events = [("", json.dumps(_gemini_payload(c), ensure_ascii=False)) for c in _split_chunks(text, self.settings.chunk_chars)]
+        self._send_sse(events)
+
+    def _handle_openai(self, body: dict, empty: bool):
+        msgs = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content") or "") for m in msgs if isinstance(m, dict))
+        json_mode = "json" in str((body.get("response_format") or {}).get("type", ""))
+        text = "" if empty else synthesize(prompt, None, json_mode, self.settings.chars, seed_text=str(body.get("model")) + prompt)
+        model = body.get("model") or "mock"
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text), "total_tokens": len(text)},
+            })
+            return
+        events = []
+        for c in _split_chunks(text, self.settings.chunk_chars):
+            events.append(("", json.dumps({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                                           "choices": [{"index": 0, "delta": {"content": c}, "finish_reason": None}]},
+                                          ensure_ascii=False)))
+        events.append(("", "[DONE]"))
+        self._send_sse(events)
+
+    def _handle_anthropic(self, body: dict, empty: bool):
+        msgs = body.get("messages") or []
+        prompt = str(body.get("system") or "") + "\n" + "\n".join(
+            str(m.get("content") or "") for m in msgs if isinstance(m, dict))
+        text = "" if empty else synthesize(prompt, None, False, self.settings.chars, seed_text=str(body.get("model")) + prompt)
+        model = body.get("model") or "mock"
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "msg_mock", "type": "message", "role": "assistant", "model": model,
+                "content": ([{"type": "text", "text": text}] if text else []),
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": 0, "output_tokens": len(text)},
+            })
+            return
+        events = [("message_start", json.dumps({"type": "message_start", "message": {"id": "msg_mock", "model": model}})),
+                  ("content_block_start", json.dumps({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}))]
+        for c in _split_chunks(text, self.settings.chunk_chars):
+            if c:
+                events.append(("content_block_delta", json.dumps({"type": "content_block_delta", "index": 0,
+                                                                  "delta": {"type": "text_delta", "text": c}}, ensure_ascii=False)))
+        events.append(("content_block_stop", json.dumps({"type": "content_block_stop", "index": 0})))
+        events.append(("message_stop", json.dumps({"type": "message_stop"})))
+        self._send_sse(events)
+
+    # ---------- 录制 / 回放 ----------
+
+    def _replay(self, key: str) -> bool:
+        path = os.path.join(self.settings.replay_dir, f"{key}.json")
+        if not os.path.exists(path):
+            return False
+        with open(path, "r", encoding="utf-8") as f:
+            fx = json.load(f)
+        self.settings.count("replayed")
+        delay = self.settings.latency.sample()
+        if delay > 0:
+            time.sleep(delay)
+        body = fx.get("body") or ""
+        ctype = fx.get("content_type") or "application/json"
+        if "event-stream" in ctype:
+            # 按录制时的事件边界逐个回放
+            self.send_response(int(fx.get("status") or 200))
+            self.send_header("Content-Type", ctype)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for block in body.split("\n\n"):
+                if not block.strip():
+                    continue
+                self.wfile.write((block + "\n\n").encode("utf-8"))
+                self.wfile.flush()
+                if self.settings.chunk_delay > 0:
+                    time.sleep(self.settings.chunk_delay)
+            return True
+        headers = {k: v for k, v in (fx.get("headers") or {}).items() if k.lower() in ("retry-after",)}
+        self._send_raw(int(fx.get("status") or 200), body.encode("utf-8"), ctype, headers)
+        return True
+
+    def _record(self, route, key: str, path: str, raw: bytes):
+        import requests
+
+        upstream = self.settings.upstreams.get(route[0]) or ""
+        url = upstream.rstrip("/") + path
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in ("host", "content-length", "accept-encoding", "connection")}
+        try:
+            resp = requests.post(url, data=raw, headers=headers, timeout=(20, 300))
+        except Exception as e:
+            self._send_json(502, {"error": {"message": f"upstream error: {e}"}})
+            return
+        body = resp.content
+        ctype = resp.headers.get("Content-Type") or "application/json"
+        try:
+            req_obj = json.loads(raw.decode("utf-8") or "{}")
+        except Exception:
+            req_obj = raw.decode("utf-8", errors="replace")
+        fixture = {
+            "key": key,
+            "path": urlsplit(path).path,
+            "request": req_obj,
+            "status": resp.status_code,
+            "content_type": ctype,
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() not in _SECRET_HEADERS},
+            "body": body.decode("utf-8", errors="replace"),
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        os.makedirs(self.settings.record_dir, exist_ok=True)
+        tmp = os.path.join(self.settings.record_dir, f"{key}.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, os.path.join(self.settings.record_dir, f"{key}.json"))
+        self.settings.count("recorded")
+        self._send_raw(resp.status_code, body, ctype,
+                       {k: v for k, v in resp.headers.items() if k.lower() in ("retry-after",)})
+
+
+class MockLLMServer:
+    """
+    在后台线程中运行的模拟服务，便于脚本/基准测试内嵌使用：
+
+        with MockLLMServer(latency="fixed:0.2") as srv:
+            base = srv.base_url
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **settings):
+        self.settings = MockSettings(**settings)
+        handler = type("BoundMockHandler", (MockHandler,), {"settings": self.settings})
+        self.httpd = ThreadingHTTPServer((host, int(port)), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        with self.settings.lock:
+            return dict(self.settings.counters)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="本地模拟 LLM 服务（Gemini / OpenAI 兼容 / Anthropic）")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8808)
+    ap.add_argument("--latency", default="fixed:0", help="fixed:x | uniform:a,b | lognormal:mean,sigma（秒）")
+    ap.add_argument("--chunk-delay", type=float, default=0.0, help="流式输出每个分片之间的间隔（秒）")
+    ap.add_argument("--chunk-chars", type=int, default=40, help="流式输出每个分片的字数")
+    ap.add_argument("--chars", type=int, default=1200, help="合成正文的字数")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="返回 429 的概率")
+    ap.add_argument("--retry-delay", type=int, default=2, help="429 中的 retryDelay / Retry-After（秒）")
+    ap.add_argument("--rate-empty", type=float, default=0.0, help="返回空内容的概率")
+    ap.add_argument("--rate-malformed", type=float, default=0.0, help="返回非法 JSON 的概率")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--record", default="", help="录制目录：转发到真实上游并保存夹具")
+    ap.add_argument("--replay", default="", help="回放目录：命中夹具直接返回")
+    ap.add_argument("--strict", action="store_true", help="回放未命中时返回 404 而不是合成内容")
+    ap.add_argument("--upstream-gemini", default=DEFAULT_UPSTREAMS["gemini"])
+    ap.add_argument("--upstream-openai", default=DEFAULT_UPSTREAMS["openai"])
+    ap.add_argument("--upstream-anthropic", default=DEFAULT_UPSTREAMS["anthropic"])
+    args = ap.parse_args(argv)
+
+    srv = MockLLMServer(
+        host=args.host, port=args.port, latency=args.latency, chunk_delay=args.chunk_delay, chunk_chars=args.chunk_chars,
+        rate_429=args.rate_429, retry_delay=args.retry_delay, rate_empty=args.rate_empty, rate_malformed=args.rate_malformed,
+        chars=args.chars, seed=args.seed, record_dir=args.record, replay_dir=args.replay, strict=args.strict,
+        upstreams={"gemini": args.upstream_gemini, "openai": args.upstream_openai, "anthropic": args.upstream_anthropic},
+    )
+    print(f"模拟 LLM 服务已启动: {srv.base_url}")
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.httpd.server_close()
+        print(f"请求统计: {srv.stats()}")
+
+
+if __name__ == "__main__":
+    main()
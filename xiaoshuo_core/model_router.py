@@ -0,0 +1,308 @@
+"""
+模型健康记分板与自适应路由
+替代固定顺序的备用模型列表：按模型统计成功率、空响应率、p50/p95 延迟与免费层封禁，
+随时间衰减，动态调整尝试顺序；连续失败时熔断，冷却后半开放行一次探测请求。
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN_SECS = 120
+DEFAULT_HALF_LIFE_SECS = 600
+# 免费层 limit 0 在短时间内不会恢复，冷却更久
+FREE_TIER_COOLDOWN_SECS = 3600
+LATENCY_WINDOW_SECS = 3600
+LATENCY_SAMPLES = 100
+# p95 超过该值视为明显变慢，降低路由优先级
+SLOW_P95_SECS = 120
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    vals = sorted(values)
+    idx = min(len(vals) - 1, max(0, int(math.ceil(q * len(vals))) - 1))
+    return vals[idx]
+
+
+class ModelHealth:
+    def __init__(self, half_life_secs: float):
+        self._tau = max(1.0, float(half_life_secs)) / math.log(2)
+        self.success_rate = 1.0
+        self.empty_rate = 0.0
+        self.updated = 0.0
+        self.latencies: Deque[Tuple[float, float]] = deque(maxlen=LATENCY_SAMPLES)
+        self.successes = 0
+        self.failures = 0
+        self.empties = 0
+        self.timeouts = 0
+        self.free_tier_blocks = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown_secs = DEFAULT_COOLDOWN_SECS
+        self.probe_in_flight = False
+
+    def _observe(self, now: float, ok: float, empty: float):
+        if self.updated <= 0:
+            alpha = 0.5
+        else:
+            # 距上次观测越久，新样本权重越大（旧数据按半衰期衰减）
+            alpha = max(0.2, 1.0 - math.exp(-(now - self.updated) / self._tau))
+        self.success_rate = self.success_rate * (1 - alpha) + ok * alpha
+        self.empty_rate = self.empty_rate * (1 - alpha) + empty * alpha
+        self.updated = now
+
+    def decayed(self, now: float) -> Tuple[float, float]:
+        """长时间无数据时向“健康”回归，避免一次事故永久拉低排名"""
+        if self.updated <= 0:
+            return self.success_rate, self.empty_rate
+        w = math.exp(-(now - self.updated) / self._tau)
+        return (self.success_rate * w + 1.0 * (1 - w), self.empty_rate * w)
+
+    def latency_percentiles(self, now: float) -> Tuple[float, float]:
+        vals = [lat for ts, lat in self.latencies if now - ts <= LATENCY_WINDOW_SECS]
+        return _percentile(vals, 0.5), _percentile(vals, 0.95)
+
+
+class ModelRouter:
+    """
+    模型路由器
+
+    - order(provider, models)：按健康度重新排序并跳过熔断中的模型（原顺序作为同分时的偏好）
+    - try_begin(provider, model)：发请求前调用；熔断打开返回 False，半开状态只放行一个探测请求
+    - record_success / record_failure：上报结果
+    """
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, cooldown_secs: float = DEFAULT_COOLDOWN_SECS,
+                 half_life_secs: float = DEFAULT_HALF_LIFE_SECS):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_secs = max(1.0, float(cooldown_secs))
+        self.half_life_secs = float(half_life_secs)
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple[str, str], ModelHealth] = {}
+
+    def _get(self, provider: str, model: str) -> ModelHealth:
+        k = ((provider or "").lower(), model or "")
+        h = self._models.get(k)
+        if h is None:
+            h = ModelHealth(self.half_life_secs)
+            h.cooldown_secs = self.cooldown_secs
+            self._models[k] = h
+        return h
+
+    def _refresh_state(self, h: ModelHealth, now: float):
+        if h.state == OPEN and now - h.opened_at >= h.cooldown_secs:
+            h.state = HALF_OPEN
+            h.probe_in_flight = False
+
+    def _score(self, h: ModelHealth, now: float) -> float:
+        success, empty = h.decayed(now)
+        score = success * (1.0 - empty)
+        _, p95 = h.latency_percentiles(now)
+        if p95 > SLOW_P95_SECS:
+            score -= 0.2
+        if h.state == HALF_OPEN:
+            score -= 0.5
+        return score
+
+    def order(self, provider: str, models: List[str]) -> List[str]:
+        now = time.monotonic()
+        seen = []
+        for m in models:
+            if m and m not in seen:
+                seen.append(m)
+        ranked = []
+        with self._lock:
+            for idx, m in enumerate(seen):
+                h = self._get(provider, m)
+                self._refresh_state(h, now)
+                if h.state == OPEN:
+                    continue
+                # 分数按 0.2 分档，只有健康度差异明显时才改变用户配置的顺序
+                bucket = round(self._score(h, now) * 5) / 5
+                ranked.append((-bucket, idx, m))
+        if not ranked:
+            # 全部熔断时仍按原顺序返回，由各自的重试逻辑兜底
+            return seen
+        ranked.sort()
+        return [m for _, _, m in ranked]
+
+    def all_open(self, provider: str, models: List[str]) -> bool:
+        """列表中的模型是否全部处于熔断状态（此时调用方应强制尝试，而不是直接失败）"""
+        now = time.monotonic()
+        with self._lock:
+            for m in models:
+                h = self._get(provider, m)
+                self._refresh_state(h, now)
+                if h.state != OPEN:
+                    return False
+        return bool(models)
+
+    def try_begin(self, provider: str, model: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            h = self._get(provider, model)
+            self._refresh_state(h, now)
+            if h.state == OPEN:
+                return False
+            if h.state == HALF_OPEN:
+                if h.probe_in_flight:
+                    return False
+                h.probe_in_flight = True
+            return True
+
+    def record_success(self, provider: str, model: str, latency_secs: float):
+        now = time.monotonic()
+        with self._lock:
+            h = self._get(provider, model)
+            h._observe(now, 1.0, 0.0)
+            h.latencies.append((now, max(0.0, float(latency_secs))))
+            h.successes += 1
+            h.consecutive_failures = 0
+            h.state = CLOSED
+            h.probe_in_flight = False
+            h.cooldown_secs = self.cooldown_secs
+
+    def release(self, provider: str, model: str):
+        """请求未产生健康结论（限流、取消）时释放半开探测名额"""
+        with self._lock:
+            self._get(provider, model).probe_in_flight = False
+
+    def record_slow(self, provider: str, model: str, latency_secs: float):
+        """请求被对冲方抢先、结果被放弃：只记一条延迟样本（真实耗时不少于该值），不计成败，并释放半开探测名额"""
+        now = time.monotonic()
+        with self._lock:
+            h = self._get(provider, model)
+            h.latencies.append((now, max(0.0, float(latency_secs))))
+            h.probe_in_flight = False
+
+    def record_failure(self, provider: str, model: str, kind: str = "error", latency_secs: Optional[float] = None):
+        """
+        kind: error / timeout / empty / free_tier；限流(429)不计入健康度，由令牌桶处理
+        """
+        now = time.monotonic()
+        with self._lock:
+            h = self._get(provider, model)
+            h._observe(now, 0.0, 1.0 if kind == "empty" else 0.0)
+            if latency_secs is not None and kind == "timeout":
+                h.latencies.append((now, max(0.0, float(latency_secs))))
+            h.failures += 1
+            if kind == "empty":
+                h.empties += 1
+            elif kind == "timeout":
+                h.timeouts += 1
+            h.consecutive_failures += 1
+            h.probe_in_flight = False
+            if kind == "free_tier":
+                h.free_tier_blocks += 1
+                h.state = OPEN
+                h.opened_at = now
+                h.cooldown_secs = FREE_TIER_COOLDOWN_SECS
+            elif h.state == HALF_OPEN:
+                # 探测失败：重新熔断，冷却时间翻倍（上限 30 分钟）
+                h.state = OPEN
+                h.opened_at = now
+                h.cooldown_secs = min(1800.0, h.cooldown_secs * 2)
+            elif h.consecutive_failures >= self.failure_threshold:
+                h.state = OPEN
+                h.opened_at = now
+
+    def latency_percentile(self, provider: str, model: str, q: float) -> Tuple[float, int]:
+        """返回 (q 分位延迟, 窗口内样本数)"""
+        now = time.monotonic()
+        with self._lock:
+            h = self._get(provider, model)
+            vals = [lat for ts, lat in h.latencies if now - ts <= LATENCY_WINDOW_SECS]
+        return _percentile(vals, q), len(vals)
+
+    def stats(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        out = {}
+        with self._lock:
+            for (provider, model), h in self._models.items():
+                self._refresh_state(h, now)
+                success, empty = h.decayed(now)
+                p50, p95 = h.latency_percentiles(now)
+                out[f"{provider}:{model}"] = {
+                    "state": h.state,
+                    "success_rate": round(success, 3),
+                    "empty_rate": round(empty, 3),
+                    "p50_secs": round(p50, 1),
+                    "p95_secs": round(p95, 1),
+                    "successes": h.successes,
+                    "failures": h.failures,
+                    "empties": h.empties,
+                    "timeouts": h.timeouts,
+                    "free_tier_blocks": h.free_tier_blocks,
+                }
+        return out
+
+    def format_stats(self) -> str:
+        items = self.stats()
+        if not items:
+            return "模型记分板为空"
+        parts = []
+        for name, s in items.items():
+            parts.append(
+                f"{name} [{s['state']}] 成功率 {s['success_rate']:.0%} 空响应率 {s['empty_rate']:.0%} "
+                f"p50 {s['p50_secs']}s p95 {s['p95_secs']}s"
+            )
+        return "；".join(parts)
+
+
+_ROUTER: Optional[ModelRouter] = None
+_ROUTER_LOCK = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    global _ROUTER
+    if _ROUTER is None:
+        with _ROUTER_LOCK:
+            if _ROUTER is None:
+                _ROUTER = ModelRouter()
+    return _ROUTER
+
+
+def order(provider: str, models: List[str]) -> List[str]:
+    return get_router().order(provider, models)
+
+
+def all_open(provider: str, models: List[str]) -> bool:
+    return get_router().all_open(provider, models)
+
+
+def try_begin(provider: str, model: str) -> bool:
+    return get_router().try_begin(provider, model)
+
+
+def record_success(provider: str, model: str, latency_secs: float):
+    get_router().record_success(provider, model, latency_secs)
+
+
+def release(provider: str, model: str):
+    get_router().release(provider, model)
+
+
+def record_slow(provider: str, model: str, latency_secs: float):
+    get_router().record_slow(provider, model, latency_secs)
+
+
+def record_failure(provider: str, model: str, kind: str = "error", latency_secs: Optional[float] = None):
+    get_router().record_failure(provider, model, kind, latency_secs)
+
+
+def latency_percentile(provider: str, model: str, q: float) -> Tuple[float, int]:
+    return get_router().latency_percentile(provider, model, q)
+
+
+def format_stats() -> str:
+    return get_router().format_stats()
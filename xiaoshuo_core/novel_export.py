@@ -0,0 +1,300 @@
+"""
+流式导出 ZIP / EPUB
+原先桌面端 on_export_zip 对每章调用 zf.writestr(完整字符串)，web_app 的 export_novel 先在 io.BytesIO 里
+拼出整个压缩包再 send_file；几 MB 的小说每次导出都要占用两到三倍的内存。
+
+这里按条目逐段写入：
+- iter_zip(entries)：生成器，边压缩边产出字节块，可直接作为 Flask 的分块响应
+- iter_epub(...)：同样流式产出 EPUB（EPUB 本身就是 ZIP：mimetype + 容器描述 + OPF/导航 + 每章一个 XHTML）
+- write_file(path, chunks)：桌面端写到临时文件再 os.replace
+
+条目内容是“返回文本片段迭代器的函数”，只有轮到该条目时才读取（如从章节存储逐块读文件、逐章查数据库），
+峰值内存只与单个片段、压缩器缓冲和每个条目约几百字节的目录信息（ZIP 末尾的中央目录必须保留）有关，与正文总长度无关。
+
+输出流不可回退（seek），zipfile 会给每个条目写数据描述符（data descriptor），主流解压工具与阅读器都支持。
+例外是开头的不压缩条目（EPUB 的 mimetype）：EPUB 规范要求它是第一个条目、不压缩且本地文件头里不能有数据描述符，
+部分阅读器/校验工具（epubcheck）只认这种写法；这类条目内容很短，整体读入后先算好 CRC 与长度再手写本地文件头。
+"""
+
+import html
+import itertools
+import os
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+CHUNK_CHARS = 64 * 1024
+Chunks = Callable[[], Iterable[Union[str, bytes]]]
+
+EPUB_MIMETYPE = "application/epub+zip"
+ZIP_MIMETYPE = "application/zip"
+
+
+def text_chunks(text: str, size: int = CHUNK_CHARS) -> Iterator[str]:
+    """已在内存中的字符串按 size 切片产出（兼容原来的字典来源）"""
+    t = text or ""
+    for i in range(0, len(t), size):
+        yield t[i:i + size]
+
+
+class _ChunkSink:
+    """zipfile 的输出对象：只支持 write/tell/flush，写入的数据由 drain() 取走"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        if data:
+            b = bytes(data)
+            self._parts.append(b)
+            self._pos += len(b)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        if not self._parts:
+            return b""
+        out = b"".join(self._parts)
+        self._parts = []
+        return out
+
+
+def _encode(piece) -> bytes:
+    if isinstance(piece, bytes):
+        return piece
+    return str(piece).encode("utf-8")
+
+
+def _stored_entry(sink: _ChunkSink, name: str, chunks: Chunks, stamp) -> zipfile.ZipInfo:
+    """整体读入一个不压缩条目，按真实 CRC 与长度手写本地文件头（flag 不带数据描述符位）；返回供中央目录使用的 ZipInfo"""
+    data = b"".join(_encode(piece) for piece in chunks() if piece)
+    info = zipfile.ZipInfo(name, date_time=stamp)
+    info.compress_type = zipfile.ZIP_STORED
+    info.external_attr = 0o644 << 16
+    info.flag_bits = 0
+    info.CRC = zlib.crc32(data) & 0xFFFFFFFF
+    info.compress_size = info.file_size = len(data)
+    info.header_offset = sink.tell()
+    sink.write(info.FileHeader())
+    sink.write(data)
+    return info
+
+
+def iter_zip(entries: Iterable[Tuple[str, Chunks]], compress: bool = True,
+             stored: Sequence[str] = ()) -> Iterator[bytes]:
+    """
+    流式生成 ZIP
+
+    Args:
+        entries: (条目名, 返回内容片段迭代器的函数)；按顺序写入，函数在轮到该条目时才调用
+        compress: 是否 DEFLATE 压缩
+        stored: 不压缩的条目名（EPUB 的 mimetype）；位于开头的这类条目整体读入，本地文件头不带数据描述符
+
+    Returns:
+        字节块迭代器
+    """
+    sink = _ChunkSink()
+    stamp = time.localtime()[:6]
+    entries = iter(entries)
+    leading: List[zipfile.ZipInfo] = []
+    for name, chunks in entries:
+        if name not in stored:
+            entries = itertools.chain([(name, chunks)], entries)
+            break
+        leading.append(_stored_entry(sink, name, chunks, stamp))
+    out = sink.drain()
+    if out:
+        yield out
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED) as zf:
+        # 手写的条目已在输出流里（zipfile 从当前位置接着写），只需登记进中央目录
+        for info in leading:
+            zf.filelist.append(info)
+            zf.NameToInfo[info.filename] = info
+        for name, chunks in entries:
+            info = zipfile.ZipInfo(name, date_time=stamp)
+            info.compress_type = zipfile.ZIP_STORED if (name in stored or not compress) else zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            with zf.open(info, "w") as dest:
+                for piece in chunks():
+                    if not piece:
+                        continue
+                    dest.write(_encode(piece))
+                    out = sink.drain()
+                    if out:
+                        yield out
+            out = sink.drain()
+            if out:
+                yield out
+    out = sink.drain()
+    if out:
+        yield out
+
+
+# ==================== EPUB ====================
+
+class EpubChapter:
+    """EPUB 中的一章：title 与按需产出正文片段的 chunks()"""
+
+    __slots__ = ("num", "title", "chunks")
+
+    def __init__(self, num: int, title: str, chunks: Chunks):
+        self.num = int(num)
+        self.title = title or ""
+        self.chunks = chunks
+
+    @property
+    def href(self) -> str:
+        return f"text/ch{self.num:04d}.xhtml"
+
+    @property
+    def item_id(self) -> str:
+        return f"ch{self.num:04d}"
+
+
+_XHTML_HEAD = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<!DOCTYPE html>\n'
+    '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{lang}" xml:lang="{lang}">\n'
+    '<head><meta charset="utf-8"/><title>{title}</title>'
+    '<link rel="stylesheet" type="text/css" href="../style.css"/></head>\n<body>\n'
+)
+_XHTML_TAIL = "</body>\n</html>\n"
+_STYLE = "body{line-height:1.8;margin:0 1em;}h1{font-size:1.4em;text-align:center;margin:1.5em 0;}p{text-indent:2em;margin:0.4em 0;}\n"
+
+
+def _paragraphs(chunks: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    """把正文片段按行转成 <p>，跨片段的半行留到下一片段再输出"""
+    rest = ""
+    for piece in chunks:
+        if isinstance(piece, bytes):
+            piece = piece.decode("utf-8", errors="replace")
+        buf = rest + (piece or "")
+        lines = buf.split("\n")
+        rest = lines.pop()
+        out = [f"<p>{html.escape(line.strip())}</p>\n" for line in lines if line.strip()]
+        if out:
+            yield "".join(out)
+    if rest.strip():
+        yield f"<p>{html.escape(rest.strip())}</p>\n"
+
+
+def _chapter_xhtml(ch: EpubChapter, lang: str) -> Iterator[str]:
+    title = html.escape(ch.title)
+    yield _XHTML_HEAD.format(lang=lang, title=title)
+    yield f"<h1>{title}</h1>\n"
+    yield from _paragraphs(ch.chunks())
+    yield _XHTML_TAIL
+
+
+def _container_xml() -> str:
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+        '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>\n'
+        '</container>\n'
+    )
+
+
+def _content_opf(title: str, author: str, lang: str, book_id: str, chapters: Sequence[EpubChapter]) -> Iterator[str]:
+    modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid">\n'
+        '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+        f'<dc:identifier id="bookid">{book_id}</dc:identifier>\n'
+        f'<dc:title>{html.escape(title)}</dc:title>\n'
+        f'<dc:language>{lang}</dc:language>\n'
+        + (f'<dc:creator>{html.escape(author)}</dc:creator>\n' if author else "")
+        + f'<meta property="dcterms:modified">{modified}</meta>\n'
+        '</metadata>\n<manifest>\n'
+        '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+        '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>\n'
+        '<item id="css" href="style.css" media-type="text/css"/>\n'
+    )
+    for ch in chapters:
+        yield f'<item id="{ch.item_id}" href="{ch.href}" media-type="application/xhtml+xml"/>\n'
+    yield '</manifest>\n<spine toc="ncx">\n'
+    for ch in chapters:
+        yield f'<itemref idref="{ch.item_id}"/>\n'
+    yield '</spine>\n</package>\n'
+
+
+def _nav_xhtml(title: str, lang: str, chapters: Sequence[EpubChapter]) -> Iterator[str]:
+    yield _XHTML_HEAD.format(lang=lang, title=html.escape(title)).replace("../style.css", "style.css")
+    yield '<nav epub:type="toc" id="toc"><h1>目录</h1>\n<ol>\n'
+    for ch in chapters:
+        yield f'<li><a href="{ch.href}">{html.escape(ch.title)}</a></li>\n'
+    yield "</ol>\n</nav>\n" + _XHTML_TAIL
+
+
+def _toc_ncx(title: str, book_id: str, chapters: Sequence[EpubChapter]) -> Iterator[str]:
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+        f'<head><meta name="dtb:uid" content="{book_id}"/></head>\n'
+        f'<docTitle><text>{html.escape(title)}</text></docTitle>\n<navMap>\n'
+    )
+    for i, ch in enumerate(chapters, 1):
+        yield (f'<navPoint id="np{i}" playOrder="{i}"><navLabel><text>{html.escape(ch.title)}</text></navLabel>'
+               f'<content src="{ch.href}"/></navPoint>\n')
+    yield "</navMap>\n</ncx>\n"
+
+
+def iter_epub(title: str, chapters: Sequence[EpubChapter], author: str = "", lang: str = "zh-CN",
+              book_id: Optional[str] = None) -> Iterator[bytes]:
+    """
+    流式生成 EPUB 3（附带 toc.ncx 兼容旧阅读器）
+
+    Args:
+        title: 书名
+        chapters: 章节列表（只需标题等元数据常驻内存，正文由各章 chunks() 按需产出）
+        author: 作者
+        lang: 语言
+        book_id: 唯一标识，缺省时按书名生成（同名书多次导出标识不变）
+
+    Returns:
+        字节块迭代器
+    """
+    chapters = list(chapters)
+    book_id = book_id or f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, 'xiaoshuo:' + (title or ''))}"
+    entries = [
+        ("mimetype", lambda: [EPUB_MIMETYPE]),
+        ("META-INF/container.xml", lambda: [_container_xml()]),
+        ("OEBPS/content.opf", lambda: _content_opf(title, author, lang, book_id, chapters)),
+        ("OEBPS/nav.xhtml", lambda: _nav_xhtml(title, lang, chapters)),
+        ("OEBPS/toc.ncx", lambda: _toc_ncx(title, book_id, chapters)),
+        ("OEBPS/style.css", lambda: [_STYLE]),
+    ]
+    for ch in chapters:
+        entries.append((f"OEBPS/{ch.href}", lambda ch=ch: _chapter_xhtml(ch, lang)))
+    return iter_zip(entries, stored=("mimetype",))
+
+
+# ==================== 写文件 ====================
+
+def write_file(path: str, chunks: Iterable[bytes]) -> int:
+    """逐块写入临时文件，完成后 os.replace 到目标路径（导出中途失败不会留下残缺文件）；返回字节数"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    total = 0
+    try:
+        with open(tmp, "wb") as f:
+            for block in chunks:
+                f.write(block)
+                total += len(block)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return total
@@ -0,0 +1,343 @@
+"""
+大纲章节偏移索引
+保存 *_大纲.txt 时在同目录写一份 <文件名>.index.json，记录每章/每卷的字符偏移、字节偏移、长度与内容哈希，
+并记下源文件的 mtime/大小/整体哈希；文件被外部改动后索引自动失效并重建。
+
+按修改意见改章、补全章节、取某范围章节做上下文时，只按偏移切出相关章节再解析，
+替换章节也只在对应偏移处拼接，不再把整份大纲重新解析一遍。
+"""
+
+import bisect
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import outline_tokenizer
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+
+
+def index_path(outline_path: str) -> str:
+    return outline_path + INDEX_SUFFIX
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+class StaleIndexError(Exception):
+    """索引与当前文本不一致（章节内容哈希对不上）"""
+
+
+class IndexEntry:
+    __slots__ = ("kind", "number", "title", "style", "volume", "start", "end", "byte_start", "byte_end", "hash")
+
+    def __init__(self, kind, number, title, style, volume, start, end, byte_start, byte_end, hash_):
+        self.kind = kind
+        self.number = number
+        self.title = title
+        self.style = style
+        self.volume = volume
+        self.start = start
+        self.end = end
+        self.byte_start = byte_start
+        self.byte_end = byte_end
+        self.hash = hash_
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+    def to_dict(self) -> dict:
+        return {
+            "n": self.number, "title": self.title, "style": self.style, "volume": self.volume,
+            "start": self.start, "end": self.end, "bstart": self.byte_start, "bend": self.byte_end, "hash": self.hash,
+        }
+
+    @classmethod
+    def from_dict(cls, kind: str, d: dict) -> "IndexEntry":
+        return cls(kind, d.get("n"), d.get("title") or "", d.get("style") or "", d.get("volume"),
+                   int(d["start"]), int(d["end"]), int(d.get("bstart") or 0), int(d.get("bend") or 0), d.get("hash") or "")
+
+    def shift(self, chars: int, nbytes: int):
+        self.start += chars
+        self.end += chars
+        self.byte_start += nbytes
+        self.byte_end += nbytes
+
+
+def _entry_from_token(tok) -> IndexEntry:
+    return IndexEntry(tok.kind, tok.number, tok.title, tok.style, tok.volume, tok.start, tok.end,
+                      tok.byte_start, tok.byte_end, content_hash(tok.raw))
+
+
+class OutlineIndex:
+    """
+    章节/卷偏移索引
+
+    章节按章号存放（同一章号出现多次时保留最后一处，与 outline_tokenizer.chapters_by_number 一致）。
+    """
+
+    def __init__(self, chapters: Dict[int, IndexEntry], volumes: List[IndexEntry], text_len: int, text_hash: str,
+                 source_mtime_ns: Optional[int] = None, source_size: Optional[int] = None):
+        self.chapters = chapters
+        self.volumes = volumes
+        self.text_len = text_len
+        self.text_hash = text_hash
+        self.source_mtime_ns = source_mtime_ns
+        self.source_size = source_size
+        self._order: Optional[List[int]] = None
+
+    # ==================== 构建 / 序列化 ====================
+
+    @classmethod
+    def build(cls, text: str) -> "OutlineIndex":
+        text = text or ""
+        chapters: Dict[int, IndexEntry] = {}
+        volumes: List[IndexEntry] = []
+        for tok in outline_tokenizer.tokenize(text).tokens:
+            if tok.kind == outline_tokenizer.KIND_CHAPTER:
+                chapters[tok.number] = _entry_from_token(tok)
+            elif tok.kind == outline_tokenizer.KIND_VOLUME:
+                volumes.append(_entry_from_token(tok))
+        return cls(chapters, volumes, len(text), content_hash(text))
+
+    def to_dict(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "text_len": self.text_len,
+            "text_hash": self.text_hash,
+            "mtime_ns": self.source_mtime_ns,
+            "size": self.source_size,
+            "chapters": [self.chapters[k].to_dict() for k in self.numbers()],
+            "volumes": [v.to_dict() for v in self.volumes],
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "OutlineIndex":
+        if int(d.get("version") or 0) != INDEX_VERSION:
+            raise ValueError("index version mismatch")
+        chapters = {}
+        for c in d.get("chapters") or []:
+            e = IndexEntry.from_dict(outline_tokenizer.KIND_CHAPTER, c)
+            chapters[int(e.number)] = e
+        volumes = [IndexEntry.from_dict(outline_tokenizer.KIND_VOLUME, v) for v in d.get("volumes") or []]
+        return cls(chapters, volumes, int(d.get("text_len") or 0), d.get("text_hash") or "",
+                   d.get("mtime_ns"), d.get("size"))
+
+    def matches(self, text: str) -> bool:
+        return len(text or "") == self.text_len and content_hash(text) == self.text_hash
+
+    # ==================== 查询 ====================
+
+    def numbers(self) -> List[int]:
+        if self._order is None:
+            self._order = sorted(self.chapters.keys())
+        return self._order
+
+    def max_chapter(self) -> int:
+        nums = self.numbers()
+        return nums[-1] if nums else 0
+
+    def __contains__(self, n) -> bool:
+        return n in self.chapters
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    def entry(self, n: int) -> Optional[IndexEntry]:
+        return self.chapters.get(n)
+
+    def in_range(self, a: int, b: int) -> List[IndexEntry]:
+        """第 a..b 章中已存在的条目（只查这 b-a+1 个章号）"""
+        return [self.chapters[n] for n in range(int(a), int(b) + 1) if n in self.chapters]
+
+    def span(self) -> Optional[Tuple[int, int]]:
+        """章节区域 [首章起点, 末章终点)；按偏移而非章号取首尾"""
+        if not self.chapters:
+            return None
+        entries = self.chapters.values()
+        return min(e.start for e in entries), max(e.end for e in entries)
+
+    def raw(self, text: str, n: int, verify: bool = False) -> str:
+        e = self.chapters.get(n)
+        if e is None:
+            return ""
+        piece = text[e.start:e.end]
+        if verify and content_hash(piece) != e.hash:
+            raise StaleIndexError(f"第{n}章内容与索引不一致")
+        return piece
+
+    def record(self, text: str, n: int, verify: bool = False) -> Optional[dict]:
+        piece = self.raw(text, n, verify=verify)
+        if not piece:
+            return None
+        for tok in outline_tokenizer.tokenize(piece).chapters:
+            if tok.number == n:
+                return tok.chapter_record()
+        return None
+
+    def records(self, text: str, nums: Iterable[int], empty_summary: str = "") -> Dict[int, dict]:
+        out = {}
+        for n in nums:
+            rec = self.record(text, n)
+            if rec is None:
+                continue
+            if not rec["summary"] and empty_summary:
+                rec["summary"] = empty_summary
+            out[n] = rec
+        return out
+
+    # ==================== 原位替换 ====================
+
+    def replace_chapters(self, text: str, blocks: Dict[int, str]) -> Tuple[str, "OutlineIndex"]:
+        """
+        用新的章节文本替换/插入若干章
+
+        Args:
+            text: 与索引对应的大纲全文
+            blocks: {章号: 新的章节块（含标题行）}；已存在的章原位替换并保留原有的结尾空白，
+                不存在的章插到前一个已有章节之后（没有更早的章节时插到后一章之前，索引为空时追加到末尾）
+
+        Returns:
+            (新文本, 新索引)；只解析被替换/插入的章节块，其余条目按偏移平移
+        """
+        # (起点, 终点, 新内容, 起点的字节偏移, 被替换部分的字节长度)
+        edits: List[Tuple[int, int, str, int, int]] = []
+        touched = set()
+        nums = self.numbers()
+        for n in sorted(blocks or {}):
+            block = (blocks[n] or "").strip()
+            if not block:
+                continue
+            e = self.chapters.get(n)
+            if e is not None:
+                old = text[e.start:e.end]
+                trailing = old[len(old.rstrip()):]
+                edits.append((e.start, e.end, block + trailing, e.byte_start, e.byte_end - e.byte_start))
+                touched.add(n)
+                continue
+            prev = max((k for k in nums if k < n), default=None)
+            nxt = min((k for k in nums if k > n), default=None)
+            if prev is not None:
+                pe = self.chapters[prev]
+                head = "" if pe.end == 0 or text[pe.end - 1] == "\n" else "\n"
+                edits.append((pe.end, pe.end, head + block + "\n\n", pe.byte_end, 0))
+            elif nxt is not None:
+                ne = self.chapters[nxt]
+                edits.append((ne.start, ne.start, block + "\n\n", ne.byte_start, 0))
+            else:
+                sep = "" if not text.strip() else ("\n" if text.endswith("\n") else "\n\n")
+                edits.append((len(text), len(text), sep + block + "\n", len(text.encode("utf-8")), 0))
+        if not edits:
+            return text, self
+        edits.sort(key=lambda x: (x[0], x[1]))
+
+        pieces = []
+        cursor = 0
+        ends = []
+        char_prefix = [0]
+        byte_prefix = [0]
+        for start, end, new, _b0, old_blen in edits:
+            pieces.append(text[cursor:start])
+            pieces.append(new)
+            cursor = end
+            ends.append(end)
+            char_prefix.append(char_prefix[-1] + len(new) - (end - start))
+            byte_prefix.append(byte_prefix[-1] + len(new.encode("utf-8")) - old_blen)
+        pieces.append(text[cursor:])
+        new_text = "".join(pieces)
+
+        def _moved(e: IndexEntry) -> IndexEntry:
+            # 终点不晚于该条目起点的改动都排在它前面（含恰好插在它起点处的新章节）
+            i = bisect.bisect_right(ends, e.start)
+            m = IndexEntry(e.kind, e.number, e.title, e.style, e.volume, e.start, e.end, e.byte_start, e.byte_end, e.hash)
+            m.shift(char_prefix[i], byte_prefix[i])
+            return m
+
+        chapters = {k: _moved(e) for k, e in self.chapters.items() if k not in touched}
+        volumes = [_moved(v) for v in self.volumes]
+        for i, (start, _end, new, byte_start, _old) in enumerate(edits):
+            base_c = start + char_prefix[i]
+            base_b = byte_start + byte_prefix[i]
+            for tok in outline_tokenizer.tokenize(new).chapters:
+                e = _entry_from_token(tok)
+                e.shift(base_c, base_b)
+                e.volume = self._volume_at(volumes, e.start)
+                chapters[e.number] = e
+
+        return new_text, OutlineIndex(chapters, volumes, len(new_text), content_hash(new_text))
+
+    @staticmethod
+    def _volume_at(volumes: List[IndexEntry], pos: int):
+        current = None
+        for v in volumes:
+            if v.start <= pos:
+                current = v.number
+        return current
+
+    # ==================== 文件 ====================
+
+    def save(self, outline_path: str):
+        """写到 <outline_path>.index.json（先写临时文件再替换）"""
+        try:
+            st = os.stat(outline_path)
+            self.source_mtime_ns = st.st_mtime_ns
+            self.source_size = st.st_size
+        except OSError:
+            pass
+        path = index_path(outline_path)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def load(outline_path: str, text: Optional[str] = None) -> Optional[OutlineIndex]:
+    """
+    读取 sidecar 索引；源文件 mtime/大小与记录一致时直接可用，
+    不一致但给了 text 且内容哈希一致时也可用（例如文件被原样重写），否则视为失效返回 None
+    """
+    try:
+        with open(index_path(outline_path), "r", encoding="utf-8") as f:
+            index = OutlineIndex.from_dict(json.load(f))
+    except Exception:
+        return None
+    if text is not None:
+        return index if index.matches(text) else None
+    try:
+        st = os.stat(outline_path)
+    except OSError:
+        return None
+    if index.source_mtime_ns == st.st_mtime_ns and index.source_size == st.st_size:
+        return index
+    return None
+
+
+def for_file(outline_path: str, text: Optional[str] = None) -> OutlineIndex:
+    """读取有效索引，失效或不存在时重建并写回"""
+    index = load(outline_path, text)
+    if index is not None:
+        return index
+    if text is None:
+        with open(outline_path, "r", encoding="utf-8") as f:
+            text = f.read()
+    index = OutlineIndex.build(text)
+    try:
+        index.save(outline_path)
+    except Exception:
+        pass
+    return index
+
+
+def save_for_file(outline_path: str, text: str, index: Optional[OutlineIndex] = None) -> Optional[OutlineIndex]:
+    """大纲文件写盘后调用，生成/更新 sidecar 索引；失败时不影响保存本身"""
+    try:
+        if index is None or not index.matches(text):
+            index = OutlineIndex.build(text)
+        index.save(outline_path)
+        return index
+    except Exception:
+        return None
@@ -0,0 +1,240 @@
+"""
+大纲章节切分
+原先各处（桌面端、web_app、web、enrich_outline、fix_outline）各自用带前瞻的 [\\s\\S]*? 正则在全文上反复匹配，
+最坏情况下接近平方级，而且对同一份大纲的解析结果互不一致（如 "### 第1章：标题" 在部分解析器里标题为空）。
+
+这里只按行扫描一遍全文，识别以下标题行：
+- Markdown 章节标题：### 第N章：标题 / ## 第N章 标题
+- 普通章节行：第N章 标题：梗概（梗概可与标题同行，也可在后续行）
+- 卷标题：第X卷 ...（X 可为中文数字或阿拉伯数字，可带 # 前缀）
+- 英文章节：Chapter N: Title / Ch. N Title
+其他 Markdown 标题（如 "### 2. 核心人设"）只作为章节正文的结束边界。
+
+每条记录带字符偏移与 UTF-8 字节偏移，便于原位改写与建立索引。
+"""
+
+import re
+from typing import Dict, List, Optional
+
+KIND_CHAPTER = "chapter"
+KIND_VOLUME = "volume"
+KIND_HEADING = "heading"
+
+STYLE_MARKDOWN = "markdown"
+STYLE_CN = "cn"
+STYLE_EN = "en"
+
+_HEADING_RE = re.compile(r"(#{1,6})[ \t]*(.*)$")
+_CN_CHAPTER_RE = re.compile(r"第[ \t]*(\d+)[ \t]*章(?!节)[ \t]*(.*)$")
+_EN_CHAPTER_RE = re.compile(r"Ch(?:apter)?\.?[ \t]*(\d+)\b[ \t]*(.*)$", re.IGNORECASE)
+_VOLUME_RE = re.compile(r"第[ \t]*([一二三四五六七八九十百千零〇两\d]+)[ \t]*卷(.*)$")
+_TITLE_SPLIT_RE = re.compile(r"[:：]|-{2,}|—{2,}")
+_TITLE_FROM_SUMMARY_RE = re.compile(r"^([^\n:：]{1,40})\s*[:：]\s*(.+)$")
+
+# 行首预筛：只有以 #、第、Ch（可带 ** 加粗）开头的行才进一步分类，其余行由正则引擎直接跳过
+# （以 \n 开头而不用 ^ + MULTILINE：字面前缀能让正则引擎按字符快速跳到下一个换行）
+_CANDIDATE_RE = re.compile(r"\n[ \t\r\u3000]*(?:#|\**[第Cc])")
+
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+
+
+def cn_to_int(s: str) -> Optional[int]:
+    """卷号转整数：'12' / '十二' / '一百零五'"""
+    s = (s or "").strip()
+    if not s:
+        return None
+    if s.isdigit():
+        return int(s)
+    total = 0
+    num = 0
+    for ch in s:
+        if ch in _CN_DIGITS:
+            num = _CN_DIGITS[ch]
+        elif ch in _CN_UNITS:
+            total += (num or 1) * _CN_UNITS[ch]
+            num = 0
+        else:
+            return None
+    return total + num
+
+
+class OutlineToken:
+    """
+    一个标题及其正文
+
+    start/end 为字符偏移（end 为下一个边界的起点），header_end 为标题行结束处；
+    byte_start/byte_end 为对应的 UTF-8 字节偏移。
+    """
+
+    __slots__ = ("kind", "style", "level", "number", "title", "inline", "line",
+                 "start", "header_end", "end", "byte_start", "byte_end", "volume", "_text")
+
+    def __init__(self, kind, style, level, number, title, inline, line, start, header_end):
+        self.kind = kind
+        self.style = style
+        self.level = level
+        self.number = number
+        self.title = title
+        self.inline = inline
+        self.line = line
+        self.start = start
+        self.header_end = header_end
+        self.end = header_end
+        self.byte_start = 0
+        self.byte_end = 0
+        self.volume = None
+        self._text = None
+
+    @property
+    def body(self) -> str:
+        return self._text[self.header_end:self.end] if self._text is not None else ""
+
+    @property
+    def raw(self) -> str:
+        return self._text[self.start:self.end] if self._text is not None else ""
+
+    def chapter_record(self) -> dict:
+        """与各解析器原有返回值一致的 {chapter, title, summary}"""
+        body = self.body.strip()
+        summary = (self.inline + ("\n" + body if body else "")).strip() if self.inline else body
+        title = self.title
+        if not title and summary:
+            m = _TITLE_FROM_SUMMARY_RE.match(summary)
+            if m:
+                title = m.group(1).strip()
+                summary = m.group(2).strip()
+        return {"chapter": self.number, "title": title, "summary": summary}
+
+    def __repr__(self):
+        return f"OutlineToken({self.kind}, {self.number}, {self.title!r}, {self.start}-{self.end})"
+
+
+class OutlineTokens:
+    def __init__(self, text: str, tokens: List[OutlineToken]):
+        self.text = text
+        self.tokens = tokens
+
+    @property
+    def chapters(self) -> List[OutlineToken]:
+        return [t for t in self.tokens if t.kind == KIND_CHAPTER]
+
+    @property
+    def volumes(self) -> List[OutlineToken]:
+        return [t for t in self.tokens if t.kind == KIND_VOLUME]
+
+    @property
+    def front_end(self) -> int:
+        """第一个章节/卷标题之前的内容（设定、人设等）的结束偏移"""
+        for t in self.tokens:
+            if t.kind != KIND_HEADING:
+                return t.start
+        return len(self.text)
+
+
+def _classify_line(s: str):
+    """s 为去掉首尾空白的行；返回 (kind, style, level, number, title, inline) 或 None"""
+    level = 0
+    style = STYLE_CN
+    m = _HEADING_RE.match(s)
+    if m:
+        level = len(m.group(1))
+        s = m.group(2)
+        style = STYLE_MARKDOWN
+    core = s.strip("*").strip()
+    m = _CN_CHAPTER_RE.match(core)
+    if m is None:
+        m = _EN_CHAPTER_RE.match(core)
+        if m is not None and style != STYLE_MARKDOWN:
+            style = STYLE_EN
+    if m is not None:
+        rest = m.group(2).strip().strip("*").strip()
+        title, inline = rest, ""
+        sp = _TITLE_SPLIT_RE.search(rest)
+        if sp is not None:
+            title = rest[:sp.start()].strip()
+            inline = rest[sp.end():].strip()
+            if not title and (style == STYLE_MARKDOWN or (len(inline) <= 30 and not any(ch in inline for ch in "，。；,;"))):
+                # "### 第1章：标题" / "第1章：标题"
+                title, inline = inline, ""
+        return KIND_CHAPTER, style, level, int(m.group(1)), title.strip("*").strip(), inline
+    m = _VOLUME_RE.match(core)
+    if m is not None:
+        return KIND_VOLUME, style, level, cn_to_int(m.group(1)), m.group(2).strip(" \t:：*"), ""
+    if level:
+        return KIND_HEADING, STYLE_MARKDOWN, level, None, s.strip(), ""
+    return None
+
+
+def tokenize(text: str) -> OutlineTokens:
+    """单次扫描切分全文；耗时与文本长度线性相关"""
+    text = text or ""
+    n = len(text)
+    tokens: List[OutlineToken] = []
+    find = text.find
+    # 在开头补一个换行，让首行也能被预筛命中；偏移相应减一
+    for m in _CANDIDATE_RE.finditer("\n" + text):
+        pos = m.start()
+        nl = find("\n", pos)
+        line_end = n if nl < 0 else nl
+        line = text[pos:line_end].strip()
+        info = _classify_line(line)
+        if info is not None:
+            kind, style, level, number, title, inline = info
+            tokens.append(OutlineToken(kind, style, level, number, title, inline, line, pos, min(line_end + 1, n)))
+
+    # 确定每个标题的正文范围：章节/卷止于下一个章节或卷；Markdown 章节还止于同级或更高级标题，
+    # 普通章节行止于任意 Markdown 标题
+    current_volume = None
+    for idx, tok in enumerate(tokens):
+        tok._text = text
+        if tok.kind == KIND_VOLUME:
+            current_volume = tok.number
+        elif tok.kind == KIND_CHAPTER:
+            tok.volume = current_volume
+        end = n
+        for j in range(idx + 1, len(tokens)):
+            nxt = tokens[j]
+            if nxt.kind != KIND_HEADING:
+                end = nxt.start
+                break
+            if tok.kind == KIND_HEADING:
+                if nxt.level <= tok.level:
+                    end = nxt.start
+                    break
+            elif tok.level == 0 or nxt.level <= tok.level:
+                end = nxt.start
+                break
+        tok.end = max(end, tok.header_end)
+
+    # 字节偏移：按起点顺序累加各段的编码长度，总计仍是一遍
+    char_pos = 0
+    byte_pos = 0
+    starts = sorted(set([t.start for t in tokens] + [t.end for t in tokens]))
+    byte_at = {}
+    for p in starts:
+        byte_pos += len(text[char_pos:p].encode("utf-8"))
+        char_pos = p
+        byte_at[p] = byte_pos
+    for tok in tokens:
+        tok.byte_start = byte_at[tok.start]
+        tok.byte_end = byte_at[tok.end]
+    return OutlineTokens(text, tokens)
+
+
+def parse_chapters(text: str, empty_summary: str = "") -> List[dict]:
+    """解析全部章节 [{chapter, title, summary}]，按章号排序；同一章号出现多次时以后出现的为准"""
+    by_ch = chapters_by_number(text, empty_summary=empty_summary)
+    return [by_ch[k] for k in sorted(by_ch.keys())]
+
+
+def chapters_by_number(text: str, empty_summary: str = "") -> Dict[int, dict]:
+    out: Dict[int, dict] = {}
+    for tok in tokenize(text).tokens:
+        if tok.kind != KIND_CHAPTER:
+            continue
+        rec = tok.chapter_record()
+        if not rec["summary"] and empty_summary:
+            rec["summary"] = empty_summary
+        out[tok.number] = rec
+    return out
@@ -0,0 +1,226 @@
+"""
+进程级 Provider 客户端注册表
+为 Gemini / 豆包兼容接口 / Claude 复用 HTTP 连接，避免每次请求都重新握手（TCP+TLS）
+"""
+
+import hashlib
+import threading
+from urllib.parse import urlsplit
+from typing import Dict, Optional
+
+from . import lazy_import
+
+# 桌面端启动时不加载 requests / google.genai，第一次发请求时才导入
+requests = lazy_import.lazy_module("requests")
+genai = lazy_import.lazy_module("google.genai")
+
+DEFAULT_POOL_CONNECTIONS = 8
+DEFAULT_POOL_MAXSIZE = 16
+
+
+def _origin_of(url: str) -> str:
+    parts = urlsplit((url or "").strip())
+    scheme = (parts.scheme or "https").lower()
+    return f"{scheme}://{(parts.netloc or '').lower()}"
+
+
+def _key_fingerprint(api_key: str) -> str:
+    # 只保存密钥指纹作为缓存键，避免明文密钥出现在统计与日志里
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class ProviderClientRegistry:
+    """
+    Provider 客户端注册表
+
+    - 每个 Base URL（scheme+host）一个 keep-alive 的 requests.Session 连接池
+    - 每个 API Key（按指纹）一个 genai.Client
+    - 统计连接复用情况，便于确认长大纲生成时的握手开销
+    """
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = DEFAULT_POOL_MAXSIZE):
+        self._lock = threading.Lock()
+        self._pool_connections = int(pool_connections)
+        self._pool_maxsize = int(pool_maxsize)
+        self._sessions: Dict[str, "requests.Session"] = {}
+        self._adapters: Dict[str, "requests.adapters.HTTPAdapter"] = {}
+        self._genai_clients: Dict[str, "genai.Client"] = {}
+        self._genai_client_keys: Dict[int, str] = {}
+        self._gemini_base_url = ""
+        self._http_requests = 0
+        self._genai_created = 0
+        self._genai_hits = 0
+
+    # ==================== HTTP（豆包兼容接口 / Claude） ====================
+
+    def get_session(self, url: str) -> "requests.Session":
+        from requests.adapters import HTTPAdapter
+
+        origin = _origin_of(url)
+        with self._lock:
+            sess = self._sessions.get(origin)
+            if sess is None:
+                sess = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self._pool_connections,
+                    pool_maxsize=self._pool_maxsize,
+                    max_retries=0,
+                )
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                self._sessions[origin] = sess
+                self._adapters[origin] = adapter
+            return sess
+
+    def post(self, url: str, **kwargs) -> "requests.Response":
+        sess = self.get_session(url)
+        with self._lock:
+            self._http_requests += 1
+        return sess.post(url, **kwargs)
+
+    # ==================== Gemini ====================
+
+    def set_gemini_base_url(self, base_url: str):
+        """覆盖 Gemini 接口地址（如指向本地模拟服务），空串恢复官方地址"""
+        base_url = (base_url or "").strip().rstrip("/")
+        with self._lock:
+            if base_url == self._gemini_base_url:
+                return
+            self._gemini_base_url = base_url
+            self._genai_clients.clear()
+            self._genai_client_keys.clear()
+
+    def get_genai_client(self, api_key: str, http_options=None) -> "genai.Client":
+        with self._lock:
+            base_url = self._gemini_base_url
+        if http_options is None and base_url:
+            from google.genai import types
+            http_options = types.HttpOptions(base_url=base_url)
+        fp = _key_fingerprint(api_key)
+        if http_options is not None:
+            fp = fp + ":" + hashlib.sha256(repr(http_options).encode("utf-8")).hexdigest()[:8]
+        with self._lock:
+            client = self._genai_clients.get(fp)
+            if client is not None:
+                self._genai_hits += 1
+                return client
+        if http_options is not None:
+            client = genai.Client(api_key=api_key, http_options=http_options)
+        else:
+            client = genai.Client(api_key=api_key)
+        with self._lock:
+            existing = self._genai_clients.get(fp)
+            if existing is not None:
+                self._genai_hits += 1
+                return existing
+            self._genai_clients[fp] = client
+            self._genai_client_keys[id(client)] = _key_fingerprint(api_key)
+            self._genai_created += 1
+            return client
+
+    def key_fingerprint_of(self, client) -> str:
+        """返回注册表创建的 genai.Client 对应的密钥指纹（用于按 Key 限流），未知返回空串"""
+        with self._lock:
+            return self._genai_client_keys.get(id(client), "")
+
+    # ==================== 统计 ====================
+
+    def _connections_opened(self) -> int:
+        total = 0
+        with self._lock:
+            adapters = list(self._adapters.values())
+        for adapter in adapters:
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            try:
+                keys = list(pools.keys())
+            except Exception:
+                continue
+            for k in keys:
+                try:
+                    pool = pools[k]
+                except Exception:
+                    continue
+                total += int(getattr(pool, "num_connections", 0) or 0)
+        return total
+
+    def stats(self) -> dict:
+        opened = self._connections_opened()
+        with self._lock:
+            http_requests = self._http_requests
+            sessions = len(self._sessions)
+            genai_created = self._genai_created
+            genai_hits = self._genai_hits
+        reused = max(0, http_requests - opened)
+        return {
+            "http_sessions": sessions,
+            "http_requests": http_requests,
+            "http_connections_opened": opened,
+            "http_connections_reused": reused,
+            "http_reuse_rate": (reused / http_requests) if http_requests else 0.0,
+            "genai_clients": genai_created,
+            "genai_client_reuses": genai_hits,
+        }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (
+            f"HTTP请求 {s['http_requests']} 次，新建连接 {s['http_connections_opened']} 个，"
+            f"复用 {s['http_connections_reused']} 次（复用率 {s['http_reuse_rate']:.0%}）；"
+            f"Gemini 客户端 {s['genai_clients']} 个，复用 {s['genai_client_reuses']} 次"
+        )
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._adapters.clear()
+            self._genai_clients.clear()
+            self._genai_client_keys.clear()
+        for sess in sessions:
+            try:
+                sess.close()
+            except Exception:
+                pass
+
+
+_REGISTRY: Optional[ProviderClientRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry() -> ProviderClientRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = ProviderClientRegistry()
+    return _REGISTRY
+
+
+def get_session(url: str) -> "requests.Session":
+    return get_registry().get_session(url)
+
+
+def post(url: str, **kwargs) -> "requests.Response":
+    return get_registry().post(url, **kwargs)
+
+
+def get_genai_client(api_key: str, http_options=None) -> "genai.Client":
+    return get_registry().get_genai_client(api_key, http_options=http_options)
+
+
+def set_gemini_base_url(base_url: str):
+    get_registry().set_gemini_base_url(base_url)
+
+
+def key_fingerprint_of(client) -> str:
+    return get_registry().key_fingerprint_of(client)
+
+
+def stats() -> dict:
+    return get_registry().stats()
+
+
+def format_stats() -> str:
+    return get_registry().format_stats()
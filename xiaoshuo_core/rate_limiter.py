@@ -0,0 +1,272 @@
+"""
+进程级令牌桶限流
+按 (provider, 模型, API Key) 共享 RPM / TPM 两个桶：所有工作线程/协程发请求前先取令牌，
+任一请求收到 429 时把共享桶的可用时间整体推后（服从服务端 retryDelay），
+各并发任务一起退避，之后再按允许的最大速度继续。
+
+在 config.json 中配置（0 或缺省表示不限制）：
+    "rate_limits": {
+        "gemini": {"rpm": 10, "tpm": 1000000},
+        "gemini:gemini-2.5-pro": {"rpm": 5},
+        "doubao": {"rpm": 60},
+        "claude": {"rpm": 50, "tpm": 40000}
+    }
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+_MAX_SLEEP_SLICE_SECS = 0.5
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class TokenBucket:
+    """
+    允许透支的令牌桶：取令牌时先扣减，再按欠额计算需要等待的时间。
+    rate_per_min <= 0 表示不限制。
+    """
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None):
+        self.rate_per_min = float(rate_per_min or 0)
+        self.capacity = float(capacity if capacity is not None else self.rate_per_min)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate_per_min <= 0
+
+    def _refill(self, now: float):
+        if self.unlimited:
+            return
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_min / 60.0)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """扣减 amount 个令牌，返回需等待的秒数"""
+        if self.unlimited or amount <= 0:
+            return 0.0
+        self._refill(now)
+        # 单次请求超过桶容量时按容量计，避免永远等不到
+        self.tokens -= min(float(amount), self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens * 60.0 / self.rate_per_min
+
+    def consume(self, amount: float, now: float):
+        if self.unlimited or amount <= 0:
+            return
+        self._refill(now)
+        self.tokens -= float(amount)
+
+    def refund(self, amount: float, now: float):
+        if self.unlimited or amount <= 0:
+            return
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + float(amount))
+
+
+class ProviderLimiter:
+    """单个 (provider, 模型, Key) 的 RPM + TPM 限流器，429 时整体推后"""
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0):
+        self.name = name
+        self._lock = threading.Lock()
+        self._rpm = TokenBucket(rpm)
+        self._tpm = TokenBucket(tpm)
+        self._blocked_until = 0.0
+        self.requests = 0
+        self.waits = 0
+        self.wait_secs = 0.0
+        self.penalties = 0
+
+    def reserve(self, tokens: int = 0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            wait = max(
+                self._blocked_until - now,
+                self._rpm.reserve(1, now),
+                self._tpm.reserve(tokens, now),
+                0.0,
+            )
+            if wait > 0:
+                self.waits += 1
+                self.wait_secs += wait
+            return wait
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """不等待：现在就能发请求时扣令牌并返回 True，否则不扣、返回 False（对冲请求用，不值得排队）"""
+        now = time.monotonic()
+        with self._lock:
+            if self._blocked_until > now:
+                return False
+            wait = max(self._rpm.reserve(1, now), self._tpm.reserve(tokens, now))
+            if wait > 0:
+                self._rpm.refund(1, now)
+                self._tpm.refund(tokens, now)
+                return False
+            self.requests += 1
+            return True
+
+    def release(self, tokens: int = 0):
+        """等待被取消时归还预扣的令牌"""
+        now = time.monotonic()
+        with self._lock:
+            self._rpm.refund(1, now)
+            self._tpm.refund(tokens, now)
+
+    def consume(self, tokens: int):
+        """响应返回后补记输出 token"""
+        with self._lock:
+            self._tpm.consume(tokens, time.monotonic())
+
+    def penalize(self, delay_secs: float):
+        """收到 429：把共享桶的可用时间推后 delay_secs"""
+        until = time.monotonic() + max(0.0, float(delay_secs))
+        with self._lock:
+            self.penalties += 1
+            if until > self._blocked_until:
+                self._blocked_until = until
+
+    def blocked_for(self) -> float:
+        with self._lock:
+            return max(0.0, self._blocked_until - time.monotonic())
+
+    def acquire(self, tokens: int = 0, cancel_event: Optional[threading.Event] = None) -> bool:
+        """阻塞直到可以发请求；被取消返回 False"""
+        wait = self.reserve(tokens)
+        deadline = time.monotonic() + wait
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                self.release(tokens)
+                return False
+            # 等待期间若又收到 429，继续顺延
+            deadline = max(deadline, time.monotonic() + self.blocked_for())
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(_MAX_SLEEP_SLICE_SECS, remaining))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "waits": self.waits,
+                "wait_secs": round(self.wait_secs, 1),
+                "penalties": self.penalties,
+            }
+
+
+class RateLimiterRegistry:
+    def __init__(self, limits: Optional[Dict[str, dict]] = None):
+        self._lock = threading.Lock()
+        self._limits: Dict[str, dict] = dict(limits or {})
+        self._limiters: Dict[Tuple[str, str, str], ProviderLimiter] = {}
+
+    def configure(self, limits: Optional[Dict[str, dict]]):
+        with self._lock:
+            self._limits = dict(limits or {})
+            # 已存在的桶保留欠额与惩罚时间，只更新速率
+            for (provider, model, _), lim in self._limiters.items():
+                rpm, tpm = self._limits_for(provider, model)
+                with lim._lock:
+                    lim._rpm.rate_per_min = lim._rpm.capacity = float(rpm)
+                    lim._tpm.rate_per_min = lim._tpm.capacity = float(tpm)
+
+    def _limits_for(self, provider: str, model: str) -> Tuple[float, float]:
+        node = self._limits.get(f"{provider}:{model}")
+        if not isinstance(node, dict):
+            node = self._limits.get(provider)
+        if not isinstance(node, dict):
+            return 0.0, 0.0
+        try:
+            rpm = float(node.get("rpm") or 0)
+        except Exception:
+            rpm = 0.0
+        try:
+            tpm = float(node.get("tpm") or 0)
+        except Exception:
+            tpm = 0.0
+        return max(0.0, rpm), max(0.0, tpm)
+
+    def get(self, provider: str, model: str, api_key: str = "") -> ProviderLimiter:
+        provider = (provider or "").lower()
+        model = model or ""
+        k = (provider, model, _key_id(api_key))
+        with self._lock:
+            lim = self._limiters.get(k)
+            if lim is None:
+                rpm, tpm = self._limits_for(provider, model)
+                lim = ProviderLimiter(f"{provider}:{model}", rpm=rpm, tpm=tpm)
+                self._limiters[k] = lim
+            return lim
+
+    def stats(self) -> dict:
+        with self._lock:
+            items = list(self._limiters.values())
+        out = {"requests": 0, "waits": 0, "wait_secs": 0.0, "penalties": 0}
+        for lim in items:
+            s = lim.stats()
+            for k in out:
+                out[k] += s[k]
+        out["wait_secs"] = round(out["wait_secs"], 1)
+        return out
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return f"限流等待 {s['waits']}/{s['requests']} 次，共 {s['wait_secs']}s；429 退避 {s['penalties']} 次"
+
+
+_REGISTRY: Optional[RateLimiterRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry() -> RateLimiterRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = RateLimiterRegistry()
+    return _REGISTRY
+
+
+def configure(cfg: Optional[dict]):
+    """读取 config.json 的 rate_limits 节点"""
+    limits = cfg.get("rate_limits") if isinstance(cfg, dict) else None
+    get_registry().configure(limits if isinstance(limits, dict) else {})
+
+
+def get_limiter(provider: str, model: str, api_key: str = "") -> ProviderLimiter:
+    return get_registry().get(provider, model, api_key)
+
+
+def acquire(provider: str, model: str, api_key: str = "", tokens: int = 0, cancel_event: Optional[threading.Event] = None) -> bool:
+    return get_limiter(provider, model, api_key).acquire(tokens, cancel_event=cancel_event)
+
+
+def try_acquire(provider: str, model: str, api_key: str = "", tokens: int = 0) -> bool:
+    return get_limiter(provider, model, api_key).try_acquire(tokens)
+
+
+def release(provider: str, model: str, api_key: str = "", tokens: int = 0):
+    """acquire 之后请求没有发出（熔断跳过、被取消）时归还令牌"""
+    get_limiter(provider, model, api_key).release(tokens)
+
+
+def penalize(provider: str, model: str, api_key: str = "", delay_secs: float = 0):
+    get_limiter(provider, model, api_key).penalize(delay_secs)
+
+
+def consume(provider: str, model: str, api_key: str = "", tokens: int = 0):
+    get_limiter(provider, model, api_key).consume(tokens)
+
+
+def format_stats() -> str:
+    return get_registry().format_stats()
@@ -0,0 +1,230 @@
+"""
+有界的模型请求执行器
+替代“每次请求起一个守护线程 + queue 等待”的超时包装：
+- 固定数量的工作线程，长时间批量生成也不会堆积僵尸线程
+- 每个请求有真实截止时间（含排队时间），同时下发 SDK 级 HTTP 超时，使被放弃的底层连接随后被真正断开
+- 超时/取消的请求被放弃：尚未开始的直接撤销，已在执行的计为“孤儿”，结果到达后丢弃
+"""
+
+import threading
+import time
+import concurrent.futures
+from typing import Any, Callable, Optional
+
+from . import lazy_import
+
+types = lazy_import.lazy_module("google.genai.types")
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT_SECS = 180
+# 截止时间之后留给 SDK 自行断开连接的余量
+SDK_TIMEOUT_GRACE_SECS = 5
+_POLL_INTERVAL_SECS = 0.5
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class _Ticket:
+    __slots__ = ("started", "abandoned")
+
+    def __init__(self):
+        self.started = False
+        self.abandoned = False
+
+
+class RequestExecutor:
+    """
+    有界请求执行器
+
+    - call(fn, ..., timeout_secs, cancel_event)：在工作线程中执行，超时抛 TimeoutError，取消抛 RequestCancelled
+    - stats()：in_flight（正在执行）/ queued（排队中）/ orphaned（已放弃但仍在执行）等计数
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, name: str = "model-request"):
+        self.max_workers = max(1, int(max_workers))
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._orphaned = 0
+        self._submitted = 0
+        self._completed = 0
+        self._timeouts = 0
+        self._cancelled = 0
+        self._abandoned_before_start = 0
+
+    def _run(self, ticket: _Ticket, fn: Callable, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            if ticket.abandoned:
+                # 排队期间已被放弃（撤销失败的极少数情况），不再发起请求
+                return None
+            ticket.started = True
+            self._in_flight += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                if ticket.abandoned:
+                    self._orphaned -= 1
+
+    def _abandon(self, ticket: _Ticket, fut: concurrent.futures.Future):
+        with self._lock:
+            if ticket.abandoned:
+                return
+            ticket.abandoned = True
+            if ticket.started:
+                self._orphaned += 1
+                return
+        if fut.cancel():
+            with self._lock:
+                self._queued -= 1
+                self._abandoned_before_start += 1
+
+    def submit(self, fn: Callable, *args, **kwargs) -> "RequestHandle":
+        """非阻塞提交；调用方自行等待 handle.future，不再需要时调用 handle.abandon()"""
+        ticket = _Ticket()
+        with self._lock:
+            self._queued += 1
+            self._submitted += 1
+        fut = self._pool.submit(self._run, ticket, fn, args, kwargs)
+        return RequestHandle(self, ticket, fut)
+
+    def call(
+        self,
+        fn: Callable,
+        *args,
+        timeout_secs: Optional[float] = DEFAULT_TIMEOUT_SECS,
+        cancel_event: Optional[threading.Event] = None,
+        **kwargs,
+    ) -> Any:
+        handle = self.submit(fn, *args, **kwargs)
+        fut = handle.future
+        deadline = None if timeout_secs is None else time.monotonic() + max(1.0, float(timeout_secs))
+        while True:
+            wait = _POLL_INTERVAL_SECS
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            try:
+                return fut.result(timeout=wait)
+            except concurrent.futures.TimeoutError:
+                pass
+            if cancel_event is not None and cancel_event.is_set():
+                handle.abandon()
+                with self._lock:
+                    self._cancelled += 1
+                raise RequestCancelled("request cancelled")
+            if deadline is not None and time.monotonic() >= deadline:
+                handle.abandon()
+                with self._lock:
+                    self._timeouts += 1
+                raise TimeoutError(f"Gemini request timeout after {timeout_secs}s")
+
+    def note_timeout(self):
+        with self._lock:
+            self._timeouts += 1
+
+    def note_cancelled(self):
+        with self._lock:
+            self._cancelled += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "in_flight": self._in_flight,
+                "orphaned": self._orphaned,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "timeouts": self._timeouts,
+                "cancelled": self._cancelled,
+                "abandoned_before_start": self._abandoned_before_start,
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (
+            f"请求线程 {s['max_workers']} 个，执行中 {s['in_flight']}，排队 {s['queued']}，"
+            f"孤儿 {s['orphaned']}；累计超时 {s['timeouts']} 次，取消 {s['cancelled']} 次"
+        )
+
+    def shutdown(self, wait: bool = False, cancel_futures: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+class RequestHandle:
+    __slots__ = ("executor", "ticket", "future")
+
+    def __init__(self, executor: RequestExecutor, ticket: _Ticket, future: concurrent.futures.Future):
+        self.executor = executor
+        self.ticket = ticket
+        self.future = future
+
+    def abandon(self):
+        if not self.future.done():
+            self.executor._abandon(self.ticket, self.future)
+
+
+def with_request_timeout(config, timeout_secs: Optional[float]):
+    """为 GenerateContentConfig 附加 SDK 级 HTTP 超时（毫秒），已显式设置的不覆盖"""
+    if config is None or timeout_secs is None:
+        return config
+    if getattr(config, "http_options", None) is not None:
+        return config
+    ms = int((max(1.0, float(timeout_secs)) + SDK_TIMEOUT_GRACE_SECS) * 1000)
+    try:
+        return config.model_copy(update={"http_options": types.HttpOptions(timeout=ms)})
+    except Exception:
+        return config
+
+
+def gemini_generate(executor: "RequestExecutor", client, model: str, contents, config,
+                    timeout_secs: float = DEFAULT_TIMEOUT_SECS, cancel_event: Optional[threading.Event] = None):
+    return executor.call(
+        client.models.generate_content,
+        model=model,
+        contents=contents,
+        config=with_request_timeout(config, timeout_secs),
+        timeout_secs=timeout_secs,
+        cancel_event=cancel_event,
+    )
+
+
+_EXECUTOR: Optional[RequestExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def configure(max_workers: int) -> RequestExecutor:
+    """按配置调整工作线程数；仍在执行的旧请求由旧线程池收尾"""
+    global _EXECUTOR
+    max_workers = max(1, int(max_workers))
+    with _EXECUTOR_LOCK:
+        old = _EXECUTOR
+        if old is not None and old.max_workers == max_workers:
+            return old
+        _EXECUTOR = RequestExecutor(max_workers=max_workers)
+    if old is not None:
+        old.shutdown(wait=False)
+    return _EXECUTOR
+
+
+def get_executor() -> RequestExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = RequestExecutor()
+    return _EXECUTOR
+
+
+def stats() -> dict:
+    return get_executor().stats()
+
+
+def format_stats() -> str:
+    return get_executor().format_stats()
@@ -0,0 +1,263 @@
+"""
+模型响应的本地持久缓存（可选，默认关闭）
+“检查并补全大纲”、崩溃后重跑、JSON 段落重试时会发送字节级相同的请求，命中缓存即可跳过调用。
+
+在 config.json 中开启：
+    "response_cache": {"enabled": true, "path": "cache/llm_responses.sqlite3", "max_mb": 256, "ttl_hours": 168}
+
+缓存键覆盖 provider / 模型 / 系统指令 / 内容 / 生成参数，以及本次生成的随机变体（nonce），
+因此不同批次的“创作变体”不会互相命中，多样性不受影响。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+DEFAULT_MAX_MB = 256
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_PATH = os.path.join("cache", "llm_responses.sqlite3")
+
+# 不影响输出内容的字段，不参与缓存键
+_IGNORED_CONFIG_FIELDS = {"http_options"}
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文约 1 字 1 token，其余约 4 字符 1 token"""
+    if not text:
+        return 0
+    cjk = 0
+    for ch in text:
+        if "一" <= ch <= "鿿":
+            cjk += 1
+    return cjk + max(0, len(text) - cjk) // 4
+
+
+def request_tokens(*parts: Any) -> int:
+    """估算请求侧（系统指令 + 内容）的 token 数，命中缓存时计入节省量"""
+    return estimate_tokens(json.dumps(_canonical(list(parts)), ensure_ascii=False))
+
+
+def _canonical(obj: Any) -> Any:
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, bytes):
+        return hashlib.sha256(obj).hexdigest()
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0])) if k not in _IGNORED_CONFIG_FIELDS}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    dump = getattr(obj, "model_dump", None)
+    if callable(dump):
+        try:
+            return _canonical(dump(mode="json", exclude_none=True))
+        except Exception:
+            pass
+    return repr(obj)
+
+
+def make_key(provider: str, model: Any, system: Any = None, contents: Any = None, config: Any = None, nonce: str = "") -> str:
+    payload = {
+        "provider": provider or "",
+        "model": _canonical(model),
+        "system": _canonical(system),
+        "contents": _canonical(contents),
+        "config": _canonical(config),
+        "nonce": nonce or "",
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite 响应缓存
+
+    - 按最近访问时间做 LRU 淘汰，总大小不超过 max_bytes
+    - 超过 TTL 的条目视为未命中并删除
+    - 统计命中率与节省的 token 数（估算）
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024, ttl_secs: float = DEFAULT_TTL_HOURS * 3600):
+        self.path = path
+        self.max_bytes = max(1024 * 1024, int(max_bytes))
+        self.ttl_secs = max(60.0, float(ttl_secs))
+        self._lock = threading.Lock()
+        d = os.path.dirname(os.path.abspath(path))
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " provider TEXT,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " tokens INTEGER NOT NULL DEFAULT 0,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._hits = 0
+        self._misses = 0
+        self._tokens_saved = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, tokens, created_at FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            response, tokens, created_at = row
+            if now - float(created_at) > self.ttl_secs:
+                self._conn.execute("DELETE FROM responses WHERE key=?", (key,))
+                self._misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at=? WHERE key=?", (now, key))
+            self._hits += 1
+            self._tokens_saved += int(tokens or 0)
+            return response
+
+    def put(self, key: str, response: str, provider: str = "", model: str = "", tokens: Optional[int] = None):
+        if not response:
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if tokens is None:
+            tokens = estimate_tokens(response)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, provider, model, response, tokens, size, created_at, accessed_at)"
+                " VALUES(?,?,?,?,?,?,?,?)",
+                (key, provider or "", str(model or ""), response, int(tokens), size, now, now),
+            )
+            self._evict_locked(now)
+
+    def _evict_locked(self, now: float):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_secs,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC"):
+            victims.append((key,))
+            excess -= int(size)
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key=?", victims)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "entries": int(entries),
+                "bytes": int(size),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "tokens_saved": self._tokens_saved,
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (
+            f"响应缓存命中 {s['hits']} 次，未命中 {s['misses']} 次（命中率 {s['hit_rate']:.0%}），"
+            f"约节省 {s['tokens_saved']} tokens；缓存 {s['entries']} 条 / {s['bytes'] / 1024 / 1024:.1f}MB"
+        )
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_SETTINGS = None
+_CACHE_LOCK = threading.Lock()
+
+
+def configure(cfg: Optional[dict], base_dir: str = "") -> Optional[ResponseCache]:
+    """
+    根据 config.json 的 response_cache 节点启用/关闭缓存
+
+    Args:
+        cfg: 完整的 config.json 字典
+        base_dir: 相对路径的基准目录
+
+    Returns:
+        启用时返回缓存实例，否则返回 None
+    """
+    global _CACHE, _CACHE_SETTINGS
+    node = cfg.get("response_cache") if isinstance(cfg, dict) else None
+    if isinstance(node, bool):
+        node = {"enabled": node}
+    if not isinstance(node, dict) or not node.get("enabled"):
+        settings = None
+    else:
+        path = str(node.get("path") or DEFAULT_PATH).strip()
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir or os.getcwd(), path)
+        try:
+            max_mb = float(node.get("max_mb") or DEFAULT_MAX_MB)
+        except Exception:
+            max_mb = DEFAULT_MAX_MB
+        try:
+            ttl_hours = float(node.get("ttl_hours") or DEFAULT_TTL_HOURS)
+        except Exception:
+            ttl_hours = DEFAULT_TTL_HOURS
+        settings = (os.path.abspath(path), int(max_mb * 1024 * 1024), ttl_hours * 3600)
+    with _CACHE_LOCK:
+        if settings == _CACHE_SETTINGS:
+            return _CACHE
+        old = _CACHE
+        _CACHE = ResponseCache(settings[0], max_bytes=settings[1], ttl_secs=settings[2]) if settings else None
+        _CACHE_SETTINGS = settings
+    if old is not None:
+        old.close()
+    return _CACHE
+
+
+def get_cache() -> Optional[ResponseCache]:
+    return _CACHE
+
+
+def lookup(key: str) -> Optional[str]:
+    cache = _CACHE
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception:
+        return None
+
+
+def store(key: str, response: str, provider: str = "", model: str = "", tokens: Optional[int] = None):
+    cache = _CACHE
+    if cache is None or not response:
+        return
+    try:
+        cache.put(key, response, provider=provider, model=model, tokens=tokens)
+    except Exception:
+        pass
+
+
+def format_stats() -> str:
+    cache = _CACHE
+    if cache is None:
+        return "响应缓存未启用"
+    return cache.format_stats()
@@ -0,0 +1,93 @@
+"""
+模型调用的错误分类与退避策略
+Gemini 重试循环 gemini_fallback 与桌面端兼容接口/Claude 调用共用
+"""
+
+import re
+
+EMPTY_RESPONSE_MESSAGE = "Empty response received"
+DEFAULT_RETRY_DELAY_SECS = 30
+
+
+def parse_retry_delay(msg: str) -> int:
+    m = re.search(r"retryDelay['\"]?:\s*'?([0-9]+)s", msg or "")
+    if m:
+        try:
+            return int(m.group(1))
+        except Exception:
+            pass
+    m2 = re.search(r"Please retry in ([0-9]+(?:\.[0-9]+)?)", msg or "")
+    if m2:
+        try:
+            return int(float(m2.group(1)))
+        except Exception:
+            pass
+    return DEFAULT_RETRY_DELAY_SECS
+
+
+def parse_retry_after(headers, default: int = DEFAULT_RETRY_DELAY_SECS) -> int:
+    """读取 HTTP 429 的 Retry-After 头（秒），缺失时返回 default"""
+    try:
+        raw = (headers or {}).get("Retry-After") or (headers or {}).get("retry-after")
+        if raw is not None:
+            return max(1, int(float(str(raw).strip())))
+    except Exception:
+        pass
+    return default
+
+
+def is_rate_limit(msg: str) -> bool:
+    s = (msg or "").lower()
+    return ("resource_exhausted" in s) or ("code: 429" in s) or ("quota" in s)
+
+
+def is_free_tier_block(msg: str) -> bool:
+    s = (msg or "").lower()
+    return ("generate_content_free_tier" in s or "free tier" in s or "free_tier" in s) and ("limit: 0" in s or "limit 0" in s)
+
+
+def is_empty_response(msg: str) -> bool:
+    return EMPTY_RESPONSE_MESSAGE in (msg or "")
+
+
+def empty_backoff(consecutive_empty: int) -> int:
+    return min(20, 2 * (2 ** min(max(consecutive_empty, 1) - 1, 4)))
+
+
+def request_backoff(request_retries: int) -> int:
+    return min(30, 4 * (2 ** request_retries))
+
+
+def extract_gemini_text(resp) -> str:
+    if resp is None:
+        return ""
+    text = getattr(resp, "text", None)
+    if isinstance(text, str) and text.strip():
+        return text
+    parts = getattr(resp, "parts", None)
+    if parts:
+        try:
+            joined = "".join([p.text for p in parts if hasattr(p, "text") and p.text])
+            if joined.strip():
+                return joined
+        except Exception:
+            pass
+    candidates = getattr(resp, "candidates", None)
+    if candidates:
+        for c in candidates:
+            content = getattr(c, "content", None)
+            if content is None:
+                continue
+            ctext = getattr(content, "text", None)
+            if isinstance(ctext, str) and ctext.strip():
+                return ctext
+            cparts = getattr(content, "parts", None)
+            if not cparts:
+                continue
+            try:
+                joined = "".join([p.text for p in cparts if hasattr(p, "text") and p.text])
+                if joined.strip():
+                    return joined
+            except Exception:
+                continue
+    return ""
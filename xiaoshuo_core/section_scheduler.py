@@ -0,0 +1,329 @@
+"""
+大纲分段的依赖调度
+_build_sections / _build_sections_text 给出的是一份有序列表，但其中很多段只依赖前三段“设定集”
+（作品名与类型、核心人设、世界观与设定）。这里为每段推导依赖关系，按 DAG 并发执行：
+依赖全部完成即可开工，结果仍按原顺序提交到界面与最终文本。
+
+依赖规则：
+- 设定集三段依次串行（后一段需要前一段的人名/书名）
+- 爽点清单、三幕结构梗概、黄金三章设计、读者钩子、支线：只依赖设定集
+- 分卷规划与章节大纲：保持原来的前后串行链，链首依赖设定集 + 爽点 + 三幕 + 黄金三章
+
+两阶段模式（多卷时默认开启）：
+- 第一阶段：各卷分卷规划依次生成
+- 第二阶段：不同卷的章节大纲并发生成，卷内批次仍串行；每批只参考设定集、本卷规划、
+  上一卷规划的结尾以及本卷已生成的批次，不再携带全书滚动上下文
+- 卷间衔接：相邻两卷的交界批次都完成后，调用 stitch_fn 改写下一卷开头几章，
+  改写完成前该批次不会提交到界面
+
+在 config.json 中配置：
+    "section_concurrency": 3,
+    "outline_two_phase": true
+"""
+
+import concurrent.futures
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_CONCURRENCY = 3
+# 两阶段模式下，章节批次携带的上一卷规划结尾长度（字符）
+PREV_PLAN_TAIL_CHARS = 1500
+
+BIBLE_TITLES = ("作品名与类型", "核心人设", "世界观与设定")
+# 只依赖设定集、彼此独立的段落
+INDEPENDENT_TITLES = ("爽点清单", "三幕结构梗概", "黄金三章设计", "读者钩子与悬念设计", "可扩展支线与后续走向")
+# 分卷/章节链开始前需要参考的段落
+CHAIN_PREREQ_TITLES = ("爽点清单", "三幕结构梗概", "黄金三章设计")
+
+
+def is_chain_title(title: str) -> bool:
+    """分卷规划与章节大纲属于同一条串行链"""
+    t = (title or "").strip()
+    return t.startswith("章节大纲") or ("分卷规划" in t and t.startswith("第"))
+
+
+def parse_volume_title(title: str) -> Optional[int]:
+    """“第3卷：分卷规划 (31-45章)” -> 3"""
+    m = re.match(r"^\s*第\s*(\d+)\s*卷[:：]\s*分卷规划", title or "")
+    return int(m.group(1)) if m else None
+
+
+def parse_batch_title(title: str) -> Optional[Tuple[int, int, int]]:
+    """“章节大纲 第31-38章 (属于第3卷)” -> (31, 38, 3)"""
+    m = re.match(r"^\s*章节大纲\s*第\s*(\d+)\s*-\s*(\d+)\s*章\s*[（(]\s*属于第\s*(\d+)\s*卷", title or "")
+    if not m:
+        return None
+    return int(m.group(1)), int(m.group(2)), int(m.group(3))
+
+
+def volume_starts(titles: Sequence[str]) -> Dict[int, int]:
+    """每卷第一章的章号"""
+    out: Dict[int, int] = {}
+    for t in titles:
+        info = parse_batch_title(t)
+        if info:
+            a, _b, v = info
+            out[v] = min(a, out.get(v, a))
+    return out
+
+
+def build_dependencies(titles: Sequence[str], two_phase: bool = False) -> List[List[int]]:
+    """
+    根据段落标题推导依赖（均为下标，且只指向更靠前的段落）
+
+    未识别的标题按保守策略处理：依赖它之前的全部段落。
+    """
+    deps: List[List[int]] = []
+    bible: List[int] = []
+    prereq: List[int] = []
+    last_chain: Optional[int] = None
+    last_plan: Optional[int] = None
+    plan_of: Dict[int, int] = {}
+    last_batch_of: Dict[int, int] = {}
+    for idx, raw in enumerate(titles):
+        t = (raw or "").strip()
+        vol = parse_volume_title(t)
+        batch = parse_batch_title(t)
+        if t in BIBLE_TITLES:
+            d = list(bible)
+            bible.append(idx)
+        elif t in INDEPENDENT_TITLES:
+            d = list(bible)
+            if t in CHAIN_PREREQ_TITLES:
+                prereq.append(idx)
+        elif two_phase and vol is not None:
+            d = [last_plan] if last_plan is not None else sorted(set(bible + prereq))
+            last_plan = idx
+            plan_of[vol] = idx
+        elif two_phase and batch is not None and batch[2] in plan_of:
+            v = batch[2]
+            d = [last_batch_of[v]] if v in last_batch_of else [plan_of[v]]
+            last_batch_of[v] = idx
+        elif is_chain_title(t):
+            if last_chain is None:
+                d = sorted(set(bible + prereq))
+            else:
+                d = [last_chain]
+            last_chain = idx
+        else:
+            d = list(range(idx))
+        deps.append(d)
+    return deps
+
+
+def build_context_sources(titles: Sequence[str]) -> Dict[int, List[Tuple[int, Optional[int]]]]:
+    """
+    两阶段模式下章节批次的上下文来源：[(段落下标, 只取结尾多少字符 或 None)]
+    设定集 + 上一卷规划结尾 + 本卷规划 + 本卷已生成的批次
+    """
+    bible = [i for i, t in enumerate(titles) if (t or "").strip() in BIBLE_TITLES]
+    plan_of: Dict[int, int] = {}
+    batches_of: Dict[int, List[int]] = {}
+    out: Dict[int, List[Tuple[int, Optional[int]]]] = {}
+    for idx, t in enumerate(titles):
+        vol = parse_volume_title(t)
+        if vol is not None:
+            plan_of[vol] = idx
+            continue
+        batch = parse_batch_title(t)
+        if batch is None or batch[2] not in plan_of:
+            continue
+        v = batch[2]
+        sources: List[Tuple[int, Optional[int]]] = [(i, None) for i in bible]
+        if (v - 1) in plan_of:
+            sources.append((plan_of[v - 1], PREV_PLAN_TAIL_CHARS))
+        sources.append((plan_of[v], None))
+        sources.extend((i, None) for i in batches_of.get(v, []))
+        batches_of.setdefault(v, []).append(idx)
+        out[idx] = sources
+    return out
+
+
+def volume_boundaries(titles: Sequence[str]) -> List[Tuple[int, int]]:
+    """相邻两卷的交界批次：[(上一卷最后一批, 下一卷第一批)]"""
+    first: Dict[int, int] = {}
+    last: Dict[int, int] = {}
+    for idx, t in enumerate(titles):
+        batch = parse_batch_title(t)
+        if batch is None:
+            continue
+        v = batch[2]
+        first.setdefault(v, idx)
+        last[v] = idx
+    return [(last[v - 1], first[v]) for v in sorted(first) if (v - 1) in last]
+
+
+def dependency_closure(deps: List[List[int]], idx: int) -> List[int]:
+    """idx 的全部（传递）依赖，升序"""
+    seen = set()
+    stack = list(deps[idx])
+    while stack:
+        d = stack.pop()
+        if d in seen:
+            continue
+        seen.add(d)
+        stack.extend(deps[d])
+    return sorted(seen)
+
+
+class SectionScheduler:
+    """
+    按依赖并发生成大纲分段
+
+    - work_fn(idx, context) 在工作线程中执行，返回该段最终文本（可为空串）；
+      context 为其全部依赖段按原顺序拼接的文本（格式同原来的 accumulated）；
+      传入 context_fn(idx) 时改用其返回值（如 ContextStore 的按预算上下文），在提交任务时于调用线程中求值
+    - on_done(idx, text) 在调用线程中、该段一完成就回调（用于更新设定集/进度）
+    - on_commit(idx, text) 在调用线程中按原顺序回调（用于写入界面；空结果不回调）
+    """
+
+    def __init__(self, titles: Sequence[str], concurrency: int = DEFAULT_CONCURRENCY,
+                 cancel_event: Optional[threading.Event] = None, deps: Optional[List[List[int]]] = None,
+                 two_phase: bool = False):
+        self.titles = [str(t or "") for t in titles]
+        self.two_phase = bool(two_phase)
+        self.deps = deps if deps is not None else build_dependencies(self.titles, two_phase=self.two_phase)
+        self.context_sources = build_context_sources(self.titles) if self.two_phase else {}
+        self.boundaries = volume_boundaries(self.titles) if self.two_phase else []
+        self.concurrency = max(1, int(concurrency or 1))
+        self.cancel_event = cancel_event
+        self.results: Dict[int, str] = {}
+
+    def _priority(self, idx: int):
+        # 两阶段模式下分卷规划链是关键路径，优先占用并发名额
+        if self.two_phase and parse_volume_title(self.titles[idx]) is not None:
+            return (0, idx)
+        return (1, idx)
+
+    def _cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def block_of(self, idx: int, text: str) -> str:
+        return "\n\n### " + str(idx + 1) + ". " + self.titles[idx] + "\n" + text
+
+    def context_for(self, idx: int) -> str:
+        sources = self.context_sources.get(idx)
+        if sources is None:
+            sources = [(d, None) for d in dependency_closure(self.deps, idx)]
+        parts = []
+        for d, tail in sources:
+            text = self.results.get(d) or ""
+            if tail:
+                text = text[-tail:]
+            if text:
+                parts.append(self.block_of(d, text))
+        return "".join(parts)
+
+    def _commit(self, idx: int, on_commit) -> str:
+        text = self.results.get(idx) or ""
+        if not text:
+            return ""
+        if on_commit is not None:
+            on_commit(idx, text)
+        return self.block_of(idx, text)
+
+    def run(
+        self,
+        work_fn: Callable[[int, str], str],
+        on_commit: Optional[Callable[[int, str], None]] = None,
+        on_done: Optional[Callable[[int, str], None]] = None,
+        stitch_fn: Optional[Callable[[int, int, str, str], str]] = None,
+        completed: Optional[Dict[int, str]] = None,
+        on_revise: Optional[Callable[[int, str], None]] = None,
+        context_fn: Optional[Callable[[int], str]] = None,
+    ) -> str:
+        """
+        执行全部分段
+
+        Args:
+            stitch_fn: 两阶段模式的卷间衔接 (上一卷最后一批下标, 下一卷第一批下标, 两段文本) -> 改写后的下一段文本；
+                抛出异常或返回空串时保留原文
+            completed: 断点续跑时已完成的段落 {下标: 文本}，直接视为完成（不回调 on_done），照常按序提交
+            on_revise: 衔接改写成功后回调 (下标, 新文本)
+            context_fn: 自定义上下文 (下标) -> 文本，替代按依赖闭包拼接
+
+        Returns:
+            按原顺序拼接的全部已完成段落文本（空结果不计入）。
+            任一段抛出异常时，等待在途段落结束后重新抛出。
+        """
+        n = len(self.titles)
+        pending = set(range(n))
+        running: Dict[concurrent.futures.Future, int] = {}
+        done = set()
+        # 衔接任务：下一卷第一批下标 -> 上一卷最后一批下标；完成前不提交该批次
+        for i, text in (completed or {}).items():
+            if 0 <= i < n and text:
+                self.results[i] = text
+                done.add(i)
+                pending.discard(i)
+        stitches = {b: a for a, b in self.boundaries if b not in (completed or {})} if stitch_fn is not None else {}
+        stitching: Dict[concurrent.futures.Future, int] = {}
+        next_commit = 0
+        accumulated = ""
+        error: Optional[BaseException] = None
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="outline-section")
+        try:
+            while pending or running or stitching:
+                if error is None and not self._cancelled():
+                    ready = [i for i in sorted(pending, key=self._priority) if all(d in done for d in self.deps[i])]
+                    for i in ready:
+                        if len(running) >= self.concurrency:
+                            break
+                        pending.discard(i)
+                        context = context_fn(i) if context_fn is not None else self.context_for(i)
+                        running[pool.submit(work_fn, i, context)] = i
+                if error is None and not self._cancelled():
+                    for b, a in list(stitches.items()):
+                        if a in done and b in done:
+                            del stitches[b]
+                            if self.results.get(a) and self.results.get(b):
+                                stitching[pool.submit(stitch_fn, a, b, self.results[a], self.results[b])] = b
+                if not running and not stitching:
+                    break
+                finished, _ = concurrent.futures.wait(list(running.keys()) + list(stitching.keys()),
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                for fut in finished:
+                    if fut in stitching:
+                        b = stitching.pop(fut)
+                        try:
+                            revised = fut.result() or ""
+                        except Exception:
+                            revised = ""
+                        if revised:
+                            self.results[b] = revised
+                            if on_revise is not None:
+                                on_revise(b, revised)
+                for fut in sorted((f for f in finished if f in running), key=lambda f: running[f]):
+                    i = running.pop(fut)
+                    try:
+                        text = fut.result() or ""
+                    except BaseException as e:
+                        if error is None:
+                            error = e
+                        continue
+                    self.results[i] = text
+                    done.add(i)
+                    if on_done is not None:
+                        on_done(i, text)
+                blocked = set(stitches.keys()) | set(stitching.values())
+                while next_commit < n and next_commit in done and next_commit not in blocked:
+                    accumulated += self._commit(next_commit, on_commit)
+                    next_commit += 1
+        finally:
+            pool.shutdown(wait=True)
+        # 取消或出错时，已完成但排在缺口之后的段落也照常提交，不丢内容
+        for i in sorted(d for d in done if d >= next_commit):
+            accumulated += self._commit(i, on_commit)
+        if error is not None:
+            raise error
+        return accumulated
+
+
+def run_sections(titles, work_fn, on_commit=None, on_done=None, concurrency: int = DEFAULT_CONCURRENCY,
+                 cancel_event: Optional[threading.Event] = None, two_phase: bool = False, stitch_fn=None,
+                 completed: Optional[Dict[int, str]] = None, on_revise=None, context_fn=None) -> str:
+    scheduler = SectionScheduler(titles, concurrency=concurrency, cancel_event=cancel_event, two_phase=two_phase)
+    return scheduler.run(work_fn, on_commit, on_done, stitch_fn=stitch_fn, completed=completed, on_revise=on_revise,
+                         context_fn=context_fn)
@@ -0,0 +1,115 @@
+"""
+桌面端启动耗时记录
+app.py 在各导入阶段、主窗口创建、登录界面画出等节点调用 mark()；默认只在内存里记几个时间点，
+开启分析模式后把报告写到 logs/startup_<时间>.json，并附一份可读的 .txt。
+
+开启方式（任选其一）：
+- 环境变量 OUTLINE_APP_PROFILE_STARTUP=1
+- 命令行参数 --profile-startup
+- 命令行参数 --startup-bench：同时开启分析，登录界面画出后立即退出（供 benchmarks/bench_startup.py 反复冷启动计时）
+"""
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+ENV_VAR = "OUTLINE_APP_PROFILE_STARTUP"
+PROFILE_FLAG = "--profile-startup"
+BENCH_FLAG = "--startup-bench"
+REPORT_PREFIX = "startup_"
+
+# 以本模块被导入的时刻为起点（app.py 最先导入它）；解释器自身与 PyInstaller 解包的耗时由基准脚本从外部计时
+_origin = time.perf_counter()
+_origin_wall = time.time()
+_lock = threading.Lock()
+_marks: List[Tuple[str, float]] = []
+_imports: List[Tuple[str, float, float]] = []
+
+
+def enabled() -> bool:
+    v = (os.environ.get(ENV_VAR) or "").strip().lower()
+    if v and v not in ("0", "false", "no", "off"):
+        return True
+    return PROFILE_FLAG in sys.argv or BENCH_FLAG in sys.argv
+
+
+def bench_mode() -> bool:
+    return BENCH_FLAG in sys.argv
+
+
+def elapsed() -> float:
+    return time.perf_counter() - _origin
+
+
+def mark(name: str) -> float:
+    """记录一个时间点，返回距起点的秒数"""
+    t = elapsed()
+    with _lock:
+        _marks.append((name, t))
+    return t
+
+
+def record_import(name: str, secs: float):
+    """延迟导入的模块实际加载时调用（at 为加载完成时距起点的秒数）"""
+    with _lock:
+        _imports.append((name, elapsed(), float(secs)))
+
+
+def marks() -> List[Tuple[str, float]]:
+    with _lock:
+        return list(_marks)
+
+
+def report() -> dict:
+    with _lock:
+        marks_ = list(_marks)
+        imports = list(_imports)
+    phases = []
+    prev = 0.0
+    for name, t in marks_:
+        phases.append({"name": name, "at_ms": round(t * 1000, 1), "delta_ms": round((t - prev) * 1000, 1)})
+        prev = t
+    heavy = ("google", "requests", "pymysql", "httpx", "pydantic", "urllib3")
+    return {
+        "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(_origin_wall)),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "phases": phases,
+        "lazy_imports": [{"module": n, "at_ms": round(at * 1000, 1), "load_ms": round(s * 1000, 1)} for n, at, s in imports],
+        "modules_loaded": len(sys.modules),
+        "heavy_modules_loaded": sorted(m for m in sys.modules if m.split(".")[0] in heavy and "." not in m),
+    }
+
+
+def format_report(rep: dict) -> str:
+    lines = [f"启动耗时报告（{rep.get('started_at', '')}，Python {rep.get('python', '')}，"
+             f"{'打包版' if rep.get('frozen') else '源码运行'}）"]
+    for p in rep.get("phases") or []:
+        lines.append(f"  {p['at_ms']:>9.1f} ms  (+{p['delta_ms']:>7.1f})  {p['name']}")
+    if rep.get("lazy_imports"):
+        lines.append("延迟导入：")
+        for it in rep["lazy_imports"]:
+            lines.append(f"  {it['module']}: 加载 {it['load_ms']:.1f} ms（于 {it['at_ms']:.1f} ms）")
+    lines.append(f"已加载模块 {rep.get('modules_loaded', 0)} 个；重模块：{', '.join(rep.get('heavy_modules_loaded') or []) or '无'}")
+    return "\n".join(lines)
+
+
+def write_report(log_dir: str, rep: Optional[dict] = None) -> Optional[str]:
+    """写 startup_<时间>.json 与同名 .txt，返回 json 路径；失败返回 None（不影响启动）"""
+    rep = rep or report()
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        ts = time.strftime("%Y%m%d_%H%M%S", time.localtime(_origin_wall))
+        path = os.path.join(log_dir, f"{REPORT_PREFIX}{ts}_{os.getpid()}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rep, f, ensure_ascii=False, indent=2)
+        with open(path[:-len(".json")] + ".txt", "w", encoding="utf-8") as f:
+            f.write(format_report(rep) + "\n")
+        return path
+    except Exception:
+        return None
@@ -0,0 +1,164 @@
+"""
+流式输出的在线质检
+在流式生成过程中检查滚动文本，发现以下问题时立即中止本次输出并重试，
+不必等完整的 8000 token 返回后再由 _violates_genre / _contains_meta 事后发现：
+- 复读：同一句话反复出现，或滚动窗口内重复 n-gram 占比过高
+- 违禁题材词（_get_forbidden_terms）
+- 元叙述（与 _sanitize_text 同一份行首短语表）
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+
+# 行首出现即视为元叙述（“收到”“以下是……”等），_sanitize_text 也使用这份列表
+META_LINE_PREFIXES = ("收到", "感谢", "作为资深", "我将", "我会", "策划案", "以下是", "将为您", "为了确保", "基于您", "这里为您提供")
+
+KIND_REPETITION = "repetition"
+KIND_FORBIDDEN = "forbidden"
+KIND_META = "meta"
+
+_SENTENCE_SPLIT = re.compile(r"[。！？!?\n]+")
+
+
+class StreamGuardTripped(Exception):
+    def __init__(self, kind: str, reason: str):
+        super().__init__(reason)
+        self.kind = kind
+        self.reason = reason
+
+
+class StreamGuard:
+    """
+    流式质检器，逐段 feed()；发现问题返回原因，否则返回 None
+
+    Args:
+        forbidden_terms: 违禁词（小写）
+        ngram: 重复检测的字符 n-gram 长度
+        window: 重复检测的滚动窗口（字符）
+        max_dup_ratio: 窗口内重复 n-gram 占比上限
+        max_sentence_repeats: 同一句（>= min_sentence 字）在窗口内允许出现的次数
+        max_meta_lines: 允许的元叙述行数（少量开场白由 _sanitize_text 清理即可）
+        check_every: 每累计多少新字符做一次重复检测
+    """
+
+    def __init__(
+        self,
+        forbidden_terms: Iterable[str] = (),
+        meta_prefixes: Iterable[str] = META_LINE_PREFIXES,
+        ngram: int = 20,
+        window: int = 2000,
+        max_dup_ratio: float = 0.35,
+        min_sentence: int = 12,
+        max_sentence_repeats: int = 3,
+        max_meta_lines: int = 3,
+        check_every: int = 200,
+    ):
+        self.forbidden_terms = [t.lower() for t in forbidden_terms if t]
+        self.meta_prefixes = tuple(meta_prefixes)
+        self.ngram = max(4, int(ngram))
+        self.window = max(self.ngram * 10, int(window))
+        self.max_dup_ratio = float(max_dup_ratio)
+        self.min_sentence = int(min_sentence)
+        self.max_sentence_repeats = max(2, int(max_sentence_repeats))
+        self.max_meta_lines = max(1, int(max_meta_lines))
+        self.check_every = max(20, int(check_every))
+        self._text = []
+        self._tail = ""
+        self._line = ""
+        self._meta_lines = 0
+        self._since_check = 0
+        self._overlap = max([len(t) for t in self.forbidden_terms] or [1]) - 1
+        self.chars = 0
+
+    def _rolling(self) -> str:
+        if len(self._text) > 64:
+            self._text = ["".join(self._text)[-self.window:]]
+        return "".join(self._text)[-self.window:]
+
+    def _check_forbidden(self, piece: str) -> Optional[str]:
+        if not self.forbidden_terms:
+            return None
+        scan = (self._tail + piece).lower()
+        self._tail = scan[-self._overlap:] if self._overlap > 0 else ""
+        for term in self.forbidden_terms:
+            if term in scan:
+                return term
+        return None
+
+    def _check_meta(self, piece: str) -> bool:
+        buf = self._line + piece
+        lines = buf.split("\n")
+        self._line = lines.pop()
+        for line in lines:
+            if line.strip().startswith(self.meta_prefixes):
+                self._meta_lines += 1
+        return self._meta_lines >= self.max_meta_lines
+
+    def _check_repetition(self) -> Optional[str]:
+        text = self._rolling()
+        sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text) if len(s.strip()) >= self.min_sentence]
+        if sentences:
+            sent, cnt = Counter(sentences).most_common(1)[0]
+            if cnt >= self.max_sentence_repeats:
+                return f"同一句重复 {cnt} 次：{sent[:20]}…"
+        n = self.ngram
+        if len(text) >= n * 10:
+            grams = [text[i:i + n] for i in range(0, len(text) - n + 1)]
+            ratio = 1.0 - len(set(grams)) / float(len(grams))
+            if ratio > self.max_dup_ratio:
+                return f"重复片段占比 {ratio:.0%}"
+        return None
+
+    def feed(self, piece: str) -> Optional[StreamGuardTripped]:
+        if not piece:
+            return None
+        self.chars += len(piece)
+        self._text.append(piece)
+        term = self._check_forbidden(piece)
+        if term:
+            return StreamGuardTripped(KIND_FORBIDDEN, f"出现违禁题材词“{term}”")
+        if self._check_meta(piece):
+            return StreamGuardTripped(KIND_META, f"元叙述行达到 {self._meta_lines} 行")
+        self._since_check += len(piece)
+        if self._since_check >= self.check_every:
+            self._since_check = 0
+            reason = self._check_repetition()
+            if reason:
+                return StreamGuardTripped(KIND_REPETITION, reason)
+        return None
+
+
+class GuardStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.trips = Counter()
+        self.chars_discarded = 0
+        self.tokens_avoided = 0
+
+    def record(self, kind: str, chars_received: int, max_tokens: int):
+        with self._lock:
+            self.trips[kind] += 1
+            self.chars_discarded += int(chars_received)
+            # 中文正文约 1 字 1 token：中止时尚未生成的部分按 max_tokens 估算为节省量
+            self.tokens_avoided += max(0, int(max_tokens) - int(chars_received))
+
+    def format_stats(self) -> str:
+        with self._lock:
+            total = sum(self.trips.values())
+            if not total:
+                return "流式质检未触发"
+            detail = "，".join(f"{k} {v} 次" for k, v in self.trips.items())
+            return f"流式质检中止 {total} 次（{detail}），约少生成 {self.tokens_avoided} tokens"
+
+
+_STATS = GuardStats()
+
+
+def record_trip(kind: str, chars_received: int, max_tokens: int = 8000):
+    _STATS.record(kind, chars_received, max_tokens)
+
+
+def format_stats() -> str:
+    return _STATS.format_stats()
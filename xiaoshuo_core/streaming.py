@@ -0,0 +1,260 @@
+"""
+流式生成
+Gemini generate_content_stream、OpenAI 兼容接口 SSE（stream: true）与 Claude Messages SSE 的统一迭代器，
+以及按章节落盘的临时文件（ChapterSpool）：文本边到边写，生成中途失败也不会丢掉已收到的内容。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Iterator, Optional
+
+from . import lazy_import
+from . import provider_clients
+from . import retry_policy
+
+# 流式读取的单次等待上限（秒）：超过即视为连接卡死
+STREAM_READ_TIMEOUT_SECS = 90
+STREAM_CONNECT_TIMEOUT_SECS = 20
+
+requests = lazy_import.lazy_module("requests")
+
+
+class StreamCancelled(Exception):
+    pass
+
+
+def _check_cancel(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise StreamCancelled("stream cancelled")
+
+
+def compat_chat_url(base_url: str) -> str:
+    base_url = (base_url or "").strip().rstrip("/")
+    if not base_url:
+        raise ValueError("未配置兼容接口 Base URL")
+    if base_url.lower().endswith("/chat/completions"):
+        return base_url
+    return f"{base_url}/chat/completions"
+
+
+def _iter_sse(resp: "requests.Response") -> Iterator[tuple]:
+    """解析 SSE：逐个产出 (event, data)"""
+    event = ""
+    data_lines = []
+    for raw in resp.iter_lines(decode_unicode=False):
+        line = raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else (raw or "")
+        if not line:
+            if data_lines:
+                yield event, "\n".join(data_lines)
+            event = ""
+            data_lines = []
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield event, "\n".join(data_lines)
+
+
+def _raise_for_status(resp: "requests.Response"):
+    if resp.status_code >= 400:
+        try:
+            body = (resp.text or "").strip()
+        except Exception:
+            body = ""
+        raise requests.HTTPError(f"{resp.status_code} Client Error: {body or resp.reason}", response=resp)
+
+
+# ==================== Gemini ====================
+
+def iter_gemini(client, model: str, contents, config, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+    for chunk in client.models.generate_content_stream(model=model, contents=contents, config=config):
+        _check_cancel(cancel_event)
+        piece = retry_policy.extract_gemini_text(chunk)
+        if piece:
+            yield piece
+
+
+# ==================== OpenAI 兼容接口（豆包） ====================
+
+def iter_compat(api_key: str, model: str, system: str, user_msg: str, temperature: float = 0.7, base_url: str = "",
+                max_tokens: int = 4000, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+    url = compat_chat_url(base_url)
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+    }
+    data = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user_msg},
+        ],
+        "temperature": temperature,
+        "max_tokens": int(max_tokens),
+        "stream": True,
+    }
+    resp = provider_clients.post(url, headers=headers, json=data, stream=True,
+                                 timeout=(STREAM_CONNECT_TIMEOUT_SECS, STREAM_READ_TIMEOUT_SECS))
+    try:
+        _raise_for_status(resp)
+        for _event, payload in _iter_sse(resp):
+            _check_cancel(cancel_event)
+            if payload.strip() == "[DONE]":
+                break
+            try:
+                obj = json.loads(payload)
+            except Exception:
+                continue
+            if isinstance(obj, dict) and obj.get("error"):
+                raise RuntimeError(f"兼容接口流式错误: {obj.get('error')}")
+            for choice in (obj.get("choices") or []) if isinstance(obj, dict) else []:
+                delta = choice.get("delta") or choice.get("message") or {}
+                piece = delta.get("content") if isinstance(delta, dict) else None
+                if isinstance(piece, str) and piece:
+                    yield piece
+    finally:
+        resp.close()
+
+
+# ==================== Claude ====================
+
+def iter_claude(api_key: str, model: str, system: str, user_msg: str, temperature: float = 0.7, url: str = "",
+                max_tokens: int = 4096, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+    headers = {
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json",
+        "accept": "text/event-stream",
+    }
+    data = {
+        "model": model,
+        "max_tokens": int(max(256, min(8192, max_tokens))),
+        "temperature": float(temperature),
+        "system": system or "",
+        "messages": [{"role": "user", "content": user_msg or ""}],
+        "stream": True,
+    }
+    resp = provider_clients.post(url, headers=headers, json=data, stream=True,
+                                 timeout=(STREAM_CONNECT_TIMEOUT_SECS, STREAM_READ_TIMEOUT_SECS))
+    try:
+        _raise_for_status(resp)
+        for event, payload in _iter_sse(resp):
+            _check_cancel(cancel_event)
+            try:
+                obj = json.loads(payload)
+            except Exception:
+                continue
+            etype = event or (obj.get("type") if isinstance(obj, dict) else "")
+            if etype == "error":
+                raise RuntimeError(f"Claude 流式错误: {obj.get('error')}")
+            if etype == "message_stop":
+                break
+            if etype == "content_block_delta":
+                delta = obj.get("delta") or {}
+                piece = delta.get("text")
+                if isinstance(piece, str) and piece:
+                    yield piece
+    finally:
+        resp.close()
+
+
+# ==================== 章节临时文件 ====================
+
+class ChapterSpool:
+    """
+    单章流式内容的临时文件
+    生成过程中逐段追加并 flush；完成后 commit() 删除，失败时保留以便续写/恢复。
+    """
+
+    def __init__(self, directory: str, chapter_num: int):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"第{int(chapter_num):04d}章.part")
+        self._parts = []
+        self._fh = open(self.path, "w", encoding="utf-8")
+
+    def write(self, piece: str):
+        if not piece:
+            return
+        self._parts.append(piece)
+        self._fh.write(piece)
+        self._fh.flush()
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def mark(self) -> int:
+        return len(self._parts)
+
+    def rollback(self, mark: int):
+        """丢弃 mark 之后写入的内容（质检中止的那次输出）"""
+        if mark >= len(self._parts):
+            return
+        self._parts = self._parts[:max(0, int(mark))]
+        self._fh.seek(0)
+        self._fh.truncate()
+        self._fh.write("".join(self._parts))
+        self._fh.flush()
+
+    def close(self):
+        try:
+            if not self._fh.closed:
+                self._fh.close()
+        except Exception:
+            pass
+
+    def commit(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except Exception:
+            pass
+
+    def discard(self):
+        """一个字都没收到就失败时删除空的临时文件（不留下误导续写的空 .part）"""
+        self.commit()
+
+    @staticmethod
+    def read_partial(directory: str, chapter_num: int) -> str:
+        path = os.path.join(directory, f"第{int(chapter_num):04d}章.part")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except Exception:
+            return ""
+
+
+class ThrottledSink:
+    """把零碎的流式片段合并后再交给 UI，避免每个 token 都排一次 Tk 回调"""
+
+    def __init__(self, emit, min_chars: int = 64, min_interval_secs: float = 0.1):
+        self._emit = emit
+        self._buf = []
+        self._size = 0
+        self._last = 0.0
+        self.min_chars = int(min_chars)
+        self.min_interval_secs = float(min_interval_secs)
+
+    def write(self, piece: str):
+        if not piece:
+            return
+        self._buf.append(piece)
+        self._size += len(piece)
+        now = time.monotonic()
+        if self._size >= self.min_chars or now - self._last >= self.min_interval_secs:
+            self.flush()
+
+    def flush(self):
+        if not self._buf:
+            return
+        text = "".join(self._buf)
+        self._buf = []
+        self._size = 0
+        self._last = time.monotonic()
+        self._emit(text)
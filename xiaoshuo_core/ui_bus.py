@@ -0,0 +1,157 @@
+"""
+桌面端 UI 更新总线
+工作线程原先每条消息都 root.after(0, ...) 排一个 Tk 事件（追加文本、进度、状态栏各一次），
+流式输出或快速重试时会把 Tk 事件队列塞满，_append_text 每次还要 insert + see(END)。
+
+这里改为：工作线程只把更新放进带锁的缓冲区，由主线程的一个定时回调按约 30 Hz 统一处理——
+连续追加的文本合并成一次 insert，状态栏/进度等只保留最新值，同一回调（如刷新进度）只执行最后一次。
+不依赖 tkinter 本身，root 与 text 只需提供 after / insert / delete / see（mark/truncate 另需 mark_set / mark_gravity / mark_unset）。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Tuple
+
+DEFAULT_INTERVAL_MS = 33
+
+_OP_APPEND = "append"
+_OP_CLEAR = "clear"
+_OP_MARK = "mark"
+_OP_TRUNCATE = "truncate"
+
+
+class UiBus:
+    """
+    线程安全的 UI 更新缓冲
+
+    - append(text)：追加到输出框末尾（相邻的追加合并为一次 insert）
+    - clear()：清空输出框（与追加保持先后顺序，排在它前面尚未显示的追加直接丢弃）
+    - mark(name) / truncate(name)：在当前末尾打标记 / 删除标记之后追加的全部文本（与追加保持先后顺序，用于撤回流式输出）
+    - set(var, value)：设置 StringVar 等变量，同一变量只保留最新值
+    - call(fn, *args)：在主线程执行回调，同一个 fn 只执行最后一次的参数
+    """
+
+    def __init__(self, root, text, interval_ms: int = DEFAULT_INTERVAL_MS):
+        self.root = root
+        self.text = text
+        self.interval_ms = max(1, int(interval_ms))
+        self._lock = threading.Lock()
+        self._ops: List[List[Any]] = []
+        self._latest: "OrderedDict[Any, Tuple[Callable, tuple]]" = OrderedDict()
+        self._scheduled = False
+        self._last_drain = 0.0
+        self._closed = False
+        self.drains = 0
+        self.messages = 0
+
+    # ==================== 工作线程 ====================
+
+    def append(self, text: str):
+        if not text:
+            return
+        with self._lock:
+            self.messages += 1
+            if self._ops and self._ops[-1][0] == _OP_APPEND:
+                self._ops[-1][1].append(text)
+            else:
+                self._ops.append([_OP_APPEND, [text]])
+        self._schedule()
+
+    def clear(self):
+        with self._lock:
+            self.messages += 1
+            self._ops = [[_OP_CLEAR, None]]
+        self._schedule()
+
+    def mark(self, name: str):
+        self._push(_OP_MARK, name)
+
+    def truncate(self, name: str):
+        self._push(_OP_TRUNCATE, name)
+
+    def _push(self, op: str, payload):
+        with self._lock:
+            self.messages += 1
+            self._ops.append([op, payload])
+        self._schedule()
+
+    def set(self, var, value):
+        self._put(("set", id(var)), var.set, (value,))
+
+    def call(self, fn: Callable, *args):
+        self._put(("call", fn), fn, args)
+
+    def _put(self, key, fn: Callable, args: tuple):
+        with self._lock:
+            self.messages += 1
+            self._latest.pop(key, None)
+            self._latest[key] = (fn, args)
+        self._schedule()
+
+    def _schedule(self):
+        with self._lock:
+            if self._scheduled or self._closed:
+                return
+            self._scheduled = True
+            # 空闲后的第一条消息尽快显示，之后每帧最多处理一次
+            wait = self.interval_ms - (time.monotonic() - self._last_drain) * 1000
+        try:
+            self.root.after(max(0, int(wait)), self._drain)
+        except Exception:
+            # 窗口已关闭
+            with self._lock:
+                self._scheduled = False
+                self._closed = True
+
+    # ==================== 主线程 ====================
+
+    def flush(self):
+        """在主线程立即处理缓冲区（读取输出框内容前调用，保证内容完整）"""
+        self._drain()
+
+    def _drain(self):
+        with self._lock:
+            ops, self._ops = self._ops, []
+            latest, self._latest = self._latest, OrderedDict()
+            self._scheduled = False
+            self._last_drain = time.monotonic()
+            self.drains += 1
+        if ops:
+            appended = False
+            for op, payload in ops:
+                try:
+                    if op == _OP_CLEAR:
+                        self.text.delete("1.0", "end")
+                    elif op == _OP_MARK:
+                        # 左重力：之后在末尾插入的文本都排在标记右侧
+                        self.text.mark_set(payload, "end-1c")
+                        self.text.mark_gravity(payload, "left")
+                    elif op == _OP_TRUNCATE:
+                        self.text.delete(payload, "end-1c")
+                        self.text.mark_unset(payload)
+                    else:
+                        self.text.insert("end", "".join(payload))
+                        appended = True
+                except Exception:
+                    pass
+            if appended:
+                try:
+                    self.text.see("end")
+                except Exception:
+                    pass
+        for fn, args in latest.values():
+            try:
+                fn(*args)
+            except Exception:
+                pass
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._ops = []
+            self._latest = OrderedDict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"messages": self.messages, "drains": self.drains}